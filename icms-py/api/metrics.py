@@ -0,0 +1,152 @@
+import re
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# 导出的分位数
+QUANTILES = (0.5, 0.95, 0.99)
+
+_INVALID_NAME_CHARS = re.compile(r'[^a-zA-Z0-9_:]')
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _format_labels(key: tuple, extra=None) -> str:
+    items = list(key) + list(extra or ())
+    if not items:
+        return ''
+    body = ','.join('{}="{}"'.format(k, str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+                    for k, v in items)
+    return '{' + body + '}'
+
+
+class RollingLatency:
+    """单个步骤的耗时：最近 window 次样本用于分位数，次数和总耗时为累计值"""
+
+    __slots__ = ('samples', 'count', 'total')
+
+    def __init__(self, window: int = 1024):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def quantiles(self) -> list[float]:
+        if not self.samples:
+            return [0.0] * len(QUANTILES)
+        values = np.fromiter(self.samples, dtype=np.float64, count=len(self.samples))
+        return [float(v) for v in np.quantile(values, QUANTILES)]
+
+
+class _Timer:
+    __slots__ = ('registry', 'step', 'labels', 'start')
+
+    def __init__(self, registry: 'MetricsRegistry', step: str, labels: dict):
+        self.registry = registry
+        self.step = step
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.registry.observe(self.step, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """
+    进程内的运行指标：热路径各步骤的耗时（滚动窗口 p50/p95/p99）和计数器，
+    render() 输出 Prometheus 文本格式，供 /metrics 使用。线程安全（编码在线程池中执行）。
+    """
+
+    def __init__(self, namespace: str = 'icms', window: int = 1024):
+        self.namespace = namespace
+        self.window = window
+        self.lock = threading.Lock()
+        self.latencies: dict[tuple, RollingLatency] = {}
+        self.counters: dict[str, dict[tuple, float]] = {}
+        self.collectors = []
+
+    def observe(self, step: str, seconds: float, **labels):
+        """记录一次步骤耗时（秒）"""
+        key = (step, _label_key(labels))
+        with self.lock:
+            latency = self.latencies.get(key)
+            if latency is None:
+                latency = self.latencies[key] = RollingLatency(self.window)
+            latency.observe(seconds)
+
+    def timer(self, step: str, **labels) -> _Timer:
+        """计时上下文：with METRICS.timer('face_detect'): ..."""
+        return _Timer(self, step, labels)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """累加计数器（name 不含前缀，以 _total 结尾）"""
+        if not value:
+            return
+        key = _label_key(labels)
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def add_collector(self, collector):
+        """注册导出时调用的采集函数 collector() -> [(name, 'counter'/'gauge', labels, value), ...]"""
+        self.collectors.append(collector)
+
+    def _metric_name(self, name: str) -> str:
+        return _INVALID_NAME_CHARS.sub('_', f"{self.namespace}_{name}")
+
+    def render(self) -> str:
+        """Prometheus 文本格式（text/plain; version=0.0.4）"""
+        lines = []
+        name = self._metric_name('step_duration_seconds')
+        with self.lock:
+            rows = [(step, key, latency.quantiles(), latency.count, latency.total)
+                    for (step, key), latency in sorted(self.latencies.items())]
+            counters = {n: sorted(series.items()) for n, series in sorted(self.counters.items())}
+
+        if rows:
+            lines.append(f"# HELP {name} Duration of hot-path steps (rolling window quantiles).")
+            lines.append(f"# TYPE {name} summary")
+            for step, key, quantiles, count, total in rows:
+                labels = key + (('step', step),)
+                for q, value in zip(QUANTILES, quantiles):
+                    lines.append(f"{name}{_format_labels(labels, [('quantile', q)])} {value!r}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total!r}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        for counter, series in counters.items():
+            metric = self._metric_name(counter)
+            lines.append(f"# TYPE {metric} counter")
+            for key, value in series:
+                lines.append(f"{metric}{_format_labels(key)} {value}")
+
+        collected = {}
+        for collector in list(self.collectors):
+            try:
+                samples = collector() or []
+            except Exception:
+                continue
+            for metric, kind, labels, value in samples:
+                if value is not None:
+                    collected.setdefault((self._metric_name(metric), kind), []).append((_label_key(labels), value))
+        for (metric, kind), series in sorted(collected.items()):
+            lines.append(f"# TYPE {metric} {kind}")
+            for key, value in series:
+                lines.append(f"{metric}{_format_labels(key)} {value}")
+
+        return '\n'.join(lines) + '\n'
+
+
+# 进程内默认注册表
+METRICS = MetricsRegistry()
@@ -1 +1,208 @@
-1
\ No newline at end of file
+import asyncio
+import logging
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from api.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+BOUNDARY_PREFIX = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+
+# 尺寸档位：相对原始画面的缩放比例
+SIZES = {"full": 1.0, "half": 0.5, "thumb": 0.25}
+# 质量档位：JPEG 编码质量
+QUALITIES = {"high": 80, "medium": 60, "low": 40}
+# 自动模式的升降档顺序，从高到低
+LADDER = [
+    ("full", "high"),
+    ("full", "medium"),
+    ("half", "high"),
+    ("half", "medium"),
+    ("thumb", "medium"),
+    ("thumb", "low"),
+]
+DEFAULT_RENDITION = ("full", "high")
+
+# 自动模式：每个评估窗口的发布帧数，以及降档/升档的丢帧比例阈值
+AUTO_WINDOW_FRAMES = 30
+AUTO_DOWNGRADE_DROP_RATIO = 0.5
+AUTO_UPGRADE_DROP_RATIO = 0.1
+
+
+def parse_rendition(size: str | None = None, quality: str | None = None) -> tuple[tuple[str, str], bool]:
+    """解析客户端请求的档位；size 为 'auto' 时从默认档位开始按吞吐自适应，无法识别的取值回退到默认档位"""
+    auto = size == "auto"
+    size = size if size in SIZES else DEFAULT_RENDITION[0]
+    quality = quality if quality in QUALITIES else DEFAULT_RENDITION[1]
+    return (size, quality), auto
+
+
+class MJPEGBroadcaster:
+    """
+    asyncio 版 MJPEG 广播器：每个发布的帧只编码一次，所有客户端共享同一份 JPEG 数据。
+    慢客户端总是拿最新帧，中间帧直接跳过，不会在服务端积压。
+    支持多档清晰度（尺寸 × 质量），每档只在有人观看时才按需编码。
+    """
+
+    def __init__(self, quality: int = 80):
+        self.qualities = dict(QUALITIES, high=quality)
+        self._new_frame = asyncio.Condition()
+        self._encode_locks: dict[tuple[str, str], asyncio.Lock] = {}
+
+        self.frame: np.ndarray | None = None  # 最新发布的帧（发布后不再修改）
+        self.seq = 0
+        self._encoded: dict[tuple[str, str], tuple[int, bytes]] = {}
+        self._scaled: dict[str, tuple[int, np.ndarray]] = {}
+        self._rendition_subscribers: dict[str, int] = {}
+
+        # 计数在事件循环和编码线程之外也会被读取（/stats、/metrics），统一在锁内修改
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "subscribers": 0,
+            "published": 0,
+            "encoded": 0,
+            "sent": 0,
+            "dropped": 0,
+        }
+
+    async def publish(self, frame: np.ndarray):
+        """发布一帧，调用方之后不得再修改该帧"""
+        if frame is None:
+            return
+        async with self._new_frame:
+            self.frame = frame
+            self.seq += 1
+            with self._stats_lock:
+                self.stats["published"] += 1
+            self._new_frame.notify_all()
+
+    def reset(self):
+        """清空最新帧（分析停止时调用）"""
+        self.frame = None
+        self._encoded.clear()
+        self._scaled.clear()
+
+    def get_stats(self) -> dict:
+        with self._stats_lock:
+            return dict(self.stats, renditions=dict(self._rendition_subscribers))
+
+    def _render(self, seq: int, frame: np.ndarray, rendition: tuple[str, str]) -> bytes | None:
+        """缩放并编码（在线程池中执行）；同一序列号的缩放结果在各质量档之间共享"""
+        with METRICS.timer('imencode'):
+            return self._render_chunk(seq, frame, rendition)
+
+    def _render_chunk(self, seq: int, frame: np.ndarray, rendition: tuple[str, str]) -> bytes | None:
+        size, quality = rendition
+        scale = SIZES[size]
+        image = frame
+        if scale < 1.0:
+            cached = self._scaled.get(size)
+            if cached is not None and cached[0] == seq:
+                image = cached[1]
+            else:
+                h, w = frame.shape[:2]
+                image = cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))),
+                                   interpolation=cv2.INTER_AREA)
+                self._scaled[size] = (seq, image)
+        flag, encoded_image = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.qualities[quality]])
+        if not flag:
+            return None
+        return BOUNDARY_PREFIX + encoded_image.tobytes() + b'\r\n'
+
+    async def _encode(self, seq: int, frame: np.ndarray, rendition: tuple[str, str]) -> bytes | None:
+        """同一序列号、同一档位只编码一次，编码在线程池中执行以免阻塞事件循环"""
+        lock = self._encode_locks.setdefault(rendition, asyncio.Lock())
+        async with lock:
+            cached = self._encoded.get(rendition)
+            if cached is not None and cached[0] >= seq:
+                return cached[1]
+            chunk = await asyncio.to_thread(self._render, seq, frame, rendition)
+            if chunk is None:
+                return None
+            self._encoded[rendition] = (seq, chunk)
+            with self._stats_lock:
+                self.stats["encoded"] += 1
+            return chunk
+
+    def _subscribe(self, rendition: tuple[str, str], delta: int):
+        key = f"{rendition[0]}/{rendition[1]}"
+        with self._stats_lock:
+            count = self._rendition_subscribers.get(key, 0) + delta
+            if count > 0:
+                self._rendition_subscribers[key] = count
+            else:
+                # 没有观众的档位不再保留缓存，后续也不会再编码
+                self._rendition_subscribers.pop(key, None)
+                self._encoded.pop(rendition, None)
+
+    async def stream(self, max_fps: float | None = None, timeout: float = 1.0,
+                     size: str | None = None, quality: str | None = None):
+        """为一个 HTTP 客户端生成 multipart 数据流；size='auto' 时按丢帧比例自动升降档"""
+        rendition, auto = parse_rendition(size, quality)
+        level = LADDER.index(rendition) if rendition in LADDER else 0
+        with self._stats_lock:
+            self.stats["subscribers"] += 1
+        self._subscribe(rendition, 1)
+
+        last_seq = 0
+        window_start_seq = 0
+        window_dropped = 0
+        min_interval = 1.0 / max_fps if max_fps else 0.0
+        last_sent = 0.0
+        try:
+            while True:
+                async with self._new_frame:
+                    if self.seq <= last_seq:
+                        try:
+                            await asyncio.wait_for(self._new_frame.wait(), timeout)
+                        except asyncio.TimeoutError:
+                            continue
+                    seq, frame = self.seq, self.frame
+                if frame is None or seq <= last_seq:
+                    continue
+
+                chunk = await self._encode(seq, frame, rendition)
+                if chunk is None:
+                    continue
+                if last_seq:
+                    dropped = seq - last_seq - 1
+                    with self._stats_lock:
+                        self.stats["dropped"] += dropped
+                    window_dropped += dropped
+                    METRICS.inc('frames_dropped_total', dropped, reason='stream_client')
+                else:
+                    window_start_seq = seq
+                last_seq = seq
+                with self._stats_lock:
+                    self.stats["sent"] += 1
+                yield chunk
+
+                if auto and seq - window_start_seq >= AUTO_WINDOW_FRAMES:
+                    drop_ratio = window_dropped / float(seq - window_start_seq)
+                    new_level = level
+                    if drop_ratio > AUTO_DOWNGRADE_DROP_RATIO and level < len(LADDER) - 1:
+                        new_level = level + 1
+                    elif drop_ratio < AUTO_UPGRADE_DROP_RATIO and level > 0:
+                        new_level = level - 1
+                    if new_level != level:
+                        logger.debug(f"客户端丢帧比例 {drop_ratio:.2f}，档位 {LADDER[level]} -> {LADDER[new_level]}")
+                        self._subscribe(rendition, -1)
+                        level = new_level
+                        rendition = LADDER[level]
+                        self._subscribe(rendition, 1)
+                    window_start_seq = seq
+                    window_dropped = 0
+
+                if min_interval:
+                    wait = last_sent + min_interval - time.time()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    last_sent = time.time()
+        finally:
+            self._subscribe(rendition, -1)
+            with self._stats_lock:
+                self.stats["subscribers"] -= 1
@@ -9,6 +9,8 @@ from fastapi import APIRouter
 from fastapi.responses import StreamingResponse, JSONResponse, HTMLResponse
 from deepface import DeepFace
 from .utils import FaceEncoder, AdvancedLivenessChecker, MouthOpeningDetector
+from api.video_streams import MJPEGBroadcaster
+from api.metrics import METRICS
 
 # 设置日志记录的基本配置，方便调试
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -58,6 +60,13 @@ class FacialRecognitionService:
         self.mouth_detector = MouthOpeningDetector()
         self.stats = {"fps": 0.0, "process_fps": 0.0}
 
+        # 视频流广播：每帧只编码一次，所有客户端共享
+        self.broadcaster = MJPEGBroadcaster(quality=80)
+        self._latest_consumed = True  # 最新帧是否已被AI循环取走，未取走就被覆盖的帧计为丢帧
+        METRICS.add_collector(lambda: [('stream_subscribers', 'gauge', {}, self.broadcaster.stats["subscribers"])])
+        self._fps_start_time = time.time()
+        self._fps_frame_count = 0
+
     async def start_analysis(self):
         """按需启动视频流分析"""
         if self.is_running:
@@ -106,6 +115,7 @@ class FacialRecognitionService:
         # 清理状态
         self.latest_frame = None
         self.processed_frame = None
+        self.broadcaster.reset()
         self.latest_result.clear()
         logger.info("视频流分析已停止")
 
@@ -128,7 +138,8 @@ class FacialRecognitionService:
                 self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 2)
                 continue
 
-            ret, frame = self.cap.read()
+            with METRICS.timer('capture_read'):
+                ret, frame = self.cap.read()
             if not ret:
                 logger.warning("无法读取视频帧，可能流已中断，尝试重连...")
                 async with self.lock:
@@ -143,8 +154,16 @@ class FacialRecognitionService:
                 self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 2)
                 continue
 
+            METRICS.inc('frames_captured_total')
             async with self.lock:
+                if not self._latest_consumed:
+                    METRICS.inc('frames_dropped_total', reason='ai_busy')
                 self.latest_frame = frame
+                self._latest_consumed = False
+                has_processed = self.processed_frame is not None
+            # 刚启动还没有处理过的帧时，先推送原始帧
+            if not has_processed:
+                await self._publish(frame.copy())
             await asyncio.sleep(1/60)
 
     def reset_state(self):
@@ -186,6 +205,7 @@ class FacialRecognitionService:
             async with self.lock:
                 if self.latest_frame is None: await asyncio.sleep(0.02); continue
                 frame_to_process = self.latest_frame.copy()
+                self._latest_consumed = True
             display_frame = frame_to_process.copy()
 
             try:
@@ -195,10 +215,11 @@ class FacialRecognitionService:
                     self.reset_state()
                     async with self.lock: self.latest_result.clear()
 
-                detected_faces = await asyncio.to_thread(
-                    DeepFace.extract_faces,
-                    img_path=frame_to_process, detector_backend=DETECTOR_BACKEND, enforce_detection=False
-                )
+                with METRICS.timer('face_detect'):
+                    detected_faces = await asyncio.to_thread(
+                        DeepFace.extract_faces,
+                        img_path=frame_to_process, detector_backend=DETECTOR_BACKEND, enforce_detection=False
+                    )
 
                 if detected_faces:
                     main_face = detected_faces[0]
@@ -207,7 +228,8 @@ class FacialRecognitionService:
                     # --- 三阶段状态机 ---
                     if self.liveness_state == "CHECKING":
                         # 阶段1: 被动检测 (模型+移动)
-                        liveness_data = self.liveness_checker.check(frame_to_process, region)
+                        with METRICS.timer('liveness'):
+                            liveness_data = self.liveness_checker.check(frame_to_process, region)
                         if self._update_passive_check_state(liveness_data, region, frame_to_process.shape):
                             self.passive_check_stable_frames += 1
                         else:
@@ -222,13 +244,15 @@ class FacialRecognitionService:
 
                     elif self.liveness_state == "ACTION_REQUIRED":
                         # 阶段2: 主动检测 (张嘴)
-                        mouth_ratio = self.mouth_detector.check_mouth_open(frame_to_process)
+                        with METRICS.timer('mouth'):
+                            mouth_ratio = self.mouth_detector.check_mouth_open(frame_to_process)
                         if mouth_ratio is not None:
                             logger.info(f"Mouth Open Ratio: {mouth_ratio:.4f} (Threshold: {self.MOUTH_OPEN_THRESHOLD})")
                             if mouth_ratio > self.MOUTH_OPEN_THRESHOLD:
                                 logger.info("✅ 主动检测通过 (嘴巴张开)!")
                                 face_crop = main_face['face']
-                                face_data = await self.encoder.extract_vector(face_crop)
+                                with METRICS.timer('embedding'):
+                                    face_data = await self.encoder.extract_vector(face_crop)
                                 if face_data:
                                     logger.info("特征向量提取成功！验证完成。")
                                     self.liveness_state = "PASSED"
@@ -242,7 +266,8 @@ class FacialRecognitionService:
                                     self.reset_state()
 
                     # 无论哪个状态，都绘制可视化框
-                    self._draw_visualization(display_frame, region)
+                    with METRICS.timer('visualize'):
+                        self._draw_visualization(display_frame, region)
 
                 else:
                     # 如果未检测到人脸，重置所有状态
@@ -256,6 +281,7 @@ class FacialRecognitionService:
                 # ... (更新FPS和processed_frame的代码保持不变) ...
                 async with self.lock:
                     self.processed_frame = display_frame
+                await self._publish(display_frame)
 
             except Exception as e:
                 logger.error(f"AI处理循环中发生错误: {e}", exc_info=True)
@@ -284,43 +310,30 @@ class FacialRecognitionService:
         cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
         cv2.putText(frame, text, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
 
-    async def get_video_stream(self):
-        """获取视频流生成器"""
-        fps_start_time = time.time()
-        fps_frame_count = 0
+    async def _publish(self, display_frame: np.ndarray):
+        """在发布端绘制FPS信息并交给广播器，每帧只绘制和编码一次"""
+        self._fps_frame_count += 1
+        elapsed_time = time.time() - self._fps_start_time
+        if elapsed_time >= 1.0:
+            self.stats['fps'] = self._fps_frame_count / elapsed_time
+            self._fps_start_time = time.time()
+            self._fps_frame_count = 0
+
+        # 在帧上绘制FPS信息
+        cv2.putText(display_frame, f"Display FPS: {self.stats['fps']:.1f}",
+                    (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+        cv2.putText(display_frame, f"Process FPS: {self.stats['process_fps']:.1f}",
+                    (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+        await self.broadcaster.publish(display_frame)
+
+    async def get_video_stream(self, size: str | None = None, quality: str | None = None):
+        """获取视频流生成器（共享广播器的编码结果，慢客户端丢帧不积压）
+
+        size: full/half/thumb/auto，quality: high/medium/low；size=auto 时按客户端吞吐自动升降档
+        """
         try:
-            while True:
-                display_frame = None
-                async with self.lock:
-                    # 优先使用处理过的帧，如果不存在（例如刚启动时），则使用原始帧
-                    display_frame = self.processed_frame if self.processed_frame is not None else self.latest_frame
-
-                if display_frame is None:
-                    await asyncio.sleep(0.1)
-                    continue
-
-                fps_frame_count += 1
-                elapsed_time = time.time() - fps_start_time
-                if elapsed_time >= 1.0:
-                    self.stats['fps'] = fps_frame_count / elapsed_time
-                    fps_start_time = time.time()
-                    fps_frame_count = 0
-
-                # 在帧上绘制FPS信息
-                cv2.putText(display_frame, f"Display FPS: {self.stats['fps']:.1f}",
-                            (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
-                cv2.putText(display_frame, f"Process FPS: {self.stats['process_fps']:.1f}",
-                            (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
-
-                # 将图像帧编码为JPEG格式
-                flag, encoded_image = cv2.imencode(".jpg", display_frame,
-                                               [cv2.IMWRITE_JPEG_QUALITY, 80])
-                if not flag:
-                    continue
-
-                yield (b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + bytearray(encoded_image) + b'\r\n')
-
-                await asyncio.sleep(1 / 25)
+            async for chunk in self.broadcaster.stream(max_fps=25, size=size, quality=quality):
+                yield chunk
         except GeneratorExit:
             # 当客户端断开连接时会触发这个异常
             logger.info("视频流客户端断开连接")
@@ -364,11 +377,11 @@ async def shutdown_event():
         logger.error(f"关闭人脸识别服务时发生错误: {e}")
 
 @router.get("/video_feed")
-async def video_feed():
+async def video_feed(size: str | None = None, quality: str | None = None):
     try:
         await facial_service.start_analysis()
         return StreamingResponse(
-            facial_service.get_video_stream(),
+            facial_service.get_video_stream(size, quality),
             media_type="multipart/x-mixed-replace; boundary=frame"
         )
     except Exception as e:
@@ -376,12 +389,12 @@ async def video_feed():
         raise
 
 @router.get("/video_feed_cors")
-async def video_feed_cors():
+async def video_feed_cors(size: str | None = None, quality: str | None = None):
     """支持CORS的视频流接口，用于前端跨域访问"""
     try:
         await facial_service.start_analysis()
         response = StreamingResponse(
-            facial_service.get_video_stream(),
+            facial_service.get_video_stream(size, quality),
             media_type="multipart/x-mixed-replace; boundary=frame"
         )
         # 添加CORS头
@@ -1,9 +1,11 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 import logging
 from facial_recognition.facial import router as facial_stream_router
 from facial_recognition.facial_login import router as facial_login_router
 import fastapi_cdn_host
+from api.metrics import METRICS
 
 # 配置日志
 logging.basicConfig(level=logging.INFO,
@@ -53,6 +55,11 @@ async def root():
     """测试根路由是否正常工作"""
     return {"message": "ICMS API 服务正常运行中"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus 文本格式的运行指标：各步骤耗时分位数和丢帧计数"""
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     logger.info("正在启动服务器...")
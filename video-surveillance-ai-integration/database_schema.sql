@@ -28,7 +28,13 @@ CREATE TABLE alert_events (
     INDEX idx_source_type (source_type),
     INDEX idx_acknowledged (acknowledged),
     INDEX idx_created_at (created_at),
-    INDEX idx_rule_id (rule_id)
+    INDEX idx_rule_id (rule_id),
+    -- 告警历史查询的复合索引：过滤条件 + 时间，支持按 (event_time, id) 游标分页
+    INDEX idx_time_id (event_time, id),
+    INDEX idx_danger_time (danger_level, event_time),
+    INDEX idx_source_time (source_type, event_time),
+    INDEX idx_ack_time (acknowledged, event_time),
+    INDEX idx_ack_danger_time (acknowledged, danger_level, event_time)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='告警事件表';
 
 -- 2. 告警图像表
@@ -87,6 +93,32 @@ CREATE TABLE IF NOT EXISTS alert_statistics (
     INDEX idx_stat_type (stat_type)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='告警统计表';
 
+-- 6. 告警按小时/按天统计汇总表（写入和确认告警时增量维护，统计接口只读汇总表；
+--    随 alert_events 一起重建；旧库可运行 rebuild_alert_rollups.py 从 alert_events 回填）
+DROP TABLE IF EXISTS alert_rollup_hourly;
+CREATE TABLE alert_rollup_hourly (
+    bucket_start DATETIME NOT NULL COMMENT '小时起始时间',
+    camera_id VARCHAR(64) NOT NULL DEFAULT '' COMMENT '摄像头ID（单路模式为空）',
+    source_type VARCHAR(50) NOT NULL COMMENT '告警来源类型',
+    danger_level VARCHAR(20) NOT NULL COMMENT '危险级别',
+    level VARCHAR(20) NOT NULL COMMENT '告警级别',
+    acknowledged BOOLEAN NOT NULL COMMENT '是否已确认',
+    alert_count INT NOT NULL DEFAULT 0 COMMENT '告警条数',
+    PRIMARY KEY (bucket_start, camera_id, source_type, danger_level, level, acknowledged)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='告警按小时统计汇总表';
+
+DROP TABLE IF EXISTS alert_rollup_daily;
+CREATE TABLE alert_rollup_daily (
+    bucket_date DATE NOT NULL COMMENT '统计日期',
+    camera_id VARCHAR(64) NOT NULL DEFAULT '' COMMENT '摄像头ID（单路模式为空）',
+    source_type VARCHAR(50) NOT NULL COMMENT '告警来源类型',
+    danger_level VARCHAR(20) NOT NULL COMMENT '危险级别',
+    level VARCHAR(20) NOT NULL COMMENT '告警级别',
+    acknowledged BOOLEAN NOT NULL COMMENT '是否已确认',
+    alert_count INT NOT NULL DEFAULT 0 COMMENT '告警条数',
+    PRIMARY KEY (bucket_date, camera_id, source_type, danger_level, level, acknowledged)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='告警按天统计汇总表';
+
 -- 插入默认配置（如果不存在）
 INSERT IGNORE INTO system_config (config_key, config_value, config_type, description) VALUES
 ('database_version', '1.0', 'string', '数据库版本'),
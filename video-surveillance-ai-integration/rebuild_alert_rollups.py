@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+告警统计汇总重建脚本
+从 alert_events 重新计算按小时/按天的统计汇总表（旧库回填，或汇总与明细不一致时使用）
+
+用法:
+    python rebuild_alert_rollups.py                 # 按 src/config/database.json 的默认数据库全部重算
+    python rebuild_alert_rollups.py --days 7        # 只重算最近7天
+    python rebuild_alert_rollups.py --backend sqlite --sqlite_db alerts.db
+"""
+
+import sys
+import json
+import argparse
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent / "src"))
+
+
+def load_database_config():
+    """加载数据库配置"""
+    config_path = Path(__file__).resolve().parent / "src" / "config" / "database.json"
+    if not config_path.exists():
+        print("错误: 数据库配置文件不存在")
+        return None
+
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"错误: 加载配置文件失败: {e}")
+        return None
+
+
+def open_database(backend, config, sqlite_db=None):
+    """按后端类型打开告警数据库"""
+    if backend == 'sqlite':
+        from models.alert.alert_database import AlertDatabase
+        return AlertDatabase(sqlite_db or config.get('sqlite', {}).get('database', 'alerts.db'))
+
+    from models.alert.mysql_database import MySQLAlertDatabase
+    mysql_config = config['mysql']
+    return MySQLAlertDatabase(
+        host=mysql_config['host'],
+        port=mysql_config['port'],
+        user=mysql_config['user'],
+        password=mysql_config['password'],
+        database=mysql_config['database'],
+        charset=mysql_config['charset']
+    )
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='重建告警统计汇总表')
+    parser.add_argument('--backend', choices=['mysql', 'sqlite'], default=None,
+                        help='数据库类型（默认取配置文件的 default）')
+    parser.add_argument('--sqlite_db', type=str, default=None, help='SQLite数据库文件')
+    parser.add_argument('--days', type=int, default=None, help='只重算最近多少天（默认全部）')
+    args = parser.parse_args()
+
+    print("=== 重建告警统计汇总 ===")
+    config = load_database_config()
+    if not config:
+        return False
+    backend = args.backend or config.get('default', 'mysql')
+
+    try:
+        database = open_database(backend, config, args.sqlite_db)
+    except Exception as e:
+        print(f"错误: 连接数据库失败: {e}")
+        return False
+
+    try:
+        rows = database.rebuild_rollups(since_days=args.days)
+        if rows < 0:
+            print("错误: 重算失败，详见日志")
+            return False
+        print(f"✓ 重算完成（{'最近 %d 天' % args.days if args.days else '全部'}），日汇总 {rows} 行")
+
+        totals = database.get_alert_totals()
+        print(f"  累计告警 {totals.get('total_alerts', 0)} 条，未处理 {totals.get('unhandled_alerts', 0)} 条")
+        return True
+    finally:
+        database.close()
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
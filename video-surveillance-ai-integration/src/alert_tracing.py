@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+告警延迟追踪模块 - 统计从画面捕获到告警各阶段（识别、入库、通知送达）的延迟
+
+- 每帧在捕获时记录单调时钟时间戳（time.monotonic()）和墙上时间，并分配 trace_id
+- 帧产生告警时，告警带上 trace 字典：trace_id、捕获时间和各阶段相对捕获的偏移 stages_ms；
+  入库完成、通知送达时再补记 db / notified 阶段
+- 各阶段按告警类型汇总延迟分布（滚动窗口 p50/p95/p99/max），
+  通过 get_stats() 提供给 /api/alerts/latency，/metrics 中为 alert_latency_seconds{stage,type}
+"""
+
+import time
+import uuid
+import threading
+
+from metrics import METRICS
+
+# 告警延迟的阶段：特征、检测、识别（告警产生）、入库、通知送达
+TRACE_STAGES = ('features', 'detection', 'recognition', 'db', 'notified')
+
+LATENCY_METRIC = 'alert_latency_seconds'
+
+
+def new_trace_id():
+    return uuid.uuid4().hex[:16]
+
+
+def make_trace(trace_id, capture_time, captured_at, marks=None):
+    """为一条告警创建 trace 字典
+
+    Args:
+        trace_id (str): 帧的 trace_id
+        capture_time (float): 捕获时的单调时钟时间戳（秒）
+        captured_at (float): 捕获时的墙上时间（time.time()）
+        marks (dict): 已经完成的阶段 {stage: 单调时钟时间戳}
+
+    Returns:
+        dict: {'trace_id', 'captured_at', 'capture_monotonic', 'stages_ms': {stage: 毫秒}}
+    """
+    trace = {
+        'trace_id': trace_id,
+        'captured_at': captured_at,
+        'capture_monotonic': capture_time,
+        'stages_ms': {}
+    }
+    for stage, timestamp in (marks or {}).items():
+        trace['stages_ms'][stage] = (timestamp - capture_time) * 1000
+    return trace
+
+
+class AlertLatencyTracker:
+    """按告警类型统计捕获到各阶段的延迟"""
+
+    def __init__(self, registry=METRICS):
+        self.registry = registry
+        self.lock = threading.Lock()
+        registry.describe(LATENCY_METRIC, 'Latency from frame capture to each alert stage (rolling window quantiles).')
+
+    def record(self, trace, alert_type):
+        """记录一条告警在产生时已完成的各阶段延迟（trace 由 make_trace 创建）"""
+        for stage, offset_ms in trace['stages_ms'].items():
+            self.registry.observe_summary(LATENCY_METRIC, offset_ms / 1000.0, stage=stage, type=alert_type)
+
+    def mark(self, trace, stage, alert_type, now=None):
+        """补记一个阶段（入库、通知送达），同一阶段只记第一次；返回该阶段相对捕获的毫秒数
+
+        trace 可能正被其他线程序列化（/alerts、入库），stages_ms 整体替换而不是原地修改
+        """
+        if not isinstance(trace, dict) or trace.get('capture_monotonic') is None:
+            return None
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            stages = dict(trace.get('stages_ms') or {})
+            if stage in stages:
+                return None
+            offset_ms = stages[stage] = (now - trace['capture_monotonic']) * 1000
+            trace['stages_ms'] = stages
+        self.registry.observe_summary(LATENCY_METRIC, offset_ms / 1000.0, stage=stage, type=alert_type)
+        return offset_ms
+
+    def get_stats(self, alert_type=None):
+        """各阶段按告警类型的延迟分布 {stage: {type: {count, p50_ms, p95_ms, p99_ms, max_ms}}}"""
+        stats = {}
+        for key, snapshot in self.registry.summary_snapshot(LATENCY_METRIC, stage=None, type=alert_type):
+            labels = dict(key)
+            stats.setdefault(labels['stage'], {})[labels['type']] = snapshot
+        return {stage: stats[stage] for stage in TRACE_STAGES if stage in stats}
+
+
+# 进程内默认的告警延迟追踪器（通知插件在送达后补记 notified 阶段）
+ALERT_LATENCY = AlertLatencyTracker()
@@ -16,7 +16,7 @@ import numpy as np
 import threading
 import json
 from queue import Queue
-from datetime import datetime, date
+from datetime import datetime
 import traceback
 import collections
 import uuid
@@ -50,6 +50,21 @@ except ImportError as e:
     logger.error(f"导入DangerRecognizer失败: {str(e)}")
     sys.exit(1)
 
+# 导入多路摄像头注册模块
+from camera_stream import CameraStream, CameraRegistry, parse_camera_sources
+from inference_scheduler import InferenceScheduler, parse_yolo_results
+from cadence_controller import CadenceController
+from load_shedding import LoadShedController
+from detection_propagation import DetectionPropagator
+from pipeline import Stage, StagePipeline
+from metrics import METRICS
+from alert_tracing import ALERT_LATENCY, new_trace_id, make_trace
+from models.alert.pagination import decode_cursor  # 告警历史游标分页
+from models.alert.alert_store import AlertStore
+
+# 首页告警列表和 /alerts/stats 不展示的告警类型
+HIDDEN_ALERT_TYPES = ('Intrusion Alert', 'Large Area Motion')
+
 # 导入告警数据库模块
 try:
     from models.alert.alert_database import AlertDatabase
@@ -92,6 +107,36 @@ except ImportError as e:
     logger.warning(f"未找到audio_monitor，声学检测功能将被禁用: {e}")
 
 
+class FrameJob:
+    """处理流水线中的一帧：依次由各阶段填充特征、检测、告警和可视化结果"""
+
+    __slots__ = ('frame_ref', 'frame_id', 'process_frame', 'display_frame', 'should_process',
+                 'features', 'object_detections', 'alerts', 'alert_infos', 'vis_frame',
+                 'analysis_start', 'features_time', 'detection_time', 'ai_time',
+                 'trace_id', 'capture_time', 'captured_at', 'marks', 'stage_times')
+
+    def __init__(self, frame_ref, should_process):
+        self.frame_ref = frame_ref  # 槽位引用，输出阶段释放
+        self.frame_id = frame_ref.frame_id
+        self.trace_id = new_trace_id()
+        self.capture_time = frame_ref.capture_time  # 捕获时的单调时钟时间戳
+        self.captured_at = frame_ref.timestamp  # 捕获时的墙上时间
+        self.marks = {}  # 各阶段完成时的单调时钟时间戳 {stage: t}
+        self.stage_times = {}  # 各阶段的处理耗时（秒），由流水线填写
+        self.process_frame = frame_ref.process_frame
+        self.display_frame = frame_ref.frame
+        self.should_process = should_process
+        self.features = None
+        self.object_detections = None
+        self.alerts = []
+        self.alert_infos = []
+        self.vis_frame = None
+        self.analysis_start = None
+        self.features_time = 0.0
+        self.detection_time = 0.0
+        self.ai_time = None  # 本帧未做AI检测时为None
+
+
 class AllInOneSystem:
     """全功能视频监控系统 - 整合所有模块"""
 
@@ -106,28 +151,16 @@ class AllInOneSystem:
         # 初始化状态
         self.running = False  # 是否正在运行
         self.paused = False  # 是否暂停
-        self.current_frame = None  # 原始摄像头当前帧
-        self.processed_frame = None  # 处理（叠加可视化）后帧
         self.last_frame_time = 0  # 上一帧的时间戳
-        self.fps = 0  # 平均帧率
-        self.frame_count = 0  # 已读取的总帧数
-        self.processed_count = 0  # 实际参与运动/AI 分析处理的帧数
         self.alerts = []  # 当前触发的告警列表
-        self.alert_count = 0  # 累积告警次数
         self.start_time = time.time()  # 启动时间戳，用于计算运行时长
         self.recognized_behaviors = []  # 存储识别到的行为信息
         self.recognized_interactions = []  # 存储识别到的交互信息
         self.recent_alerts = collections.deque(maxlen=1000)  # 记录最近1000条告警
-        # 新增：全历史告警列表
-        self.all_alerts = []  # 保存所有历史告警
-        
-        # 新增：告警处理相关
-        self.alert_handling_stats = {
-            'total_alerts': 0,
-            'handled_alerts': 0,
-            'unhandled_alerts': 0
-        }  # 告警处理统计
-        self.alert_lock = threading.Lock()  # 告警数据锁
+        # 内存中的告警：有界存储，按id索引并维护按类型的处理计数；淘汰的未落库告警写入数据库
+        self.alert_store = AlertStore(max_alerts=getattr(args, 'max_alerts_in_memory', 5000),
+                                      on_evict=self._spill_alerts)
+        self.alert_lock = self.alert_store.lock  # 告警数据锁（recent_alerts 等共用）
         
         # 初始化告警数据库（强制只用MySQL测试）
         from models.alert.mysql_database import MySQLAlertDatabase
@@ -145,53 +178,86 @@ class AllInOneSystem:
             logger.error(f"MySQL告警数据库初始化失败: {str(e)}")
             self.alert_database = None
 
-        # 线程和队列设置
-        self.frame_queue = Queue(maxsize=30)  # 存储「捕获线程 → 处理线程」的帧（缓冲队列）
+        # 告警持久化：图片和数据库记录在后台批量写入，不阻塞处理线程
+        self.alert_persistence = None
+        if self.alert_database is not None:
+            from models.alert.alert_persistence import AlertPersistence
+            self.alert_persistence = AlertPersistence(
+                self.alert_database,
+                max_queue=getattr(args, 'alert_queue_size', 256),
+                image_workers=getattr(args, 'alert_image_workers', 2)
+            )
+
+        # 线程和队列设置（「捕获线程 → 处理线程」的帧队列由每路摄像头各自持有）
         self.result_queue = Queue(maxsize=30)  # 暂未使用，可用于「处理线程 → 其他线程」
         self.threads = []  # 存储线程对象，后面方便一起管理 & join
 
-        # 初始化运动特征管理器
-        self.motion_manager = MotionFeatureManager(
-            use_optical_flow=True,
-            use_motion_history=args.use_motion_history,
-            optical_flow_method='farneback',
-            use_gpu=args.use_gpu
-        )
-
-        # 初始化危险行为识别器
-        danger_config = {
-            'feature_count_threshold': args.feature_threshold,
-            'motion_area_threshold': args.area_threshold,
-            'alert_cooldown': args.alert_cooldown,
-            'save_alerts': args.save_alerts,
-            'alert_dir': os.path.join(args.output, 'alerts'),
-            'min_confidence': args.min_confidence,
-            # 新增：危险区域停留检测配置
-            'distance_threshold_m': getattr(args, 'distance_threshold', 50),
-            'dwell_time_threshold_s': getattr(args, 'dwell_time_threshold', 1.0),
-            'fps': args.max_fps
-        }
-        # 实例化危险检测器
-        self.danger_recognizer = DangerRecognizer(danger_config)
-
-        # 如果指定了警戒区域，添加它，也是从命令行传参
-        if args.alert_region:
+        # 可选的光流工作进程池，各路摄像头共享（需在启动任何线程之前创建）
+        self.flow_pool = None
+        if getattr(args, 'flow_workers', 0) > 0:
             try:
-                regions = eval(args.alert_region)
-                if isinstance(regions, list) and len(regions) >= 3:
-                    self.danger_recognizer.add_alert_region(regions, "Alert Zone")
+                from models.motion.flow_pool import FlowWorkerPool
+                from models.motion.motion_manager import flow_sampling_params
+                # 工作进程按分析宽度对应的步长采样运动矢量，主进程不必重新采样
+                _, step, mag_threshold = flow_sampling_params(getattr(args, 'flow_width', 0) or None)
+                self.flow_pool = FlowWorkerPool(
+                    num_workers=args.flow_workers,
+                    max_width=max(int(1920 * args.process_scale), args.width),
+                    max_height=max(int(1080 * args.process_scale), args.height),
+                    step=step,
+                    mag_threshold=mag_threshold
+                )
             except Exception as e:
-                logger.error(f"解析警戒区域失败: {str(e)}")
-
-        # 初始化AI模块（如果可用）
+                logger.error(f"光流进程池初始化失败，使用进程内计算: {str(e)}")
+                self.flow_pool = None
+
+        # 初始化摄像头注册表：每路视频拥有独立的运动特征管理器、危险行为识别器和跟踪状态
+        self.cameras = CameraRegistry()
+        camera_sources = parse_camera_sources(getattr(args, 'sources', None), args.source)
+        multi_camera = len(camera_sources) > 1
+        # 流水线模式下各阶段队列中的帧都持有槽位，环形缓冲需额外留出这些槽位
+        ring_slots = 8
+        if getattr(args, 'pipelined', False):
+            ring_slots += 5 * (getattr(args, 'pipeline_queue_size', 2) + 1) + 2
+        for cam_id, source in camera_sources:
+            alert_dir = os.path.join(args.output, 'alerts', cam_id) if multi_camera else os.path.join(args.output, 'alerts')
+            metrics = METRICS.scope(camera=cam_id)
+            self.cameras.register(CameraStream(
+                cam_id,
+                source,
+                self._create_motion_manager(metrics),
+                self._create_danger_recognizer(alert_dir, metrics),
+                cadence=self._create_cadence_controller(),
+                propagator=DetectionPropagator() if getattr(args, 'propagate_detections', False) else None,
+                ring_slots=ring_slots,
+                metrics=metrics,
+                load_shedder=self._create_load_shedder()
+            ))
+        for camera in self.cameras:
+            camera.pipeline = self._create_pipeline(camera)
+            METRICS.add_collector(camera.collect_metrics)
+        METRICS.add_collector(self._collect_metrics)
+        logger.info(f"已注册 {len(self.cameras)} 路摄像头: {self.cameras.ids()}")
+
+        # 初始化AI模块（如果可用），所有摄像头共享同一个检测模型，
+        # 由批量推理调度器把各路请求合并成批次后统一调用
         self.ai_model = None
+        self.inference_scheduler = None
         if args.enable_ai and HAS_AI:
             try:
                 self.ai_model = YOLO(args.vision_model + ".pt")
                 logger.info(f"成功加载AI模型: {args.vision_model}")
+                self.inference_scheduler = InferenceScheduler(
+                    self.ai_model,
+                    self._parse_ai_results,
+                    max_batch=args.ai_batch_size,
+                    max_wait_ms=args.ai_batch_wait_ms,
+                    num_streams=len(self.cameras)
+                )
             except Exception as e:
                 logger.error(f"加载AI模型失败: {str(e)}")
                 self.ai_model = None
+                self.inference_scheduler = None
 
         # 初始化Web服务器（如果可用且启用）
         self.app = None
@@ -202,17 +268,18 @@ class AllInOneSystem:
         else:
             print("未调用init_web_server，条件不满足")
 
-        # 初始化视频录制器，如果用户传了 --record 参数，就把最终处理后的画面同时录制到视频文件里保存
-        self.video_writer = None
+        # 初始化视频录制器，如果用户传了 --record 参数，就把每路处理后的画面同时录制到视频文件里保存
         if args.record:
-            try:
-                fourcc = cv2.VideoWriter_fourcc('X', 'V', 'I', 'D')
-                output_path = os.path.join(args.output, f"output_{datetime.now().strftime('%Y%m%d_%H%M%S')}.avi")
-                self.video_writer = cv2.VideoWriter(output_path, fourcc, 20.0, (args.width, args.height))
-                logger.info(f"视频将录制到: {output_path}")
-            except Exception as e:
-                logger.error(f"初始化视频录制器失败: {str(e)}")
-                self.video_writer = None
+            for camera in self.cameras:
+                try:
+                    fourcc = cv2.VideoWriter_fourcc('X', 'V', 'I', 'D')
+                    name = f"output_{camera.cam_id}_" if multi_camera else "output_"
+                    output_path = os.path.join(args.output, f"{name}{datetime.now().strftime('%Y%m%d_%H%M%S')}.avi")
+                    camera.video_writer = cv2.VideoWriter(output_path, fourcc, 20.0, (args.width, args.height))
+                    logger.info(f"摄像头 {camera.cam_id} 视频将录制到: {output_path}")
+                except Exception as e:
+                    logger.error(f"初始化视频录制器失败: {str(e)}")
+                    camera.video_writer = None
 
         # 自动启动音频监控线程（如可用）
         self.audio_thread = None
@@ -229,6 +296,104 @@ class AllInOneSystem:
 
         logger.info("全功能视频监控系统初始化完成")
 
+    def _create_motion_manager(self, metrics=None):
+        """为单路摄像头创建运动特征管理器"""
+        return MotionFeatureManager(
+            use_optical_flow=True,
+            use_motion_history=self.args.use_motion_history,
+            optical_flow_method='farneback',
+            use_gpu=self.args.use_gpu,
+            flow_pool=self.flow_pool,
+            roi_gating=getattr(self.args, 'roi_flow', False),
+            flow_width=getattr(self.args, 'flow_width', 0) or None,
+            metrics=metrics
+        )
+
+    def _create_cadence_controller(self):
+        """为单路摄像头创建自适应处理节奏控制器（未启用时返回None，按固定间隔处理）"""
+        args = self.args
+        if not getattr(args, 'adaptive_cadence', False):
+            return None
+        return CadenceController(
+            busy_process_every=1,
+            idle_process_every=args.idle_process_every,
+            busy_ai_interval=args.busy_ai_interval,
+            idle_ai_interval=args.idle_ai_interval,
+            cpu_budget=args.cadence_budget
+        )
+
+    def _create_load_shedder(self):
+        """为单路摄像头创建过载降级控制器（未启用时返回None）"""
+        if not getattr(self.args, 'load_shedding', False):
+            return None
+        return LoadShedController(min_check_fps=self.args.min_check_fps)
+
+    def _create_danger_recognizer(self, alert_dir, metrics=None):
+        """为单路摄像头创建危险行为识别器（含独立的跟踪和告警状态）"""
+        args = self.args
+        danger_config = {
+            'feature_count_threshold': args.feature_threshold,
+            'motion_area_threshold': args.area_threshold,
+            'alert_cooldown': args.alert_cooldown,
+            'save_alerts': args.save_alerts,
+            'alert_dir': alert_dir,
+            'min_confidence': args.min_confidence,
+            # 新增：危险区域停留检测配置
+            'distance_threshold_m': getattr(args, 'distance_threshold', 50),
+            'dwell_time_threshold_s': getattr(args, 'dwell_time_threshold', 1.0),
+            'fps': args.max_fps
+        }
+        # 实例化危险检测器
+        danger_recognizer = DangerRecognizer(danger_config, metrics=metrics)
+
+        # 如果指定了警戒区域，添加它，也是从命令行传参
+        if args.alert_region:
+            try:
+                regions = eval(args.alert_region)
+                if isinstance(regions, list) and len(regions) >= 3:
+                    danger_recognizer.add_alert_region(regions, "Alert Zone")
+            except Exception as e:
+                logger.error(f"解析警戒区域失败: {str(e)}")
+        return danger_recognizer
+
+    # 以下属性保持单路模式下的原有接口，指向默认摄像头或汇总所有摄像头
+    @property
+    def motion_manager(self):
+        return self.cameras.default.motion_manager
+
+    @property
+    def danger_recognizer(self):
+        return self.cameras.default.danger_recognizer
+
+    @property
+    def current_frame(self):
+        return self.cameras.default.current_frame
+
+    @property
+    def processed_frame(self):
+        return self.cameras.default.processed_frame
+
+    @property
+    def frame_count(self):
+        return sum(camera.frame_count for camera in self.cameras)
+
+    @property
+    def processed_count(self):
+        return sum(camera.processed_count for camera in self.cameras)
+
+    @property
+    def fps(self):
+        return sum(camera.fps for camera in self.cameras)
+
+    @property
+    def alert_count(self):
+        """累积告警次数（各路在 stats_lock 下计数，这里求和）"""
+        return sum(camera.alert_count for camera in self.cameras)
+
+    def _resolve_camera(self, cam_id=None):
+        """根据请求中的cam_id获取摄像头，未指定时返回默认摄像头"""
+        return self.cameras.get(cam_id or None)
+
     def init_web_server(self):
         """初始化Web服务器"""
         print("init_web_server方法被调用")
@@ -265,11 +430,28 @@ class AllInOneSystem:
             return render_template('index.html')
 
         @self.app.route('/video_feed')
-        def video_feed():
-            """视频流路由"""
-            return Response(self.generate_frames(),
+        @self.app.route('/video_feed/<cam_id>')
+        def video_feed(cam_id=None):
+            """视频流路由，未指定cam_id时输出默认摄像头
+
+            查询参数 size=full|half|thumb|auto、quality=high|medium|low 选择清晰度档位，
+            size=auto 时按客户端实际吞吐自动升降档
+            """
+            camera = self._resolve_camera(cam_id)
+            if camera is None:
+                return jsonify({'success': False, 'message': f'摄像头不存在: {cam_id}'}), 404
+            return Response(self.generate_frames(camera, request.args.get('size'), request.args.get('quality')),
                             mimetype='multipart/x-mixed-replace; boundary=frame')
 
+        @self.app.route('/cameras')
+        def cameras():
+            """摄像头列表API"""
+            return jsonify({
+                'success': True,
+                'default': self.cameras.default.cam_id,
+                'cameras': [camera.get_stats() for camera in self.cameras]
+            })
+
         @self.app.route('/stats')
         def stats():
             """统计信息API"""
@@ -280,60 +462,63 @@ class AllInOneSystem:
                 'processed_count': self.processed_count,
                 'alert_count': self.alert_count,
                 'running_time': f"{elapsed:.1f}秒",
-                'status': 'Running' if self.running else 'Stopped'
+                'status': 'Running' if self.running else 'Stopped',
+                'cameras': {camera.cam_id: camera.get_stats() for camera in self.cameras},
+                'inference': self.inference_scheduler.get_stats() if self.inference_scheduler else None,
+                'flow_pool': self.flow_pool.get_stats() if self.flow_pool else None,
+                'alert_persistence': self.alert_persistence.get_stats() if self.alert_persistence else None,
+                'alert_store': self.alert_store.get_stats(),
+                'db_pool': self.alert_database.get_pool_stats() if self.alert_database else None
             })
 
+        @self.app.route('/metrics')
+        def metrics():
+            """Prometheus 文本格式的运行指标：各步骤耗时分位数、丢帧等计数器和队列深度"""
+            return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
         @self.app.route('/alerts')
         def alerts():
-            # 过滤掉 Intrusion Alert 和 Large Area Motion，取全历史最新10条有效告警
-            with self.alert_lock:
-                filtered_alerts = [alert for alert in self.all_alerts[::-1]
-                                   if alert.get('type', '') not in ['Intrusion Alert', 'Large Area Motion']]
-                alerts_data = []
-                for alert in filtered_alerts[:10]:
-                    alert_data = {
-                        'id': alert.get('id', ''),
-                        'type': alert.get('type', ''),
-                        'danger_level': alert.get('danger_level', 'medium'),
-                        'time': alert.get('time', ''),
-                        'confidence': alert.get('confidence', 0),
-                        'frame': alert.get('frame', 0),
-                        'desc': alert.get('desc', ''),
-                        'handled': alert.get('handled', False),
-                        'handled_time': alert.get('handled_time', None),
-                        'person_id': alert.get('person_id', ''),
-                        'person_class': alert.get('person_class', ''),
-                        # 添加位置信息
-                        'location': alert.get('location', {
-                            'x': 0,
-                            'y': 0,
-                            'rel_x': 0,
-                            'rel_y': 0,
-                            'description': '未知位置',
-                            'region_name': alert.get('region_name', '')
-                        }),
-                        # 新增：声学检测结果
-                        'audio_labels': alert.get('audio_labels', None),
-                        'audio_db_stats': alert.get('audio_db_stats', None),
-                        'volume_exceeded': alert.get('volume_exceeded', False),
-                        'volume_threshold': alert.get('volume_threshold', None)
-                    }
-                    alerts_data.append(alert_data)
-                return jsonify(alerts_data)
+            # 过滤掉 Intrusion Alert 和 Large Area Motion，取最新10条有效告警
+            alerts_data = []
+            for alert in self.alert_store.recent(10, exclude_types=HIDDEN_ALERT_TYPES):
+                # 告警第一次返回给前端时记为送达，记录捕获到通知的延迟
+                ALERT_LATENCY.mark(alert.get('trace'), 'notified', alert.get('type', ''))
+                alert_data = {
+                    'id': alert.get('id', ''),
+                    'trace_id': alert.get('trace_id'),
+                    'trace': alert.get('trace'),
+                    'type': alert.get('type', ''),
+                    'danger_level': alert.get('danger_level', 'medium'),
+                    'time': alert.get('time', ''),
+                    'confidence': alert.get('confidence', 0),
+                    'frame': alert.get('frame', 0),
+                    'desc': alert.get('desc', ''),
+                    'handled': alert.get('handled', False),
+                    'handled_time': alert.get('handled_time', None),
+                    'person_id': alert.get('person_id', ''),
+                    'person_class': alert.get('person_class', ''),
+                    # 添加位置信息
+                    'location': alert.get('location', {
+                        'x': 0,
+                        'y': 0,
+                        'rel_x': 0,
+                        'rel_y': 0,
+                        'description': '未知位置',
+                        'region_name': alert.get('region_name', '')
+                    }),
+                    # 新增：声学检测结果
+                    'audio_labels': alert.get('audio_labels', None),
+                    'audio_db_stats': alert.get('audio_db_stats', None),
+                    'volume_exceeded': alert.get('volume_exceeded', False),
+                    'volume_threshold': alert.get('volume_threshold', None)
+                }
+                alerts_data.append(alert_data)
+            return jsonify(alerts_data)
 
         @self.app.route('/alerts/stats')
         def alert_stats():
-            # 统计时也过滤掉 Intrusion Alert 和 Large Area Motion，基于 all_alerts
-            with self.alert_lock:
-                filtered_alerts = [a for a in self.all_alerts if a.get('type', '') not in ['Intrusion Alert', 'Large Area Motion']]
-                total = len(filtered_alerts)
-                handled = sum(1 for a in filtered_alerts if a.get('handled', False))
-                unhandled = total - handled
-            return jsonify({
-                'total_alerts': total,
-                'handled_alerts': handled,
-                'unhandled_alerts': unhandled
-            })
+            # 统计时也过滤掉 Intrusion Alert 和 Large Area Motion，读取按类型维护的计数
+            return jsonify(self.alert_store.counts(exclude_types=HIDDEN_ALERT_TYPES))
 
         @self.app.route('/alerts/handle', methods=['POST'])
         def handle_alert():
@@ -346,23 +531,18 @@ class AllInOneSystem:
             if self.alert_database:
                 db_success = self.alert_database.acknowledge_alert(alert_id)
 
-            with self.alert_lock:
-                # 查找并更新告警状态
-                for alert in self.all_alerts:
-                    if alert.get('id') == alert_id:
-                        if not alert.get('handled', False):
-                            alert['handled'] = True
-                            alert['handled_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                            self.alert_handling_stats['handled_alerts'] += 1
-                            self.alert_handling_stats['unhandled_alerts'] = max(0, self.alert_handling_stats['unhandled_alerts'] - 1)
-                            if db_success:
-                                return jsonify({'status': 'success', 'message': 'Alert marked as handled and database updated'})
-                            else:
-                                return jsonify({'status': 'warning', 'message': 'Alert marked as handled, but database update failed'})
-                        else:
-                            return jsonify({'status': 'info', 'message': 'Alert already handled'})
-
+            # 按id更新内存中的告警状态
+            changed = self.alert_store.set_handled(alert_id, True, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            if changed is None:
+                # 已被淘汰出内存的告警只更新数据库
+                if db_success:
+                    return jsonify({'status': 'success', 'message': 'Alert marked as handled in database'})
                 return jsonify({'status': 'error', 'message': 'Alert not found'})
+            if not changed:
+                return jsonify({'status': 'info', 'message': 'Alert already handled'})
+            if db_success:
+                return jsonify({'status': 'success', 'message': 'Alert marked as handled and database updated'})
+            return jsonify({'status': 'warning', 'message': 'Alert marked as handled, but database update failed'})
 
         @self.app.route('/alerts/unhandle', methods=['POST'])
         def unhandle_alert():
@@ -375,23 +555,18 @@ class AllInOneSystem:
             if self.alert_database:
                 db_success = self.alert_database.unacknowledge_alert(alert_id)
 
-            with self.alert_lock:
-                # 查找并更新告警状态
-                for alert in self.all_alerts:
-                    if alert.get('id') == alert_id:
-                        if alert.get('handled', False):
-                            alert['handled'] = False
-                            alert.pop('handled_time', None)
-                            self.alert_handling_stats['handled_alerts'] = max(0, self.alert_handling_stats['handled_alerts'] - 1)
-                            self.alert_handling_stats['unhandled_alerts'] += 1
-                            if db_success:
-                                return jsonify({'status': 'success', 'message': 'Alert marked as unhandled and database updated'})
-                            else:
-                                return jsonify({'status': 'warning', 'message': 'Alert marked as unhandled, but database update failed'})
-                        else:
-                            return jsonify({'status': 'info', 'message': 'Alert already unhandled'})
-
+            # 按id更新内存中的告警状态
+            changed = self.alert_store.set_handled(alert_id, False)
+            if changed is None:
+                # 已被淘汰出内存的告警只更新数据库
+                if db_success:
+                    return jsonify({'status': 'success', 'message': 'Alert marked as unhandled in database'})
                 return jsonify({'status': 'error', 'message': 'Alert not found'})
+            if not changed:
+                return jsonify({'status': 'info', 'message': 'Alert already unhandled'})
+            if db_success:
+                return jsonify({'status': 'success', 'message': 'Alert marked as unhandled and database updated'})
+            return jsonify({'status': 'warning', 'message': 'Alert marked as unhandled, but database update failed'})
 
         @self.app.route('/alerts/history')
         def alerts_history():
@@ -429,22 +604,29 @@ class AllInOneSystem:
                     acknowledged = False
                 else:
                     acknowledged = None
-                alerts = self.alert_database.get_alert_events(
-                    limit=limit,
-                    offset=offset,
+                # 传入 cursor 时按游标翻页（不受页深影响），否则按页码偏移（用于跳页）
+                cursor = request.args.get('cursor') or None
+                if cursor:
+                    try:
+                        decode_cursor(cursor)
+                    except ValueError as e:
+                        return jsonify({'success': False, 'message': str(e)}), 400
+                filters = dict(
                     danger_level=danger_level,
                     source_type=source_type,
                     acknowledged=acknowledged,
                     start_time=start_time_str,
                     end_time=end_time_str
                 )
-                total = self.alert_database.get_alert_count(
-                    danger_level=danger_level,
-                    source_type=source_type,
-                    acknowledged=acknowledged,
-                    start_time=start_time_str,
-                    end_time=end_time_str
+                result = self.alert_database.get_alert_events_page(
+                    limit=limit,
+                    cursor=cursor,
+                    offset=offset,
+                    **filters
                 )
+                alerts = result['alerts']
+                # 总数只用于显示页数，使用缓存值避免每次翻页都做一次 COUNT
+                total = self.alert_database.get_alert_count(cached=True, **filters)
                 pages = (total + limit - 1) // limit
                 
                 return jsonify({
@@ -452,7 +634,9 @@ class AllInOneSystem:
                     'alerts': alerts,
                     'total': total,
                     'page': page,
-                    'pages': pages
+                    'pages': pages,
+                    'next_cursor': result['next_cursor'],
+                    'has_more': result['has_more']
                 })
                 
             except Exception as e:
@@ -464,20 +648,13 @@ class AllInOneSystem:
                 return jsonify({'success': False, 'message': '数据库未初始化'})
             try:
                 days = int(request.args.get('days', 30))
+                # 统计周期内的数量和今日告警数都来自按天/按小时汇总表，不扫描 alert_events
                 stats = self.alert_database.get_alert_statistics(days)
-                # 今日告警数
-                today = date.today()
-                today_start_dt = datetime.combine(today, datetime.min.time())
-                today_start_str = today_start_dt.strftime('%Y-%m-%d %H:%M:%S')
-                today_alerts = self.alert_database.get_alert_count(start_time=today_start_str)
-                # 计算未处理告警数
-                unhandled_alerts = self.alert_database.get_alert_count(acknowledged=False)
-                # 计算高级别告警数
-                high_level_alerts = self.alert_database.get_alert_count(level='CRITICAL')
+                # 未处理告警数、高级别告警数为全部告警的累计值
+                totals = self.alert_database.get_alert_totals()
                 stats.update({
-                    'today_alerts': today_alerts,
-                    'unhandled_alerts': unhandled_alerts,
-                    'high_level_alerts': high_level_alerts
+                    'unhandled_alerts': totals.get('unhandled_alerts', 0),
+                    'high_level_alerts': totals.get('level_statistics', {}).get('CRITICAL', 0)
                 })
                 return jsonify({
                     'success': True,
@@ -485,7 +662,23 @@ class AllInOneSystem:
                 })
             except Exception as e:
                 return jsonify({'success': False, 'message': str(e)})
-        
+
+        @self.app.route('/api/alerts/latency')
+        def api_alerts_latency():
+            """捕获到告警各阶段的延迟分布（可用 type 参数只看某类告警）；sla 字段单列摔倒和打架告警"""
+            alert_type = request.args.get('type') or None
+            sla_types = [DangerRecognizer.DANGER_TYPES['fall'], DangerRecognizer.DANGER_TYPES['fighting']]
+            sla = {}
+            for sla_type in sla_types:
+                stages = ALERT_LATENCY.get_stats(sla_type)
+                sla[sla_type] = {stage: stages[stage][sla_type]
+                                 for stage in ('recognition', 'db', 'notified') if stage in stages}
+            return jsonify({
+                'success': True,
+                'stages': ALERT_LATENCY.get_stats(alert_type),
+                'sla': sla
+            })
+
         @self.app.route('/api/alerts/acknowledge', methods=['POST'])
         def api_acknowledge_alert():
             # 确认告警API
@@ -554,8 +747,12 @@ class AllInOneSystem:
                 if threshold is None or threshold <= 0:
                     return jsonify({'success': False, 'message': '无效的时间阈值'})
                 
+                camera = self._resolve_camera(data.get('cam_id'))
+                if camera is None:
+                    return jsonify({'success': False, 'message': '摄像头不存在'})
+
                 # 更新危险识别器的配置
-                self.danger_recognizer.dwell_time_threshold_s = threshold
+                camera.danger_recognizer.dwell_time_threshold_s = threshold
                 logger.info(f"停留时间阈值已更新为: {threshold}秒")
                 return jsonify({'success': True, 'message': '时间阈值设置成功'})
             except Exception as e:
@@ -573,9 +770,13 @@ class AllInOneSystem:
                 if not region or not isinstance(region, list) or len(region) < 3:
                     return jsonify({'success': False, 'message': '无效的警戒区域格式'})
                 
+                camera = self._resolve_camera(data.get('cam_id'))
+                if camera is None:
+                    return jsonify({'success': False, 'message': '摄像头不存在'})
+
                 # 清除现有警戒区域并添加新的
-                self.danger_recognizer.clear_alert_regions()
-                self.danger_recognizer.add_alert_region(region, "User Selected Zone")
+                camera.danger_recognizer.clear_alert_regions()
+                camera.danger_recognizer.add_alert_region(region, "User Selected Zone")
                 logger.info(f"警戒区域已更新: {region}")
                 return jsonify({'success': True, 'message': '警戒区域设置成功'})
             except Exception as e:
@@ -586,7 +787,11 @@ class AllInOneSystem:
         def reset_alert_region():
             """重置警戒区域"""
             try:
-                self.danger_recognizer.clear_alert_regions()
+                data = request.get_json(silent=True) or {}
+                camera = self._resolve_camera(data.get('cam_id'))
+                if camera is None:
+                    return jsonify({'success': False, 'message': '摄像头不存在'})
+                camera.danger_recognizer.clear_alert_regions()
                 logger.info("警戒区域已重置")
                 return jsonify({'success': True, 'message': '警戒区域已重置'})
             except Exception as e:
@@ -597,10 +802,11 @@ class AllInOneSystem:
         def get_alert_region():
             # 假设danger_recognizer.alert_regions为 [{'points': np.array([...]), ...}, ...]
             region_points = []
-            if hasattr(self, 'danger_recognizer') and hasattr(self.danger_recognizer, 'alert_regions'):
-                if self.danger_recognizer.alert_regions:
+            camera = self._resolve_camera(request.args.get('cam_id'))
+            if camera is not None and hasattr(camera.danger_recognizer, 'alert_regions'):
+                if camera.danger_recognizer.alert_regions:
                     # 只取第一个区域（如有多个可扩展）
-                    pts = self.danger_recognizer.alert_regions[0].get('points', None)
+                    pts = camera.danger_recognizer.alert_regions[0].get('points', None)
                     if pts is not None:
                         # np.array转list
                         region_points = pts.tolist()
@@ -611,8 +817,9 @@ class AllInOneSystem:
             try:
                 data = request.get_json(force=True)
                 threshold = int(data.get('threshold', 50))
-                if hasattr(self, 'danger_recognizer'):
-                    self.danger_recognizer.config['danger_zone_approach_distance'] = threshold
+                camera = self._resolve_camera(data.get('cam_id'))
+                if camera is not None:
+                    camera.danger_recognizer.config['danger_zone_approach_distance'] = threshold
                 return jsonify(success=True)
             except Exception as e:
                 return jsonify(success=False, message=str(e))
@@ -804,31 +1011,36 @@ class AllInOneSystem:
         web_thread.start()
         logger.info(f"Web服务器已启动，访问 http://localhost:{self.args.web_port}/")
 
-    def generate_frames(self):
-        """生成帧序列用于Web流"""
-        while True:
-            if self.processed_frame is not None:
-                ret, buffer = cv2.imencode('.jpg', self.processed_frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
-                frame = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-            time.sleep(0.03)  # 约30 FPS
+    def generate_frames(self, camera=None, size=None, quality=None):
+        """生成帧序列用于Web流（每帧每档位只编码一次，所有客户端共享）"""
+        camera = camera or self.cameras.default
+        yield from camera.broadcaster.stream(size=size, quality=quality)
 
     def start(self):
         """启动系统"""
         self.running = True
 
-        # 启动捕获线程
-        capture_thread = threading.Thread(target=self.capture_thread_func)
-        capture_thread.daemon = True
-        capture_thread.start()
-        self.threads.append(capture_thread)
+        # 启动批量推理调度线程
+        if self.inference_scheduler is not None:
+            self.inference_scheduler.start()
 
-        # 启动处理线程
-        process_thread = threading.Thread(target=self.process_thread_func)
-        process_thread.daemon = True
-        process_thread.start()
-        self.threads.append(process_thread)
+        # 启动告警持久化线程
+        if self.alert_persistence is not None:
+            self.alert_persistence.start()
+
+        # 每路摄像头各启动一个捕获线程和一个处理线程
+        for camera in self.cameras:
+            capture_thread = threading.Thread(target=self.capture_thread_func, args=(camera,),
+                                              name=f"capture-{camera.cam_id}")
+            capture_thread.daemon = True
+            capture_thread.start()
+            self.threads.append(capture_thread)
+
+            process_thread = threading.Thread(target=self.process_thread_func, args=(camera,),
+                                              name=f"process-{camera.cam_id}")
+            process_thread.daemon = True
+            process_thread.start()
+            self.threads.append(process_thread)
 
         logger.info("全功能视频监控系统已启动")
 
@@ -854,27 +1066,47 @@ class AllInOneSystem:
         """停止系统"""
         self.running = False
 
+        # 先停止推理调度器，释放正在等待检测结果的处理线程
+        if self.inference_scheduler is not None:
+            self.inference_scheduler.stop()
+
         for thread in self.threads:
             if thread.is_alive():
                 thread.join(timeout=1.0)
 
-        if self.video_writer is not None:
-            self.video_writer.release()
+        for camera in self.cameras:
+            if camera.video_writer is not None:
+                camera.video_writer.release()
+
+        # 处理线程已停止，写完队列中剩余的告警
+        if self.alert_persistence is not None:
+            self.alert_persistence.stop()
+
+        if self.flow_pool is not None:
+            self.flow_pool.close()
 
         # 生成报告
         self.generate_report()
 
         logger.info("全功能视频监控系统已停止")
 
-    def capture_thread_func(self):
-        """视频捕获线程"""
-        logger.info("开始视频捕获线程")
+    def _stop_camera(self, camera):
+        """视频源无法恢复时停止该路摄像头；单路模式下同时停止整个系统"""
+        camera.connected = False
+        if len(self.cameras) == 1:
+            self.running = False
+        else:
+            logger.error(f"摄像头 {camera.cam_id} 已停止，其余摄像头继续运行")
+
+    def capture_thread_func(self, camera):
+        """视频捕获线程（每路摄像头一个）"""
+        logger.info(f"开始视频捕获线程: {camera.cam_id}")
 
         # 打开视频源
-        if self.args.source.isdigit():
-            source = int(self.args.source)
+        if camera.source.isdigit():
+            source = int(camera.source)
         else:
-            source = self.args.source
+            source = camera.source
 
         # 特殊处理source=1，使用RTMP拉流
         if source == 1:
@@ -884,8 +1116,9 @@ class AllInOneSystem:
         cap = cv2.VideoCapture(source)
         if not cap.isOpened():
             logger.error(f"无法打开视频源: {source}")
-            self.running = False
+            self._stop_camera(camera)
             return
+        camera.connected = True
         
         # 设置较低的目标分辨率
         target_width = int(self.args.width * 0.02)  # 例如，设为原宽度的2%
@@ -929,9 +1162,13 @@ class AllInOneSystem:
                 if delta < min_frame_time:
                     time.sleep(min_frame_time - delta)
 
-                # 读取帧
-                ret, frame = cap.read()
+                # 直接读入环形缓冲的空闲槽位（复用槽位内存，避免每帧分配）
+                slot = camera.frame_ring.acquire_write()
+                with camera.metrics.timer('capture_read'):
+                    ret, frame = cap.read(slot.buffer('raw') if slot is not None else None)
                 if not ret:
+                    if slot is not None:
+                        camera.frame_ring.abort(slot)
                     if isinstance(source, str) and not source.isdigit():
                         # 视频文件或RTMP流结束/中断
                         logger.warning(f"视频流中断: {source}")
@@ -948,13 +1185,13 @@ class AllInOneSystem:
                                 cap = cv2.VideoCapture(source)
                                 if not cap.isOpened():
                                     logger.error("RTMP重新连接失败")
-                                    self.running = False
+                                    self._stop_camera(camera)
                                     break
                                 else:
                                     logger.info("RTMP重新连接成功")
                                     continue
                             else:
-                                self.running = False
+                                self._stop_camera(camera)
                                 break
                     else:
                         # 摄像头出错，尝试重新连接
@@ -964,60 +1201,112 @@ class AllInOneSystem:
                         cap = cv2.VideoCapture(source)
                         if not cap.isOpened():
                             logger.error("重新连接失败")
-                            self.running = False
+                            self._stop_camera(camera)
                             break
                         continue
 
-                # 检查是否需要旋转（竖屏转横屏）
-                if frame is not None:
-                    h, w = frame.shape[:2]
-                    if h > w:  # 如果是竖屏视频
-                        frame = cv2.rotate(frame, cv2.ROTATE_90_COUNTERCLOCKWISE)
-                        logger.debug("检测到竖屏视频，已自动旋转为横屏")
-
-                # 更新时间和计数
+                # 更新时间和计数（单调时钟时间戳随帧传递，用于捕获到告警的延迟追踪）
+                capture_time = time.monotonic()
                 last_time = time.time()
                 frame_count += 1
-                self.frame_count = frame_count
-                self.current_frame = frame
+                camera.frame_count = frame_count
+                camera.metrics.inc('frames_captured_total')
+
+                # 所有槽位都被读取方占用时丢弃该帧（由环形缓冲统计 write_drops）
+                if slot is None:
+                    camera.metrics.inc('frames_dropped_total', reason='ring_full')
+                    continue
+                slot.keep('raw', frame)
+
+                # 检查是否需要旋转（竖屏转横屏）
+                h, w = frame.shape[:2]
+                if h > w:  # 如果是竖屏视频
+                    frame = cv2.rotate(frame, cv2.ROTATE_90_COUNTERCLOCKWISE,
+                                       dst=slot.buffer('rotated', (w, h) + frame.shape[2:]))
+                    logger.debug("检测到竖屏视频，已自动旋转为横屏")
 
                 # 降低分辨率（如果启用）
                 if self.args.process_scale < 1.0:
                     h, w = frame.shape[:2]
                     new_width = int(w * self.args.process_scale)
                     new_height = int(h * self.args.process_scale)
-                    process_frame = cv2.resize(frame, (new_width, new_height))
+                    with camera.metrics.timer('resize'):
+                        process_frame = cv2.resize(frame, (new_width, new_height),
+                                                   dst=slot.buffer('scaled', (new_height, new_width) + frame.shape[2:]))
                 else:
                     process_frame = frame
 
-                # 将帧放入队列
-                if not self.frame_queue.full():
-                    self.frame_queue.put(
-                        (frame_count, process_frame, frame.copy() if process_frame is not frame else None, last_time))
-                else:
-                    # 如果队列满了，移除最旧的帧
-                    try:
-                        self.frame_queue.get_nowait()
-                        self.frame_queue.put((frame_count, process_frame,
-                                              frame.copy() if process_frame is not frame else None, last_time))
-                    except:
-                        pass
+                # 提交到环形缓冲，处理线程按序列号读取槽位视图
+                camera.frame_ring.commit(slot, frame, process_frame, frame_count, last_time, capture_time)
 
         except Exception as e:
             logger.error(f"视频捕获线程出错: {str(e)}")
             logger.error(traceback.format_exc())
         finally:
             cap.release()
-            logger.info("视频捕获线程结束")
-
-    def process_thread_func(self):
-        """视频处理线程"""
-        logger.info("开始视频处理线程")
-
-        prev_frame = None
-        processed_count = 0
+            camera.connected = False
+            logger.info(f"视频捕获线程结束: {camera.cam_id}")
+
+    def _collect_metrics(self):
+        """导出 /metrics 时采集的系统级指标：运行时长、推理和告警持久化队列深度"""
+        samples = [('uptime_seconds', 'gauge', {}, time.time() - self.start_time)]
+        if self.inference_scheduler is not None:
+            samples.append(('queue_depth', 'gauge', {'queue': 'inference'},
+                            self.inference_scheduler.request_queue.qsize()))
+        if self.alert_persistence is not None:
+            samples.append(('queue_depth', 'gauge', {'queue': 'alert_persistence'},
+                            self.alert_persistence.queue.qsize()))
+        return samples
+
+    def _create_pipeline(self, camera):
+        """为单路摄像头创建处理流水线：特征 → 检测 → 识别 → 渲染 → 输出
+
+        --pipelined 时每个阶段一个线程、阶段之间用有界队列连接；否则在处理线程内依次执行
+        """
+        queue_size = getattr(self.args, 'pipeline_queue_size', 2)
+
+        def on_error(job, stage_name, exc):
+            job.frame_ref.release()
+
+        return StagePipeline([
+            Stage('features', lambda job: self._stage_features(camera, job), queue_size),
+            Stage('detection', lambda job: self._stage_detection(camera, job), queue_size),
+            Stage('recognition', lambda job: self._stage_recognition(camera, job), queue_size),
+            Stage('render', lambda job: self._stage_render(camera, job), queue_size),
+            Stage('sink', lambda job: self._stage_sink(camera, job), queue_size),
+        ], name=f"pipeline-{camera.cam_id}", threaded=getattr(self.args, 'pipelined', False), on_error=on_error,
+            on_complete=(lambda job: self._observe_load(camera, job)) if camera.load_shedder else None)
+
+    def _observe_load(self, camera, job):
+        """一帧走完流水线后更新过载降级控制器，级别变化时调整该路的处理设置
+
+        多线程流水线的处理能力由最慢的阶段决定，串行执行时为各阶段耗时之和
+        """
+        shedder = camera.load_shedder
+        if not job.stage_times:
+            return
+        if camera.pipeline.threaded:
+            busy_time = max(job.stage_times.values())
+        else:
+            busy_time = sum(job.stage_times.values())
+        change = shedder.observe(busy_time, camera.frame_ring.backlog())
+        if change:
+            camera.apply_load_shedding()
+            stats = shedder.get_stats()
+            logger.info(f"摄像头 {camera.cam_id} 负载{'过高，降级' if change > 0 else '恢复，还原'}到 "
+                        f"{stats['level']} 级 ({stats['level_name']})，处理耗时占比 {stats['utilization']:.2f}")
+
+    def process_thread_func(self, camera):
+        """视频处理线程（每路摄像头一个，AI模型在各路之间共享）
+
+        从环形缓冲按序读取帧并提交给该路的处理流水线
+        """
+        logger.info(f"开始视频处理线程: {camera.cam_id}")
+
+        last_seq = -1
         process_every = self.args.process_every  # 每N帧处理一次
-        last_ai_frame = 0
+        pipeline = camera.pipeline
+        pipeline.start()
 
         try:
             while self.running:
@@ -1026,288 +1315,368 @@ class AllInOneSystem:
                     time.sleep(0.1)
                     continue
 
-                # 从队列中获取帧
-                try:
-                    frame_data = self.frame_queue.get(timeout=1.0)
-                except:
+                # 从环形缓冲获取下一帧（落后超过5帧时跳到最新帧附近，保持低延迟）
+                frame_ref = camera.frame_ring.wait_next(last_seq, timeout=1.0, max_lag=5)
+                if frame_ref is None:
                     continue
+                if last_seq >= 0 and frame_ref.seq > last_seq + 1:
+                    # 处理落后时跳过的帧（原先由 frame_queue.get_nowait() 静默丢弃）
+                    camera.metrics.inc('frames_dropped_total', frame_ref.seq - last_seq - 1, reason='reader_lag')
+                    if camera.load_shedder:
+                        camera.load_shedder.note_skipped(frame_ref.seq - last_seq - 1)
+                last_seq = frame_ref.seq
+
+                # 仅处理每N帧（启用自适应节奏时由控制器决定），跳过的帧不做分析，仅可视化
+                if camera.cadence:
+                    should_process = camera.cadence.should_process(frame_ref.frame_id)
+                else:
+                    should_process = frame_ref.frame_id % process_every == 0
+                pipeline.submit(FrameJob(frame_ref, should_process))
+
+        except Exception as e:
+            logger.error(f"视频处理线程出错: {str(e)}")
+            logger.error(traceback.format_exc())
+        finally:
+            pipeline.stop()
+            if camera.prev_frame_ref is not None:
+                camera.prev_frame_ref.release()
+                camera.prev_frame_ref = None
+            logger.info(f"视频处理线程结束: {camera.cam_id}")
+
+    def _stage_features(self, camera, job):
+        """特征阶段：提取运动特征"""
+        # 上一帧的槽位由本阶段单独持有一个引用，后续阶段释放当前帧时不会被覆盖（无需拷贝）
+        prev_frame = camera.prev_frame_ref.process_frame if camera.prev_frame_ref is not None else None
+        if job.should_process:
+            camera.processed_count += 1
+            camera.metrics.inc('frames_processed_total')
+            job.analysis_start = time.time()
+            job.features = camera.motion_manager.extract_features(job.process_frame, prev_frame,
+                                                                  person_boxes=camera.person_boxes)
+            job.features_time = time.time() - job.analysis_start
+            job.marks['features'] = time.monotonic()
+        if camera.prev_frame_ref is not None:
+            camera.prev_frame_ref.release()
+        camera.prev_frame_ref = job.frame_ref.retain()
+
+    def _stage_detection(self, camera, job):
+        """检测阶段：AI对象检测，或在两次检测之间传播上一次的人员框"""
+        if not job.should_process:
+            return
+        frame_id, process_frame = job.frame_id, job.process_frame
+        detection_start = time.time()
+
+        # AI对象检测（如果启用），过载降级时拉长检测间隔（不低于摔倒/打架/区域检测所需的最低频率）
+        shedder = camera.load_shedder
+        if camera.cadence:
+            interval = shedder.ai_interval(camera.cadence.ai_interval, camera.fps) if shedder else None
+            run_ai = camera.cadence.should_run_ai(frame_id, interval)
+        else:
+            interval = shedder.ai_interval(self.args.ai_interval, camera.fps) if shedder else self.args.ai_interval
+            run_ai = (frame_id - camera.last_ai_frame) >= interval
+        propagator = camera.propagator
+        if propagator is not None and propagator.needs_refresh():
+            run_ai = True  # 传播结果已不可靠，提前重新检测
+        if self.inference_scheduler is not None and run_ai:
+            try:
+                with camera.metrics.timer('yolo'):
+                    job.object_detections = self.inference_scheduler.infer(process_frame, timeout=10.0)
+                camera.last_ai_frame = frame_id
+                camera.person_boxes = [det['bbox'] for det in job.object_detections or []
+                                       if str(det.get('class', '')).lower() == 'person']
+                if propagator is not None:
+                    propagator.reset(job.object_detections)
+            except Exception as e:
+                logger.error(f"AI处理出错: {str(e)}")
+            job.ai_time = time.time() - detection_start
+        elif propagator is not None:
+            # 两次检测之间沿用上一次的人员框（按光流推移，标记为 propagated）
+            h, w = process_frame.shape[:2]
+            propagated = propagator.propagate(job.features, (w, h))
+            if propagated:
+                job.object_detections = propagated
+                camera.person_boxes = [det['bbox'] for det in propagated]
+        job.detection_time = time.time() - detection_start
+        job.marks['detection'] = time.monotonic()
+
+    def _stage_recognition(self, camera, job):
+        """识别阶段：危险行为识别、音视频联动和告警登记"""
+        if not job.should_process:
+            return
+        object_detections = job.object_detections
+        recognition_start = time.time()
+
+        # 检测危险行为（渲染阶段绘制告警时也会读取识别器状态，两者互斥）
+        with camera.recognizer_lock:
+            alerts = camera.danger_recognizer.process_frame(job.process_frame, job.features, object_detections)
+        if object_detections is not None:
+            # 保存识别时分配的 person_id，渲染阶段按这份结果绘制，不再推进跟踪
+            job.object_detections = object_detections = [dict(det) for det in object_detections]
+        job.alerts = alerts
+        job.marks['recognition'] = time.monotonic()
+        if camera.cadence:
+            process_time = (job.features_time + job.detection_time - (job.ai_time or 0.0) +
+                            time.time() - recognition_start)
+            camera.cadence.observe(job.frame_id, job.features, len(camera.person_boxes),
+                                   process_time, job.ai_time, camera.fps)
+        if alerts:
+            with camera.stats_lock:
+                camera.alert_count += len(alerts)
+
+        # 音视频联动：所有行为告警都合并音频信息
+        audio_msgs = []
+        if alerts and self.recent_audio_events:
+            last_event = self.recent_audio_events[-1]
+            labels, scores, ts, audio_db_stats = last_event if len(last_event) >= 4 else (*last_event, None)
+            for alert in alerts:
+                alert['audio_db_stats'] = audio_db_stats if audio_db_stats else None
+                alert['audio_labels'] = labels if labels else None
+                # 检查是否超过音量阈值（设定为60分贝）
+                volume_threshold = 60
+                max_db = audio_db_stats.get('max_db', 0) if audio_db_stats else 0
+                if max_db > volume_threshold:
+                    alert['volume_exceeded'] = True
+                    alert['volume_threshold'] = volume_threshold
+                    logger.info(f"[行为告警音频联动] 设置音频数据: max_db={max_db}, volume_exceeded={alert.get('volume_exceeded', False)}")
+                else:
+                    alert['volume_exceeded'] = False
+                    alert['volume_threshold'] = volume_threshold
+                    logger.info("[行为告警音频联动] 未超过音量阈值或无分贝数据")
+                # 追加音频描述
+                if labels and scores:
+                    for label, score in zip(labels, scores):
+                        audio_msgs.append(f"声音: {label}({score:.2f})")
+                if audio_msgs:
+                    alert['desc'] += '；' + '；'.join(audio_msgs)
+        elif alerts:
+            for alert in alerts:
+                alert['audio_db_stats'] = None
+                alert['audio_labels'] = None
+                alert['volume_exceeded'] = False
+                alert['volume_threshold'] = 60
+                logger.info("[行为告警音频联动] recent_audio_events为空，无音频数据")
+        # 更新alert_store和recent_alerts
+        job.alert_infos = alert_infos = []
+        capture_time_str = datetime.fromtimestamp(job.captured_at).strftime('%Y-%m-%d %H:%M:%S')
+        for alert in alerts:
+            # 每条告警一份 trace：各阶段相对画面捕获的延迟，入库和送达时补记
+            trace = make_trace(job.trace_id, job.capture_time, job.captured_at, job.marks)
+            ALERT_LATENCY.record(trace, alert.get('type', ''))
+            alert_info = {
+                'id': str(uuid.uuid4()),  # 使用UUID生成唯一ID
+                'camera_id': camera.cam_id,
+                'type': alert.get('type', ''),
+                'danger_level': alert.get('danger_level', 'medium'),  # 新增：危险等级
+                'time': capture_time_str,  # 告警时间取画面捕获时间
+                'trace_id': job.trace_id,
+                'trace': trace,
+                'confidence': float(alert.get('confidence', 0)) if alert.get('confidence', '') != '' else '',
+                'frame': int(alert.get('frame', 0)) if alert.get('frame', '') != '' else '',
+                'desc': alert.get('desc', ''),
+                'handled': False,  # 默认未处理
+                'handled_time': None,  # 处理时间
+                'person_id': alert.get('person_id', ''),  # 新增：person id
+                'person_class': alert.get('person_class', ''),  # 新增：person类别
+                # 新增：位置信息
+                'location': alert.get('location', {
+                    'x': 0,
+                    'y': 0,
+                    'rel_x': 0,
+                    'rel_y': 0,
+                    'description': '未知位置',
+                    'region_name': alert.get('region_name', '')
+                }),
+                # 新增：声学检测结果
+                'audio_labels': alert.get('audio_labels', None),
+                'audio_db_stats': alert.get('audio_db_stats', None),
+                'volume_exceeded': alert.get('volume_exceeded', False),
+                'volume_threshold': alert.get('volume_threshold', None)
+            }
 
-                frame_id, process_frame, original_frame, timestamp = frame_data
+            alert_infos.append(alert_info)
+            self.alert_store.add(alert_info)
+            with self.alert_lock:
+                self.recent_alerts.append(alert_info)
 
-                # 仅处理每N帧
-                if frame_id % process_every == 0:
-                    processed_count += 1
-                    self.processed_count = processed_count
+            # 追加行为信息
+            behavior_info = f"{alert.get('type', '未知')} (置信度: {alert.get('confidence', 0):.2f}, 帧号: {alert.get('frame', '-')})"
+            if behavior_info not in self.recognized_behaviors:
+                self.recognized_behaviors.append(behavior_info)
+
+            # 追加交互信息（如有）
+            if object_detections and len(object_detections) > 1:
+                interaction_info = f"多对象交互检测 (对象数: {len(object_detections)}, 帧号: {alert.get('frame', '-')})"
+                if interaction_info not in self.recognized_interactions:
+                    self.recognized_interactions.append(interaction_info)
+            if alert.get('type') == '入侵警告区域':
+                region_name = alert.get('region_name', '未知区域')
+                interaction_info = f"区域入侵交互 ({region_name}, 帧号: {alert.get('frame', '-')})"
+                if interaction_info not in self.recognized_interactions:
+                    self.recognized_interactions.append(interaction_info)
+
+    def _stage_render(self, camera, job):
+        """渲染阶段：叠加可视化并发布给视频流（跳过的帧 features/alerts 为空，只输出原始画面）"""
+        with camera.metrics.timer('visualize'):
+            if not job.alerts and camera.load_shedder and camera.load_shedder.disable_overlays:
+                # 过载降级：不绘制叠加层（有告警的帧照常绘制，告警图片保持完整）；槽位随后会被覆盖，需拷贝
+                job.vis_frame = job.display_frame.copy()
+            elif job.alerts:
+                with camera.recognizer_lock:
+                    job.vis_frame = self.visualize_frame(job.display_frame, job.process_frame, job.features,
+                                                         job.alerts, job.object_detections, camera=camera)
+            else:
+                job.vis_frame = self.visualize_frame(job.display_frame, job.process_frame, job.features, job.alerts,
+                                                     job.object_detections, camera=camera)
+        camera.processed_frame = job.vis_frame
+        camera.broadcaster.publish(job.vis_frame)  # 确保前端能持续收到视频流，编码由广播器按需完成
 
-                    # 提取运动特征
-                    features = self.motion_manager.extract_features(process_frame, prev_frame)
+    def _stage_sink(self, camera, job):
+        """输出阶段：告警持久化、最近告警列表、录像，最后释放该帧的槽位"""
+        try:
+            self._write_outputs(camera, job)
+        finally:
+            job.frame_ref.release()
 
-                    # AI对象检测（如果启用）
-                    object_detections = None
-                    if self.ai_model is not None and (frame_id - last_ai_frame) >= self.args.ai_interval:
-                        try:
-                            results = self.ai_model(process_frame, verbose=False)
-                            object_detections = self._parse_ai_results(results)
-                            last_ai_frame = frame_id
-                        except Exception as e:
-                            logger.error(f"AI处理出错: {str(e)}")
-
-                    # 检测危险行为
-                    alerts = self.danger_recognizer.process_frame(process_frame, features, object_detections)
-
-                    # 音视频联动：所有行为告警都合并音频信息
-                    audio_msgs = []
-                    if alerts and self.recent_audio_events:
-                        last_event = self.recent_audio_events[-1]
-                        labels, scores, ts, audio_db_stats = last_event if len(last_event) >= 4 else (*last_event, None)
-                        for alert in alerts:
-                            alert['audio_db_stats'] = audio_db_stats if audio_db_stats else None
-                            alert['audio_labels'] = labels if labels else None
-                            # 检查是否超过音量阈值（设定为60分贝）
-                            volume_threshold = 60
-                            max_db = audio_db_stats.get('max_db', 0) if audio_db_stats else 0
-                            if max_db > volume_threshold:
-                                alert['volume_exceeded'] = True
-                                alert['volume_threshold'] = volume_threshold
-                                logger.info(f"[行为告警音频联动] 设置音频数据: max_db={max_db}, volume_exceeded={alert.get('volume_exceeded', False)}")
-                            else:
-                                alert['volume_exceeded'] = False
-                                alert['volume_threshold'] = volume_threshold
-                                logger.info("[行为告警音频联动] 未超过音量阈值或无分贝数据")
-                            # 追加音频描述
-                            if labels and scores:
-                                for label, score in zip(labels, scores):
-                                    audio_msgs.append(f"声音: {label}({score:.2f})")
-                            if audio_msgs:
-                                alert['desc'] += '；' + '；'.join(audio_msgs)
-                    elif alerts:
-                        for alert in alerts:
-                            alert['audio_db_stats'] = None
-                            alert['audio_labels'] = None
-                            alert['volume_exceeded'] = False
-                            alert['volume_threshold'] = 60
-                            logger.info("[行为告警音频联动] recent_audio_events为空，无音频数据")
-                    # 更新all_alerts和recent_alerts
-                    for alert in alerts:
-                        alert_info = {
-                            'id': str(uuid.uuid4()),  # 使用UUID生成唯一ID
-                            'type': alert.get('type', ''),
-                            'danger_level': alert.get('danger_level', 'medium'),  # 新增：危险等级
-                            'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                            'confidence': float(alert.get('confidence', 0)) if alert.get('confidence', '') != '' else '',
-                            'frame': int(alert.get('frame', 0)) if alert.get('frame', '') != '' else '',
-                            'desc': alert.get('desc', ''),
-                            'handled': False,  # 默认未处理
-                            'handled_time': None,  # 处理时间
-                            'person_id': alert.get('person_id', ''),  # 新增：person id
-                            'person_class': alert.get('person_class', ''),  # 新增：person类别
-                            # 新增：位置信息
-                            'location': alert.get('location', {
-                                'x': 0,
-                                'y': 0,
-                                'rel_x': 0,
-                                'rel_y': 0,
-                                'description': '未知位置',
-                                'region_name': alert.get('region_name', '')
-                            }),
-                            # 新增：声学检测结果
-                            'audio_labels': alert.get('audio_labels', None),
-                            'audio_db_stats': alert.get('audio_db_stats', None),
-                            'volume_exceeded': alert.get('volume_exceeded', False),
-                            'volume_threshold': alert.get('volume_threshold', None)
-                        }
-                        
-                        with self.alert_lock:
-                            self.all_alerts.append(alert_info)
-                            self.alert_handling_stats['total_alerts'] = len(self.all_alerts)
-                            self.alert_handling_stats['handled_alerts'] = sum(1 for a in self.all_alerts if a.get('handled', False))
-                            self.alert_handling_stats['unhandled_alerts'] = self.alert_handling_stats['total_alerts'] - self.alert_handling_stats['handled_alerts']
-                            # recent_alerts只保留最新10条
-                            self.recent_alerts.append(alert_info)
-                        
-                        # 追加行为信息
-                        behavior_info = f"{alert.get('type', '未知')} (置信度: {alert.get('confidence', 0):.2f}, 帧号: {alert.get('frame', '-')})"
-                        if behavior_info not in self.recognized_behaviors:
-                            self.recognized_behaviors.append(behavior_info)
-
-                        # 追加交互信息（如有）
-                        if object_detections and len(object_detections) > 1:
-                            interaction_info = f"多对象交互检测 (对象数: {len(object_detections)}, 帧号: {alert.get('frame', '-')})"
-                            if interaction_info not in self.recognized_interactions:
-                                self.recognized_interactions.append(interaction_info)
-                        if alert.get('type') == '入侵警告区域':
-                            region_name = alert.get('region_name', '未知区域')
-                            interaction_info = f"区域入侵交互 ({region_name}, 帧号: {alert.get('frame', '-')})"
-                            if interaction_info not in self.recognized_interactions:
-                                self.recognized_interactions.append(interaction_info)
+    def _write_outputs(self, camera, job):
+        """告警图片和记录的持久化、最近告警列表、行为汇总和录像"""
+        alerts, alert_infos, vis_frame = job.alerts, job.alert_infos, job.vis_frame
+        object_detections = job.object_detections
 
+        # 只保存带标识的图片到数据库（只保存一次，用第一个alert的信息）
+        if self.alert_persistence and self.args.save_alerts and vis_frame is not None and alerts:
+            try:
+                import os
+                # 类型简称映射
+                type_map = {
+                    'fall_detection': 'fall',
+                    'danger_zone_dwell': 'dwell',
+                    'sudden_motion': 'motion',
+                    'large_area_motion': 'area',
+                }
+                alert = alerts[0]
+                type_short = type_map.get(alert.get('type', '').lower(), alert.get('type', '').lower().split('_')[0])
+                # 统一命名：大写+空格+帧号
+                alert_type = alert.get('type', 'Alert').replace('_', ' ').title()  # Danger Zone Dwell
+                frame_id = alert.get('frame', camera.frame_count)
+                ts = datetime.now().strftime('%Y%m%d_%H%M%S')
+                alert_dir = camera.danger_recognizer.config.get('alert_dir', os.path.join(self.args.output, 'alerts'))
+                filename = f"{alert_type}_{frame_id}_{ts}.jpg"
+                vis_path = os.path.join(alert_dir, filename)
+                rel_vis_path = os.path.relpath(vis_path, os.getcwd()).replace('\\', '/')
+                # 创建告警事件对象
+                from models.alert.alert_event import AlertEvent
+                from models.alert.alert_rule import AlertLevel
+                danger_level = alert.get('danger_level', 'medium')
+                if danger_level == 'high':
+                    alert_level = AlertLevel.CRITICAL
+                elif danger_level == 'medium':
+                    alert_level = AlertLevel.ALERT
                 else:
-                    # 对于跳过处理的帧，仍然要可视化，但不进行特征提取
-                    vis_frame = self.visualize_frame(original_frame or process_frame, None, None, None, None)
+                    alert_level = AlertLevel.WARNING
+                alert_event = AlertEvent.create(
+                    rule_id=f"rule_{alert.get('type', 'unknown')}",
+                    level=alert_level,
+                    danger_level=danger_level,
+                    source_type=alert.get('type', 'unknown'),
+                    message=alert.get('desc', ''),
+                    details={
+                        'camera_id': camera.cam_id,
+                        'person_id': alert.get('person_id', ''),
+                        'person_class': alert.get('person_class', ''),
+                        'confidence': alert.get('confidence', 0),
+                        'frame': alert.get('frame', 0),
+                        'location': alert.get('location', {}),
+                        'region_name': alert.get('region_name', ''),
+                        'trace_id': job.trace_id,
+                        'trace': dict(alert_infos[0]['trace'])
+                    },
+                    frame_idx=alert.get('frame', 0),
+                    frame=None
+                )
+                alert_event.timestamp = job.captured_at  # 告警时间取画面捕获时间
+                # 只写入一条frame类型图片；vis_frame 已发布给广播器、之后不再修改，无需拷贝
+                first_info = alert_infos[0]
+
+                def on_saved(new_id, info=first_info):
+                    # 写入数据库后用自增id替换alert_info的临时UUID，并记录捕获到入库的延迟
+                    if new_id is not None:
+                        self.alert_store.mark_persisted(info, new_id)
+                        ALERT_LATENCY.mark(info['trace'], 'db', info['type'])
+                    else:
+                        self.alert_store.mark_submitted(info, False)
 
-                # 可视化结果
-                vis_frame = self.visualize_frame(original_frame or process_frame, process_frame, features, alerts, object_detections)
-                self.processed_frame = vis_frame  # 确保前端能持续收到视频流
-                prev_frame = process_frame.copy()
+                # 先标记已提交：回调到达前被淘汰的告警不再经 on_evict 重复落库
+                self.alert_store.mark_submitted(first_info)
+                if not self.alert_persistence.submit(alert_event, {'frame': (vis_path, rel_vis_path, vis_frame)},
+                                                     callback=on_saved):
+                    self.alert_store.mark_submitted(first_info, False)
+            except Exception as e:
+                logger.error(f"保存可视化告警图片到数据库失败: {str(e)}")
 
-                # 只保存带标识的图片到数据库（只保存一次，用第一个alert的信息）
-                if self.alert_database and self.args.save_alerts and vis_frame is not None and alerts:
-                    try:
-                        import os
-                        # 类型简称映射
-                        type_map = {
-                            'fall_detection': 'fall',
-                            'danger_zone_dwell': 'dwell',
-                            'sudden_motion': 'motion',
-                            'large_area_motion': 'area',
-                        }
-                        alert = alerts[0]
-                        type_short = type_map.get(alert.get('type', '').lower(), alert.get('type', '').lower().split('_')[0])
-                        # 统一命名：大写+空格+帧号
-                        alert_type = alert.get('type', 'Alert').replace('_', ' ').title()  # Danger Zone Dwell
-                        frame_id = alert.get('frame', self.frame_count)
-                        ts = datetime.now().strftime('%Y%m%d_%H%M%S')
-                        alert_dir = os.path.join(self.args.output, 'alerts')
-                        os.makedirs(alert_dir, exist_ok=True)
-                        filename = f"{alert_type}_{frame_id}_{ts}.jpg"
-                        vis_path = os.path.join(alert_dir, filename)
-                        cv2.imwrite(vis_path, vis_frame)
-                        rel_vis_path = os.path.relpath(vis_path, os.getcwd()).replace('\\', '/')
-                        # 创建告警事件对象
-                        from models.alert.alert_event import AlertEvent
-                        from models.alert.alert_rule import AlertLevel
-                        danger_level = alert.get('danger_level', 'medium')
-                        if danger_level == 'high':
-                            alert_level = AlertLevel.CRITICAL
-                        elif danger_level == 'medium':
-                            alert_level = AlertLevel.ALERT
-                        else:
-                            alert_level = AlertLevel.WARNING
-                        alert_event = AlertEvent.create(
-                            rule_id=f"rule_{alert.get('type', 'unknown')}",
-                            level=alert_level,
-                            danger_level=danger_level,
-                            source_type=alert.get('type', 'unknown'),
-                            message=alert.get('desc', ''),
-                            details={
-                                'person_id': alert.get('person_id', ''),
-                                'person_class': alert.get('person_class', ''),
-                                'confidence': alert.get('confidence', 0),
-                                'frame': alert.get('frame', 0),
-                                'location': alert.get('location', {}),
-                                'region_name': alert.get('region_name', '')
-                            },
-                            frame_idx=alert.get('frame', 0),
-                            frame=None
-                        )
-                        # 只写入一条frame类型图片
-                        rel_image_paths = {'frame': rel_vis_path}
-                        logger.info(f"保存可视化告警图片: {rel_image_paths}")
-                        new_id = self.alert_database.save_alert_event(alert_event, rel_image_paths)
-                        logger.info(f"写入数据库返回id: {new_id}")
-                        # 更新alert_info的id
-                        with self.alert_lock:
-                            for info in self.all_alerts:
-                                if alerts and info['time'] == alert_event.to_dict().get('datetime') and info['type'] == alert_event.source_type:
-                                    info['id'] = new_id
-                    except Exception as e:
-                        logger.error(f"保存可视化告警图片到数据库失败: {str(e)}")
-
-                # 更新recent_alerts
-                for alert in alerts:
-                    alert_info = {
-                        'id': str(uuid.uuid4()),  # 使用UUID生成唯一ID
-                        'type': alert.get('type', ''),
-                        'danger_level': alert.get('danger_level', 'medium'),  # 新增：危险等级
-                        'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                        'confidence': float(alert.get('confidence', 0)) if alert.get('confidence', '') != '' else '',
-                        'frame': int(alert.get('frame', 0)) if alert.get('frame', '') != '' else '',
-                        'desc': alert.get('desc', ''),
-                        'handled': False,  # 默认未处理
-                        'handled_time': None,  # 处理时间
-                        'person_id': alert.get('person_id', ''),  # 新增：person id
-                        'person_class': alert.get('person_class', ''),  # 新增：person类别
-                        # 新增：声学检测结果
-                        'audio_labels': alert.get('audio_labels', None),
-                        'audio_db_stats': alert.get('audio_db_stats', None),
-                        'volume_exceeded': alert.get('volume_exceeded', False),
-                        'volume_threshold': alert.get('volume_threshold', None)
-                    }
-                    
-                    with self.alert_lock:
-                        self.recent_alerts.append(alert_info)
-                        self.alert_handling_stats['total_alerts'] += 1
-                        self.alert_handling_stats['unhandled_alerts'] += 1
-                        
-                        if len(self.recent_alerts) > 10:
-                            removed_alert = self.recent_alerts.popleft()
-                            # 如果移除的告警未处理，减少未处理计数
-                            if not removed_alert.get('handled', False):
-                                self.alert_handling_stats['unhandled_alerts'] = max(0, self.alert_handling_stats['unhandled_alerts'] - 1)
-
-                # 追加行为信息
-                if alerts:
-                    for alert in alerts:
-                        behavior_info = f"{alert.get('type', '未知')} (置信度: {alert.get('confidence', 0):.2f}, 帧号: {alert.get('frame', '-')})"
-                        if behavior_info not in self.recognized_behaviors:
-                            self.recognized_behaviors.append(behavior_info)
-
-                        # 追加交互信息（如有）
-                        if object_detections and len(object_detections) > 1:
-                            interaction_info = f"多对象交互检测 (对象数: {len(object_detections)}, 帧号: {alert.get('frame', '-')})"
-                            if interaction_info not in self.recognized_interactions:
-                                self.recognized_interactions.append(interaction_info)
-                        if alert.get('type') == '入侵警告区域':
-                            region_name = alert.get('region_name', '未知区域')
-                            interaction_info = f"区域入侵交互 ({region_name}, 帧号: {alert.get('frame', '-')})"
-                            if interaction_info not in self.recognized_interactions:
-                                self.recognized_interactions.append(interaction_info)
-
-                # 计算FPS
-                elapsed = time.time() - self.start_time
-                self.fps = self.frame_count / elapsed if elapsed > 0 else 0
-
-                # 录制视频
-                if self.video_writer is not None and vis_frame is not None:
-                    # 确保尺寸匹配
-                    if vis_frame.shape[1] != self.args.width or vis_frame.shape[0] != self.args.height:
-                        vis_frame_resized = cv2.resize(vis_frame, (self.args.width, self.args.height))
-                        self.video_writer.write(vis_frame_resized)
-                    else:
-                        self.video_writer.write(vis_frame)
+        # 更新recent_alerts
+        for alert in alerts:
+            alert_info = {
+                'id': str(uuid.uuid4()),  # 使用UUID生成唯一ID
+                'camera_id': camera.cam_id,
+                'type': alert.get('type', ''),
+                'danger_level': alert.get('danger_level', 'medium'),  # 新增：危险等级
+                'time': datetime.fromtimestamp(job.captured_at).strftime('%Y-%m-%d %H:%M:%S'),
+                'trace_id': job.trace_id,
+                'confidence': float(alert.get('confidence', 0)) if alert.get('confidence', '') != '' else '',
+                'frame': int(alert.get('frame', 0)) if alert.get('frame', '') != '' else '',
+                'desc': alert.get('desc', ''),
+                'handled': False,  # 默认未处理
+                'handled_time': None,  # 处理时间
+                'person_id': alert.get('person_id', ''),  # 新增：person id
+                'person_class': alert.get('person_class', ''),  # 新增：person类别
+                # 新增：声学检测结果
+                'audio_labels': alert.get('audio_labels', None),
+                'audio_db_stats': alert.get('audio_db_stats', None),
+                'volume_exceeded': alert.get('volume_exceeded', False),
+                'volume_threshold': alert.get('volume_threshold', None)
+            }
 
-                # 清理帧队列以保持低延迟
-                while self.frame_queue.qsize() > 5:
-                    try:
-                        self.frame_queue.get_nowait()
-                    except:
-                        break
+            with self.alert_lock:
+                self.recent_alerts.append(alert_info)
+                if len(self.recent_alerts) > 10:
+                    self.recent_alerts.popleft()
+
+        # 追加行为信息
+        if alerts:
+            for alert in alerts:
+                behavior_info = f"{alert.get('type', '未知')} (置信度: {alert.get('confidence', 0):.2f}, 帧号: {alert.get('frame', '-')})"
+                if behavior_info not in self.recognized_behaviors:
+                    self.recognized_behaviors.append(behavior_info)
+
+                # 追加交互信息（如有）
+                if object_detections and len(object_detections) > 1:
+                    interaction_info = f"多对象交互检测 (对象数: {len(object_detections)}, 帧号: {alert.get('frame', '-')})"
+                    if interaction_info not in self.recognized_interactions:
+                        self.recognized_interactions.append(interaction_info)
+                if alert.get('type') == '入侵警告区域':
+                    region_name = alert.get('region_name', '未知区域')
+                    interaction_info = f"区域入侵交互 ({region_name}, 帧号: {alert.get('frame', '-')})"
+                    if interaction_info not in self.recognized_interactions:
+                        self.recognized_interactions.append(interaction_info)
+
+        # 录制视频
+        if camera.video_writer is not None and vis_frame is not None:
+            # 确保尺寸匹配
+            if vis_frame.shape[1] != self.args.width or vis_frame.shape[0] != self.args.height:
+                vis_frame_resized = cv2.resize(vis_frame, (self.args.width, self.args.height))
+                camera.video_writer.write(vis_frame_resized)
+            else:
+                camera.video_writer.write(vis_frame)
 
-        except Exception as e:
-            logger.error(f"视频处理线程出错: {str(e)}")
-            logger.error(traceback.format_exc())
-        finally:
-            logger.info("视频处理线程结束")
 
     def _parse_ai_results(self, results):
         """解析AI检测结果"""
-        detections = []
-        for r in results:
-            boxes = r.boxes
-            for box in boxes:
-                if box.conf.item() > self.args.ai_confidence:
-                    x1, y1, x2, y2 = box.xyxy[0].tolist()
-                    cls = int(box.cls.item())
-                    conf = box.conf.item()
-                    detections.append({
-                        'bbox': [int(x1), int(y1), int(x2), int(y2)],
-                        'class': r.names[cls],
-                        'confidence': conf
-                    })
-        return detections
-
-    def visualize_frame(self, original_frame, process_frame=None, features=None, alerts=None, detections=None):
+        return parse_yolo_results(results, self.args.ai_confidence)
+
+    def visualize_frame(self, original_frame, process_frame=None, features=None, alerts=None, detections=None,
+                        camera=None):
         """可视化处理结果"""
+        camera = camera or self.cameras.default
         if original_frame is None:
             return np.zeros((480, 640, 3), dtype=np.uint8)
 
@@ -1323,7 +1692,7 @@ class AllInOneSystem:
         if features and process_frame is not None:
             try:
                 # 绘制特征
-                vis_frame = self.motion_manager.visualize_features(vis_frame, features)
+                vis_frame = camera.motion_manager.visualize_features(vis_frame, features)
             except Exception as e:
                 logger.error(f"可视化特征出错: {str(e)}")
 
@@ -1331,7 +1700,8 @@ class AllInOneSystem:
         if alerts:
             try:
                 # 使用危险识别器的可视化功能，传递AI检测结果
-                vis_frame = self.danger_recognizer.visualize(vis_frame, alerts, features, detections=detections)
+                vis_frame = camera.danger_recognizer.visualize(vis_frame, alerts, features, detections=detections,
+                                                               track=False)
             except Exception as e:
                 logger.error(f"可视化告警出错: {str(e)}")
         # 如果没有告警但有AI检测结果，仍然显示检测框
@@ -1390,9 +1760,11 @@ class AllInOneSystem:
 
         try:
             while self.running:
-                # 显示处理后的帧
-                if self.processed_frame is not None:
-                    cv2.imshow("全功能视频监控系统", self.processed_frame)
+                # 显示处理后的帧（多路时每路一个窗口）
+                for camera in self.cameras:
+                    if camera.processed_frame is not None:
+                        title = "全功能视频监控系统" if len(self.cameras) == 1 else f"全功能视频监控系统 - {camera.cam_id}"
+                        cv2.imshow(title, camera.processed_frame)
 
                 # 检查键盘输入
                 key = cv2.waitKey(1) & 0xFF
@@ -1409,8 +1781,10 @@ class AllInOneSystem:
                         cv2.imwrite(save_path, self.processed_frame)
                         logger.info(f"已保存当前帧: {save_path}")
                 elif key == ord('r'):  # 'r'键重置统计
-                    self.danger_recognizer.reset_stats()
-                    self.alert_count = 0
+                    for camera in self.cameras:
+                        camera.danger_recognizer.reset_stats()
+                        with camera.stats_lock:
+                            camera.alert_count = 0
                     logger.info("已重置统计信息")
 
                 # 避免CPU占用过高
@@ -1488,22 +1862,22 @@ class AllInOneSystem:
             report += f"  - {k}: {v}\n"
 
         # 新增：告警处理统计
+        handling_stats = self.alert_store.counts()
         report += "\n告警处理统计:\n"
-        report += f"  - 总告警数: {self.alert_handling_stats['total_alerts']}\n"
-        report += f"  - 已处理: {self.alert_handling_stats['handled_alerts']}\n"
-        report += f"  - 未处理: {self.alert_handling_stats['unhandled_alerts']}\n"
-        report += f"  - 处理率: {(self.alert_handling_stats['handled_alerts'] / max(1, self.alert_handling_stats['total_alerts']) * 100):.1f}%\n"
+        report += f"  - 总告警数: {handling_stats['total_alerts']}\n"
+        report += f"  - 已处理: {handling_stats['handled_alerts']}\n"
+        report += f"  - 未处理: {handling_stats['unhandled_alerts']}\n"
+        report += f"  - 处理率: {(handling_stats['handled_alerts'] / max(1, handling_stats['total_alerts']) * 100):.1f}%\n"
 
-        # 新增：详细告警处理记录
+        # 新增：详细告警处理记录（内存中保留的最近告警，更早的在数据库中）
         report += "\n详细告警处理记录:\n"
-        with self.alert_lock:
-            for alert in self.all_alerts:
-                status = "已处理" if alert.get('handled', False) else "未处理"
-                handled_time = alert.get('handled_time', 'N/A')
-                report += f"  - {alert.get('time', 'N/A')} | {alert.get('type', 'N/A')} | {status}"
-                if alert.get('handled', False):
-                    report += f" | 处理时间: {handled_time}"
-                report += "\n"
+        for alert in self.alert_store.snapshot():
+            status = "已处理" if alert.get('handled', False) else "未处理"
+            handled_time = alert.get('handled_time', 'N/A')
+            report += f"  - {alert.get('time', 'N/A')} | {alert.get('type', 'N/A')} | {status}"
+            if alert.get('handled', False):
+                report += f" | 处理时间: {handled_time}"
+            report += "\n"
 
         # 添加系统配置信息
         report += "\n系统配置:\n"
@@ -1526,6 +1900,41 @@ class AllInOneSystem:
             'interactions': getattr(self, 'recognized_interactions', [])
         }
 
+    def _spill_alerts(self, alerts):
+        """内存告警存储淘汰的、尚未写入数据库的告警（音频告警、同一帧的其余告警等）转交后台持久化"""
+        if self.alert_persistence is None or not getattr(self.args, 'save_alerts', False):
+            return
+        from models.alert.alert_event import AlertEvent
+        from models.alert.alert_rule import AlertLevel
+        level_map = {'high': AlertLevel.CRITICAL, 'medium': AlertLevel.ALERT}
+        for info in alerts:
+            danger_level = info.get('danger_level', 'medium')
+            event = AlertEvent.create(
+                rule_id=f"rule_{info.get('type', 'unknown')}",
+                level=level_map.get(danger_level, AlertLevel.WARNING),
+                danger_level=danger_level,
+                source_type=info.get('type', 'unknown'),
+                message=info.get('desc', ''),
+                details={
+                    'camera_id': info.get('camera_id', ''),
+                    'person_id': info.get('person_id', ''),
+                    'person_class': info.get('person_class', ''),
+                    'confidence': info.get('confidence', 0),
+                    'frame': info.get('frame', 0),
+                    'location': info.get('location', {}),
+                    'audio_labels': info.get('audio_labels'),
+                    'audio_db_stats': info.get('audio_db_stats')
+                },
+                frame_idx=info.get('frame') or 0,
+                frame=None
+            )
+            try:
+                event.timestamp = time.mktime(time.strptime(info.get('time', ''), '%Y-%m-%d %H:%M:%S'))
+            except (TypeError, ValueError):
+                pass
+            event.acknowledged = bool(info.get('handled', False))
+            self.alert_persistence.submit(event)
+
     def add_audio_alert(self, labels, scores, audio_db_stats=None):
         """供音频监控模块调用，推送声学异常告警，支持一人/多人喧哗"""
         now = time.time()
@@ -1536,19 +1945,10 @@ class AllInOneSystem:
         logger.info(f"音频事件已添加到队列，当前队列长度: {len(self.recent_audio_events)}")
 
         # 2. 只有labels非空且无recent_behavior时才生成Classroom Noise告警
-        recent_behavior = False
-        with self.alert_lock:
-            for alert in list(self.all_alerts)[-10:]:
-                if alert.get('type') in ['Fighting Detection', 'Fall Detection']:
-                    alert_time = alert.get('time')
-                    try:
-                        alert_ts = time.mktime(time.strptime(alert_time, '%Y-%m-%d %H:%M:%S'))
-                    except:
-                        continue
-                    if now - alert_ts < 2.0:
-                        recent_behavior = True
-                        logger.info(f"发现相关行为告警: {alert.get('type')}")
-                        break
+        last_behavior_time = self.alert_store.last_time(['Fighting Detection', 'Fall Detection'])
+        recent_behavior = last_behavior_time is not None and now - last_behavior_time < 2.0
+        if recent_behavior:
+            logger.info("发现相关行为告警: 2秒内有打架/摔倒告警")
         if labels and len(labels) > 0 and not recent_behavior:
             alert_type = 'Classroom Noise'
             # 统计最近10秒内所有音频事件的分贝
@@ -1587,11 +1987,8 @@ class AllInOneSystem:
                 'volume_exceeded': max_db > volume_threshold,
                 'volume_threshold': volume_threshold
             }
+            self.alert_store.add(alert_info, timestamp=now)
             with self.alert_lock:
-                self.all_alerts.append(alert_info)
-                self.alert_handling_stats['total_alerts'] = len(self.all_alerts)
-                self.alert_handling_stats['handled_alerts'] = sum(1 for a in self.all_alerts if a.get('handled', False))
-                self.alert_handling_stats['unhandled_alerts'] = self.alert_handling_stats['total_alerts'] - self.alert_handling_stats['handled_alerts']
                 self.recent_alerts.append(alert_info)
         # 新增：统计声学异常（不再生成"声学异常"告警）
         if hasattr(self, 'danger_recognizer') and hasattr(self.danger_recognizer, 'behavior_stats'):
@@ -1608,15 +2005,36 @@ def parse_args():
 
     # 输入参数
     parser.add_argument('--source', type=str, default='0', help='视频源 (0表示摄像头, 或者是视频文件路径)')
+    parser.add_argument('--sources', type=str, default=None,
+                        help='多路视频源，逗号分隔，每项为 "cam_id=source" 或 "source"（指定后忽略 --source）')
     parser.add_argument('--width', type=int, default=640, help='视频宽度')
     parser.add_argument('--height', type=int, default=480, help='视频高度')
     parser.add_argument('--loop_video', action='store_true', help='循环播放视频文件')
 
     # 处理参数
     parser.add_argument('--process_every', type=int, default=3, help='每N帧处理一次')
+    parser.add_argument('--adaptive_cadence', action='store_true',
+                        help='按画面活跃程度自适应调整分析间隔和AI检测间隔（替代 --process_every/--ai_interval）')
+    parser.add_argument('--idle_process_every', type=int, default=6, help='自适应节奏：空闲时每N帧分析一次')
+    parser.add_argument('--busy_ai_interval', type=int, default=5, help='自适应节奏：最活跃时的AI检测间隔帧数')
+    parser.add_argument('--idle_ai_interval', type=int, default=60, help='自适应节奏：空闲时的AI检测间隔帧数')
+    parser.add_argument('--cadence_budget', type=float, default=0.5,
+                        help='自适应节奏：每路摄像头的CPU预算（1.0为一个核心，0表示不限制）')
     parser.add_argument('--process_scale', type=float, default=1.0, help='处理分辨率缩放比例 (0.5=半分辨率)')
     parser.add_argument('--max_fps', type=int, default=30, help='最大帧率')
     parser.add_argument('--use_gpu', action='store_true', help='使用GPU加速')
+    parser.add_argument('--pipelined', action='store_true',
+                        help='每路摄像头的处理拆成 特征→检测→识别→渲染→输出 五个阶段，各阶段在独立线程中并行')
+    parser.add_argument('--pipeline_queue_size', type=int, default=2, help='流水线各阶段之间的队列长度')
+    parser.add_argument('--load_shedding', action='store_true',
+                        help='处理跟不上帧率时逐级降级：跳过运动历史→降低光流分辨率→拉长AI间隔→关闭叠加→降低视频流质量')
+    parser.add_argument('--min_check_fps', type=float, default=1.0,
+                        help='过载降级：摔倒/打架/区域检测所需人员框的最低刷新频率（次/秒）')
+    parser.add_argument('--flow_workers', type=int, default=0, help='光流工作进程数（0表示在处理线程内计算）')
+    parser.add_argument('--flow_width', type=int, default=0,
+                        help='光流分析宽度（如320），光流统计换算为与分辨率无关的值（0表示按处理分辨率计算）')
+    parser.add_argument('--roi_flow', action='store_true',
+                        help='按帧差门控光流，只在有变化的区域和人员框附近计算，静止帧跳过光流')
     parser.add_argument('--use_motion_history', action='store_true', help='使用运动历史')
     parser.add_argument('--minimal_ui', action='store_true', help='使用最小化界面')
 
@@ -1635,7 +2053,11 @@ def parse_args():
     parser.add_argument('--enable_ai', action='store_true', help='启用AI功能')
     parser.add_argument('--vision_model', type=str, default='yolov8n', help='使用的视觉模型')
     parser.add_argument('--ai_interval', type=int, default=20, help='AI处理间隔帧数')
+    parser.add_argument('--propagate_detections', action='store_true',
+                        help='两次AI检测之间按光流推移上一次的人员框，置信度衰减后提前重新检测')
     parser.add_argument('--ai_confidence', type=float, default=0.4, help='AI检测置信度阈值')
+    parser.add_argument('--ai_batch_size', type=int, default=8, help='批量推理每批最多帧数')
+    parser.add_argument('--ai_batch_wait_ms', type=float, default=40, help='批量推理凑批最长等待时间（毫秒）')
 
     # Web界面参数
     parser.add_argument('--web_interface', action='store_true', help='启用Web界面')
@@ -1645,6 +2067,10 @@ def parse_args():
     parser.add_argument('--output', type=str, default='system_output', help='输出目录')
     parser.add_argument('--record', action='store_true', help='记录视频')
     parser.add_argument('--save_alerts', action='store_true', help='保存告警帧')
+    parser.add_argument('--alert_queue_size', type=int, default=256, help='告警持久化队列长度，满时丢弃新告警')
+    parser.add_argument('--alert_image_workers', type=int, default=2, help='写告警图片的线程数')
+    parser.add_argument('--max_alerts_in_memory', type=int, default=5000,
+                        help='内存中保留的最近告警数，更早的告警只在数据库中（启用 --save_alerts 时淘汰前落库）')
     parser.add_argument('--enable_audio_monitor', action='store_true', help='启用音频监控（声学异常检测）')
 
     return parser.parse_args()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+自适应处理节奏模块 - 按画面活跃程度调整每路摄像头的运动分析间隔和AI检测间隔
+
+- 活跃度由光流平均幅值、前景（运动面积）比例和人数三项中最高的一项决定，
+  上升时立即生效，场景安静后按指数衰减回到空闲节奏
+- 活跃度在「空闲间隔」和「繁忙间隔」之间线性插值得到目标间隔
+- 按实测的单帧分析耗时、单次AI检测耗时和视频帧率估算CPU占用，
+  超出该路摄像头的预算时按比例拉长两个间隔
+"""
+
+import math
+import threading
+
+
+class CadenceController:
+    """单路摄像头的自适应处理节奏"""
+
+    def __init__(self, busy_process_every=1, idle_process_every=6, busy_ai_interval=5, idle_ai_interval=60,
+                 cpu_budget=0.5, motion_high=2.0, foreground_high=0.1, person_high=3, decay=0.95,
+                 cost_smoothing=0.2):
+        """初始化节奏控制器
+
+        Args:
+            busy_process_every (int): 最活跃时每N帧做一次运动分析
+            idle_process_every (int): 空闲时每N帧做一次运动分析
+            busy_ai_interval (int): 最活跃时AI检测间隔帧数
+            idle_ai_interval (int): 空闲时AI检测间隔帧数
+            cpu_budget (float): 该路摄像头可占用的CPU时间比例（1.0 为一个核心）
+            motion_high (float): 光流平均幅值达到该值视为满活跃
+            foreground_high (float): 前景（运动面积）比例达到该值视为满活跃
+            person_high (int): 人数达到该值视为满活跃
+            decay (float): 每次分析后活跃度的衰减系数
+            cost_smoothing (float): 耗时指数滑动平均的系数
+        """
+        self.busy_process_every = max(1, int(busy_process_every))
+        self.idle_process_every = max(self.busy_process_every, int(idle_process_every))
+        self.busy_ai_interval = max(1, int(busy_ai_interval))
+        self.idle_ai_interval = max(self.busy_ai_interval, int(idle_ai_interval))
+        self.cpu_budget = float(cpu_budget)
+        self.motion_high = float(motion_high)
+        self.foreground_high = float(foreground_high)
+        self.person_high = max(1, int(person_high))
+        self.decay = float(decay)
+        self.cost_smoothing = float(cost_smoothing)
+
+        self.lock = threading.Lock()
+        self.activity = 0.0
+        self.process_cost = 0.0  # 单帧运动分析+行为识别耗时（秒，滑动平均）
+        self.ai_cost = 0.0  # 单次AI检测耗时（秒，滑动平均）
+        self.fps = 0.0
+        self.budget_scale = 1.0  # 因预算限制拉长间隔的倍数
+        self.process_every = self.idle_process_every
+        self.ai_interval = self.idle_ai_interval
+        self.last_process_frame = None
+        self.last_ai_frame = None
+
+    def should_process(self, frame_id):
+        """当前帧是否做运动分析（返回True时即记为已分析，流水线中分析结果稍后才由 observe 上报）"""
+        with self.lock:
+            due = self.last_process_frame is None or frame_id - self.last_process_frame >= self.process_every
+            if due:
+                self.last_process_frame = frame_id
+            return due
+
+    def should_run_ai(self, frame_id, interval=None):
+        """当前帧是否做AI检测（只在参与分析的帧上调用，返回True时即记为已检测）
+
+        interval 不为None时代替当前的AI检测间隔（如过载降级时拉长后的间隔）
+        """
+        with self.lock:
+            interval = self.ai_interval if interval is None else interval
+            due = self.last_ai_frame is None or frame_id - self.last_ai_frame >= interval
+            if due:
+                self.last_ai_frame = frame_id
+            return due
+
+    def observe(self, frame_id, features=None, person_count=0, process_time=0.0, ai_time=None, fps=None):
+        """记录一次分析的结果和耗时，更新活跃度和节奏
+
+        Args:
+            frame_id: 帧号
+            features: 运动特征字典（使用 flow_mean_magnitude、foreground_ratio / motion_area_ratio）
+            person_count (int): 当前人数
+            process_time (float): 本次运动分析和行为识别的耗时（秒，不含AI检测）
+            ai_time (float): 本次AI检测的耗时（秒），本帧未做AI检测时为None
+            fps (float): 视频源帧率
+        """
+        features = features or {}
+        motion = float(features.get('flow_mean_magnitude', 0.0)) / self.motion_high
+        foreground = features.get('foreground_ratio', features.get('motion_area_ratio', 0.0))
+        foreground = float(foreground) / self.foreground_high
+        persons = person_count / self.person_high
+        level = min(1.0, max(motion, foreground, persons))
+
+        with self.lock:
+            self.activity = max(level, self.activity * self.decay)
+            self.process_cost = self._smooth(self.process_cost, process_time)
+            if ai_time is not None:
+                self.ai_cost = self._smooth(self.ai_cost, ai_time)
+            if fps:
+                self.fps = float(fps)
+            self._update_cadence()
+
+    def _smooth(self, average, value):
+        if average == 0.0:
+            return float(value)
+        return average + self.cost_smoothing * (value - average)
+
+    def _update_cadence(self):
+        """按活跃度插值目标间隔，超出CPU预算时按比例拉长"""
+        process_every = self.idle_process_every - self.activity * (self.idle_process_every - self.busy_process_every)
+        ai_interval = self.idle_ai_interval - self.activity * (self.idle_ai_interval - self.busy_ai_interval)
+
+        self.budget_scale = 1.0
+        usage = self._usage(process_every, ai_interval)
+        if self.cpu_budget > 0 and usage > self.cpu_budget:
+            self.budget_scale = usage / self.cpu_budget
+
+        self.process_every = min(self.idle_process_every,
+                                 max(self.busy_process_every, int(math.ceil(process_every * self.budget_scale))))
+        self.ai_interval = min(self.idle_ai_interval,
+                               max(self.busy_ai_interval, int(math.ceil(ai_interval * self.budget_scale))))
+
+    def _usage(self, process_every, ai_interval):
+        """按给定间隔估算的CPU占用比例"""
+        return self.fps * (self.process_cost / process_every + self.ai_cost / ai_interval)
+
+    def get_stats(self):
+        """获取当前节奏和预算使用情况"""
+        with self.lock:
+            return {
+                'activity': round(self.activity, 3),
+                'process_every': self.process_every,
+                'ai_interval': self.ai_interval,
+                'cpu_budget': self.cpu_budget,
+                'cpu_usage': round(self._usage(self.process_every, self.ai_interval), 3),
+                'budget_limited': self.budget_scale > 1.0,
+                'avg_process_ms': self.process_cost * 1000,
+                'avg_ai_ms': self.ai_cost * 1000
+            }
@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+多路摄像头注册模块 - 管理单进程内多路视频源的独立运行状态
+每路摄像头拥有自己的帧环形缓冲、运动特征管理器、危险行为识别器和统计信息，
+AI检测模型由所有摄像头共享
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+from frame_ring_buffer import FrameRingBuffer
+from load_shedding import SHED_FLOW_WIDTH_MIN, SHED_STREAM_QUALITY
+from metrics import METRICS
+from mjpeg_broadcaster import MJPEGBroadcaster
+
+logger = logging.getLogger("CameraStream")
+
+
+class CameraStream:
+    """单路摄像头的运行状态"""
+
+    def __init__(self, cam_id, source, motion_manager, danger_recognizer, ring_slots=8, cadence=None,
+                 propagator=None, metrics=None, load_shedder=None):
+        """初始化摄像头状态
+
+        Args:
+            cam_id (str): 摄像头ID（用于 /video_feed/<cam_id> 和 /stats）
+            source: 视频源（摄像头索引、视频文件路径或RTMP地址）
+            motion_manager: 该路视频独享的运动特征管理器
+            danger_recognizer: 该路视频独享的危险行为识别器（含跟踪状态）
+            ring_slots (int): 「捕获线程 → 处理线程」帧环形缓冲的槽位数
+            cadence (CadenceController): 可选的自适应处理节奏，None 表示按固定间隔处理
+            propagator (DetectionPropagator): 可选的检测结果传播器，两次AI检测之间按光流推移检测框
+            metrics (MetricsScope): 该路的指标句柄，None 时创建带 camera 标签的句柄
+            load_shedder (LoadShedController): 可选的过载降级控制器，None 表示不降级
+        """
+        self.cam_id = cam_id
+        self.source = source
+        self.motion_manager = motion_manager
+        self.danger_recognizer = danger_recognizer
+        self.cadence = cadence
+        self.propagator = propagator
+        self.load_shedder = load_shedder
+        self.shed_defaults = None  # 降级前的运动分析设置，级别回到0时还原
+        self.metrics = metrics if metrics is not None else METRICS.scope(camera=cam_id)
+
+        self.frame_ring = FrameRingBuffer(ring_slots)
+        self.broadcaster = MJPEGBroadcaster(metrics=self.metrics)  # /video_feed 共享编码结果
+        self.video_writer = None
+
+        # 运行状态
+        self.connected = False  # 视频源是否已打开
+        self.processed_frame = None  # 叠加可视化后的帧
+        self.frame_count = 0  # 已读取帧数
+        self.processed_count = 0  # 参与分析的帧数
+        self.alert_count = 0  # 该路产生的告警数
+        self.last_ai_frame = 0  # 上一次AI检测的帧号
+        self.person_boxes = []  # 最近一次AI检测到的人员框，用于光流区域门控
+        self.pipeline = None  # 处理流水线（StagePipeline），由主系统创建
+        self.prev_frame_ref = None  # 上一帧的槽位引用，由流水线的特征阶段持有
+        self.recognizer_lock = threading.Lock()  # 识别阶段与渲染阶段访问危险行为识别器时互斥
+        self.start_time = time.time()
+        self.stats_lock = threading.Lock()
+
+    @property
+    def current_frame(self):
+        """最新捕获的原始帧（拷贝，槽位随后可能被覆盖）"""
+        ref = self.frame_ring.latest()
+        if ref is None:
+            return None
+        with ref:
+            return ref.frame.copy()
+
+    @property
+    def fps(self):
+        """该路视频的平均读取帧率"""
+        elapsed = time.time() - self.start_time
+        return self.frame_count / elapsed if elapsed > 0 else 0
+
+    def get_stats(self):
+        """获取该路摄像头的统计信息"""
+        elapsed = time.time() - self.start_time
+        with self.stats_lock:
+            return {
+                'cam_id': self.cam_id,
+                'source': str(self.source),
+                'connected': self.connected,
+                'fps': self.fps,
+                'frame_count': self.frame_count,
+                'processed_count': self.processed_count,
+                'alert_count': self.alert_count,
+                'queue_size': self.frame_ring.backlog(),
+                'frame_ring': self.frame_ring.get_stats(),
+                'stream': self.broadcaster.get_stats(),
+                'cadence': self.cadence.get_stats() if self.cadence else None,
+                'propagation': self.propagator.get_stats() if self.propagator else None,
+                'pipeline': self.pipeline.get_stats() if self.pipeline else None,
+                'load_shedding': self.load_shedder.get_stats() if self.load_shedder else None,
+                'latency': self.metrics.snapshot(),
+                'running_time': f"{elapsed:.1f}秒"
+            }
+
+    def apply_load_shedding(self):
+        """按降级控制器的当前级别调整运动分析和视频流编码，级别降低后还原对应的设置"""
+        shedder = self.load_shedder
+        if shedder is None:
+            return
+        motion_manager = self.motion_manager
+        if self.shed_defaults is None:
+            self.shed_defaults = {
+                'use_motion_history': motion_manager.use_motion_history,
+                'flow_width': motion_manager.flow_width
+            }
+        defaults = self.shed_defaults
+
+        motion_manager.use_motion_history = defaults['use_motion_history'] and not shedder.skip_motion_history
+        if shedder.reduce_flow_resolution:
+            # 光流分析宽度减半（未设置时按当前帧宽），检测框、区域和轨迹仍在原分辨率下
+            prev_gray = motion_manager.prev_gray
+            width = defaults['flow_width'] or (prev_gray.shape[1] if prev_gray is not None else 640)
+            motion_manager.flow_width = max(SHED_FLOW_WIDTH_MIN, width // 2)
+        else:
+            motion_manager.flow_width = defaults['flow_width']
+        self.broadcaster.quality_limit = SHED_STREAM_QUALITY if shedder.lower_stream_quality else None
+
+    def collect_metrics(self):
+        """导出 /metrics 时采集的指标：连接状态、环形缓冲积压和流水线各阶段队列深度"""
+        labels = {'camera': self.cam_id}
+        samples = [
+            ('camera_connected', 'gauge', labels, int(self.connected)),
+            ('queue_depth', 'gauge', dict(labels, queue='frame_ring'), self.frame_ring.backlog())
+        ]
+        if self.load_shedder is not None:
+            samples.append(('load_shed_level', 'gauge', labels, self.load_shedder.level))
+        if self.pipeline is not None:
+            for stage in self.pipeline.stages:
+                samples.append(('queue_depth', 'gauge', dict(labels, queue=stage.name), stage.queue.qsize()))
+        return samples
+
+
+class CameraRegistry:
+    """摄像头注册表 - 按注册顺序保存所有摄像头，第一个为默认摄像头"""
+
+    def __init__(self):
+        self._cameras = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, camera):
+        """注册摄像头，ID重复时抛出 ValueError"""
+        with self._lock:
+            if camera.cam_id in self._cameras:
+                raise ValueError(f"摄像头ID重复: {camera.cam_id}")
+            self._cameras[camera.cam_id] = camera
+        logger.info(f"注册摄像头 {camera.cam_id}: {camera.source}")
+        return camera
+
+    def get(self, cam_id=None):
+        """按ID获取摄像头，cam_id为空时返回默认摄像头，不存在时返回None"""
+        with self._lock:
+            if cam_id is None:
+                return next(iter(self._cameras.values()), None)
+            return self._cameras.get(cam_id)
+
+    @property
+    def default(self):
+        """默认摄像头（第一个注册的摄像头）"""
+        return self.get()
+
+    def ids(self):
+        """所有摄像头ID"""
+        with self._lock:
+            return list(self._cameras.keys())
+
+    def __iter__(self):
+        with self._lock:
+            cameras = list(self._cameras.values())
+        return iter(cameras)
+
+    def __len__(self):
+        return len(self._cameras)
+
+
+def parse_camera_sources(sources, default_source='0'):
+    """解析多路视频源参数
+
+    Args:
+        sources (str): 逗号分隔的视频源列表，每项为 "cam_id=source" 或 "source"，
+            例如 "front=rtmp://host/live/a,back=1,2"；为空时使用 default_source
+        default_source (str): 单路模式下的 --source
+
+    Returns:
+        list: [(cam_id, source_str), ...]，未指定ID的视频源按位置命名为 cam0、cam1...，
+        与显式指定的ID冲突时依次加后缀（如 cam1_2）
+
+    Raises:
+        ValueError: 显式指定的ID重复或为空
+    """
+    if not sources:
+        return [('cam0', default_source)]
+
+    parsed = []
+    for index, item in enumerate(s.strip() for s in sources.split(',')):
+        if not item:
+            continue
+        # 仅把 "://" 之前的等号视为ID分隔符，避免误拆URL查询参数
+        head = item.split('://', 1)[0]
+        if '=' in head:
+            cam_id, source = item.split('=', 1)
+            cam_id, source = cam_id.strip(), source.strip()
+            if not cam_id:
+                raise ValueError(f"视频源缺少摄像头ID: {item}")
+        else:
+            cam_id, source = None, item
+        parsed.append((index, cam_id, source))
+
+    used = set()
+    for _, cam_id, _ in parsed:
+        if cam_id is not None:
+            if cam_id in used:
+                raise ValueError(f"摄像头ID重复: {cam_id}")
+            used.add(cam_id)
+
+    entries = []
+    for index, cam_id, source in parsed:
+        if cam_id is None:
+            # 按位置命名的ID不能占用显式指定的ID，否则一路视频的画面和统计会被另一路覆盖
+            cam_id, suffix = f"cam{index}", 2
+            while cam_id in used:
+                cam_id, suffix = f"cam{index}_{suffix}", suffix + 1
+            used.add(cam_id)
+        entries.append((cam_id, source))
+    return entries
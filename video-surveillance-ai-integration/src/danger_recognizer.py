@@ -13,8 +13,31 @@ import os
 from datetime import datetime
 from threading import Lock
 
+from metrics import METRICS
+from zone_index import ZoneIndex
+from tracking_engine import TrackingEngine, iou_matrix, linear_assignment
+from pair_analysis import candidate_pairs, pair_geometry, estimate_real_distance, PairHistory
+
 logger = logging.getLogger("DangerRecognizer")
 
+
+def _motion_vector_columns(motion_vectors):
+    """把运动矢量转换为 (x, y, fx, fy) 四个列数组
+
+    兼容 MotionFeatureManager 输出的结构化数组和 (x, y, fx, fy, mag) 元组列表，
+    没有运动矢量时返回 None
+    """
+    if motion_vectors is None or len(motion_vectors) == 0:
+        return None
+    if isinstance(motion_vectors, np.ndarray) and motion_vectors.dtype.names:
+        return (motion_vectors['x'], motion_vectors['y'],
+                motion_vectors['fx'], motion_vectors['fy'])
+    data = np.asarray(motion_vectors, dtype=np.float32)
+    if data.ndim != 2 or data.shape[1] < 4:
+        return None
+    return data[:, 0], data[:, 1], data[:, 2], data[:, 3]
+
+
 class DangerRecognizer:
     """危险行为识别器 - 用于检测和识别视频中的危险行为"""
     
@@ -43,11 +66,12 @@ class DangerRecognizer:
         'approaching_danger_zone': 'low',  # 新增
     }
     
-    def __init__(self, config=None):
+    def __init__(self, config=None, metrics=None):
         """初始化危险行为识别器
         
         Args:
             config: 配置字典，包含检测参数和阈值
+            metrics (MetricsScope): 记录区域/打架/摔倒检测耗时的指标句柄，None 时使用默认注册表
         """
         # 默认配置
         self.config = {
@@ -83,6 +107,9 @@ class DangerRecognizer:
         if self.config['save_alerts']:
             os.makedirs(self.config['alert_dir'], exist_ok=True)
         
+        self.metrics = metrics if metrics is not None else METRICS.scope()
+        self.clock = time.time  # 停留时间、打架持续时间等计时用的时钟，离线分析时换成视频时间
+
         # 初始化状态
         self.history = []
         self.current_frame = 0
@@ -95,6 +122,7 @@ class DangerRecognizer:
         
         # 添加用于ROI区域的属性
         self.alert_regions = []  # 告警区域列表
+        self._zone_index = None  # 告警区域的栅格索引，区域变化后在下次查询时重建
         
         # 新增：告警对象跟踪
         self.alerted_objects = {}  # 格式: {object_id: {'frame': frame_num, 'alert_type': type, 'bbox': bbox}}
@@ -105,8 +133,6 @@ class DangerRecognizer:
         self.dwell_alert_cooldown = {}  # 格式: {object_id: last_alert_frame} 防止重复告警
         
         # 新增：多目标跟踪
-        self.tracked_persons = {}  # {id: {'bbox': [x1, y1, x2, y2], 'last_seen': frame_idx}}
-        self.next_person_id = 1
         self.tracking_max_distance = 50  # 最大中心点距离，判定为同一人
         self.tracking_max_missing = 30   # 最大丢失帧数
         
@@ -114,8 +140,19 @@ class DangerRecognizer:
         self.tracking_iou_threshold = 0.3  # IOU匹配阈值
         self.tracking_distance_threshold = 75  # 距离匹配阈值（增加）
         self.tracking_recent_frames = 10  # 最近帧数限制
-        self.tracking_min_consecutive = 3  # 最小连续跟踪帧数
-        self.tracking_max_consecutive = 100  # 最大连续跟踪帧数（防止ID溢出）
+        self.tracking_min_consecutive = 3  # 最小连续跟踪帧数（之前丢失超过15帧即删除）
+        self.person_tracker = TrackingEngine(
+            iou_threshold=self.tracking_iou_threshold,
+            distance_threshold=self.tracking_distance_threshold,
+            recent_frames=self.tracking_recent_frames,
+            min_hits=self.tracking_min_consecutive,
+            max_missing=self.tracking_max_missing,
+            tentative_max_missing=15,
+            first_id=1
+        )
+        self._tracking_frame = None  # 最近一次更新跟踪的帧号，保证每帧只更新一次
+        self._tracking_boxes = np.zeros((0, 4))  # 该帧的person检测框和分配的ID
+        self._tracking_ids = []
         
         # 新增：帧尺寸信息
         self.frame_width = 640
@@ -132,7 +169,7 @@ class DangerRecognizer:
         }
         
         # 新增：打架检测相关
-        self.fighting_history = {}  # 格式: {pair_key: {'start_frame': frame, 'duration': frames, 'motion_history': []}}
+        self.fighting_history = PairHistory(window=max(30, self.config['fighting_duration_frames']))  # 按 (person_id, person_id) 记录持续性
         self.last_fighting_frame = 0  # 打架检测冷却时间
         
         # 添加属性访问器，方便动态更新配置
@@ -175,14 +212,43 @@ class DangerRecognizer:
             'color': (255, 0, 0),  # 蓝色
             'thickness': 2
         })
+        self._zone_index = None
         logger.info(f"Added alert region: {name}")
         return len(self.alert_regions) - 1  # 返回区域ID
     
     def clear_alert_regions(self):
         """清除所有告警区域"""
         self.alert_regions.clear()
+        self._zone_index = None
         logger.info("Cleared all alert regions")
     
+    def _get_zone_index(self):
+        """获取告警区域的栅格索引（区域或接近距离阈值变化时重建）"""
+        margin = int(self.config.get('danger_zone_approach_distance', 50))
+        if self._zone_index is None or self._zone_index.margin != margin:
+            self._zone_index = ZoneIndex([region['points'] for region in self.alert_regions], margin)
+        return self._zone_index
+    
+    def _query_zones(self, bboxes):
+        """一次性计算一批检测框与所有告警区域的关系
+        
+        Args:
+            bboxes: [[x1, y1, x2, y2], ...] 边界框列表
+            
+        Returns:
+            (in_zone, distance): (N, R) 的布尔数组和距离数组；
+            in_zone 与逐个调用 _check_bbox_intersection 的结果一致，
+            distance 与 _calculate_distance_to_region 一致（超出接近距离阈值的为 inf）
+        """
+        index = self._get_zone_index()
+        point_inside, distance = index.query(bboxes)
+        b = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+        rx, ry, rw, rh = (index.rects[:, k][None, :] for k in range(4))
+        x1, y1, x2, y2 = (b[:, k][:, None] for k in range(4))
+        # 与 _check_bbox_intersection 的外接矩形判定一致（把 [x1, y1, x2, y2] 当作 x, y, w, h 代入）
+        rect_overlap = (x1 < rx + rw) & (x1 + x2 > rx) & (y1 < ry + rh) & (y1 + y2 > ry)
+        return point_inside | rect_overlap, distance
+    
     def _calculate_distance_to_region(self, bbox, region_points):
         """计算边界框到危险区域的距离
         
@@ -260,21 +326,23 @@ class DangerRecognizer:
             alerts: 停留时间告警列表
         """
         alerts = []
-        current_time = time.time()
+        current_time = self.clock()
         current_frame = self.current_frame
         
-        # 首先更新人员跟踪，分配唯一ID
+        # 确保已分配人员ID（本帧已更新过跟踪时只标注ID，不会重复推进）
         self.update_person_tracking(object_detections)
         
         # # print("[调试] 当前危险区域设置:")
         # # for i, region in enumerate(self.alert_regions):
         # #     print(f"  区域{i}: {region['points'].tolist()}")
         
+        # 所有person与所有区域的重合关系一次性查表得到
+        persons = [obj for obj in object_detections
+                   if 'bbox' in obj and str(obj.get('class', '')).lower() == 'person']
+        in_zone, _ = self._query_zones([obj['bbox'] for obj in persons])
+        
         # 检查每个检测到的对象
-        for obj in object_detections:
-            if 'bbox' not in obj or str(obj.get('class', '')).lower() != 'person':
-                continue
-            
+        for n, obj in enumerate(persons):
             bbox = obj['bbox']
             # # print(f"[调试] 检测到person方框: {bbox}")
             
@@ -285,20 +353,9 @@ class DangerRecognizer:
             else:
                 object_id = f"{obj.get('class', 'person')}_{hash(tuple(bbox))}"  # 备用哈希ID
             
-            # 检查是否在危险区域内
-            in_danger_zone = False
-            region_id = None
-            
-            for i, region in enumerate(self.alert_regions):
-                # 检查边界框是否与危险区域有重合
-                is_overlap = self._check_bbox_intersection(bbox, region['points'])
-                # print(f"[调试] 检查person方框 {bbox} 与区域{i} 是否重合: {is_overlap}")
-                if is_overlap:
-                    in_danger_zone = True
-                    region_id = i
-                    # 只要有重合就输出一次告警
-                    # print(f"[告警] person方框 {bbox} 已进入危险区域{i}！")
-                    break
+            # 检查是否在危险区域内（取第一个有重合的区域）
+            in_danger_zone = bool(in_zone[n].any())
+            region_id = int(np.argmax(in_zone[n])) if in_danger_zone else None
             
             if in_danger_zone:
                 # 对象在危险区域内，开始或继续计时
@@ -387,49 +444,48 @@ class DangerRecognizer:
         now_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         if not hasattr(self, 'approach_alerted_set'):
             self.approach_alerted_set = set()
-        for obj in object_detections:
-            if 'bbox' not in obj or str(obj.get('class', '')).lower() != 'person':
-                continue
+        persons = [obj for obj in object_detections
+                   if 'bbox' in obj and str(obj.get('class', '')).lower() == 'person']
+        in_zone, distances = self._query_zones([obj['bbox'] for obj in persons])
+        for n, obj in enumerate(persons):
             bbox = obj['bbox']
             person_id = obj.get('person_id', None)
             object_id = f"person_{person_id}" if person_id is not None else f"person_{hash(tuple(bbox))}"  # 与停留一致
-            in_any_zone = False
-            for region in self.alert_regions:
-                if self._check_bbox_intersection(bbox, region['points']):
-                    in_any_zone = True
-                    break
-            if in_any_zone:
+            if in_zone[n].any():
                 self.approach_alert_cooldown.pop(object_id, None)
                 continue
-            for i, region in enumerate(self.alert_regions):
-                dist = self._calculate_distance_to_region(bbox, region['points'])
-                if dist < approach_distance:
-                    last_frame = self.approach_alert_cooldown.get(object_id, -10000)
-                    if current_frame - last_frame > cooldown_frames:
-                        region_name = region.get('name', str(i))
-                        desc = f"检测到人员（ID: {person_id}）距离危险区域 '{region_name}' 过近（{dist:.1f} 像素），请注意安全"
-                        alert = {
-                            'type': self.DANGER_TYPES['approaching_danger_zone'],
-                            'danger_level': self.DANGER_LEVELS['approaching_danger_zone'],
-                            'confidence': 0.8,
-                            'frame': current_frame,
-                            'object_id': object_id,
-                            'person_id': person_id,
-                            'region_id': i,
-                            'region_name': region_name,
-                            'distance': dist,
-                            'threshold': approach_distance,
-                            'bbox': bbox,
-                            'desc': desc,
-                            'alert_time': now_str
-                        }
-                        alert_key = (object_id, i, now_str)
-                        if alert_key in self.approach_alerted_set:
-                            continue
-                        alerts.append(alert)
-                        self.approach_alerted_set.add(alert_key)
-                        self.approach_alert_cooldown[object_id] = current_frame
-                    break
+            # 取第一个距离小于阈值的区域
+            near = np.flatnonzero(distances[n] < approach_distance)
+            if len(near) == 0:
+                continue
+            i = int(near[0])
+            region = self.alert_regions[i]
+            dist = float(distances[n, i])
+            last_frame = self.approach_alert_cooldown.get(object_id, -10000)
+            if current_frame - last_frame > cooldown_frames:
+                region_name = region.get('name', str(i))
+                desc = f"检测到人员（ID: {person_id}）距离危险区域 '{region_name}' 过近（{dist:.1f} 像素），请注意安全"
+                alert = {
+                    'type': self.DANGER_TYPES['approaching_danger_zone'],
+                    'danger_level': self.DANGER_LEVELS['approaching_danger_zone'],
+                    'confidence': 0.8,
+                    'frame': current_frame,
+                    'object_id': object_id,
+                    'person_id': person_id,
+                    'region_id': i,
+                    'region_name': region_name,
+                    'distance': dist,
+                    'threshold': approach_distance,
+                    'bbox': bbox,
+                    'desc': desc,
+                    'alert_time': now_str
+                }
+                alert_key = (object_id, i, now_str)
+                if alert_key in self.approach_alerted_set:
+                    continue
+                alerts.append(alert)
+                self.approach_alerted_set.add(alert_key)
+                self.approach_alert_cooldown[object_id] = current_frame
         # 清理过期的唯一性key（只保留最近1000个）
         if len(self.approach_alerted_set) > 1000:
             self.approach_alerted_set = set(list(self.approach_alerted_set)[-1000:])
@@ -452,6 +508,10 @@ class DangerRecognizer:
         # 更新帧尺寸信息
         self.frame_height, self.frame_width = frame_shape[:2]
         
+        # 每帧推进一次人员跟踪，后续的停留检测、摔倒检测和可视化复用本帧分配的ID
+        if object_detections is not None:
+            self.update_person_tracking(object_detections)
+        
         # 提取当前帧的运动统计
         motion_stats = self._extract_motion_stats(features, (frame_shape[1], frame_shape[0]))
         
@@ -507,7 +567,7 @@ class DangerRecognizer:
         """
         frame_area = frame_size[0] * frame_size[1]
         stats = {
-            'timestamp': time.time(),
+            'timestamp': self.clock(),
             'avg_magnitude': 0,
             'max_magnitude': 0,
             'motion_directions': {},
@@ -528,17 +588,17 @@ class DangerRecognizer:
             stats['max_magnitude'] = features.get('flow_max_magnitude', features['flow_mean_magnitude'])
             # 用motion_vectors数量估算运动面积
             if 'motion_vectors' in features:
-                # 16为采样步长，motion_vectors数量*采样面积
-                motion_area = len(features['motion_vectors']) * 16 * 16
+                if 'motion_area_ratio' in features:
+                    # 运动特征管理器已按采样步长和分析分辨率归一化
+                    motion_area = features['motion_area_ratio'] * frame_area
+                else:
+                    # 16为采样步长，motion_vectors数量*采样面积
+                    motion_area = len(features['motion_vectors']) * 16 * 16
                 
                 # 计算垂直运动分量
-                if 'motion_vectors' in features and len(features['motion_vectors']) > 0:
-                    vertical_components = []
-                    for vector in features['motion_vectors']:
-                        if len(vector) >= 2:  # 确保有y分量
-                            vertical_components.append(vector[1])  # y分量
-                    if vertical_components:
-                        vertical_motion = np.mean(vertical_components)
+                columns = _motion_vector_columns(features['motion_vectors'])
+                if columns is not None:
+                    vertical_motion = float(np.mean(columns[1]))  # y分量
         else:
             # 兼容原有特征点方式
             magnitudes = []
@@ -578,6 +638,7 @@ class DangerRecognizer:
         in_cooldown = self.current_frame - self.last_alert_frame <= self.config['alert_cooldown']
         
         # 摔倒检测（不受冷却时间限制）
+        fall_start = time.perf_counter()
         fall_alerts = []
         if len(self.history) >= 10:  # 需要更多历史记录来判断摔倒事件
             # 新增：检查是否有人员存在，避免摄像设备运动被误判
@@ -608,19 +669,16 @@ class DangerRecognizer:
                         pass  # 跳过摔倒检测
                     else:
                         # 新增：统计水平方向运动
-                        recent_horizontal_motions = []
+                        max_horizontal_motion = 0
                         if isinstance(features, dict) and 'motion_vectors' in features:
-                            for v in features['motion_vectors']:
-                                if len(v) >= 3:
-                                    recent_horizontal_motions.append(v[2])  # fx
+                            columns = _motion_vector_columns(features['motion_vectors'])
+                            if columns is not None:
+                                max_horizontal_motion = np.max(np.abs(columns[2]))  # fx
                         elif features:
-                            for f in features:
-                                if hasattr(f, 'data') and len(f.data) >= 1:
-                                    recent_horizontal_motions.append(f.data[0])  # dx
-                        if recent_horizontal_motions:
-                            max_horizontal_motion = np.max(np.abs(recent_horizontal_motions))
-                        else:
-                            max_horizontal_motion = 0
+                            recent_horizontal_motions = [f.data[0] for f in features
+                                                         if hasattr(f, 'data') and len(f.data) >= 1]  # dx
+                            if recent_horizontal_motions:
+                                max_horizontal_motion = np.max(np.abs(recent_horizontal_motions))
                         recent_magnitudes = [h['avg_magnitude'] for h in self.history[-8:]]
                         recent_avg = np.mean(recent_magnitudes[-3:])
                         earlier_avg = np.mean(recent_magnitudes[:-3]) if len(recent_magnitudes) > 3 else 0
@@ -640,20 +698,16 @@ class DangerRecognizer:
                             
                             # 检查运动方向的一致性（摄像头移动通常有方向性）
                             if isinstance(features, dict) and 'motion_vectors' in features:
-                                motion_vectors = features['motion_vectors']
-                                if len(motion_vectors) > 10:
+                                columns = _motion_vector_columns(features['motion_vectors'])
+                                if columns is not None and len(columns[2]) > 10:
                                     # 计算运动向量的方向一致性
-                                    directions = []
-                                    for v in motion_vectors:
-                                        if len(v) >= 4:
-                                            dx, dy = v[2], v[3]
-                                            if abs(dx) > 0.1 or abs(dy) > 0.1:
-                                                directions.append((dx, dy))
+                                    dxs, dys = columns[2], columns[3]
+                                    moving = (np.abs(dxs) > 0.1) | (np.abs(dys) > 0.1)
                             
-                                    if len(directions) > 5:
+                                    if np.count_nonzero(moving) > 5:
                                         # 计算方向的一致性
-                                        avg_dx = np.mean([d[0] for d in directions])
-                                        avg_dy = np.mean([d[1] for d in directions])
+                                        avg_dx = np.mean(dxs[moving])
+                                        avg_dy = np.mean(dys[moving])
                                         direction_consistency = np.sqrt(avg_dx**2 + avg_dy**2)
                                         
                                         # 如果方向一致性很高，可能是摄像头移动
@@ -748,8 +802,11 @@ class DangerRecognizer:
                             # 增加行为统计
                             self.behavior_stats['fall_count'] += 1
         
+        fall_time = time.perf_counter() - fall_start
+
         # 如果在冷却时间内，只返回摔倒检测结果
         if in_cooldown:
+            self.metrics.observe('fall', fall_time)
             return fall_alerts
         
         # 其他类型的告警处理
@@ -776,10 +833,12 @@ class DangerRecognizer:
 
         # 3. 检测警戒区域入侵和停留时间
         if object_detections and self.alert_regions:
+            zone_start = time.perf_counter()
             # 新增：检测接近危险区域
             approach_alerts = self._track_danger_zone_approach(object_detections)
             # 3.1 检测危险区域停留时间
             dwell_alerts = self._track_danger_zone_dwell(object_detections)
+            self.metrics.observe('zone', time.perf_counter() - zone_start)
             # 合并两类告警
             for alert in approach_alerts:
                 alerts.append(alert)
@@ -792,10 +851,12 @@ class DangerRecognizer:
         # 4. 打架检测
         if object_detections:
             # 移除重复统计，只在_detect_fighting中统计
-            fighting_alerts = self._detect_fighting(object_detections, features)
+            with self.metrics.timer('fighting'):
+                fighting_alerts = self._detect_fighting(object_detections, features)
             alerts.extend(fighting_alerts)
 
         # 5. 摔倒检测（不受冷却时间限制，融合唯一告警状态机）
+        fall_start = time.perf_counter()
         fall_alerts = []
         if len(self.history) >= 10:
             has_person = False
@@ -817,19 +878,16 @@ class DangerRecognizer:
                     elif downward_motion_count < 2:
                         pass
                     else:
-                        recent_horizontal_motions = []
+                        max_horizontal_motion = 0
                         if isinstance(features, dict) and 'motion_vectors' in features:
-                            for v in features['motion_vectors']:
-                                if len(v) >= 3:
-                                    recent_horizontal_motions.append(v[2])
+                            columns = _motion_vector_columns(features['motion_vectors'])
+                            if columns is not None:
+                                max_horizontal_motion = np.max(np.abs(columns[2]))
                         elif features:
-                            for f in features:
-                                if hasattr(f, 'data') and len(f.data) >= 1:
-                                    recent_horizontal_motions.append(f.data[0])
-                        if recent_horizontal_motions:
-                            max_horizontal_motion = np.max(np.abs(recent_horizontal_motions))
-                        else:
-                            max_horizontal_motion = 0
+                            recent_horizontal_motions = [f.data[0] for f in features
+                                                         if hasattr(f, 'data') and len(f.data) >= 1]
+                            if recent_horizontal_motions:
+                                max_horizontal_motion = np.max(np.abs(recent_horizontal_motions))
                         recent_magnitudes = [h['avg_magnitude'] for h in self.history[-8:]]
                         recent_avg = np.mean(recent_magnitudes[-3:])
                         earlier_avg = np.mean(recent_magnitudes[:-3]) if len(recent_magnitudes) > 3 else 0
@@ -846,22 +904,22 @@ class DangerRecognizer:
                             direction_consistency = 0
                             dx_var = 0
                             dy_var = 0
+                            columns = None
                             if isinstance(features, dict) and 'motion_vectors' in features:
-                                motion_vectors = features['motion_vectors']
-                                if len(motion_vectors) > 10:
-                                    dxs = [v[2] for v in motion_vectors if len(v) >= 4]
-                                    dys = [v[3] for v in motion_vectors if len(v) >= 4]
-                                    if dxs and dys:
-                                        avg_dx = np.mean(dxs)
-                                        avg_dy = np.mean(dys)
-                                        direction_consistency = np.sqrt(avg_dx**2 + avg_dy**2)
-                                        dx_var = np.var(dxs)
-                                        dy_var = np.var(dys)
+                                columns = _motion_vector_columns(features['motion_vectors'])
+                            if columns is not None and len(columns[2]) > 10:
+                                dxs, dys = columns[2], columns[3]
+                                avg_dx = np.mean(dxs)
+                                avg_dy = np.mean(dys)
+                                direction_consistency = np.sqrt(avg_dx**2 + avg_dy**2)
+                                dx_var = np.var(dxs)
+                                dy_var = np.var(dys)
                             direction_consistent = direction_consistency > 2.0 and dx_var < 2.0 and dy_var < 2.0
                             # 全局特征点漂移
-                            if isinstance(features, dict) and 'motion_vectors' in features:
-                                all_magnitudes = [np.sqrt(v[2]**2 + v[3]**2) for v in features['motion_vectors'] if len(v) >= 4]
-                                global_motion = np.mean(all_magnitudes) if all_magnitudes else 0
+                            vector_magnitudes = None
+                            if columns is not None:
+                                vector_magnitudes = np.sqrt(columns[2].astype(np.float64)**2 + columns[3].astype(np.float64)**2)
+                                global_motion = np.mean(vector_magnitudes)
                             else:
                                 global_motion = 0
                             # 连续帧判据
@@ -873,14 +931,15 @@ class DangerRecognizer:
                             # 边缘与中心区域运动幅度对比
                             edge_motion = 0
                             center_motion = 0
-                            if isinstance(features, dict) and 'motion_vectors' in features:
+                            if columns is not None:
                                 h, w = frame_height, frame_width
-                                edge_vectors = [v for v in features['motion_vectors'] if len(v) >= 2 and (v[0] < w*0.1 or v[0] > w*0.9 or v[1] < h*0.1 or v[1] > h*0.9)]
-                                center_vectors = [v for v in features['motion_vectors'] if len(v) >= 2 and (w*0.3 < v[0] < w*0.7 and h*0.3 < v[1] < h*0.7)]
-                                if edge_vectors:
-                                    edge_motion = np.mean([np.sqrt(v[2]**2 + v[3]**2) for v in edge_vectors if len(v) >= 4])
-                                if center_vectors:
-                                    center_motion = np.mean([np.sqrt(v[2]**2 + v[3]**2) for v in center_vectors if len(v) >= 4])
+                                xs, ys = columns[0], columns[1]
+                                edge_mask = (xs < w*0.1) | (xs > w*0.9) | (ys < h*0.1) | (ys > h*0.9)
+                                center_mask = (w*0.3 < xs) & (xs < w*0.7) & (h*0.3 < ys) & (ys < h*0.7)
+                                if edge_mask.any():
+                                    edge_motion = np.mean(vector_magnitudes[edge_mask])
+                                if center_mask.any():
+                                    center_motion = np.mean(vector_magnitudes[center_mask])
                             edge_center_similar = edge_motion > 4 and abs(edge_motion - center_motion) < 2
                             # 判据融合：满足以下任意一项即判定为画面移动（更严格）
                             cam_move_criteria = [
@@ -1024,6 +1083,7 @@ class DangerRecognizer:
                                 if not fall_alerts[-1]['vertical_motion'] and prev_state and stand_up:
                                     # fall_alerts[-1]['desc'] += "，站起"  # 移除输出
                                     self.person_fall_state[person_id] = False
+        self.metrics.observe('fall', fall_time + time.perf_counter() - fall_start)
         if in_cooldown:
             return fall_alerts
         alerts.extend(fall_alerts)
@@ -1075,243 +1135,201 @@ class DangerRecognizer:
             if magnitudes:
                 motion_intensity = np.mean(magnitudes)
         
-        # 计算人员之间的距离和运动特征
-        person_pairs = []
-        for i in range(len(persons)):
-            for j in range(i + 1, len(persons)):
-                person1 = persons[i]
-                person2 = persons[j]
-                
-                # 计算两个人员边界框中心点之间的距离
-                bbox1 = person1['bbox']
-                bbox2 = person2['bbox']
-                center1_x = (bbox1[0] + bbox1[2]) // 2
-                center1_y = (bbox1[1] + bbox1[3]) // 2
-                center2_x = (bbox2[0] + bbox2[2]) // 2
-                center2_y = (bbox2[1] + bbox2[3]) // 2
-                
-                # 计算像素距离
-                pixel_distance = np.sqrt((center1_x - center2_x)**2 + (center1_y - center2_y)**2)
-                
-                # 估算实际距离（基于人物在画面中的位置和大小）
-                estimated_real_distance = self._estimate_real_distance(bbox1, bbox2, center1_x, center1_y, center2_x, center2_y)
-                
-                # 计算边界框的重叠面积
-                overlap_area = self._calculate_overlap_area(bbox1, bbox2)
-                
-                # 计算人物大小（用于距离估算）
-                person1_size = (bbox1[2] - bbox1[0]) * (bbox1[3] - bbox1[1])
-                person2_size = (bbox2[2] - bbox2[0]) * (bbox2[3] - bbox2[1])
-                
-                person_pairs.append({
-                    'person1': person1,
-                    'person2': person2,
-                    'pixel_distance': pixel_distance,
-                    'real_distance': estimated_real_distance,
-                    'overlap_area': overlap_area,
-                    'center1': (center1_x, center1_y),
-                    'center2': (center2_x, center2_y),
-                    'person1_size': person1_size,
-                    'person2_size': person2_size,
-                    'motion_intensity': motion_intensity
-                })
-        
-        # 持续性打架检测
-        current_time = time.time()
-        fighting_detected = False
-        confidence = 0.0
-        condition_details = []
-        
-        for pair in person_pairs:
-            # 新增：必须有重叠面积>60 或 距离<80px，否则直接跳过（更宽松）
-            if pair['overlap_area'] < 60 and pair['pixel_distance'] > 80:
-                continue
-            # 必须有剧烈运动
-            motion_threshold = self.config['fighting_motion_threshold']
-            if pair['motion_intensity'] <= motion_threshold:
-                continue
-            # 生成配对键（用于跟踪持续性）
-            person1_id = pair['person1'].get('person_id', 'unknown')
-            person2_id = pair['person2'].get('person_id', 'unknown')
-            pair_key = f"{min(person1_id, person2_id)}_{max(person1_id, person2_id)}"
-            
-            # 检查是否满足打架条件
-            pair_confidence = 0.0
-            pair_conditions = []
-            
-            # 条件1：实际距离很近（考虑人物大小和位置）
-            distance_threshold = self.config['fighting_distance_threshold']
-            if pair['pixel_distance'] < distance_threshold:
-                # 根据人物大小调整距离权重
-                avg_size = (pair['person1_size'] + pair['person2_size']) / 2
-                size_factor = min(avg_size / 10000, 2.0)  # 人物越大，距离权重越高
-                adjusted_distance_score = max(0, 1 - pair['pixel_distance'] / (distance_threshold * size_factor))
-                pair_confidence += adjusted_distance_score * 0.3
-                pair_conditions.append(f"距离很近({pair['pixel_distance']:.1f}px)")
+        # 运动强度是整帧的指标：不够剧烈时任何一对都不会判为打架
+        motion_threshold = self.config['fighting_motion_threshold']
+        if motion_intensity <= motion_threshold:
+            self._cleanup_fighting_history()
+            return alerts
+        
+        # 网格近邻搜索只保留有重叠或中心距离在80px内的两两组合，再按数组计算几何关系
+        bboxes = np.array([det['bbox'][:4] for det in persons], dtype=np.float64)
+        idx1, idx2 = candidate_pairs(bboxes, margin=40)
+        geometry = pair_geometry(bboxes, idx1, idx2)
+        # 新增：必须有重叠面积>60 或 距离<80px，否则直接跳过（更宽松）
+        keep = ~((geometry['overlap_area'] < 60) & (geometry['pixel_distance'] > 80))
+        if not keep.any():
+            self._cleanup_fighting_history()
+            return alerts
+        idx1, idx2 = idx1[keep], idx2[keep]
+        geometry = {name: values[keep] for name, values in geometry.items()}
+        pixel_distance = geometry['pixel_distance']
+        overlap_area = geometry['overlap_area']
+        size1, size2 = geometry['size1'], geometry['size2']
+        real_distance = estimate_real_distance(geometry['center1'], geometry['center2'], size1, size2,
+                                               self.frame_width, self.frame_height)
+        
+        # 与具体配对无关的条件每帧只计算一次
+        frame_confidence = 0.0
+        frame_conditions = []
+        
+        # 条件3：剧烈运动（运动强度大于阈值）
+        motion_score = min((motion_intensity - motion_threshold) / motion_threshold, 1.0)
+        frame_confidence += motion_score * 0.3
+        frame_conditions.append(f"剧烈运动({motion_intensity:.1f})")
+        
+        # 条件4：多个人员同时运动（轻微排除摔倒场景）
+        # 检查是否为摔倒场景：如果运动主要是垂直向下或水平运动，可能是摔倒
+        is_fall_scenario = False
+        columns = None
+        if isinstance(features, dict) and 'motion_vectors' in features:
+            columns = _motion_vector_columns(features['motion_vectors'])
+            if columns is not None:
+                avg_vertical = np.mean(columns[3])  # dy
+                avg_horizontal = np.mean(columns[2])  # dx
+                # 提高阈值，减少误判
+                if abs(avg_vertical) > 6 or abs(avg_horizontal) > 6:  # 从5提高到6
+                    is_fall_scenario = True
+        
+        # 只有在不是摔倒场景时才加分
+        if not is_fall_scenario:
+            frame_confidence += 0.2
+            frame_conditions.append("多人同时运动")
+        else:
+            frame_conditions.append("检测到可能的摔倒场景，显著降低打架置信度")
+            frame_confidence -= 0.2  # 原-0.05，扣分更重
+        
+        # 新增条件6：检查运动模式（避免静态或缓慢移动被误判）
+        high_motion = motion_intensity > motion_threshold * 2.0  # 从1.5提高到2.0，要求更高的运动强度
+        if high_motion:
+            frame_confidence += 0.2
+        
+        # 新增条件7：排除摔倒场景（检查运动特征，更宽松）
+        fall_indicators = 0
+        if isinstance(features, dict) and 'motion_vectors' in features:
+            # 检查是否有大量垂直向下运动（提高阈值）
+            vertical_down_motions = int(np.count_nonzero(columns[3] > 3)) if columns is not None else 0  # dy > 3 表示明显的向下运动
             
-            # 条件2：边界框有重叠（人员接触）
-            if pair['overlap_area'] > 0:
-                overlap_score = min(pair['overlap_area'] / 1000, 1.0)  # 重叠面积越大，分数越高
-                pair_confidence += overlap_score * 0.4
-                pair_conditions.append(f"人员接触(重叠{pair['overlap_area']:.1f})")
+            if vertical_down_motions > len(features['motion_vectors']) * 0.4:  # 40%以上明显向下运动
+                fall_indicators += 1
             
-            # 条件3：剧烈运动（运动强度大于阈值）
-            motion_threshold = self.config['fighting_motion_threshold']
-            if pair['motion_intensity'] > motion_threshold:
-                motion_score = min((pair['motion_intensity'] - motion_threshold) / motion_threshold, 1.0)
-                pair_confidence += motion_score * 0.3
-                pair_conditions.append(f"剧烈运动({pair['motion_intensity']:.1f})")
+            # 检查运动后是否静止（更严格的条件）
+            if len(self.history) >= 5:
+                recent_magnitudes = [h['avg_magnitude'] for h in self.history[-3:]]
+                earlier_magnitudes = [h['avg_magnitude'] for h in self.history[-5:-3]]
+                if earlier_magnitudes and recent_magnitudes:
+                    if np.mean(earlier_magnitudes) > 5 and np.mean(recent_magnitudes) < 1.5:
+                        fall_indicators += 1
+        
+        # 如果有摔倒指标，适度降低打架置信度
+        if fall_indicators >= 2:
+            frame_confidence -= 0.3
+        elif fall_indicators == 1:
+            frame_confidence -= 0.1
+        
+        # 按配对计算的条件（数组运算）
+        # 条件1：实际距离很近（根据人物大小调整距离权重，人物越大，距离权重越高）
+        distance_threshold = self.config['fighting_distance_threshold']
+        is_close = pixel_distance < distance_threshold
+        size_factor = np.minimum((size1 + size2) / 2 / 10000, 2.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            adjusted_distance_score = np.maximum(0, 1 - pixel_distance / (distance_threshold * size_factor))
+        adjusted_distance_score = np.nan_to_num(adjusted_distance_score, nan=0.0)
+        # 条件2：边界框有重叠（人员接触），重叠面积越大，分数越高
+        has_overlap = overlap_area > 0
+        overlap_score = np.minimum(overlap_area / 1000, 1.0)
+        # 新增条件5：检查人物大小是否合理（更宽松，原2000→800）
+        min_reasonable_size = 800
+        reasonable_size = (size1 > min_reasonable_size) & (size2 > min_reasonable_size)
+        
+        pair_confidences = (frame_confidence
+                            + np.where(is_close, adjusted_distance_score * 0.3, 0.0)
+                            + np.where(has_overlap, overlap_score * 0.4, 0.0)
+                            + np.where(reasonable_size, 0.1, 0.0))
+        
+        # 持续性打架检测（只遍历剪枝后的配对）
+        current_time = self.clock()
+        duration_threshold = self.config['fighting_duration_frames']
+        confidence_threshold = self.config['fighting_confidence_threshold']
+        
+        for k in range(len(idx1)):
+            person1, person2 = persons[idx1[k]], persons[idx2[k]]
+            pair_confidence = float(pair_confidences[k])
+            # 生成配对键（轨迹ID对，用于跟踪持续性）
+            person1_id = person1.get('person_id', 'unknown')
+            person2_id = person2.get('person_id', 'unknown')
+            pair_key = tuple(sorted((person1_id, person2_id), key=str))
             
-            # 条件4：多个人员同时运动（轻微排除摔倒场景）
-            if len(persons) >= 2:
-                # 检查是否为摔倒场景：如果运动主要是垂直向下或水平运动，可能是摔倒
-                is_fall_scenario = False
-                if isinstance(features, dict) and 'motion_vectors' in features:
-                    vertical_motions = []
-                    horizontal_motions = []
-                    for v in features['motion_vectors']:
-                        if len(v) >= 4:
-                            vertical_motions.append(v[3])  # dy
-                            horizontal_motions.append(v[2])  # dx
-                    
-                    if vertical_motions and horizontal_motions:
-                        avg_vertical = np.mean(vertical_motions)
-                        avg_horizontal = np.mean(horizontal_motions)
-                        # 提高阈值，减少误判
-                        if abs(avg_vertical) > 6 or abs(avg_horizontal) > 6:  # 从5提高到6
-                            is_fall_scenario = True
-                
-                # 只有在不是摔倒场景时才加分
-                if not is_fall_scenario:
-                    pair_confidence += 0.2
-                    pair_conditions.append("多人同时运动")
-                else:
-                    pair_conditions.append("检测到可能的摔倒场景，显著降低打架置信度")
-                    pair_confidence -= 0.2  # 原-0.05，扣分更重
+            row = self.fighting_history.get(pair_key)
+            if row is None:
+                # 新配对，初始化历史记录
+                if pair_confidence >= confidence_threshold * 0.7:  # 原0.9，放宽初始阈值
+                    self.fighting_history.start(pair_key, self.current_frame, current_time,
+                                                motion_intensity, pair_confidence)
+                continue
             
-            # 新增条件5：检查人物大小是否合理（更宽松，原2000→800）
-            min_reasonable_size = 800
-            if person1_size > min_reasonable_size and person2_size > min_reasonable_size:
-                pair_confidence += 0.1
-                pair_conditions.append("人物大小合理")
+            # 检查时间连续性（允许2秒或10帧的短暂中断）
+            time_gap = current_time - self.fighting_history.last_update[row]
+            frame_gap = self.current_frame - self.fighting_history.start_frame[row] - self.fighting_history.duration[row]
+            if not (time_gap < 2.0 and frame_gap < 10):
+                # 时间间隔太长，重置历史记录
+                self.fighting_history.remove(pair_key)
+                continue
             
-            # 新增条件6：检查运动模式（避免静态或缓慢移动被误判）
-            if pair['motion_intensity'] > motion_threshold * 2.0:  # 从1.5提高到2.0，要求更高的运动强度
-                pair_confidence += 0.2
-                pair_conditions.append("高强度运动")
+            self.fighting_history.append(row, current_time, motion_intensity, pair_confidence)
+            duration = int(self.fighting_history.duration[row])
             
-            # 新增条件7：排除摔倒场景（检查运动特征，更宽松）
-            fall_indicators = 0
-            if isinstance(features, dict) and 'motion_vectors' in features:
-                # 检查是否有大量垂直向下运动（提高阈值）
-                vertical_down_motions = 0
-                for v in features['motion_vectors']:
-                    if len(v) >= 4 and v[3] > 3:  # dy > 3 表示明显的向下运动
-                        vertical_down_motions += 1
-                
-                if vertical_down_motions > len(features['motion_vectors']) * 0.4:  # 40%以上明显向下运动
-                    fall_indicators += 1
-                
-                # 检查运动后是否静止（更严格的条件）
-                if len(self.history) >= 5:
-                    recent_magnitudes = [h['avg_magnitude'] for h in self.history[-3:]]
-                    earlier_magnitudes = [h['avg_magnitude'] for h in self.history[-5:-3]]
-                    if earlier_magnitudes and recent_magnitudes:
-                        if np.mean(earlier_magnitudes) > 5 and np.mean(recent_magnitudes) < 1.5:
-                            fall_indicators += 1
+            # 检查是否满足持续性要求
+            if duration < duration_threshold:
+                continue
+            avg_confidence = float(np.mean(self.fighting_history.recent_confidence(row, duration_threshold)))
+            if avg_confidence < confidence_threshold:
+                continue
             
-            # 如果有摔倒指标，适度降低打架置信度
+            condition_details = []
+            if is_close[k]:
+                condition_details.append(f"距离很近({pixel_distance[k]:.1f}px)")
+            if has_overlap[k]:
+                condition_details.append(f"人员接触(重叠{overlap_area[k]:.1f})")
+            condition_details.extend(frame_conditions)
+            if reasonable_size[k]:
+                condition_details.append("人物大小合理")
+            if high_motion:
+                condition_details.append("高强度运动")
             if fall_indicators >= 2:
-                pair_confidence -= 0.3
-                pair_conditions.append(f"检测到{fall_indicators}个摔倒指标，适度降低打架置信度")
+                condition_details.append(f"检测到{fall_indicators}个摔倒指标，适度降低打架置信度")
             elif fall_indicators == 1:
-                pair_confidence -= 0.1
-                pair_conditions.append("检测到1个摔倒指标，轻微降低打架置信度")
+                condition_details.append("检测到1个摔倒指标，轻微降低打架置信度")
+            condition_details.append(f"持续{duration}帧")
             
-            # 持续性检测
-            if pair_key not in self.fighting_history:
-                # 新配对，初始化历史记录
-                if pair_confidence >= self.config['fighting_confidence_threshold'] * 0.7:  # 原0.9，放宽初始阈值
-                    self.fighting_history[pair_key] = {
-                        'start_frame': self.current_frame,
-                        'duration': 1,
-                        'motion_history': [pair['motion_intensity']],
-                        'confidence_history': [pair_confidence],
-                        'last_update': current_time
-                    }
-            else:
-                # 更新现有配对的历史记录
-                history = self.fighting_history[pair_key]
-                
-                # 检查时间连续性（允许短暂中断）
-                time_gap = current_time - history['last_update']
-                frame_gap = self.current_frame - history['start_frame'] - history['duration']
-                
-                if time_gap < 2.0 and frame_gap < 10:  # 允许2秒或10帧的短暂中断
-                    # 更新历史记录
-                    history['duration'] += 1
-                    history['motion_history'].append(pair['motion_intensity'])
-                    history['confidence_history'].append(pair_confidence)
-                    history['last_update'] = current_time
-                    
-                    # 保持历史记录长度
-                    if len(history['motion_history']) > 30:
-                        history['motion_history'] = history['motion_history'][-30:]
-                        history['confidence_history'] = history['confidence_history'][-30:]
-                    
-                    # 检查是否满足持续性要求
-                    duration_threshold = self.config['fighting_duration_frames']
-                    if history['duration'] >= duration_threshold:
-                        # 计算平均置信度
-                        avg_confidence = np.mean(history['confidence_history'][-duration_threshold:])
-                        if avg_confidence >= self.config['fighting_confidence_threshold']:
-                            fighting_detected = True
-                            confidence = avg_confidence
-                            condition_details = pair_conditions
-                            condition_details.append(f"持续{history['duration']}帧")
-                            
-                            # 生成告警信息
-                            center_x = (pair['center1'][0] + pair['center2'][0]) // 2
-                            center_y = (pair['center1'][1] + pair['center2'][1]) // 2
-                            
-                            # 使用类的帧尺寸属性
-                            rel_x = round(center_x / self.frame_width * 100, 2)
-                            rel_y = round(center_y / self.frame_height * 100, 2)
-                            x_desc = "左侧" if rel_x < 33.33 else "右侧" if rel_x > 66.67 else "中间"
-                            y_desc = "上方" if rel_y < 33.33 else "下方" if rel_y > 66.67 else "中间"
-                            
-                            location = {
-                                'x': center_x,
-                                'y': center_y,
-                                'rel_x': rel_x,
-                                'rel_y': rel_y,
-                                'description': f"画面{x_desc}{y_desc}"
-                            }
-                            
-                            desc = f"检测到人员（ID: {person1_id}）和人员（ID: {person2_id}）在{location['description']}发生持续性打架行为"
-                            
-                            alert = {
-                                'type': self.DANGER_TYPES['fighting'],
-                                'danger_level': self.DANGER_LEVELS['fighting'],
-                                'confidence': confidence,
-                                'frame': self.current_frame,
-                                'location': location,
-                                'desc': desc,
-                                'person1_id': person1_id,
-                                'person2_id': person2_id,
-                                'pixel_distance': pair['pixel_distance'],
-                                'real_distance': pair['real_distance'],
-                                'motion_intensity': pair['motion_intensity'],
-                                'duration': history['duration'],
-                                'condition_details': condition_details
-                            }
-                            alerts.append(alert)
-                            # 增加行为统计
-                            self.behavior_stats['fighting_count'] += 1
-                            self.last_fighting_frame = self.current_frame
-                else:
-                    # 时间间隔太长，重置历史记录
-                    del self.fighting_history[pair_key]
+            # 生成告警信息
+            center_x = int(geometry['center1'][k][0] + geometry['center2'][k][0]) // 2
+            center_y = int(geometry['center1'][k][1] + geometry['center2'][k][1]) // 2
+            
+            # 使用类的帧尺寸属性
+            rel_x = round(center_x / self.frame_width * 100, 2)
+            rel_y = round(center_y / self.frame_height * 100, 2)
+            x_desc = "左侧" if rel_x < 33.33 else "右侧" if rel_x > 66.67 else "中间"
+            y_desc = "上方" if rel_y < 33.33 else "下方" if rel_y > 66.67 else "中间"
+            
+            location = {
+                'x': center_x,
+                'y': center_y,
+                'rel_x': rel_x,
+                'rel_y': rel_y,
+                'description': f"画面{x_desc}{y_desc}"
+            }
+            
+            desc = f"检测到人员（ID: {person1_id}）和人员（ID: {person2_id}）在{location['description']}发生持续性打架行为"
+            
+            alert = {
+                'type': self.DANGER_TYPES['fighting'],
+                'danger_level': self.DANGER_LEVELS['fighting'],
+                'confidence': avg_confidence,
+                'frame': self.current_frame,
+                'location': location,
+                'desc': desc,
+                'person1_id': person1_id,
+                'person2_id': person2_id,
+                'pixel_distance': float(pixel_distance[k]),
+                'real_distance': float(real_distance[k]),
+                'motion_intensity': motion_intensity,
+                'duration': duration,
+                'condition_details': condition_details
+            }
+            alerts.append(alert)
+            # 增加行为统计
+            self.behavior_stats['fighting_count'] += 1
+            self.last_fighting_frame = self.current_frame
         
         # 清理过期的打架历史记录
         self._cleanup_fighting_history()
@@ -1334,78 +1352,14 @@ class DangerRecognizer:
         Returns:
             estimated_distance: 估算的实际距离（相对单位）
         """
-        # 计算人物大小
         size1 = (bbox1[2] - bbox1[0]) * (bbox1[3] - bbox1[1])
         size2 = (bbox2[2] - bbox2[0]) * (bbox2[3] - bbox2[1])
-        
-        # 计算人物在画面中的位置（距离画面中心的距离）
-        frame_center_x = self.frame_width / 2
-        frame_center_y = self.frame_height / 2
-        
-        distance1_to_center = np.sqrt((center1_x - frame_center_x)**2 + (center1_y - frame_center_y)**2)
-        distance2_to_center = np.sqrt((center2_x - frame_center_x)**2 + (center2_y - frame_center_y)**2)
-        
-        # 计算像素距离
-        pixel_distance = np.sqrt((center1_x - center2_x)**2 + (center1_y - center2_y)**2)
-        
-        # 改进的距离因子计算
-        # 1. 人物大小因子：人物越大，距离因子越小（更近）
-        avg_size = (size1 + size2) / 2
-        size_factor = min(avg_size / 8000, 1.5)  # 限制大小因子的影响
-        
-        # 2. 位置因子：距离画面中心越远，距离因子越大（更远）
-        avg_distance_to_center = (distance1_to_center + distance2_to_center) / 2
-        position_factor = 1 + (avg_distance_to_center / 200)  # 位置影响
-        
-        # 3. 大小差异因子：如果两个人物大小差异很大，可能距离较远
-        size_ratio = max(size1, size2) / min(size1, size2) if min(size1, size2) > 0 else 1
-        size_diff_factor = min(size_ratio / 2, 1.5)  # 限制大小差异的影响
-        
-        # 4. 综合距离因子（更保守的估算）
-        combined_factor = (size_factor + position_factor + size_diff_factor) / 3
-        
-        # 估算实际距离（更保守）
-        estimated_distance = pixel_distance * combined_factor * 1.2  # 增加1.2倍保守系数
-        
-        return estimated_distance
+        return float(estimate_real_distance((center1_x, center1_y), (center2_x, center2_y), size1, size2,
+                                            self.frame_width, self.frame_height))
     
     def _cleanup_fighting_history(self):
-        """清理过期的打架历史记录"""
-        current_time = time.time()
-        to_delete = []
-        
-        for pair_key, history in self.fighting_history.items():
-            # 如果超过5秒没有更新，删除记录
-            if current_time - history['last_update'] > 5.0:
-                to_delete.append(pair_key)
-        
-        for pair_key in to_delete:
-            del self.fighting_history[pair_key]
-    
-    def _calculate_overlap_area(self, bbox1, bbox2):
-        """计算两个边界框的重叠面积
-        
-        Args:
-            bbox1: [x1, y1, x2, y2] 第一个边界框
-            bbox2: [x1, y1, x2, y2] 第二个边界框
-            
-        Returns:
-            overlap_area: 重叠面积
-        """
-        x1_1, y1_1, x2_1, y2_1 = bbox1
-        x1_2, y1_2, x2_2, y2_2 = bbox2
-        
-        # 计算重叠区域
-        x_left = max(x1_1, x1_2)
-        y_top = max(y1_1, y1_2)
-        x_right = min(x2_1, x2_2)
-        y_bottom = min(y2_1, y2_2)
-        
-        if x_right < x_left or y_bottom < y_top:
-            return 0  # 没有重叠
-        
-        overlap_area = (x_right - x_left) * (y_bottom - y_top)
-        return overlap_area
+        """清理过期的打架历史记录（超过5秒没有更新）"""
+        self.fighting_history.expire(self.clock(), 5.0)
     
     def _save_alert_frame(self, frame, alert):
         """保存告警帧
@@ -1446,132 +1400,46 @@ class DangerRecognizer:
         logger.info(f"已保存告警帧: {filepath}")
     
     def update_person_tracking(self, detections):
-        """改进的人员跟踪方法
+        """人员跟踪：为检测结果中的每个person分配唯一的 person_id
         
-        使用更稳定的跟踪算法：
-        1. IOU匹配（优先）
-        2. 中心点距离匹配（备用）
-        3. 外观特征匹配（可选）
-        4. 状态管理（处理遮挡和重新出现）
+        跟踪状态由 TrackingEngine 维护（IOU/中心点距离代价矩阵 + 最优分配 + 卡尔曼预测），
+        每帧只推进一次：同一帧内再次调用（停留检测、摔倒检测、可视化）时不改变跟踪状态，
+        只按该帧已分配的结果为检测框标注ID。
         """
-        # 只处理person
         persons = [det for det in detections if str(det.get('class', '')).lower() == 'person']
-        updated_ids = set()
-        
-        # 计算当前帧所有检测框的IOU矩阵
-        current_bboxes = [det['bbox'] for det in persons]
-        if not current_bboxes:
-            return
-        
-        # 与历史跟踪的IOU匹配
-        for det in persons:
-            bbox = det['bbox']
-            cx = (bbox[0] + bbox[2]) // 2
-            cy = (bbox[1] + bbox[3]) // 2
-            
-            best_match_id = None
-            best_iou = self.tracking_iou_threshold  # 使用配置的IOU阈值
-            best_distance = float('inf')
-            
-            # 1. 优先使用IOU匹配
-            for pid, info in self.tracked_persons.items():
-                prev_bbox = info['bbox']
-                iou = self._calculate_iou(bbox, prev_bbox)
-                
-                if iou > best_iou:
-                    best_iou = iou
-                    best_match_id = pid
-            
-            # 2. 如果IOU匹配失败，使用距离匹配
-            if best_match_id is None:
-                for pid, info in self.tracked_persons.items():
-                    prev_bbox = info['bbox']
-                    pcx = (prev_bbox[0] + prev_bbox[2]) // 2
-                    pcy = (prev_bbox[1] + prev_bbox[3]) // 2
-                    dist = ((cx - pcx) ** 2 + (cy - pcy) ** 2) ** 0.5
-                    
-                    # 使用配置的距离阈值和帧数限制
-                    if (dist < self.tracking_distance_threshold and 
-                        dist < best_distance and
-                        self.current_frame - info['last_seen'] < self.tracking_recent_frames):
-                        best_distance = dist
-                        best_match_id = pid
-            
-            # 3. 分配ID
-            if best_match_id is not None:
-                # 更新已有ID
-                self.tracked_persons[best_match_id] = {
-                    'bbox': bbox, 
-                    'last_seen': self.current_frame,
-                    'consecutive_frames': self.tracked_persons[best_match_id].get('consecutive_frames', 0) + 1
-                }
-                det['person_id'] = best_match_id
-                updated_ids.add(best_match_id)
-            else:
-                # 分配新ID
-                pid = self.next_person_id
-                self.next_person_id += 1
-                self.tracked_persons[pid] = {
-                    'bbox': bbox, 
-                    'last_seen': self.current_frame,
-                    'consecutive_frames': 1
-                }
-                det['person_id'] = pid
-                updated_ids.add(pid)
+        bboxes = [det['bbox'] for det in persons]
         
-        # 4. 清理长时间未出现的ID（更宽松的清理策略）
-        to_del = []
-        for pid, info in self.tracked_persons.items():
-            frames_missing = self.current_frame - info['last_seen']
-            consecutive_frames = info.get('consecutive_frames', 0)
-            
-            # 根据连续跟踪帧数调整清理策略
-            if consecutive_frames < self.tracking_min_consecutive:
-                max_missing = 15  # 15帧
-            else:
-                max_missing = self.tracking_max_missing  # 30帧
-            
-            # 防止连续帧数过多导致ID溢出
-            if consecutive_frames > self.tracking_max_consecutive:
-                to_del.append(pid)
-            elif frames_missing > max_missing:
-                to_del.append(pid)
-        
-        for pid in to_del:
-            del self.tracked_persons[pid]
+        if self._tracking_frame != self.current_frame:
+            self._tracking_frame = self.current_frame
+            ids = self.person_tracker.update(bboxes, frame_index=self.current_frame)
+            self._tracking_boxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+            self._tracking_ids = ids
+        else:
+            # 同一帧的重复调用：与本帧已跟踪的检测框按IOU一对一对应
+            ids = [None] * len(bboxes)
+            if bboxes and self._tracking_ids:
+                iou = iou_matrix(bboxes, self._tracking_boxes)
+                for d, t in linear_assignment(1.0 - iou, iou > self.tracking_iou_threshold):
+                    ids[d] = self._tracking_ids[t]
+        
+        for det, pid in zip(persons, ids):
+            if pid is not None:
+                det['person_id'] = pid
     
-    def _calculate_iou(self, bbox1, bbox2):
-        """计算两个边界框的IOU
-        
-        Args:
-            bbox1: [x1, y1, x2, y2]
-            bbox2: [x1, y1, x2, y2]
-            
-        Returns:
-            iou: IOU值 (0-1)
-        """
-        x1_1, y1_1, x2_1, y2_1 = bbox1
-        x1_2, y1_2, x2_2, y2_2 = bbox2
-        
-        # 计算交集
-        x1_i = max(x1_1, x1_2)
-        y1_i = max(y1_1, y1_2)
-        x2_i = min(x2_1, x2_2)
-        y2_i = min(y2_1, y2_2)
-        
-        if x2_i <= x1_i or y2_i <= y1_i:
-            return 0.0
-        
-        intersection = (x2_i - x1_i) * (y2_i - y1_i)
-        
-        # 计算并集
-        area1 = (x2_1 - x1_1) * (y2_1 - y1_1)
-        area2 = (x2_2 - x1_2) * (y2_2 - y1_2)
-        union = area1 + area2 - intersection
-        
-        return intersection / union if union > 0 else 0.0
+    @property
+    def tracked_persons(self):
+        """当前跟踪中的人员 {id: {'bbox', 'last_seen', 'consecutive_frames', 'state'}}"""
+        return {
+            pid: {
+                'bbox': track.bbox,
+                'last_seen': track.last_seen,
+                'consecutive_frames': track.consecutive_frames,
+                'state': track.state
+            }
+            for pid, track in self.person_tracker.tracks.items()
+        }
     
-    def visualize(self, frame, alerts=None, features=None, show_debug=True, detections=None):
+    def visualize(self, frame, alerts=None, features=None, show_debug=True, detections=None, track=True):
         """可视化危险行为检测结果
         
         Args:
@@ -1580,6 +1448,8 @@ class DangerRecognizer:
             features: 特征列表
             show_debug: 是否显示调试信息
             detections: AI检测结果，用于对象级告警显示
+            track: 为False时不推进跟踪，直接使用 detections 中识别时已标注的 person_id
+                （流水线的渲染阶段使用：渲染的帧可能早于识别器已处理到的帧）
         Returns:
             vis_frame: 可视化后的视频帧
         """
@@ -1627,8 +1497,13 @@ class DangerRecognizer:
 
         # 优化：使用告警对象跟踪来精确显示红框
         if detections:
-            self.update_person_tracking(detections)
-            for det in detections:
+            if track:
+                self.update_person_tracking(detections)
+            if self.alert_regions:
+                in_zone_flags = self._query_zones([det['bbox'] for det in detections])[0].any(axis=1)
+            else:
+                in_zone_flags = np.zeros(len(detections), dtype=bool)
+            for det, det_in_zone in zip(detections, in_zone_flags):
                 if str(det.get('class', '')).lower() == 'person':
                     x1, y1, x2, y2 = det['bbox']
                     pid = det.get('person_id', -1)
@@ -1640,12 +1515,7 @@ class DangerRecognizer:
                     # 在危险区域内或处于告警状态的person显示红框
                     if pid != -1: # 只有当有ID时才检查
                         is_alerted = self.is_object_alerted(det)
-                        in_danger_zone = False
-                        if self.alert_regions:
-                            for region in self.alert_regions:
-                                if self._check_bbox_intersection(det['bbox'], region['points']):
-                                    in_danger_zone = True
-                                    break
+                        in_danger_zone = bool(det_in_zone)
                         if is_alerted or in_danger_zone:
                             cv2.rectangle(vis_frame, (x1, y1), (x2, y2), color, thickness)
                     else:
@@ -1743,10 +1613,12 @@ class DangerRecognizer:
             self.danger_zone_trackers = {}
             self.dwell_alert_cooldown = {}
             # 清理多目标跟踪
-            self.tracked_persons = {}
-            self.next_person_id = 1
+            self.person_tracker.reset()
+            self._tracking_frame = None
+            self._tracking_boxes = np.zeros((0, 4))
+            self._tracking_ids = []
             # 清理打架检测历史
-            self.fighting_history = {}
+            self.fighting_history.clear()
             self.last_fighting_frame = 0
             logger.info("危险行为识别器已重置")
 
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+检测结果传播模块 - 在两次AI检测之间，用已经计算好的稠密光流把上一次的检测框逐帧向前推移
+
+- 每个框取框内运动像素的光流中位数作为位移（框内大部分像素静止时视为不动），不做额外的图像计算
+- 传播出的检测带 propagated=True 和 propagated_frames，置信度每传播一次按 decay 衰减
+- 置信度相对检测时的原始值衰减到 refresh_confidence 以下（decay ** 传播次数）、或连续传播
+  超过 max_age 次时，needs_refresh() 为真，由调用方提前重新做一次完整检测；按相对值判断，
+  原始置信度本来就偏低的检测不会导致频繁重新检测
+"""
+
+import numpy as np
+
+
+def box_flow_shift(flow, box, scale=1.0, min_magnitude=0.5, min_moving_fraction=0.1, step=2):
+    """框内运动像素的光流中位数
+
+    Args:
+        flow: (H, W, 2) 稠密光流（分析分辨率）
+        box: [x1, y1, x2, y2]（输入帧坐标）
+        scale (float): 分析分辨率相对输入帧的缩放比例（features['flow_scale']）
+        min_magnitude (float): 运动像素的最小位移（分析分辨率像素）
+        min_moving_fraction (float): 运动像素占比低于该值时视为不动
+        step (int): 框内采样步长
+
+    Returns:
+        tuple: 输入帧坐标下的位移 (dx, dy)
+    """
+    h, w = flow.shape[:2]
+    x1, y1, x2, y2 = (int(round(v * scale)) for v in box[:4])
+    x1, y1 = max(0, x1), max(0, y1)
+    x2, y2 = min(w, x2), min(h, y2)
+    if x2 <= x1 or y2 <= y1:
+        return 0.0, 0.0
+    vectors = flow[y1:y2:step, x1:x2:step].reshape(-1, 2)
+    moving = vectors[np.hypot(vectors[:, 0], vectors[:, 1]) > min_magnitude]
+    if len(moving) == 0 or len(moving) < min_moving_fraction * len(vectors):
+        return 0.0, 0.0
+    dx, dy = np.median(moving, axis=0)
+    return float(dx) / scale, float(dy) / scale
+
+
+class DetectionPropagator:
+    """单路摄像头的检测结果传播器"""
+
+    def __init__(self, decay=0.95, refresh_confidence=0.3, max_age=30, classes=('person',)):
+        """初始化传播器
+
+        Args:
+            decay (float): 每传播一次置信度乘以的系数
+            refresh_confidence (float): 置信度衰减到原始值的该比例以下时需要重新检测
+            max_age (int): 连续传播的最大次数，超过后需要重新检测
+            classes: 参与传播的类别（小写），None 表示全部类别
+        """
+        self.decay = float(decay)
+        self.refresh_confidence = float(refresh_confidence)
+        self.max_age = int(max_age)
+        self.classes = None if classes is None else {str(c).lower() for c in classes}
+        self.detections = []  # 最近一次检测（或传播）的结果
+        self.boxes = np.zeros((0, 4), dtype=np.float64)  # 亚像素精度的框，避免取整误差累积
+        self.age = 0
+        self.propagated_count = 0
+
+    def reset(self, detections):
+        """记录一次完整检测的结果"""
+        self.detections = [det for det in (detections or [])
+                           if self.classes is None or str(det.get('class', '')).lower() in self.classes]
+        self.boxes = np.array([det['bbox'][:4] for det in self.detections], dtype=np.float64).reshape(-1, 4)
+        self.age = 0
+
+    def propagate(self, features=None, frame_size=None):
+        """把上一次的检测框按光流推移一帧
+
+        Args:
+            features: 运动特征字典（使用 optical_flow 和 flow_scale），没有稠密光流时框保持不动
+            frame_size: (width, height)，推移后的框裁剪到画面内
+
+        Returns:
+            list: 传播后的检测（新字典，带 propagated=True），没有可传播的检测时为空列表
+        """
+        if not self.detections:
+            return []
+        flow = features.get('optical_flow') if isinstance(features, dict) else None
+        if isinstance(flow, np.ndarray) and flow.ndim == 3:
+            scale = features.get('flow_scale', 1.0)
+            for box in self.boxes:
+                dx, dy = box_flow_shift(flow, box, scale)
+                box += (dx, dy, dx, dy)
+        if frame_size is not None:
+            width, height = frame_size
+            self.boxes[:, [0, 2]] = np.clip(self.boxes[:, [0, 2]], 0, width)
+            self.boxes[:, [1, 3]] = np.clip(self.boxes[:, [1, 3]], 0, height)
+
+        self.age += 1
+        self.propagated_count += 1
+        propagated = []
+        for det, box in zip(self.detections, self.boxes):
+            det = dict(det)
+            det['bbox'] = [int(round(v)) for v in box]
+            det['confidence'] = det.get('confidence', 1.0) * self.decay
+            det['propagated'] = True
+            det['propagated_frames'] = self.age
+            propagated.append(det)
+        self.detections = propagated
+        return propagated
+
+    def needs_refresh(self):
+        """传播结果是否已不可靠，需要重新做完整检测"""
+        if not self.detections or self.age == 0:
+            return False
+        if self.age >= self.max_age:
+            return True
+        # 所有框在同一次检测时重置，衰减比例相同
+        return self.decay ** self.age < self.refresh_confidence
+
+    def get_stats(self):
+        """获取传播状态"""
+        return {
+            'tracked': len(self.detections),
+            'age': self.age,
+            'propagated_count': self.propagated_count,
+            'needs_refresh': self.needs_refresh()
+        }
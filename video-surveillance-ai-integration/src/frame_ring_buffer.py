@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+帧环形缓冲模块 - 捕获线程与处理线程之间的零拷贝帧传递
+
+缓冲区预先分配固定数量的帧槽位，捕获线程直接把帧读入槽位（cap.read 复用槽位内存），
+读取方拿到带引用计数的槽位视图，释放前该槽位不会被覆盖。
+每个提交的帧都有递增的序列号，读取方可据此判断丢帧。
+"""
+
+import time
+import threading
+
+import numpy as np
+
+
+class FrameSlot:
+    """帧槽位：保存一帧及其预分配的缓冲区"""
+
+    def __init__(self, index):
+        self.index = index
+        self.seq = -1  # 提交后的序列号，-1 表示无有效帧（未写入或正在写入）
+        self.frame_id = 0  # 捕获线程的帧号
+        self.timestamp = 0.0
+        self.capture_time = 0.0  # 捕获时的单调时钟时间戳，用于端到端延迟
+        self.frame = None  # 原始帧（缓冲区视图）
+        self.process_frame = None  # 用于分析的帧（缩放后或与 frame 相同）
+        self.refcount = 0
+        self.writing = False
+        self._buffers = {}
+
+    def buffer(self, name, shape=None, dtype=np.uint8):
+        """获取名为 name 的预分配缓冲区
+
+        指定 shape 时，尺寸或类型不符会重新分配；不指定时返回现有缓冲区（可能为 None），
+        用于 cap.read(image) 这类可复用输出内存的调用
+        """
+        buf = self._buffers.get(name)
+        if shape is None:
+            return buf
+        if buf is None or buf.shape != tuple(shape) or buf.dtype != dtype:
+            buf = np.empty(shape, dtype=dtype)
+            self._buffers[name] = buf
+        return buf
+
+    def keep(self, name, array):
+        """登记由 OpenCV 分配的数组，下次作为输出缓冲区复用"""
+        self._buffers[name] = array
+        return array
+
+
+class FrameRef:
+    """槽位的只读引用，使用完毕必须 release()（或用 with 语句）"""
+
+    def __init__(self, ring, slot):
+        self._ring = ring
+        self._slot = slot
+        self.seq = slot.seq
+        self.frame_id = slot.frame_id
+        self.timestamp = slot.timestamp
+        self.capture_time = slot.capture_time
+        self.frame = slot.frame
+        self.process_frame = slot.process_frame
+        self._released = False
+
+    @property
+    def original_frame(self):
+        """与原队列接口一致：未缩放时为 None"""
+        return self.frame if self.process_frame is not self.frame else None
+
+    def retain(self):
+        """为同一槽位再增加一个引用，返回的新引用需单独 release()"""
+        return self._ring._retain(self._slot)
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._ring._release(self._slot)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+class FrameRingBuffer:
+    """固定槽位的帧环形缓冲区（单写多读）"""
+
+    def __init__(self, num_slots=8):
+        """初始化环形缓冲
+
+        Args:
+            num_slots (int): 槽位数量，需大于同时被读取方持有的帧数
+        """
+        self.slots = [FrameSlot(i) for i in range(max(2, int(num_slots)))]
+        self.cond = threading.Condition()
+        self.next_seq = 0
+        self.latest_seq = -1
+        self.last_read_seq = -1
+
+        # 统计信息
+        self.write_count = 0
+        self.write_drops = 0  # 所有槽位都被占用，捕获帧被丢弃
+        self.read_skips = 0  # 读取方落后被跳过的帧数
+
+    def acquire_write(self):
+        """获取一个可写槽位（最旧且未被引用的槽位），没有可用槽位时返回 None"""
+        with self.cond:
+            candidates = [s for s in self.slots if s.refcount == 0 and not s.writing]
+            if not candidates:
+                self.write_drops += 1
+                return None
+            slot = min(candidates, key=lambda s: s.seq)
+            slot.writing = True
+            slot.seq = -1  # 写入期间读取方不可见
+            return slot
+
+    def commit(self, slot, frame, process_frame, frame_id, timestamp=None, capture_time=None):
+        """提交写好的槽位，返回序列号
+
+        timestamp 为捕获时的墙上时间，capture_time 为捕获时的单调时钟时间戳，未指定时取提交时刻
+        """
+        with self.cond:
+            slot.frame = frame
+            slot.process_frame = process_frame if process_frame is not None else frame
+            slot.frame_id = frame_id
+            slot.timestamp = timestamp if timestamp is not None else time.time()
+            slot.capture_time = capture_time if capture_time is not None else time.monotonic()
+            slot.seq = self.next_seq
+            slot.writing = False
+            self.next_seq += 1
+            self.latest_seq = slot.seq
+            self.write_count += 1
+            self.cond.notify_all()
+            return slot.seq
+
+    def abort(self, slot):
+        """放弃写入（读取失败时）"""
+        with self.cond:
+            slot.writing = False
+
+    def _find_slot(self, min_seq):
+        """序列号不小于 min_seq 的最旧有效槽位"""
+        best = None
+        for slot in self.slots:
+            if slot.seq >= min_seq and (best is None or slot.seq < best.seq):
+                best = slot
+        return best
+
+    def wait_next(self, last_seq=-1, timeout=None, max_lag=None):
+        """等待序列号大于 last_seq 的下一帧
+
+        Args:
+            last_seq (int): 读取方上一次处理的序列号
+            timeout (float): 最长等待时间（秒），超时返回 None
+            max_lag (int): 最多落后的帧数，超过时跳到最新的 max_lag 帧以内
+
+        Returns:
+            FrameRef: 已增加引用计数的帧引用，或 None
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self.cond:
+            while True:
+                if self.latest_seq > last_seq:
+                    target = last_seq + 1
+                    if max_lag is not None:
+                        target = max(target, self.latest_seq - max_lag)
+                    slot = self._find_slot(target)
+                    if slot is not None:
+                        if last_seq >= 0:
+                            self.read_skips += slot.seq - last_seq - 1
+                        slot.refcount += 1
+                        self.last_read_seq = slot.seq
+                        return FrameRef(self, slot)
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.cond.wait(remaining)
+
+    def latest(self):
+        """获取最新一帧的引用，没有帧时返回 None"""
+        with self.cond:
+            if self.latest_seq < 0:
+                return None
+            slot = self._find_slot(self.latest_seq)
+            if slot is None:
+                return None
+            slot.refcount += 1
+            return FrameRef(self, slot)
+
+    def _retain(self, slot):
+        with self.cond:
+            slot.refcount += 1
+            return FrameRef(self, slot)
+
+    def _release(self, slot):
+        with self.cond:
+            slot.refcount = max(0, slot.refcount - 1)
+
+    def backlog(self):
+        """已提交但尚未被读取的帧数"""
+        with self.cond:
+            return max(0, self.latest_seq - self.last_read_seq)
+
+    def get_stats(self):
+        """获取缓冲区统计信息"""
+        with self.cond:
+            return {
+                'slots': len(self.slots),
+                'slots_in_use': sum(1 for s in self.slots if s.refcount > 0),
+                'latest_seq': self.latest_seq,
+                'backlog': max(0, self.latest_seq - self.last_read_seq),
+                'write_count': self.write_count,
+                'write_drops': self.write_drops,
+                'read_skips': self.read_skips
+            }
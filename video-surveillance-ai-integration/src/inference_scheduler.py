@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+批量推理调度模块 - 将多路视频（或同一路排队的多帧）的检测请求合并成批次，
+一次调用检测模型完成推理，再把解析结果分发回各个调用方
+"""
+
+import time
+import logging
+import threading
+from queue import Queue, Empty
+from collections import Counter
+from concurrent.futures import Future
+
+logger = logging.getLogger("InferenceScheduler")
+
+
+def parse_yolo_results(results, confidence=0.0):
+    """解析YOLO检测结果，只保留置信度高于 confidence 的框
+
+    Returns:
+        list: [{'bbox': [x1, y1, x2, y2], 'class': 类别名, 'confidence': 置信度}, ...]
+    """
+    detections = []
+    for r in results:
+        for box in r.boxes:
+            conf = box.conf.item()
+            if conf > confidence:
+                x1, y1, x2, y2 = box.xyxy[0].tolist()
+                detections.append({
+                    'bbox': [int(x1), int(y1), int(x2), int(y2)],
+                    'class': r.names[int(box.cls.item())],
+                    'confidence': conf
+                })
+    return detections
+
+
+class InferenceScheduler:
+    """带截止时间的批量推理调度器
+
+    调用方通过 submit() 提交单帧并得到 Future；调度线程在凑满 max_batch 帧
+    或等待超过 max_wait_ms 后执行一次批量推理。
+    """
+
+    def __init__(self, model, parse_fn, max_batch=8, max_wait_ms=40, max_queue=64, num_streams=None):
+        """初始化调度器
+
+        Args:
+            model: 检测模型，需支持 model(frames, verbose=False) 且按输入顺序返回结果列表（如YOLO）
+            parse_fn: 单帧结果解析函数，输入为 [result]，返回检测列表（如 _parse_ai_results）
+            max_batch (int): 每批最多帧数
+            max_wait_ms (float): 第一帧入队后最长等待时间（毫秒）
+            max_queue (int): 请求队列长度，满时 submit 会阻塞
+            num_streams (int): 提交请求的视频路数（每路同时最多一个未完成的请求），
+                批次凑到该数量即执行，单路时不再等待 max_wait_ms；None 表示只按 max_batch 凑批
+        """
+        self.model = model
+        self.parse_fn = parse_fn
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.num_streams = num_streams
+
+        self.request_queue = Queue(maxsize=max_queue)
+        self.running = False
+        self.thread = None
+
+        # 统计信息
+        self.stats_lock = threading.Lock()
+        self.batch_histogram = Counter()  # 批大小 -> 次数
+        self.batch_count = 0
+        self.frame_count = 0
+        self.error_count = 0
+        self.total_infer_time = 0.0
+        self.total_wait_time = 0.0
+
+    def start(self):
+        """启动调度线程"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._worker, name="inference-scheduler")
+        self.thread.daemon = True
+        self.thread.start()
+        logger.info(f"批量推理调度器已启动: max_batch={self.max_batch}, max_wait={self.max_wait * 1000:.0f}ms")
+
+    def stop(self):
+        """停止调度线程，未完成的请求以异常结束"""
+        self.running = False
+        if self.thread is not None and self.thread.is_alive():
+            self.thread.join(timeout=1.0)
+        while True:
+            try:
+                _, future, _ = self.request_queue.get_nowait()
+            except Empty:
+                break
+            if not future.done():
+                future.set_exception(RuntimeError("推理调度器已停止"))
+        logger.info("批量推理调度器已停止")
+
+    def submit(self, frame):
+        """提交一帧检测请求
+
+        Returns:
+            Future: 结果为 parse_fn 的返回值
+        """
+        future = Future()
+        if not self.running:
+            future.set_exception(RuntimeError("推理调度器未启动"))
+            return future
+        self.request_queue.put((frame, future, time.time()))
+        return future
+
+    def infer(self, frame, timeout=None):
+        """提交一帧并等待检测结果"""
+        return self.submit(frame).result(timeout=timeout)
+
+    def _collect_batch(self):
+        """收集一个批次：阻塞等待第一帧，之后在截止时间内尽量凑满批次
+
+        每路视频同时最多一个未完成的请求，批次目标大小不超过视频路数，凑齐即执行
+        """
+        try:
+            first = self.request_queue.get(timeout=0.1)
+        except Empty:
+            return []
+
+        target = self.max_batch
+        if self.num_streams:
+            target = max(1, min(target, int(self.num_streams)))
+        batch = [first]
+        deadline = time.time() + self.max_wait
+        while len(batch) < target:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.request_queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _worker(self):
+        """调度线程主循环"""
+        while self.running:
+            batch = self._collect_batch()
+            if not batch:
+                continue
+
+            frames = [item[0] for item in batch]
+            start = time.time()
+            try:
+                results = list(self.model(frames, verbose=False))
+                infer_time = time.time() - start
+                if len(results) != len(batch):
+                    # 结果数与输入不一致时无法对应，整批以异常结束，避免调用方一直等到超时
+                    raise RuntimeError(f"检测模型返回 {len(results)} 个结果，输入 {len(batch)} 帧")
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(self.parse_fn([result]))
+            except Exception as e:
+                infer_time = time.time() - start
+                logger.error(f"批量推理出错: {str(e)}")
+                with self.stats_lock:
+                    self.error_count += 1
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+            with self.stats_lock:
+                self.batch_histogram[len(batch)] += 1
+                self.batch_count += 1
+                self.frame_count += len(batch)
+                self.total_infer_time += infer_time
+                self.total_wait_time += sum(start - item[2] for item in batch)
+
+    def get_stats(self):
+        """获取调度统计信息（用于 /stats）"""
+        with self.stats_lock:
+            batch_count = max(1, self.batch_count)
+            frame_count = max(1, self.frame_count)
+            return {
+                'queue_depth': self.request_queue.qsize(),
+                'max_batch': self.max_batch,
+                'max_wait_ms': self.max_wait * 1000,
+                'num_streams': self.num_streams,
+                'batch_count': self.batch_count,
+                'frame_count': self.frame_count,
+                'error_count': self.error_count,
+                'avg_batch_size': self.frame_count / batch_count,
+                'avg_infer_ms': self.total_infer_time / batch_count * 1000,
+                'avg_wait_ms': self.total_wait_time / frame_count * 1000,
+                'batch_size_histogram': {str(size): count for size, count in sorted(self.batch_histogram.items())}
+            }
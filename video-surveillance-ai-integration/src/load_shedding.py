@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+过载降级模块 - 处理跟不上视频帧率时按固定顺序逐级减少工作量，余量恢复后逐级还原
+
+- 按时间窗口（默认1秒）统计处理耗时占比（多线程流水线取最慢阶段）、环形缓冲积压和落后跳帧数
+- 连续 escalate_windows 个窗口过载时升一级，连续 restore_windows 个窗口有余量时降一级（滞回，避免抖动）
+- 降级顺序（级别越高，包含的措施越多）：
+    1 跳过运动历史
+    2 降低光流分析分辨率
+    3 拉长AI检测间隔
+    4 关闭画面叠加（有告警的帧仍绘制，保证告警图片完整）
+    5 降低视频流JPEG质量
+- AI检测间隔拉长后不超过 fps / min_check_fps 帧，摔倒、打架和区域检测依赖的人员框至少按该频率刷新
+"""
+
+import threading
+import time
+
+# 降低光流分析分辨率时的最小分析宽度
+SHED_FLOW_WIDTH_MIN = 160
+# 降低视频流质量时各档位JPEG质量的上限
+SHED_STREAM_QUALITY = 50
+
+
+class LoadShedController:
+    """单路摄像头的过载降级控制器"""
+
+    LEVELS = ('normal', 'skip_motion_history', 'reduce_flow_resolution', 'lengthen_ai_interval',
+              'disable_overlays', 'lower_stream_quality')
+
+    def __init__(self, high_utilization=0.9, low_utilization=0.6, max_backlog=3, window=1.0,
+                 escalate_windows=2, restore_windows=5, ai_interval_factor=3, min_check_fps=1.0):
+        """初始化降级控制器
+
+        Args:
+            high_utilization (float): 处理耗时占比超过该值视为过载
+            low_utilization (float): 处理耗时占比低于该值（且无积压、无跳帧）视为有余量
+            max_backlog (int): 环形缓冲积压超过该帧数视为过载
+            window (float): 评估窗口长度（秒）
+            escalate_windows (int): 连续过载多少个窗口升一级
+            restore_windows (int): 连续有余量多少个窗口降一级
+            ai_interval_factor (int): 拉长AI检测间隔时的倍数
+            min_check_fps (float): 摔倒/打架/区域检测所需人员框的最低刷新频率（次/秒）
+        """
+        self.high_utilization = float(high_utilization)
+        self.low_utilization = float(low_utilization)
+        self.max_backlog = int(max_backlog)
+        self.window = float(window)
+        self.escalate_windows = max(1, int(escalate_windows))
+        self.restore_windows = max(1, int(restore_windows))
+        self.ai_interval_factor = max(1, int(ai_interval_factor))
+        self.min_check_fps = float(min_check_fps)
+
+        self.lock = threading.Lock()
+        self.level = 0
+        self.window_start = None
+        self.busy_time = 0.0  # 当前窗口内的处理耗时（秒）
+        self.max_backlog_seen = 0
+        self.skipped = 0
+        self.over_windows = 0
+        self.under_windows = 0
+        self.utilization = 0.0  # 最近一个窗口的处理耗时占比
+        self.escalations = 0
+        self.restorations = 0
+
+    @property
+    def max_level(self):
+        return len(self.LEVELS) - 1
+
+    @property
+    def skip_motion_history(self):
+        return self.level >= 1
+
+    @property
+    def reduce_flow_resolution(self):
+        return self.level >= 2
+
+    @property
+    def lengthen_ai_interval(self):
+        return self.level >= 3
+
+    @property
+    def disable_overlays(self):
+        return self.level >= 4
+
+    @property
+    def lower_stream_quality(self):
+        return self.level >= 5
+
+    def note_skipped(self, count):
+        """记录处理落后被跳过的帧数"""
+        if count > 0:
+            with self.lock:
+                self.skipped += count
+
+    def observe(self, busy_time, backlog=0, now=None):
+        """记录一帧的处理耗时和当前积压，窗口结束时评估是否升降级
+
+        Args:
+            busy_time (float): 该帧占用处理能力的时间（秒）；多线程流水线传最慢阶段的耗时
+            backlog (int): 当前环形缓冲中尚未读取的帧数
+            now (float): 当前时间（单调时钟），用于测试
+
+        Returns:
+            int: 级别变化（+1 升级、-1 降级、0 不变）
+        """
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            if self.window_start is None:
+                self.window_start = now
+            self.busy_time += busy_time
+            self.max_backlog_seen = max(self.max_backlog_seen, backlog)
+            elapsed = now - self.window_start
+            if elapsed < self.window:
+                return 0
+            change = self._evaluate(self.busy_time / elapsed)
+            self.window_start = now
+            self.busy_time = 0.0
+            self.max_backlog_seen = 0
+            self.skipped = 0
+            return change
+
+    def _evaluate(self, utilization):
+        self.utilization = utilization
+        overloaded = (utilization > self.high_utilization or self.skipped > 0 or
+                      self.max_backlog_seen > self.max_backlog)
+        headroom = utilization < self.low_utilization and self.skipped == 0 and self.max_backlog_seen <= 1
+
+        if overloaded:
+            self.under_windows = 0
+            self.over_windows += 1
+            if self.over_windows >= self.escalate_windows and self.level < self.max_level:
+                self.over_windows = 0
+                self.level += 1
+                self.escalations += 1
+                return 1
+        elif headroom:
+            self.over_windows = 0
+            self.under_windows += 1
+            if self.under_windows >= self.restore_windows and self.level > 0:
+                self.under_windows = 0
+                self.level -= 1
+                self.restorations += 1
+                return -1
+        else:
+            self.over_windows = 0
+            self.under_windows = 0
+        return 0
+
+    def ai_interval(self, base_interval, fps):
+        """当前级别下的AI检测间隔（帧）
+
+        拉长后不超过 fps / min_check_fps 帧（基础间隔本身更长时保持基础间隔）
+        """
+        base_interval = max(1, int(base_interval))
+        if not self.lengthen_ai_interval:
+            return base_interval
+        interval = base_interval * self.ai_interval_factor
+        if fps and self.min_check_fps > 0:
+            interval = min(interval, max(base_interval, int(fps / self.min_check_fps)))
+        return interval
+
+    def get_stats(self):
+        """获取当前降级级别和负载情况"""
+        with self.lock:
+            return {
+                'level': self.level,
+                'level_name': self.LEVELS[self.level],
+                'utilization': round(self.utilization, 3),
+                'escalations': self.escalations,
+                'restorations': self.restorations,
+                'min_check_fps': self.min_check_fps
+            }
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+运行指标模块 - 热路径各步骤的耗时统计和计数器，以 Prometheus 文本格式导出（/metrics）
+
+- observe()/timer() 记录一次步骤耗时（秒），按 (指标名, 标签) 分别保留最近 window 次样本，
+  导出滚动窗口内的 p50/p95/p99（summary 类型）以及累计次数和总耗时；
+  observe_summary() 记录其他名称的延迟类指标（如告警延迟）
+- inc() 累加计数器（如丢帧数），add_collector() 注册在导出时才读取的指标（如队列深度）
+- scope(camera=...) 返回带固定标签的句柄，交给每路摄像头独享的组件使用
+
+所有步骤共用一个指标名 step_duration_seconds，用 step 标签区分：
+capture_read、resize、flow、yolo、zone、fighting、fall、visualize、imencode、db_save、notify
+"""
+
+import re
+import time
+import threading
+from collections import deque
+
+import numpy as np
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+_INVALID_NAME_CHARS = re.compile(r'[^a-zA-Z0-9_:]')
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _format_labels(key, extra=None):
+    items = list(key) + list(extra or ())
+    if not items:
+        return ''
+    body = ','.join('{}="{}"'.format(k, str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+                    for k, v in items)
+    return '{' + body + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value) if np.isfinite(value) else ('+Inf' if value > 0 else 'NaN')
+    return str(value)
+
+
+class RollingLatency:
+    """单个步骤的耗时统计：最近 window 次样本用于分位数，次数和总耗时为累计值"""
+
+    __slots__ = ('samples', 'count', 'total')
+
+    def __init__(self, window=1024):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def quantiles(self):
+        """滚动窗口内的分位数（秒），没有样本时为0"""
+        if not self.samples:
+            return [0.0] * len(QUANTILES)
+        values = np.fromiter(self.samples, dtype=np.float64, count=len(self.samples))
+        return [float(v) for v in np.quantile(values, QUANTILES)]
+
+    def snapshot(self):
+        p50, p95, p99 = self.quantiles()
+        return {'count': self.count, 'p50_ms': p50 * 1000, 'p95_ms': p95 * 1000, 'p99_ms': p99 * 1000,
+                'max_ms': max(self.samples, default=0.0) * 1000}
+
+
+class _Timer:
+    """timer() 返回的计时上下文"""
+
+    __slots__ = ('registry', 'step', 'labels', 'start')
+
+    def __init__(self, registry, step, labels):
+        self.registry = registry
+        self.step = step
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.registry.observe(self.step, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class MetricsScope:
+    """带固定标签（如 camera）的指标句柄"""
+
+    def __init__(self, registry, labels):
+        self.registry = registry
+        self.labels = labels
+
+    def observe(self, step, seconds, **labels):
+        self.registry.observe(step, seconds, **dict(self.labels, **labels))
+
+    def timer(self, step, **labels):
+        return _Timer(self.registry, step, dict(self.labels, **labels))
+
+    def inc(self, name, value=1, **labels):
+        self.registry.inc(name, value, **dict(self.labels, **labels))
+
+    def snapshot(self):
+        """该句柄标签下各步骤的耗时分位数 {step: {...}}"""
+        return self.registry.step_snapshot(**self.labels)
+
+
+class MetricsRegistry:
+    """进程内的指标注册表（线程安全）"""
+
+    def __init__(self, namespace='vsai', window=1024):
+        """
+        Args:
+            namespace (str): 导出时的指标名前缀
+            window (int): 每个步骤保留的最近样本数
+        """
+        self.namespace = namespace
+        self.window = window
+        self.lock = threading.Lock()
+        self.summaries = {}  # {name: {label_key: RollingLatency}}
+        self.help = {'step_duration_seconds': 'Duration of hot-path steps (rolling window quantiles).'}
+        self.counters = {}  # {name: {label_key: value}}
+        self.collectors = []
+
+    def observe(self, step, seconds, **labels):
+        """记录一次步骤耗时（秒）"""
+        self.observe_summary('step_duration_seconds', seconds, step=step, **labels)
+
+    def observe_summary(self, name, seconds, **labels):
+        """记录一次名为 name 的延迟样本（秒），name 不含前缀"""
+        key = _label_key(labels)
+        with self.lock:
+            series = self.summaries.setdefault(name, {})
+            latency = series.get(key)
+            if latency is None:
+                latency = series[key] = RollingLatency(self.window)
+            latency.observe(seconds)
+
+    def describe(self, name, text):
+        """设置指标的 HELP 说明"""
+        self.help[name] = text
+
+    def timer(self, step, **labels):
+        """计时上下文：with registry.timer('flow', camera='cam0'): ..."""
+        return _Timer(self, step, labels)
+
+    def inc(self, name, value=1, **labels):
+        """累加计数器（name 不含前缀，以 _total 结尾）"""
+        if not value:
+            return
+        key = _label_key(labels)
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def add_collector(self, collector):
+        """注册导出时调用的采集函数 collector() -> [(name, type, labels, value), ...]，type 为 'counter'/'gauge'"""
+        self.collectors.append(collector)
+
+    def scope(self, **labels):
+        return MetricsScope(self, labels)
+
+    def step_snapshot(self, **labels):
+        """除 step 外标签完全匹配的各步骤耗时分位数 {step: {...}}（用于 /stats）"""
+        return {dict(key)['step']: stats
+                for key, stats in self.summary_snapshot('step_duration_seconds', step=None, **labels)}
+
+    def summary_snapshot(self, name, **labels):
+        """名为 name 的延迟分位数 [(label_key, {...}), ...]
+
+        labels 中值为 None 的标签必须存在（取值不限），其余标签须完全匹配且不能有多余标签
+        """
+        required = {k: str(v) for k, v in labels.items() if v is not None}
+        wildcard = {k for k, v in labels.items() if v is None}
+        with self.lock:
+            items = sorted(self.summaries.get(name, {}).items())
+            result = []
+            for key, latency in items:
+                key_labels = dict(key)
+                if set(key_labels) != set(required) | wildcard:
+                    continue
+                if all(key_labels[k] == v for k, v in required.items()):
+                    result.append((key, latency.snapshot()))
+            return result
+
+    def _metric_name(self, name):
+        return _INVALID_NAME_CHARS.sub('_', f"{self.namespace}_{name}")
+
+    def render(self):
+        """Prometheus 文本格式（text/plain; version=0.0.4）"""
+        lines = []
+        with self.lock:
+            summaries = {n: [(key, latency.quantiles(), latency.count, latency.total)
+                             for key, latency in sorted(series.items())]
+                         for n, series in sorted(self.summaries.items())}
+            counters = {n: sorted(series.items()) for n, series in sorted(self.counters.items())}
+
+        for summary, rows in summaries.items():
+            metric = self._metric_name(summary)
+            if summary in self.help:
+                lines.append(f"# HELP {metric} {self.help[summary]}")
+            lines.append(f"# TYPE {metric} summary")
+            for key, quantiles, count, total in rows:
+                for q, value in zip(QUANTILES, quantiles):
+                    lines.append(f"{metric}{_format_labels(key, [('quantile', q)])} {_format_value(value)}")
+                lines.append(f"{metric}_sum{_format_labels(key)} {_format_value(total)}")
+                lines.append(f"{metric}_count{_format_labels(key)} {count}")
+
+        for counter, series in counters.items():
+            metric = self._metric_name(counter)
+            lines.append(f"# TYPE {metric} counter")
+            for key, value in series:
+                lines.append(f"{metric}{_format_labels(key)} {_format_value(value)}")
+
+        collected = {}
+        for collector in list(self.collectors):
+            try:
+                samples = collector() or []
+            except Exception:
+                continue
+            for metric, kind, labels, value in samples:
+                if value is None:
+                    continue
+                collected.setdefault((self._metric_name(metric), kind), []).append((_label_key(labels), value))
+        for (metric, kind), series in sorted(collected.items()):
+            lines.append(f"# TYPE {metric} {kind}")
+            for key, value in series:
+                lines.append(f"{metric}{_format_labels(key)} {_format_value(value)}")
+
+        return '\n'.join(lines) + '\n'
+
+
+# 进程内默认注册表
+METRICS = MetricsRegistry()
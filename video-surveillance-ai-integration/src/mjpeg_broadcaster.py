@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+MJPEG广播模块 - 每个处理后的帧只编码一次，所有连接的客户端共享同一份JPEG数据
+
+处理线程通过 publish() 发布帧（只登记引用并递增序列号，不编码）；
+第一个请求该序列号的客户端负责编码，其余客户端直接复用结果。
+客户端总是取最新一帧，慢客户端会跳过中间帧而不是排队积压。
+
+支持多档清晰度（尺寸 × JPEG质量），每档只在有人观看时才按需编码；
+客户端可以指定档位，也可以按实际吞吐自动升降档。
+"""
+
+import time
+import logging
+import threading
+
+import cv2
+
+from metrics import METRICS
+
+logger = logging.getLogger("MJPEGBroadcaster")
+
+BOUNDARY_PREFIX = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+
+# 尺寸档位：相对处理后画面的缩放比例
+SIZES = {'full': 1.0, 'half': 0.5, 'thumb': 0.25}
+# 质量档位：JPEG编码质量
+QUALITIES = {'high': 80, 'medium': 60, 'low': 40}
+# 自动模式的升降档顺序，从高到低
+LADDER = [
+    ('full', 'high'),
+    ('full', 'medium'),
+    ('half', 'high'),
+    ('half', 'medium'),
+    ('thumb', 'medium'),
+    ('thumb', 'low'),
+]
+DEFAULT_RENDITION = ('full', 'high')
+
+# 自动模式参数：每个评估窗口的发布帧数，以及降档/升档的丢帧比例阈值
+AUTO_WINDOW_FRAMES = 30
+AUTO_DOWNGRADE_DROP_RATIO = 0.5
+AUTO_UPGRADE_DROP_RATIO = 0.1
+
+
+def parse_rendition(size=None, quality=None):
+    """解析客户端请求的档位
+
+    Returns:
+        tuple: ((size, quality), auto)，size 为 'auto' 时 auto 为 True，从默认档位开始自适应；
+        无法识别的取值回退到默认档位
+    """
+    auto = size == 'auto'
+    size = size if size in SIZES else DEFAULT_RENDITION[0]
+    quality = quality if quality in QUALITIES else DEFAULT_RENDITION[1]
+    return (size, quality), auto
+
+
+class MJPEGBroadcaster:
+    """单路视频的MJPEG广播器"""
+
+    def __init__(self, quality=80, metrics=None):
+        """初始化广播器
+
+        Args:
+            quality (int): 'high' 档的JPEG编码质量
+            metrics (MetricsScope): 记录编码耗时和客户端丢帧的指标句柄，None 时使用默认注册表
+        """
+        self.qualities = dict(QUALITIES, high=quality)
+        self.quality_limit = None  # 过载降级时各档位JPEG质量的上限，None 表示不限制
+        self.metrics = metrics if metrics is not None else METRICS.scope()
+        self.cond = threading.Condition()
+
+        self.frame = None  # 最新发布的帧（发布后不再修改）
+        self.seq = 0  # 最新帧的序列号，0 表示尚无帧
+
+        # 按档位缓存的编码结果 {(size, quality): (seq, chunk)} 和缩放结果 {size: (seq, image)}
+        self.encoded = {}
+        self.scaled = {}
+        self.encode_locks = {}
+
+        # 统计信息
+        self.subscribers = 0
+        self.rendition_subscribers = {}
+        self.published_count = 0
+        self.encode_count = 0
+        self.encode_counts = {}
+        self.sent_count = 0
+        self.dropped_count = 0  # 客户端跳过的帧数（慢客户端丢帧）
+        self.total_encode_time = 0.0
+
+    @property
+    def quality(self):
+        return self.qualities['high']
+
+    def publish(self, frame):
+        """发布一帧处理后的图像，调用方之后不得再修改该帧"""
+        if frame is None:
+            return
+        with self.cond:
+            self.frame = frame
+            self.seq += 1
+            self.published_count += 1
+            self.cond.notify_all()
+
+    def wait_chunk(self, last_seq=0, timeout=1.0, rendition=DEFAULT_RENDITION):
+        """等待比 last_seq 更新的帧，返回 (seq, multipart片段)，超时返回 (last_seq, None)"""
+        with self.cond:
+            if self.seq <= last_seq:
+                self.cond.wait(timeout)
+            if self.seq <= last_seq or self.frame is None:
+                return last_seq, None
+            seq, frame = self.seq, self.frame
+            lock = self.encode_locks.setdefault(rendition, threading.Lock())
+
+        with lock:
+            return seq, self._encode(seq, frame, rendition)
+
+    def _scale(self, seq, frame, size):
+        """获取指定尺寸的画面，同一序列号只缩放一次"""
+        scale = SIZES[size]
+        if scale >= 1.0:
+            return frame
+        with self.cond:
+            cached = self.scaled.get(size)
+        if cached is not None and cached[0] == seq:
+            return cached[1]
+        h, w = frame.shape[:2]
+        image = cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))),
+                           interpolation=cv2.INTER_AREA)
+        with self.cond:
+            self.scaled[size] = (seq, image)
+        return image
+
+    def _encode(self, seq, frame, rendition):
+        """编码指定序列号和档位的帧，同一序列号、同一档位只编码一次（调用方持有该档位的锁）"""
+        cached = self.encoded.get(rendition)
+        if cached is not None and cached[0] >= seq:
+            return cached[1]
+
+        size, quality = rendition
+        start = time.time()
+        image = self._scale(seq, frame, size)
+        jpeg_quality = self.qualities[quality]
+        if self.quality_limit is not None:
+            jpeg_quality = min(jpeg_quality, self.quality_limit)
+        ret, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+        if not ret:
+            return None
+        chunk = BOUNDARY_PREFIX + buffer.tobytes() + b'\r\n'
+        elapsed = time.time() - start
+        self.metrics.observe('imencode', elapsed)
+
+        with self.cond:
+            self.encoded[rendition] = (seq, chunk)
+            self.encode_count += 1
+            key = f"{size}/{quality}"
+            self.encode_counts[key] = self.encode_counts.get(key, 0) + 1
+            self.total_encode_time += elapsed
+        return chunk
+
+    def _subscribe(self, rendition, delta):
+        with self.cond:
+            key = f"{rendition[0]}/{rendition[1]}"
+            count = self.rendition_subscribers.get(key, 0) + delta
+            if count > 0:
+                self.rendition_subscribers[key] = count
+            else:
+                # 没有观众的档位不再保留缓存，后续也不会再编码
+                self.rendition_subscribers.pop(key, None)
+                self.encoded.pop(rendition, None)
+
+    def stream(self, timeout=1.0, size=None, quality=None):
+        """为一个HTTP客户端生成 multipart 数据流
+
+        Args:
+            timeout (float): 等待新帧的超时时间（秒）
+            size (str): 'full'/'half'/'thumb'，或 'auto' 按吞吐自动升降档
+            quality (str): 'high'/'medium'/'low'
+        """
+        rendition, auto = parse_rendition(size, quality)
+        level = LADDER.index(rendition) if rendition in LADDER else 0
+
+        with self.cond:
+            self.subscribers += 1
+        self._subscribe(rendition, 1)
+
+        last_seq = 0
+        window_start_seq = 0
+        window_dropped = 0
+        try:
+            while True:
+                seq, chunk = self.wait_chunk(last_seq, timeout, rendition)
+                if chunk is None:
+                    continue
+                if last_seq:
+                    # 跳过的帧计为该客户端丢弃的帧
+                    dropped = seq - last_seq - 1
+                    with self.cond:
+                        self.dropped_count += dropped
+                    window_dropped += dropped
+                    self.metrics.inc('frames_dropped_total', dropped, reason='stream_client')
+                else:
+                    window_start_seq = seq
+                last_seq = seq
+                with self.cond:
+                    self.sent_count += 1
+                yield chunk
+
+                # 自动模式：按评估窗口内的丢帧比例升降档
+                if auto and seq - window_start_seq >= AUTO_WINDOW_FRAMES:
+                    drop_ratio = window_dropped / float(seq - window_start_seq)
+                    new_level = level
+                    if drop_ratio > AUTO_DOWNGRADE_DROP_RATIO and level < len(LADDER) - 1:
+                        new_level = level + 1
+                    elif drop_ratio < AUTO_UPGRADE_DROP_RATIO and level > 0:
+                        new_level = level - 1
+                    if new_level != level:
+                        logger.debug(f"客户端丢帧比例 {drop_ratio:.2f}，档位 {LADDER[level]} -> {LADDER[new_level]}")
+                        self._subscribe(rendition, -1)
+                        level = new_level
+                        rendition = LADDER[level]
+                        self._subscribe(rendition, 1)
+                    window_start_seq = seq
+                    window_dropped = 0
+        finally:
+            self._subscribe(rendition, -1)
+            with self.cond:
+                self.subscribers -= 1
+
+    def get_stats(self):
+        """获取广播统计信息"""
+        with self.cond:
+            return {
+                'subscribers': self.subscribers,
+                'renditions': dict(self.rendition_subscribers),
+                'latest_seq': self.seq,
+                'published_count': self.published_count,
+                'encode_count': self.encode_count,
+                'encode_counts': dict(self.encode_counts),
+                'sent_count': self.sent_count,
+                'dropped_count': self.dropped_count,
+                'avg_encode_ms': self.total_encode_time / max(1, self.encode_count) * 1000
+            }
@@ -5,10 +5,14 @@ import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Union
 from pathlib import Path
-import threading
+from contextlib import closing
 
 from models.alert.alert_event import AlertEvent
 from models.alert.alert_rule import AlertLevel
+from models.alert.db_pool import ConnectionPool
+from models.alert.pagination import CountCache, encode_cursor, decode_cursor, keyset_condition
+from models.alert.alert_rollup import (ROLLUP_TABLES, ROLLUP_DIMENSIONS, camera_of, rollup_key, split_deltas,
+                                       ack_deltas, period_start, summarize, summarize_totals)
 
 
 class AlertDatabase:
@@ -16,24 +20,60 @@ class AlertDatabase:
     告警数据库管理器，负责告警数据的持久化存储和查询
     """
     
-    def __init__(self, db_path: str = "alerts.db"):
+    def __init__(self, db_path: str = "alerts.db", pool_size: int = 4, busy_timeout: float = 30.0,
+                 count_cache_ttl: float = 30.0):
         """
         初始化告警数据库
         
         Args:
             db_path: 数据库文件路径
+            pool_size: 连接池最大连接数，0 表示每次操作新建连接（旧行为）
+            busy_timeout: 数据库被其他连接写锁定时的最长等待时间（秒）
+            count_cache_ttl: 告警总数缓存有效期（秒），0 表示不缓存
         """
         self.db_path = db_path
+        self.busy_timeout = busy_timeout
         self.logger = logging.getLogger("AlertDatabase")
-        self.lock = threading.Lock()
+        self.pool = None
+        if pool_size > 0:
+            # 连接在线程间复用，由连接池保证同一时刻只有一个线程持有；
+            # 内存数据库每个连接都是独立的库，只能保留唯一一个长期连接
+            in_memory = db_path == ":memory:"
+            self.pool = ConnectionPool(
+                lambda: self._connect(check_same_thread=False),
+                ping_fn=lambda conn: conn.execute("SELECT 1"),
+                max_size=1 if in_memory else pool_size,
+                idle_timeout=float('inf') if in_memory else 300.0,
+                name="sqlite"
+            )
+        
+        # 按过滤条件缓存的告警总数
+        self.count_cache = CountCache(ttl=count_cache_ttl)
         
         # 初始化数据库
         self._init_database()
         
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        """建立新的数据库连接"""
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, check_same_thread=check_same_thread)
+        if self.pool is not None and self.db_path != ":memory:":
+            # WAL模式下读操作不阻塞写操作，适合多个连接并发访问
+            conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+    
+    def _get_connection(self):
+        """获取数据库连接，用法: with self._get_connection() as conn"""
+        if self.pool is not None:
+            return self.pool.connection()
+        return closing(self._connect())
+    
+    def get_pool_stats(self) -> Optional[Dict[str, Any]]:
+        """获取连接池统计信息，未启用连接池时返回None"""
+        return self.pool.get_stats() if self.pool is not None else None
+    
     def _init_database(self):
         """初始化数据库表结构"""
-        with self.lock:
-            conn = sqlite3.connect(self.db_path)
+        with self._get_connection() as conn:
             cursor = conn.cursor()
             
             # 创建告警事件表
@@ -72,13 +112,108 @@ class AlertDatabase:
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_source_type ON alert_events (source_type)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_acknowledged ON alert_events (acknowledged)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_created_at ON alert_events (created_at)')
+            # 告警历史查询的复合索引：过滤条件（危险级别/来源/确认状态）+ 时间，支持按 (timestamp, id) 游标分页
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_time_id ON alert_events (timestamp, id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_danger_time ON alert_events (danger_level, timestamp, id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_source_time ON alert_events (source_type, timestamp, id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_ack_time ON alert_events (acknowledged, timestamp, id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_ack_danger_time ON alert_events (acknowledged, danger_level, timestamp, id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_image_event ON alert_images (event_id)')
+            
+            # 按小时/按天的告警统计汇总表
+            for table, bucket_column in ROLLUP_TABLES.items():
+                cursor.execute(f'''
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        {bucket_column} TEXT NOT NULL,
+                        camera_id TEXT NOT NULL DEFAULT '',
+                        source_type TEXT NOT NULL,
+                        danger_level TEXT NOT NULL,
+                        level TEXT NOT NULL,
+                        acknowledged INTEGER NOT NULL,
+                        alert_count INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY ({bucket_column}, camera_id, source_type, danger_level, level, acknowledged)
+                    ) WITHOUT ROWID
+                ''')
             
             conn.commit()
-            conn.close()
+            
+            # 旧库升级：汇总表为空而告警表有数据时回填
+            needs_backfill = (cursor.execute('SELECT 1 FROM alert_events LIMIT 1').fetchone() is not None and
+                              cursor.execute('SELECT 1 FROM alert_rollup_daily LIMIT 1').fetchone() is None)
             
         self.logger.info(f"数据库初始化完成: {self.db_path}")
+        if needs_backfill:
+            self.logger.info("告警统计汇总表为空，开始从 alert_events 回填")
+            self.rebuild_rollups()
+    
+    def _apply_rollup_deltas(self, cursor, deltas: Dict[tuple, int]):
+        """把 {汇总键: 增量} 累加到小时表和日表（调用方负责提交）"""
+        columns = ", ".join(ROLLUP_DIMENSIONS)
+        for table, rows in split_deltas(deltas).items():
+            if rows:
+                cursor.executemany(f'''
+                    INSERT INTO {table} ({ROLLUP_TABLES[table]}, {columns}, alert_count)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT ({ROLLUP_TABLES[table]}, {columns})
+                    DO UPDATE SET alert_count = alert_count + excluded.alert_count
+                ''', rows)
+    
+    # 从 alert_events 重新计算汇总时使用的时间桶表达式（本地时间，与 rollup_key 一致）
+    _ROLLUP_BUCKETS = {
+        'alert_rollup_hourly': "strftime('%Y-%m-%d %H:00:00', timestamp, 'unixepoch', 'localtime')",
+        'alert_rollup_daily': "date(timestamp, 'unixepoch', 'localtime')",
+    }
+    _CAMERA_EXPR = "COALESCE(CAST(json_extract(details, '$.camera_id') AS TEXT), '')"
+    
+    def _rebuild_rollups(self, cursor, start_day: Optional[str] = None, end_day: Optional[str] = None) -> int:
+        """删除 [start_day, end_day) 内的汇总行并从 alert_events 重新计算（调用方负责提交）"""
+        columns = ", ".join(ROLLUP_DIMENSIONS)
+        bucket_conditions, bucket_params, time_conditions, time_params = [], [], [], []
+        for day, op in ((start_day, '>='), (end_day, '<')):
+            if day:
+                bucket_conditions.append(f"{{column}} {op} ?")
+                bucket_params.append(day)
+                time_conditions.append(f"timestamp {op} ?")
+                time_params.append(time.mktime(datetime.strptime(day, '%Y-%m-%d').timetuple()))
+        bucket_where = " AND ".join(bucket_conditions) if bucket_conditions else "1=1"
+        time_where = " AND ".join(time_conditions) if time_conditions else "1=1"
+        
+        rebuilt = 0
+        for table, bucket_column in ROLLUP_TABLES.items():
+            cursor.execute(f"DELETE FROM {table} WHERE {bucket_where.format(column=bucket_column)}", bucket_params)
+            cursor.execute(f'''
+                INSERT INTO {table} ({bucket_column}, {columns}, alert_count)
+                SELECT {self._ROLLUP_BUCKETS[table]} AS bucket, {self._CAMERA_EXPR} AS camera,
+                       source_type, danger_level, level, CAST(acknowledged AS INTEGER) AS ack, COUNT(*)
+                FROM alert_events
+                WHERE {time_where}
+                GROUP BY bucket, camera, source_type, danger_level, level, ack
+            ''', time_params)
+            rebuilt = cursor.rowcount
+        return rebuilt
+    
+    def rebuild_rollups(self, since_days: Optional[int] = None) -> int:
+        """
+        从 alert_events 重新计算统计汇总（旧库回填或汇总与明细不一致时使用）
+        
+        Args:
+            since_days: 只重算最近多少天（含今天），None 表示全部重算
+            
+        Returns:
+            重算后的日汇总行数，失败返回-1
+        """
+        start_day = period_start(since_days)[0] if since_days else None
+        try:
+            with self._get_connection() as conn:
+                rows = self._rebuild_rollups(conn.cursor(), start_day)
+                conn.commit()
+            self.logger.info(f"告警统计汇总已重算: 起始日期 {start_day or '全部'}，{rows} 行日汇总")
+            return rows
+        except Exception as e:
+            self.logger.error(f"重算告警统计汇总失败: {str(e)}")
+            return -1
     
-    def save_alert_event(self, event: AlertEvent, image_paths: Optional[Dict[str, str]] = None) -> bool:
+    def save_alert_event(self, event: AlertEvent, image_paths: Optional[Dict[str, str]] = None) -> Optional[str]:
         """
         保存告警事件到数据库
         
@@ -87,11 +222,10 @@ class AlertDatabase:
             image_paths: 相关图像路径字典
             
         Returns:
-            是否保存成功
+            告警记录的主键（event.id，确认/查询等方法都按它查找），失败返回None
         """
         try:
-            with self.lock:
-                conn = sqlite3.connect(self.db_path)
+            with self._get_connection() as conn:
                 cursor = conn.cursor()
                 
                 # 插入告警事件
@@ -122,15 +256,62 @@ class AlertDatabase:
                             VALUES (?, ?, ?)
                         ''', (event.id, image_type, image_path))
                 
+                # 统计汇总与告警记录在同一事务内累加
+                self._apply_rollup_deltas(cursor, {rollup_key(
+                    event.timestamp, camera_of(event.details), event.source_type,
+                    event.danger_level, event.level.name, event.acknowledged): 1})
+                
                 conn.commit()
-                conn.close()
                 
                 self.logger.debug(f"告警事件已保存到数据库: {event.id}")
-                return True
+                return event.id
                 
         except Exception as e:
             self.logger.error(f"保存告警事件失败: {str(e)}")
-            return False
+            return None
+    
+    @staticmethod
+    def _build_conditions(level: Optional[str] = None,
+                          source_type: Optional[str] = None,
+                          acknowledged: Optional[bool] = None,
+                          start_time: Optional[float] = None,
+                          end_time: Optional[float] = None,
+                          search_text: Optional[str] = None,
+                          danger_level: Optional[str] = None) -> tuple:
+        """构建过滤条件，返回 (条件列表, 参数列表)"""
+        conditions = []
+        params = []
+        
+        if danger_level:
+            conditions.append("danger_level = ?")
+            params.append(danger_level)
+        
+        if level:
+            conditions.append("level = ?")
+            params.append(level)
+        
+        if source_type:
+            conditions.append("source_type = ?")
+            params.append(source_type)
+        
+        if acknowledged is not None:
+            conditions.append("acknowledged = ?")
+            params.append(acknowledged)
+        
+        if start_time:
+            conditions.append("timestamp >= ?")
+            params.append(start_time)
+        
+        if end_time:
+            conditions.append("timestamp <= ?")
+            params.append(end_time)
+        
+        if search_text:
+            conditions.append("(message LIKE ? OR details LIKE ?)")
+            search_pattern = f"%{search_text}%"
+            params.extend([search_pattern, search_pattern])
+        
+        return conditions, params
     
     def get_alert_events(self, 
                         limit: int = 100,
@@ -140,117 +321,125 @@ class AlertDatabase:
                         acknowledged: Optional[bool] = None,
                         start_time: Optional[float] = None,
                         end_time: Optional[float] = None,
-                        search_text: Optional[str] = None) -> List[Dict[str, Any]]:
+                        search_text: Optional[str] = None,
+                        danger_level: Optional[str] = None,
+                        cursor: Optional[str] = None) -> List[Dict[str, Any]]:
         """
-        查询告警事件
+        查询告警事件（按时间倒序）
         
         Args:
             limit: 返回结果数量限制
-            offset: 分页偏移量
+            offset: 分页偏移量（指定 cursor 时忽略）
             level: 告警级别过滤
             source_type: 来源类型过滤
             acknowledged: 是否已确认过滤
             start_time: 开始时间戳
             end_time: 结束时间戳
             search_text: 搜索文本（在消息和详情中搜索）
+            danger_level: 危险级别过滤
+            cursor: 分页游标（上一页返回的 next_cursor），从该位置之后继续查询
             
         Returns:
             告警事件列表
         """
         try:
-            with self.lock:
-                conn = sqlite3.connect(self.db_path)
-                conn.row_factory = sqlite3.Row  # 使结果可以通过列名访问
-                cursor = conn.cursor()
-                
-                # 构建查询条件
-                conditions = []
-                params = []
-                
-                if level:
-                    conditions.append("level = ?")
-                    params.append(level)
-                
-                if source_type:
-                    conditions.append("source_type = ?")
-                    params.append(source_type)
-                
-                if acknowledged is not None:
-                    conditions.append("acknowledged = ?")
-                    params.append(acknowledged)
-                
-                if start_time:
-                    conditions.append("timestamp >= ?")
-                    params.append(start_time)
-                
-                if end_time:
-                    conditions.append("timestamp <= ?")
-                    params.append(end_time)
-                
-                if search_text:
-                    conditions.append("(message LIKE ? OR details LIKE ?)")
-                    search_pattern = f"%{search_text}%"
-                    params.extend([search_pattern, search_pattern])
-                
-                # 构建SQL查询
-                where_clause = " AND ".join(conditions) if conditions else "1=1"
-                
-                sql = f'''
-                    SELECT e.*, 
-                           GROUP_CONCAT(i.image_path) as image_paths,
-                           GROUP_CONCAT(i.image_type) as image_types
-                    FROM alert_events e
-                    LEFT JOIN alert_images i ON e.id = i.event_id
+            conditions, params = self._build_conditions(level, source_type, acknowledged, start_time,
+                                                        end_time, search_text, danger_level)
+            if cursor:
+                cursor_time, cursor_id = decode_cursor(cursor)
+                conditions.append(keyset_condition('timestamp', 'id', True, '?'))
+                params.extend([cursor_time, cursor_time, cursor_id])
+                offset = 0
+            
+            # 构建SQL查询：先按索引取出本页的id，再只对这些行关联图片表。
+            # LIMIT/OFFSET 直接写入整数而不是绑定参数，否则SQLite无法估计子查询行数，会改为扫描整张表做连接
+            where_clause = " AND ".join(conditions) if conditions else "1=1"
+            
+            sql = f'''
+                SELECT e.*, 
+                       GROUP_CONCAT(i.image_path) as image_paths,
+                       GROUP_CONCAT(i.image_type) as image_types
+                FROM (
+                    SELECT id FROM alert_events
                     WHERE {where_clause}
-                    GROUP BY e.id
-                    ORDER BY e.timestamp DESC
-                    LIMIT ? OFFSET ?
-                '''
-                
-                params.extend([limit, offset])
-                
-                cursor.execute(sql, params)
-                rows = cursor.fetchall()
-                
-                # 转换为字典列表
-                results = []
-                for row in rows:
-                    event_dict = dict(row)
-                    
-                    # 解析JSON字段
-                    try:
-                        event_dict['details'] = json.loads(event_dict['details'])
-                        event_dict['related_events'] = json.loads(event_dict['related_events'])
-                    except:
-                        event_dict['details'] = {}
-                        event_dict['related_events'] = []
-                    
-                    # 处理图像路径
-                    if event_dict['image_paths']:
-                        image_paths = event_dict['image_paths'].split(',')
-                        image_types = event_dict['image_types'].split(',')
-                        event_dict['images'] = dict(zip(image_types, image_paths))
-                    else:
-                        event_dict['images'] = {}
-                    
-                    # 添加可读时间
-                    event_dict['datetime'] = datetime.fromtimestamp(event_dict['timestamp']).strftime('%Y-%m-%d %H:%M:%S')
-                    
-                    results.append(event_dict)
-                
-                conn.close()
-                return results
+                    ORDER BY timestamp DESC, id DESC
+                    LIMIT {int(limit)} OFFSET {int(offset)}
+                ) page
+                JOIN alert_events e ON e.id = page.id
+                LEFT JOIN alert_images i ON e.id = i.event_id
+                GROUP BY e.id
+                ORDER BY e.timestamp DESC, e.id DESC
+            '''
+            
+            with self._get_connection() as conn:
+                db_cursor = conn.cursor()
+                db_cursor.row_factory = sqlite3.Row  # 使结果可以通过列名访问（只作用于该游标，不影响池中连接）
+                db_cursor.execute(sql, params)
+                rows = db_cursor.fetchall()
+                
+            # 转换为字典列表
+            results = []
+            for row in rows:
+                event_dict = dict(row)
+                
+                # 解析JSON字段
+                try:
+                    event_dict['details'] = json.loads(event_dict['details'])
+                    event_dict['related_events'] = json.loads(event_dict['related_events'])
+                except:
+                    event_dict['details'] = {}
+                    event_dict['related_events'] = []
+                
+                # 处理图像路径
+                if event_dict['image_paths']:
+                    image_paths = event_dict['image_paths'].split(',')
+                    image_types = event_dict['image_types'].split(',')
+                    event_dict['images'] = dict(zip(image_types, image_paths))
+                else:
+                    event_dict['images'] = {}
+                
+                # 添加可读时间
+                event_dict['datetime'] = datetime.fromtimestamp(event_dict['timestamp']).strftime('%Y-%m-%d %H:%M:%S')
+                
+                results.append(event_dict)
+            
+            return results
                 
         except Exception as e:
             self.logger.error(f"查询告警事件失败: {str(e)}")
             return []
     
+    def get_alert_events_page(self,
+                              limit: int = 20,
+                              cursor: Optional[str] = None,
+                              offset: int = 0,
+                              **filters) -> Dict[str, Any]:
+        """
+        分页查询告警事件，并返回下一页的游标
+        
+        Args:
+            limit: 每页数量
+            cursor: 分页游标，为空时按 offset 定位（用于跳页）
+            offset: 分页偏移量
+            **filters: 与 get_alert_events 相同的过滤条件
+            
+        Returns:
+            {'alerts': 告警列表, 'next_cursor': 下一页游标或None, 'has_more': 是否还有下一页}
+        """
+        rows = self.get_alert_events(limit=limit + 1, offset=offset, cursor=cursor, **filters)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['timestamp'], rows[-1]['id']) if has_more else None
+        return {'alerts': rows, 'next_cursor': next_cursor, 'has_more': has_more}
+    
     def get_alert_count(self, 
                        level: Optional[str] = None,
                        source_type: Optional[str] = None,
                        acknowledged: Optional[bool] = None,
                        start_time: Optional[float] = None,
-                       end_time: Optional[float] = None) -> int:
+                       end_time: Optional[float] = None,
+                       danger_level: Optional[str] = None,
+                       cached: bool = False) -> int:
         """
         获取告警事件数量
         
@@ -260,53 +449,58 @@ class AlertDatabase:
             acknowledged: 是否已确认过滤
             start_time: 开始时间戳
             end_time: 结束时间戳
+            danger_level: 危险级别过滤
+            cached: 是否使用缓存的总数（在 count_cache.ttl 秒内可能略有滞后）
             
         Returns:
             告警事件数量
         """
+        cache_key = CountCache.make_key(level=level, source_type=source_type, acknowledged=acknowledged,
+                                        start_time=start_time, end_time=end_time, danger_level=danger_level)
+        if cached:
+            count = self.count_cache.get(cache_key)
+            if count is not None:
+                return count
         try:
-            with self.lock:
-                conn = sqlite3.connect(self.db_path)
+            conditions, params = self._build_conditions(level, source_type, acknowledged, start_time,
+                                                        end_time, danger_level=danger_level)
+            where_clause = " AND ".join(conditions) if conditions else "1=1"
+            
+            with self._get_connection() as conn:
                 cursor = conn.cursor()
-                
-                # 构建查询条件
-                conditions = []
-                params = []
-                
-                if level:
-                    conditions.append("level = ?")
-                    params.append(level)
-                
-                if source_type:
-                    conditions.append("source_type = ?")
-                    params.append(source_type)
-                
-                if acknowledged is not None:
-                    conditions.append("acknowledged = ?")
-                    params.append(acknowledged)
-                
-                if start_time:
-                    conditions.append("timestamp >= ?")
-                    params.append(start_time)
-                
-                if end_time:
-                    conditions.append("timestamp <= ?")
-                    params.append(end_time)
-                
-                where_clause = " AND ".join(conditions) if conditions else "1=1"
-                
-                sql = f"SELECT COUNT(*) FROM alert_events WHERE {where_clause}"
-                
-                cursor.execute(sql, params)
+                cursor.execute(f"SELECT COUNT(*) FROM alert_events WHERE {where_clause}", params)
                 count = cursor.fetchone()[0]
-                
-                conn.close()
-                return count
+            
+            self.count_cache.put(cache_key, count)
+            return count
                 
         except Exception as e:
             self.logger.error(f"获取告警数量失败: {str(e)}")
             return 0
     
+    def _set_acknowledged(self, event_id: str, acknowledged: bool) -> bool:
+        """修改确认状态，并在同一事务内把统计汇总从原确认状态挪到新状态"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            # 只更新状态确实变化的行；UPDATE 取得写锁后才读取维度，并发确认同一告警时只有一个会挪动汇总
+            cursor.execute('''
+                UPDATE alert_events SET acknowledged = ?
+                WHERE id = ? AND acknowledged <> ?
+            ''', (acknowledged, event_id, acknowledged))
+            changed = cursor.rowcount > 0
+            row = cursor.execute(f'''
+                SELECT timestamp, {self._CAMERA_EXPR}, source_type, danger_level, level
+                FROM alert_events WHERE id = ?
+            ''', (event_id,)).fetchone()
+            if changed and row:
+                self._apply_rollup_deltas(cursor, ack_deltas(*row, acknowledged))
+            conn.commit()
+        
+        if changed:
+            # 确认状态变化会影响按 acknowledged 过滤的总数
+            self.count_cache.invalidate()
+        return row is not None
+    
     def acknowledge_alert(self, event_id: str) -> bool:
         """
         确认告警事件
@@ -315,25 +509,10 @@ class AlertDatabase:
             event_id: 告警事件ID
             
         Returns:
-            是否确认成功
+            是否确认成功（告警已是确认状态时也返回True）
         """
         try:
-            with self.lock:
-                conn = sqlite3.connect(self.db_path)
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    UPDATE alert_events 
-                    SET acknowledged = TRUE 
-                    WHERE id = ?
-                ''', (event_id,))
-                
-                affected_rows = cursor.rowcount
-                conn.commit()
-                conn.close()
-                
-                return affected_rows > 0
-                
+            return self._set_acknowledged(event_id, True)
         except Exception as e:
             self.logger.error(f"确认告警失败: {str(e)}")
             return False
@@ -346,104 +525,66 @@ class AlertDatabase:
             event_id: 告警事件ID
             
         Returns:
-            是否取消确认成功
+            是否取消确认成功（告警已是未确认状态时也返回True）
         """
         try:
-            with self.lock:
-                conn = sqlite3.connect(self.db_path)
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    UPDATE alert_events 
-                    SET acknowledged = FALSE 
-                    WHERE id = ?
-                ''', (event_id,))
-                
-                affected_rows = cursor.rowcount
-                conn.commit()
-                conn.close()
-                
-                return affected_rows > 0
-                
+            return self._set_acknowledged(event_id, False)
         except Exception as e:
             self.logger.error(f"取消确认告警失败: {str(e)}")
             return False
     
     def get_alert_statistics(self, days: int = 30) -> Dict[str, Any]:
         """
-        获取告警统计信息
+        获取告警统计信息（读取按天/按小时的统计汇总表，耗时与天数成正比，与告警总量无关）
         
         Args:
-            days: 统计天数
+            days: 统计天数（含今天）
             
         Returns:
-            统计信息字典
+            统计信息字典：总数、未处理/已处理数、各危险级别/告警级别/来源/摄像头数量、
+            今日告警数、每日趋势和最近24小时的逐小时趋势
         """
         try:
-            with self.lock:
-                conn = sqlite3.connect(self.db_path)
+            start_day, start_hour = period_start(days)
+            columns = ", ".join(ROLLUP_DIMENSIONS)
+            with self._get_connection() as conn:
                 cursor = conn.cursor()
-                
-                # 计算时间范围
-                end_time = time.time()
-                start_time = end_time - (days * 24 * 3600)
-                
-                # 总告警数
-                cursor.execute('''
-                    SELECT COUNT(*) FROM alert_events 
-                    WHERE timestamp >= ?
-                ''', (start_time,))
-                total_alerts = cursor.fetchone()[0]
-                
-                # 按级别统计
-                cursor.execute('''
-                    SELECT level, COUNT(*) FROM alert_events 
-                    WHERE timestamp >= ?
-                    GROUP BY level
-                ''', (start_time,))
-                level_stats = dict(cursor.fetchall())
-                
-                # 按来源类型统计
-                cursor.execute('''
-                    SELECT source_type, COUNT(*) FROM alert_events 
-                    WHERE timestamp >= ?
-                    GROUP BY source_type
-                ''', (start_time,))
-                source_stats = dict(cursor.fetchall())
-                
-                # 已确认和未确认统计
-                cursor.execute('''
-                    SELECT acknowledged, COUNT(*) FROM alert_events 
-                    WHERE timestamp >= ?
-                    GROUP BY acknowledged
-                ''', (start_time,))
-                ack_stats = dict(cursor.fetchall())
-                
-                # 每日告警趋势
-                cursor.execute('''
-                    SELECT DATE(datetime(timestamp, 'unixepoch')) as date, COUNT(*) 
-                    FROM alert_events 
-                    WHERE timestamp >= ?
-                    GROUP BY date
-                    ORDER BY date
-                ''', (start_time,))
-                daily_trend = dict(cursor.fetchall())
-                
-                conn.close()
-                
-                return {
-                    'total_alerts': total_alerts,
-                    'level_statistics': level_stats,
-                    'source_statistics': source_stats,
-                    'acknowledgment_statistics': ack_stats,
-                    'daily_trend': daily_trend,
-                    'period_days': days
-                }
+                cursor.row_factory = sqlite3.Row
+                daily_rows = cursor.execute(f'''
+                    SELECT bucket_date AS bucket, {columns}, alert_count
+                    FROM alert_rollup_daily WHERE bucket_date >= ?
+                ''', (start_day,)).fetchall()
+                hourly_rows = cursor.execute(f'''
+                    SELECT bucket_start AS bucket, {columns}, alert_count
+                    FROM alert_rollup_hourly WHERE bucket_start >= ?
+                ''', (start_hour,)).fetchall()
+            return summarize(daily_rows, hourly_rows, days)
                 
         except Exception as e:
             self.logger.error(f"获取告警统计失败: {str(e)}")
             return {}
     
+    def get_alert_totals(self) -> Dict[str, Any]:
+        """
+        获取全部告警的累计数量（总数、未处理数、各级别数量），读取按天汇总表
+        
+        Returns:
+            累计数量字典
+        """
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = sqlite3.Row
+                cursor.execute('''
+                    SELECT danger_level, level, acknowledged, SUM(alert_count) AS alert_count
+                    FROM alert_rollup_daily
+                    GROUP BY danger_level, level, acknowledged
+                ''')
+                return summarize_totals(cursor.fetchall())
+        except Exception as e:
+            self.logger.error(f"获取告警累计数量失败: {str(e)}")
+            return {}
+    
     def delete_old_alerts(self, days: int = 90) -> int:
         """
         删除指定天数之前的告警数据
@@ -455,8 +596,7 @@ class AlertDatabase:
             删除的记录数
         """
         try:
-            with self.lock:
-                conn = sqlite3.connect(self.db_path)
+            with self._get_connection() as conn:
                 cursor = conn.cursor()
                 
                 cutoff_time = time.time() - (days * 24 * 3600)
@@ -482,16 +622,24 @@ class AlertDatabase:
                 ''', (cutoff_time,))
                 
                 deleted_count = cursor.rowcount
+                
+                # 删除保留期之前的统计汇总，并重算保留期起始那一天（该天的告警只删除了一部分）
+                cutoff_day = datetime.fromtimestamp(cutoff_time).strftime('%Y-%m-%d')
+                next_day = (datetime.fromtimestamp(cutoff_time) + timedelta(days=1)).strftime('%Y-%m-%d')
+                for table, bucket_column in ROLLUP_TABLES.items():
+                    cursor.execute(f"DELETE FROM {table} WHERE {bucket_column} < ?", (cutoff_day,))
+                self._rebuild_rollups(cursor, cutoff_day, next_day)
                 conn.commit()
-                conn.close()
                 
-                self.logger.info(f"删除了 {deleted_count} 条旧告警记录")
-                return deleted_count
+            self.count_cache.invalidate()
+            self.logger.info(f"删除了 {deleted_count} 条旧告警记录")
+            return deleted_count
                 
         except Exception as e:
             self.logger.error(f"删除旧告警失败: {str(e)}")
             return 0
     
     def close(self):
-        """关闭数据库连接"""
-        pass  # SQLite会自动管理连接 
\ No newline at end of file
+        """关闭连接池中的数据库连接"""
+        if self.pool is not None:
+            self.pool.close() 
\ No newline at end of file
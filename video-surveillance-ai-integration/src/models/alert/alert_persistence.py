@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+告警持久化模块 - 在后台线程中保存告警图片和数据库记录，处理线程只负责入队
+
+处理线程通过 submit() 提交告警事件和待保存的图片（非阻塞）；后台线程把排队的请求
+凑成批次，先在线程池中并行写图片，再一次性批量写入数据库（单个事务），
+最后通过回调把数据库自增id交还给调用方。
+队列满时直接丢弃新请求并计数；队列积压超过高水位时，非高危告警只保存记录不写图片。
+"""
+
+import os
+import time
+import logging
+import threading
+from queue import Queue, Empty, Full
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from metrics import METRICS
+
+logger = logging.getLogger("AlertPersistence")
+
+
+class PersistRequest:
+    """一条待持久化的告警"""
+
+    def __init__(self, event, images=None, callback=None):
+        """
+        Args:
+            event: AlertEvent 告警事件
+            images (dict): {image_type: (保存路径, 写入数据库的路径, 图像)}
+            callback: 保存完成后的回调 callback(new_id)，失败时 new_id 为 None
+        """
+        self.event = event
+        self.images = images or {}
+        self.callback = callback
+        self.enqueue_time = time.time()
+
+
+class AlertPersistence:
+    """异步告警持久化器（有界队列 + 批量写库 + 图片写入线程池）"""
+
+    def __init__(self, database, max_queue=256, batch_size=32, flush_interval_ms=200,
+                 image_workers=2, high_watermark=0.75):
+        """初始化持久化器
+
+        Args:
+            database: 告警数据库，支持 save_alert_events_batch(items) 时批量写入，
+                否则逐条调用 save_alert_event(event, image_paths)
+            max_queue (int): 队列长度，满时丢弃新请求
+            batch_size (int): 每批最多写入的告警数
+            flush_interval_ms (float): 第一条请求入队后最长等待时间（毫秒）
+            image_workers (int): 写图片的线程数
+            high_watermark (float): 队列占用比例超过该值时，非高危告警不再写图片
+        """
+        self.database = database
+        self.max_queue = max(1, int(max_queue))
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.0, float(flush_interval_ms)) / 1000.0
+        self.high_watermark = max(1, int(self.max_queue * high_watermark))
+
+        self.queue = Queue(maxsize=self.max_queue)
+        self.image_executor = ThreadPoolExecutor(max_workers=max(1, int(image_workers)),
+                                                 thread_name_prefix="alert-image")
+        self.running = False
+        self.thread = None
+
+        # 统计信息
+        self.stats_lock = threading.Lock()
+        self.submitted_count = 0
+        self.saved_count = 0
+        self.failed_count = 0
+        self.dropped_count = 0  # 队列已满被丢弃的告警
+        self.images_written = 0
+        self.images_skipped = 0  # 高水位时跳过的图片
+        self.batch_count = 0
+        self.total_write_time = 0.0
+        self.last_lag = 0.0  # 最近一批从入队到写入完成的最大延迟
+        self.max_lag = 0.0
+
+    def start(self):
+        """启动后台写入线程"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._worker, name="alert-persistence")
+        self.thread.daemon = True
+        self.thread.start()
+        logger.info(f"告警持久化已启动: max_queue={self.max_queue}, batch_size={self.batch_size}")
+
+    def stop(self, timeout=5.0):
+        """停止后台线程，在 timeout 内尽量写完队列中剩余的告警"""
+        if not self.running:
+            return
+        self.running = False
+        if self.thread is not None and self.thread.is_alive():
+            self.thread.join(timeout=timeout)
+        if self.thread is not None and self.thread.is_alive():
+            # 后台线程仍在写剩余告警，图片线程池由它写完后自行关闭
+            logger.warning(f"告警持久化停止超时，后台继续写入剩余 {self.queue.qsize()} 条告警")
+        else:
+            self.image_executor.shutdown(wait=True)
+            remaining = self.queue.qsize()
+            if remaining:
+                logger.warning(f"告警持久化停止时仍有 {remaining} 条告警未写入")
+        logger.info("告警持久化已停止")
+
+    def submit(self, event, images=None, callback=None):
+        """提交一条告警（不阻塞）
+
+        Args:
+            event: AlertEvent 告警事件
+            images (dict): {image_type: (保存路径, 写入数据库的路径, 图像)}，图像提交后不得再修改
+            callback: 保存完成后的回调 callback(new_id)
+
+        Returns:
+            bool: 是否入队成功，队列满时返回 False
+        """
+        if not self.running:
+            return False
+        if images and self.queue.qsize() >= self.high_watermark and event.danger_level != 'high':
+            with self.stats_lock:
+                self.images_skipped += len(images)
+            images = None
+        try:
+            self.queue.put_nowait(PersistRequest(event, images, callback))
+        except Full:
+            with self.stats_lock:
+                self.dropped_count += 1
+            METRICS.inc('alerts_dropped_total', reason='persistence_queue_full')
+            logger.warning(f"告警持久化队列已满，丢弃告警: {event.source_type}")
+            return False
+        with self.stats_lock:
+            self.submitted_count += 1
+        return True
+
+    def _collect_batch(self):
+        """收集一个批次：阻塞等待第一条请求，之后在刷新间隔内尽量凑满批次"""
+        try:
+            first = self.queue.get(timeout=0.1)
+        except Empty:
+            return []
+
+        batch = [first]
+        deadline = time.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.time()
+            try:
+                if remaining <= 0:
+                    # 截止后只取已经在队列中的请求
+                    batch.append(self.queue.get_nowait())
+                else:
+                    batch.append(self.queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    @staticmethod
+    def _write_image(path, image):
+        """写一张图片（在线程池中执行）"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        return cv2.imwrite(path, image)
+
+    def _write_images(self, batch):
+        """并行写入批次内所有图片，返回成功写入的数量；线程池已关闭时在当前线程写入"""
+        written = 0
+        futures = []
+        for request in batch:
+            for path, _, image in request.images.values():
+                try:
+                    futures.append(self.image_executor.submit(self._write_image, path, image))
+                    continue
+                except RuntimeError:
+                    pass
+                try:
+                    if self._write_image(path, image):
+                        written += 1
+                except Exception as e:
+                    logger.error(f"写入告警图片失败: {str(e)}")
+        for future in futures:
+            try:
+                if future.result():
+                    written += 1
+            except Exception as e:
+                logger.error(f"写入告警图片失败: {str(e)}")
+        return written
+
+    def _save_batch(self, batch):
+        """写入数据库，返回与 batch 一一对应的新id列表"""
+        items = [(request.event, {image_type: db_path for image_type, (_, db_path, _) in request.images.items()})
+                 for request in batch]
+        if hasattr(self.database, 'save_alert_events_batch'):
+            return self.database.save_alert_events_batch(items)
+        return [self.database.save_alert_event(event, image_paths or None) for event, image_paths in items]
+
+    def _process_batch(self, batch):
+        start = time.time()
+        with METRICS.timer('image_write'):
+            written = self._write_images(batch)
+        try:
+            with METRICS.timer('db_save'):
+                ids = self._save_batch(batch)
+        except Exception as e:
+            logger.error(f"批量保存告警失败: {str(e)}")
+            ids = [None] * len(batch)
+        finished = time.time()
+
+        for request, new_id in zip(batch, ids):
+            if request.callback is not None:
+                try:
+                    request.callback(new_id)
+                except Exception as e:
+                    logger.error(f"告警保存回调出错: {str(e)}")
+
+        failed = sum(1 for new_id in ids if new_id is None)
+        lag = finished - min(request.enqueue_time for request in batch)
+        with self.stats_lock:
+            self.batch_count += 1
+            self.saved_count += len(batch) - failed
+            self.failed_count += failed
+            self.images_written += written
+            self.total_write_time += finished - start
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+
+    def _worker(self):
+        """后台线程主循环；停止后继续写完队列中剩余的请求"""
+        while True:
+            batch = self._collect_batch()
+            if batch:
+                self._process_batch(batch)
+            elif not self.running:
+                break
+        self.image_executor.shutdown(wait=False)
+
+    def get_stats(self):
+        """获取持久化统计信息（用于 /stats）"""
+        with self.queue.mutex:
+            oldest = self.queue.queue[0].enqueue_time if self.queue.queue else None
+        with self.stats_lock:
+            return {
+                'queue_depth': self.queue.qsize(),
+                'max_queue': self.max_queue,
+                'queue_lag_ms': (time.time() - oldest) * 1000 if oldest is not None else 0.0,
+                'last_batch_lag_ms': self.last_lag * 1000,
+                'max_batch_lag_ms': self.max_lag * 1000,
+                'submitted_count': self.submitted_count,
+                'saved_count': self.saved_count,
+                'failed_count': self.failed_count,
+                'dropped_count': self.dropped_count,
+                'images_written': self.images_written,
+                'images_skipped': self.images_skipped,
+                'batch_count': self.batch_count,
+                'avg_batch_size': (self.saved_count + self.failed_count) / max(1, self.batch_count),
+                'avg_batch_write_ms': self.total_write_time / max(1, self.batch_count) * 1000
+            }
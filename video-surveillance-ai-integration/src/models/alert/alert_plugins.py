@@ -12,6 +12,8 @@ from typing import Dict, List, Any, Optional, Callable
 
 from models.alert.alert_event import AlertEvent
 from models.alert.alert_rule import AlertLevel
+from metrics import METRICS
+from alert_tracing import ALERT_LATENCY
 
 
 class AlertNotifier(abc.ABC):
@@ -347,12 +349,25 @@ class NotificationManager:
             # Send notifications immediately
             for notifier in self.notifiers:
                 if notifier.should_notify(event):
-                    notifier.notify(event)
+                    self._send(notifier, event)
         else:
             # Queue for background processing
             with self.queue_lock:
                 self.notification_queue.append(event)
     
+    def _send(self, notifier: AlertNotifier, event: AlertEvent) -> bool:
+        """
+        Send one notification and record its latency under the 'notify' step.
+
+        When the event carries a capture trace (details['trace']), the first
+        successful delivery also records the capture-to-notification latency.
+        """
+        with METRICS.timer('notify', notifier=notifier.name):
+            delivered = notifier.notify(event)
+        if delivered and isinstance(event.details, dict):
+            ALERT_LATENCY.mark(event.details.get('trace'), 'notified', event.source_type)
+        return delivered
+
     def _notification_worker(self):
         """Background worker that processes the notification queue."""
         while self.running:
@@ -368,7 +383,7 @@ class NotificationManager:
                 for notifier in self.notifiers:
                     try:
                         if notifier.should_notify(event):
-                            notifier.notify(event)
+                            self._send(notifier, event)
                     except Exception as e:
                         self.logger.error(f"Error in notifier {notifier.name}: {e}")
             
@@ -392,6 +407,6 @@ class NotificationManager:
             for notifier in self.notifiers:
                 try:
                     if notifier.should_notify(event):
-                        notifier.notify(event)
+                        self._send(notifier, event)
                 except Exception:
                     pass 
\ No newline at end of file
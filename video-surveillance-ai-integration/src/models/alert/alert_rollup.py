@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+告警统计汇总（rollup）- 按小时/按天增量维护的告警计数，MySQL 与 SQLite 告警库共用
+
+汇总表以 (时间桶, 摄像头, 来源类型, 危险级别, 告警级别, 确认状态) 为键保存告警条数：
+写入告警时在同一事务内累加，确认/取消确认时把计数从一个确认状态挪到另一个。
+统计接口只读取统计天数内的汇总行（行数与天数成正比），不再对 alert_events 做全表 GROUP BY。
+"""
+
+import json
+from collections import Counter
+from datetime import datetime, timedelta
+
+# 汇总表名 -> 时间桶列名
+ROLLUP_TABLES = {
+    'alert_rollup_hourly': 'bucket_start',
+    'alert_rollup_daily': 'bucket_date',
+}
+ROLLUP_DIMENSIONS = ('camera_id', 'source_type', 'danger_level', 'level', 'acknowledged')
+
+
+def event_datetime(value):
+    """把告警时间（时间戳、datetime 或 DATETIME 字符串）转换为本地时间的 datetime"""
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromtimestamp(float(value))
+    except (TypeError, ValueError):
+        return datetime.strptime(str(value)[:19], '%Y-%m-%d %H:%M:%S')
+
+
+def camera_of(details):
+    """从告警详情中取摄像头ID，单路模式下没有该字段，记为空字符串"""
+    if isinstance(details, str):
+        try:
+            details = json.loads(details)
+        except ValueError:
+            return ''
+    camera_id = details.get('camera_id') if isinstance(details, dict) else None
+    return '' if camera_id is None else str(camera_id)
+
+
+def rollup_key(event_time, camera_id, source_type, danger_level, level, acknowledged):
+    """告警对应的汇总键: (小时桶, 日桶, 摄像头, 来源类型, 危险级别, 告警级别, 确认状态)"""
+    dt = event_datetime(event_time)
+    return (dt.strftime('%Y-%m-%d %H:00:00'), dt.strftime('%Y-%m-%d'),
+            camera_id, source_type, danger_level, level, int(bool(acknowledged)))
+
+
+def split_deltas(deltas):
+    """把 {汇总键: 增量} 合并为小时表和日表两组行 [(时间桶, *维度, 增量)]，去掉增量为0的项"""
+    hourly, daily = Counter(), Counter()
+    for (hour, day, *dims), delta in deltas.items():
+        hourly[(hour, *dims)] += delta
+        daily[(day, *dims)] += delta
+    return {
+        'alert_rollup_hourly': [(*key, delta) for key, delta in hourly.items() if delta],
+        'alert_rollup_daily': [(*key, delta) for key, delta in daily.items() if delta],
+    }
+
+
+def ack_deltas(event_time, camera_id, source_type, danger_level, level, acknowledged):
+    """确认状态变为 acknowledged 时的汇总增量：原状态 -1，新状态 +1"""
+    new_key = rollup_key(event_time, camera_id, source_type, danger_level, level, acknowledged)
+    old_key = new_key[:-1] + (1 - new_key[-1],)
+    return {old_key: -1, new_key: 1}
+
+
+def period_start(days, now=None):
+    """统计周期（含今天共 days 天）的起始日期和最近24小时的起始小时桶"""
+    now = now or datetime.now()
+    start_day = (now - timedelta(days=max(1, days) - 1)).strftime('%Y-%m-%d')
+    start_hour = (now - timedelta(hours=23)).strftime('%Y-%m-%d %H:00:00')
+    return start_day, start_hour
+
+
+def summarize(daily_rows, hourly_rows, days, now=None):
+    """
+    把汇总行合成统计结果
+
+    Args:
+        daily_rows: 统计周期内日表的行，需支持按列名取值（bucket, camera_id, source_type,
+            danger_level, level, acknowledged, alert_count）
+        hourly_rows: 最近24小时小时表的行，列同上
+        days: 统计天数
+        now: 当前时间（测试用）
+
+    Returns:
+        统计信息字典
+    """
+    today = (now or datetime.now()).strftime('%Y-%m-%d')
+    total = unhandled = today_alerts = 0
+    levels, danger_levels, sources, cameras = Counter(), Counter(), Counter(), Counter()
+    daily_trend, hourly_trend = Counter(), Counter()
+
+    for row in daily_rows:
+        count = int(row['alert_count'])
+        if not count:
+            continue
+        day = str(row['bucket'])[:10]
+        total += count
+        if not int(row['acknowledged']):
+            unhandled += count
+        if day == today:
+            today_alerts += count
+        levels[row['level']] += count
+        danger_levels[row['danger_level']] += count
+        sources[row['source_type']] += count
+        cameras[row['camera_id']] += count
+        daily_trend[day] += count
+
+    for row in hourly_rows:
+        count = int(row['alert_count'])
+        if count:
+            hourly_trend[str(row['bucket'])[:19]] += count
+
+    return {
+        'total_alerts': total,
+        'unhandled_alerts': unhandled,
+        'handled_alerts': total - unhandled,
+        'high_level_alerts': danger_levels.get('high', 0),
+        'medium_level_alerts': danger_levels.get('medium', 0),
+        'low_level_alerts': danger_levels.get('low', 0),
+        'today_alerts': today_alerts,
+        'level_statistics': dict(levels),
+        'danger_level_statistics': dict(danger_levels),
+        'source_statistics': dict(sources),
+        'camera_statistics': dict(cameras),
+        'acknowledgment_statistics': {0: unhandled, 1: total - unhandled},
+        'daily_trend': dict(sorted(daily_trend.items())),
+        'hourly_trend': dict(sorted(hourly_trend.items())),
+        'period_days': days
+    }
+
+
+def summarize_totals(rows):
+    """
+    把按 (危险级别, 告警级别, 确认状态) 聚合的全部汇总行合成累计总数
+
+    Args:
+        rows: 行需支持按列名取值（danger_level, level, acknowledged, alert_count）
+    """
+    total = unhandled = 0
+    levels, danger_levels = Counter(), Counter()
+    for row in rows:
+        count = int(row['alert_count'] or 0)
+        total += count
+        if not int(row['acknowledged']):
+            unhandled += count
+        levels[row['level']] += count
+        danger_levels[row['danger_level']] += count
+    return {
+        'total_alerts': total,
+        'unhandled_alerts': unhandled,
+        'handled_alerts': total - unhandled,
+        'level_statistics': {k: v for k, v in levels.items() if v},
+        'danger_level_statistics': {k: v for k, v in danger_levels.items() if v},
+    }
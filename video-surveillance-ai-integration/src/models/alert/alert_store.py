@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+内存告警存储 - 有界的最近告警集合，替代不断增长的 all_alerts 列表
+
+- 按写入顺序（即时间顺序）保存最近 max_alerts 条告警，超出后淘汰最旧的
+- 按 id 建立索引，处理/取消处理告警时 O(1) 定位；写入数据库后告警换成自增id时同步更新索引
+- 按告警类型维护已处理/未处理计数（自启动以来的累计值，淘汰不影响计数），统计接口不再扫描列表
+- 记录每种类型最近一次告警的时间，供音频告警判断附近是否已有行为告警
+- 淘汰的告警若尚未写入数据库、也未提交给后台持久化，交给 on_evict 回调落库（在锁外调用）；
+  已提交但回调还没到的告警不再交出，避免数据库中重复一行
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+
+class AlertStore:
+    """线程安全的有界内存告警存储"""
+
+    def __init__(self, max_alerts=5000, on_evict=None):
+        """
+        Args:
+            max_alerts (int): 内存中保留的最大告警数
+            on_evict: 回调 on_evict(alerts)，参数为被淘汰且尚未写入数据库的告警列表；None 表示直接丢弃
+        """
+        self.max_alerts = max(1, int(max_alerts))
+        self.on_evict = on_evict
+        self.lock = threading.Lock()
+        self.alerts = OrderedDict()  # 序号 -> 告警字典，按写入顺序
+        self.id_index = {}  # str(告警id) -> 序号
+        self.persisted = set()  # 已写入数据库的告警序号
+        self.submitted = set()  # 已提交后台持久化、尚未确认写入的告警序号
+        self.next_seq = 0
+
+        # 按类型的累计计数 {类型: [总数, 已处理数]} 和最近一次告警时间
+        self.type_counts = {}
+        self.last_time_by_type = {}
+
+        # 统计信息
+        self.evicted_count = 0
+        self.spilled_count = 0
+
+    def add(self, alert, timestamp=None):
+        """写入一条告警（字典对象直接保存，不拷贝），超出容量时淘汰最旧的告警"""
+        timestamp = time.time() if timestamp is None else timestamp
+        alert_type = alert.get('type', '')
+        with self.lock:
+            seq = self.next_seq
+            self.next_seq += 1
+            self.alerts[seq] = alert
+            self.id_index[str(alert.get('id'))] = seq
+            counts = self.type_counts.setdefault(alert_type, [0, 0])
+            counts[0] += 1
+            counts[1] += 1 if alert.get('handled', False) else 0
+            self.last_time_by_type[alert_type] = max(timestamp, self.last_time_by_type.get(alert_type, 0.0))
+
+            spill = []
+            while len(self.alerts) > self.max_alerts:
+                old_seq, old_alert = self.alerts.popitem(last=False)
+                if self.id_index.get(str(old_alert.get('id'))) == old_seq:
+                    del self.id_index[str(old_alert.get('id'))]
+                self.evicted_count += 1
+                if old_seq in self.persisted or old_seq in self.submitted:
+                    self.persisted.discard(old_seq)
+                    self.submitted.discard(old_seq)
+                elif self.on_evict is not None:
+                    spill.append(old_alert)
+            self.spilled_count += len(spill)
+
+        if spill:
+            self.on_evict(spill)
+
+    def mark_submitted(self, alert, submitted=True):
+        """告警已提交后台持久化（淘汰时不再回调）；submitted=False 表示提交或写入失败，淘汰时重新交出"""
+        with self.lock:
+            seq = self.id_index.get(str(alert.get('id')))
+            if seq is None or self.alerts.get(seq) is not alert:
+                return
+            if submitted:
+                self.submitted.add(seq)
+            else:
+                self.submitted.discard(seq)
+
+    def mark_persisted(self, alert, new_id=None):
+        """告警已写入数据库：标记为已落库（淘汰时不再回调），new_id 不为空时用它替换临时id"""
+        with self.lock:
+            seq = self.id_index.pop(str(alert.get('id')), None)
+            if new_id is not None:
+                alert['id'] = new_id
+            if seq is not None and self.alerts.get(seq) is alert:
+                self.id_index[str(alert.get('id'))] = seq
+                self.submitted.discard(seq)
+                self.persisted.add(seq)
+
+    def get(self, alert_id):
+        """按id查找告警，不存在（或已淘汰）时返回None"""
+        with self.lock:
+            seq = self.id_index.get(str(alert_id))
+            return dict(self.alerts[seq]) if seq is not None else None
+
+    def set_handled(self, alert_id, handled, handled_time=None):
+        """
+        修改告警的处理状态
+
+        Returns:
+            None 表示告警不在内存中，False 表示状态未变化，True 表示已修改
+        """
+        with self.lock:
+            seq = self.id_index.get(str(alert_id))
+            if seq is None:
+                return None
+            alert = self.alerts[seq]
+            if bool(alert.get('handled', False)) == bool(handled):
+                return False
+            alert['handled'] = bool(handled)
+            if handled:
+                alert['handled_time'] = handled_time
+            else:
+                alert.pop('handled_time', None)
+            self.type_counts[alert.get('type', '')][1] += 1 if handled else -1
+            return True
+
+    def recent(self, limit=10, exclude_types=()):
+        """按时间倒序返回最近 limit 条告警（拷贝），跳过 exclude_types 中的类型"""
+        result = []
+        with self.lock:
+            for alert in reversed(self.alerts.values()):
+                if alert.get('type', '') in exclude_types:
+                    continue
+                result.append(dict(alert))
+                if len(result) >= limit:
+                    break
+        return result
+
+    def snapshot(self):
+        """按时间顺序返回内存中全部告警（拷贝）"""
+        with self.lock:
+            return [dict(alert) for alert in self.alerts.values()]
+
+    def counts(self, exclude_types=()):
+        """自启动以来的告警总数/已处理数/未处理数，跳过 exclude_types 中的类型"""
+        with self.lock:
+            total = sum(c[0] for t, c in self.type_counts.items() if t not in exclude_types)
+            handled = sum(c[1] for t, c in self.type_counts.items() if t not in exclude_types)
+        return {'total_alerts': total, 'handled_alerts': handled, 'unhandled_alerts': total - handled}
+
+    def last_time(self, alert_types):
+        """alert_types 中任一类型最近一次告警的时间戳，没有时返回None"""
+        with self.lock:
+            times = [self.last_time_by_type[t] for t in alert_types if t in self.last_time_by_type]
+        return max(times) if times else None
+
+    def __len__(self):
+        with self.lock:
+            return len(self.alerts)
+
+    def get_stats(self):
+        """获取存储统计信息"""
+        with self.lock:
+            return {
+                'size': len(self.alerts),
+                'max_alerts': self.max_alerts,
+                'evicted_count': self.evicted_count,
+                'spilled_count': self.spilled_count,
+                'by_type': {t: {'total': c[0], 'handled': c[1], 'unhandled': c[0] - c[1]}
+                            for t, c in self.type_counts.items()}
+            }
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据库连接池模块 - 复用数据库连接，避免每次操作都重新建立TCP连接和认证
+
+连接池有上限，空闲连接按后进先出复用（热连接优先）；借出前对闲置过久的连接做健康检查，
+闲置超过回收时间的连接直接关闭重建。操作中出现异常时也会检查连接，失效的连接不再归还。
+MySQL 和 SQLite 告警数据库共用同一个实现，通过 connect_fn / ping_fn 适配。
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger("ConnectionPool")
+
+
+class ConnectionPool:
+    """有界、线程安全的数据库连接池"""
+
+    def __init__(self, connect_fn, ping_fn=None, max_size=8, acquire_timeout=10.0,
+                 idle_timeout=300.0, health_check_interval=30.0, name="db"):
+        """初始化连接池（不预先建立连接）
+
+        Args:
+            connect_fn: 无参函数，返回一个新连接
+            ping_fn: 健康检查函数 ping_fn(conn)，连接失效时抛出异常；None 表示不检查
+            max_size (int): 最大连接数（借出 + 空闲）
+            acquire_timeout (float): 连接全部借出时最长等待时间（秒），超时抛出 TimeoutError
+            idle_timeout (float): 空闲超过该时间的连接关闭回收（秒）
+            health_check_interval (float): 空闲超过该时间的连接借出前先做健康检查（秒）
+            name (str): 连接池名称，用于日志
+        """
+        self.connect_fn = connect_fn
+        self.ping_fn = ping_fn
+        self.max_size = max(1, int(max_size))
+        self.acquire_timeout = acquire_timeout
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.name = name
+
+        self.cond = threading.Condition()
+        self.idle = deque()  # [(conn, 归还时间)]，右端为最近归还
+        self.size = 0  # 已建立的连接数（借出 + 空闲 + 正在建立）
+        self.in_use = 0
+        self.waiters = 0
+        self.closed = False
+
+        # 统计信息
+        self.acquire_count = 0
+        self.created_count = 0
+        self.recycled_count = 0  # 因闲置过久被关闭的连接
+        self.discarded_count = 0  # 健康检查失败或出错后丢弃的连接
+        self.timeout_count = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_alive(self, conn):
+        if self.ping_fn is None:
+            return True
+        try:
+            self.ping_fn(conn)
+            return True
+        except Exception as e:
+            logger.debug(f"[{self.name}] 连接健康检查失败: {str(e)}")
+            return False
+
+    def _prune_idle(self, now):
+        """关闭闲置超过 idle_timeout 的空闲连接（调用方持有 cond）"""
+        stale = []
+        while self.idle and now - self.idle[0][1] > self.idle_timeout:
+            stale.append(self.idle.popleft()[0])
+        self.size -= len(stale)
+        self.recycled_count += len(stale)
+        return stale
+
+    def acquire(self, timeout=None):
+        """借出一个连接，使用完毕必须 release()"""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        start = time.time()
+        deadline = start + timeout
+        conn = None
+        last_used = 0.0
+        with self.cond:
+            stale = self._prune_idle(start)
+            while True:
+                if self.closed:
+                    raise RuntimeError(f"连接池 {self.name} 已关闭")
+                if self.idle:
+                    conn, last_used = self.idle.pop()
+                    break
+                if self.size < self.max_size:
+                    self.size += 1
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self.timeout_count += 1
+                    raise TimeoutError(f"等待数据库连接超时（{timeout:.1f}秒，连接池 {self.name} 已满）")
+                self.waiters += 1
+                try:
+                    self.cond.wait(remaining)
+                finally:
+                    self.waiters -= 1
+            self.in_use += 1
+            wait_time = time.time() - start
+            self.acquire_count += 1
+            self.total_wait_time += wait_time
+            self.max_wait_time = max(self.max_wait_time, wait_time)
+
+        for stale_conn in stale:
+            self._close_quietly(stale_conn)
+
+        # 空闲较久的连接借出前先检查，失效则重建
+        if conn is not None and time.time() - last_used > self.health_check_interval and not self._is_alive(conn):
+            self._close_quietly(conn)
+            conn = None
+            with self.cond:
+                self.discarded_count += 1
+
+        if conn is None:
+            try:
+                conn = self.connect_fn()
+            except Exception:
+                with self.cond:
+                    self.size -= 1
+                    self.in_use -= 1
+                    self.cond.notify()
+                raise
+            with self.cond:
+                self.created_count += 1
+        return conn
+
+    def release(self, conn, discard=False):
+        """归还连接；discard 为 True 时关闭该连接而不放回池中"""
+        with self.cond:
+            self.in_use -= 1
+            if discard or self.closed:
+                self.size -= 1
+                self.discarded_count += 1 if discard else 0
+            else:
+                self.idle.append((conn, time.time()))
+                conn = None
+            self.cond.notify()
+        if conn is not None:
+            self._close_quietly(conn)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """借出连接的上下文管理器；块内抛出异常时检查连接，失效的连接直接丢弃"""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        except Exception:
+            # 回滚未完成的事务，连接仍然可用时才放回池中
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            self.release(conn, discard=not self._is_alive(conn))
+            raise
+        else:
+            self.release(conn)
+
+    def get_stats(self):
+        """获取连接池统计信息"""
+        with self.cond:
+            return {
+                'max_size': self.max_size,
+                'size': self.size,
+                'in_use': self.in_use,
+                'idle': len(self.idle),
+                'waiters': self.waiters,
+                'acquire_count': self.acquire_count,
+                'created_count': self.created_count,
+                'recycled_count': self.recycled_count,
+                'discarded_count': self.discarded_count,
+                'timeout_count': self.timeout_count,
+                'avg_wait_ms': self.total_wait_time / max(1, self.acquire_count) * 1000,
+                'max_wait_ms': self.max_wait_time * 1000
+            }
+
+    def close(self):
+        """关闭所有空闲连接；借出中的连接归还时关闭"""
+        with self.cond:
+            self.closed = True
+            idle = [conn for conn, _ in self.idle]
+            self.idle.clear()
+            self.size -= len(idle)
+            self.cond.notify_all()
+        for conn in idle:
+            self._close_quietly(conn)
+        logger.info(f"[{self.name}] 连接池已关闭")
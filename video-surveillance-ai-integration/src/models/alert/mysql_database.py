@@ -5,11 +5,15 @@ import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Union
 from pathlib import Path
-import threading
 import os
+from collections import Counter
 
 from models.alert.alert_event import AlertEvent
 from models.alert.alert_rule import AlertLevel
+from models.alert.db_pool import ConnectionPool
+from models.alert.pagination import CountCache, encode_cursor, decode_cursor, keyset_condition
+from models.alert.alert_rollup import (ROLLUP_TABLES, ROLLUP_DIMENSIONS, camera_of, rollup_key, split_deltas,
+                                       ack_deltas, period_start, summarize, summarize_totals)
 
 
 class MySQLAlertDatabase:
@@ -20,7 +24,12 @@ class MySQLAlertDatabase:
     def __init__(self, host: str = 'localhost', port: int = 3306, 
                  user: str = 'root', password: str = '', 
                  database: str = 'video_surveillance_alerts',
-                 charset: str = 'utf8mb4'):
+                 charset: str = 'utf8mb4',
+                 pool_size: int = 8,
+                 pool_timeout: float = 10.0,
+                 pool_recycle: float = 300.0,
+                 health_check_interval: float = 30.0,
+                 count_cache_ttl: float = 30.0):
         """
         初始化MySQL告警数据库
         
@@ -31,6 +40,11 @@ class MySQLAlertDatabase:
             password: 密码
             database: 数据库名
             charset: 字符集
+            pool_size: 连接池最大连接数
+            pool_timeout: 连接全部借出时最长等待时间（秒）
+            pool_recycle: 空闲超过该时间的连接关闭回收（秒）
+            health_check_interval: 空闲超过该时间的连接借出前先ping检查（秒）
+            count_cache_ttl: 告警总数缓存有效期（秒），0 表示不缓存
         """
         self.host = host
         self.port = port
@@ -39,13 +53,26 @@ class MySQLAlertDatabase:
         self.database = database
         self.charset = charset
         self.logger = logging.getLogger("MySQLAlertDatabase")
-        self.lock = threading.Lock()
+        self.pool = ConnectionPool(
+            self._connect,
+            ping_fn=lambda conn: conn.ping(reconnect=False),
+            max_size=pool_size,
+            acquire_timeout=pool_timeout,
+            idle_timeout=pool_recycle,
+            health_check_interval=health_check_interval,
+            name="mysql"
+        )
+        
+        # 按过滤条件缓存的告警总数（历史页每次翻页都要显示总数）
+        self.count_cache = CountCache(ttl=count_cache_ttl)
         
         # 测试连接
         self._test_connection()
+        self.ensure_indexes()
+        self.ensure_rollup_tables()
         
-    def _get_connection(self):
-        """获取数据库连接"""
+    def _connect(self):
+        """建立新的数据库连接（由连接池调用）"""
         try:
             connection = pymysql.connect(
                 host=self.host,
@@ -62,6 +89,14 @@ class MySQLAlertDatabase:
             self.logger.error(f"数据库连接失败: {str(e)}")
             raise
     
+    def _get_connection(self):
+        """从连接池借出连接，用法: with self._get_connection() as conn"""
+        return self.pool.connection()
+    
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """获取连接池统计信息（借出数、等待数、等待耗时等）"""
+        return self.pool.get_stats()
+    
     def _test_connection(self):
         """测试数据库连接"""
         try:
@@ -74,6 +109,50 @@ class MySQLAlertDatabase:
             self.logger.error(f"MySQL数据库连接测试失败: {str(e)}")
             raise
     
+    _INSERT_EVENT_COLUMNS = """
+        INSERT INTO alert_events 
+        (rule_id, level, danger_level, source_type, event_time, message, details, 
+         frame_idx, acknowledged, related_events)
+        VALUES """
+    _EVENT_PLACEHOLDERS = "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+    _INSERT_IMAGE_COLUMNS = "INSERT INTO alert_images (event_id, image_type, image_path, file_size) VALUES "
+    _IMAGE_PLACEHOLDERS = "(%s, %s, %s, %s)"
+
+    @staticmethod
+    def _event_params(event: AlertEvent) -> tuple:
+        """告警事件对应的 alert_events 插入参数"""
+        # 强制格式化为MySQL DATETIME格式
+        try:
+            event_time_str = datetime.fromtimestamp(float(event.timestamp)).strftime('%Y-%m-%d %H:%M:%S')
+        except Exception:
+            event_time_str = str(event.timestamp)[:19]
+        return (
+            event.rule_id,
+            event.level.name,
+            event.danger_level,
+            event.source_type,
+            event_time_str,
+            event.message,
+            json.dumps(event.details),
+            event.frame_idx,
+            event.acknowledged,
+            json.dumps(event.related_events)
+        )
+
+    @staticmethod
+    def _image_params(event_id: int, image_paths: Optional[Dict[str, str]]) -> List[tuple]:
+        """告警图片对应的 alert_images 插入参数"""
+        rows = []
+        for image_type, image_path in (image_paths or {}).items():
+            file_size = None
+            try:
+                if os.path.exists(image_path):
+                    file_size = os.path.getsize(image_path)
+            except:
+                pass
+            rows.append((event_id, image_type, image_path, file_size))
+        return rows
+
     def save_alert_event(self, event: AlertEvent, image_paths: Optional[Dict[str, str]] = None) -> Optional[int]:
         """
         保存告警事件到数据库
@@ -83,59 +162,328 @@ class MySQLAlertDatabase:
         Returns:
             新插入的自增id，失败返回None
         """
+        # 与批量写入走同一事务路径，保证告警记录与统计汇总同时提交
+        return self.save_alert_events_batch([(event, image_paths)])[0]
+
+    def save_alert_events_batch(self, items: List[tuple]) -> List[Optional[int]]:
+        """
+        在一个事务中批量保存告警事件（alert_events、alert_images 各一条多行INSERT）
+        
+        多行INSERT属于"简单插入"，InnoDB 一次性为整条语句分配自增id（各种 autoinc 锁模式下都不与
+        并发语句交错），相邻两条相差 auto_increment_increment（主主复制/Galera 下可能大于1），
+        因此第 i 条事件的id为 lastrowid + i × 步长。
+        
+        Args:
+            items: [(告警事件对象, 相关图像路径字典或None), ...]
+            
+        Returns:
+            与 items 一一对应的新id列表，失败时全部为None
+        """
+        if not items:
+            return []
         try:
-            with self.lock:
-                with self._get_connection() as conn:
+            with self._get_connection() as conn:
+                try:
+                    conn.begin()
                     with conn.cursor() as cursor:
-                        # 强制格式化为MySQL DATETIME格式
-                        try:
-                            event_time_str = datetime.fromtimestamp(float(event.timestamp)).strftime('%Y-%m-%d %H:%M:%S')
-                        except Exception:
-                            event_time_str = str(event.timestamp)[:19]
-                        self.logger.info(f"插入的时间字符串: {event_time_str}")
-                        sql = """
-                            INSERT INTO alert_events 
-                            (rule_id, level, danger_level, source_type, event_time, message, details, 
-                             frame_idx, acknowledged, related_events)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        """
-                        params = (
-                            event.rule_id,
-                            event.level.name,
-                            event.danger_level,
-                            event.source_type,
-                            event_time_str,
-                            event.message,
-                            json.dumps(event.details),
-                            event.frame_idx,
-                            event.acknowledged,
-                            json.dumps(event.related_events)
-                        )
-                        self.logger.info(f"插入SQL: {sql}")
-                        self.logger.info(f"插入参数: {params}")
-                        cursor.execute(sql, params)
-                        new_id = cursor.lastrowid
-                        self.logger.info(f"插入后new_id={new_id}")
-                        # 保存相关图像路径
-                        if image_paths:
-                            for image_type, image_path in image_paths.items():
-                                file_size = None
-                                try:
-                                    if os.path.exists(image_path):
-                                        file_size = os.path.getsize(image_path)
-                                except:
-                                    pass
-                                self.logger.info(f"插入图片: event_id={new_id}, image_type={image_type}, image_path={image_path}, file_size={file_size}")
-                                cursor.execute("""
-                                    INSERT INTO alert_images (event_id, image_type, image_path, file_size)
-                                    VALUES (%s, %s, %s, %s)
-                                """, (new_id, image_type, image_path, file_size))
-                        self.logger.debug(f"告警事件已保存到MySQL数据库: {event.message}, 新id: {new_id}")
-                        return new_id
+                        event_params = []
+                        deltas = Counter()
+                        for event, _ in items:
+                            params = self._event_params(event)
+                            event_params.extend(params)
+                            deltas[rollup_key(params[4], camera_of(event.details), event.source_type,
+                                              event.danger_level, event.level.name, event.acknowledged)] += 1
+                        sql = self._INSERT_EVENT_COLUMNS + ", ".join([self._EVENT_PLACEHOLDERS] * len(items))
+                        cursor.execute(sql, event_params)
+                        if cursor.rowcount != len(items):
+                            raise RuntimeError(f"批量插入行数不符: {cursor.rowcount} != {len(items)}")
+                        first_id = cursor.lastrowid
+                        cursor.execute("SELECT @@auto_increment_increment AS step")
+                        step = int(cursor.fetchone()['step'] or 1)
+                        new_ids = [first_id + i * step for i in range(len(items))]
+
+                        image_rows = []
+                        for new_id, (_, image_paths) in zip(new_ids, items):
+                            image_rows.extend(self._image_params(new_id, image_paths))
+                        if image_rows:
+                            sql = self._INSERT_IMAGE_COLUMNS + ", ".join([self._IMAGE_PLACEHOLDERS] * len(image_rows))
+                            cursor.execute(sql, [value for row in image_rows for value in row])
+
+                        # 统计汇总与告警记录在同一事务内累加
+                        self._apply_rollup_deltas(cursor, deltas)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                self.logger.debug(f"批量保存 {len(items)} 条告警事件，id {new_ids[0]}-{new_ids[-1]}")
+                return new_ids
         except Exception as e:
-            self.logger.error(f"保存告警事件到MySQL失败: {str(e)}", exc_info=True)
-            return None
+            self.logger.error(f"批量保存告警事件到MySQL失败: {str(e)}", exc_info=True)
+            return [None] * len(items)
     
+    # 告警历史查询使用的复合索引：与实际的过滤组合（危险级别/来源/确认状态 + 时间）对应，
+    # InnoDB 二级索引隐含主键，(…, event_time) 即可支持按 (event_time, id) 的游标分页
+    HISTORY_INDEXES = {
+        'idx_time_id': '(event_time, id)',
+        'idx_danger_time': '(danger_level, event_time)',
+        'idx_source_time': '(source_type, event_time)',
+        'idx_ack_time': '(acknowledged, event_time)',
+        'idx_ack_danger_time': '(acknowledged, danger_level, event_time)',
+    }
+
+    def ensure_indexes(self) -> List[str]:
+        """
+        补建告警历史查询所需的复合索引（旧库升级用，已存在的索引跳过）
+        
+        Returns:
+            新建的索引名列表
+        """
+        created = []
+        try:
+            with self._get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("""
+                        SELECT DISTINCT index_name AS name FROM information_schema.statistics
+                        WHERE table_schema = %s AND table_name = 'alert_events'
+                    """, (self.database,))
+                    existing = {row['name'] for row in cursor.fetchall()}
+                    for name, columns in self.HISTORY_INDEXES.items():
+                        if name not in existing:
+                            cursor.execute(f"ALTER TABLE alert_events ADD INDEX {name} {columns}")
+                            created.append(name)
+            if created:
+                self.logger.info(f"已创建告警历史索引: {created}")
+        except Exception as e:
+            self.logger.error(f"创建告警历史索引失败: {str(e)}")
+        return created
+
+    ROLLUP_TABLE_SQL = """
+        CREATE TABLE IF NOT EXISTS {table} (
+            {bucket_column} {bucket_type} NOT NULL COMMENT '{bucket_comment}',
+            camera_id VARCHAR(64) NOT NULL DEFAULT '' COMMENT '摄像头ID（单路模式为空）',
+            source_type VARCHAR(50) NOT NULL COMMENT '告警来源类型',
+            danger_level VARCHAR(20) NOT NULL COMMENT '危险级别',
+            level VARCHAR(20) NOT NULL COMMENT '告警级别',
+            acknowledged BOOLEAN NOT NULL COMMENT '是否已确认',
+            alert_count INT NOT NULL DEFAULT 0 COMMENT '告警条数',
+            PRIMARY KEY ({bucket_column}, camera_id, source_type, danger_level, level, acknowledged)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='{table_comment}'
+    """
+
+    def ensure_rollup_tables(self) -> bool:
+        """
+        创建按小时/按天的告警统计汇总表（旧库升级用）；汇总表为空而告警表有数据时自动回填
+        
+        Returns:
+            是否执行了回填
+        """
+        try:
+            with self._get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(self.ROLLUP_TABLE_SQL.format(
+                        table='alert_rollup_hourly', bucket_column='bucket_start', bucket_type='DATETIME',
+                        bucket_comment='小时起始时间', table_comment='告警按小时统计汇总表'))
+                    cursor.execute(self.ROLLUP_TABLE_SQL.format(
+                        table='alert_rollup_daily', bucket_column='bucket_date', bucket_type='DATE',
+                        bucket_comment='统计日期', table_comment='告警按天统计汇总表'))
+                    cursor.execute("SELECT 1 FROM alert_rollup_daily LIMIT 1")
+                    has_rollups = cursor.fetchone() is not None
+                    cursor.execute("SELECT 1 FROM alert_events LIMIT 1")
+                    has_events = cursor.fetchone() is not None
+            if has_events and not has_rollups:
+                self.logger.info("告警统计汇总表为空，开始从 alert_events 回填")
+                self.rebuild_rollups()
+                return True
+        except Exception as e:
+            self.logger.error(f"创建告警统计汇总表失败: {str(e)}")
+        return False
+
+    def _apply_rollup_deltas(self, cursor, deltas: Dict[tuple, int]):
+        """把 {汇总键: 增量} 累加到小时表和日表（调用方负责事务）"""
+        columns = ", ".join(ROLLUP_DIMENSIONS)
+        for table, rows in split_deltas(deltas).items():
+            if not rows:
+                continue
+            placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * len(rows))
+            cursor.execute(f"""
+                INSERT INTO {table} ({ROLLUP_TABLES[table]}, {columns}, alert_count)
+                VALUES {placeholders}
+                ON DUPLICATE KEY UPDATE alert_count = alert_count + VALUES(alert_count)
+            """, [value for row in rows for value in row])
+
+    # 从 alert_events 重新计算汇总时使用的时间桶表达式（本地时间，与写入时的 event_time 一致）
+    _ROLLUP_BUCKETS = {
+        'alert_rollup_hourly': "DATE_FORMAT(event_time, '%%Y-%%m-%%d %%H:00:00')",
+        'alert_rollup_daily': "DATE(event_time)",
+    }
+    _CAMERA_EXPR = "COALESCE(NULLIF(JSON_UNQUOTE(JSON_EXTRACT(details, '$.camera_id')), 'null'), '')"
+
+    def _rebuild_rollups(self, cursor, start_day: Optional[str] = None, end_day: Optional[str] = None) -> int:
+        """删除 [start_day, end_day) 内的汇总行并从 alert_events 重新计算（调用方负责事务）"""
+        columns = ", ".join(ROLLUP_DIMENSIONS)
+        conditions, params = [], []
+        if start_day:
+            conditions.append("{column} >= %s")
+            params.append(start_day)
+        if end_day:
+            conditions.append("{column} < %s")
+            params.append(end_day)
+        where_clause = " AND ".join(conditions) if conditions else "1=1"
+        
+        rebuilt = 0
+        for table, bucket_column in ROLLUP_TABLES.items():
+            cursor.execute(f"DELETE FROM {table} WHERE {where_clause.format(column=bucket_column)}", params)
+            cursor.execute(f"""
+                INSERT INTO {table} ({bucket_column}, {columns}, alert_count)
+                SELECT {self._ROLLUP_BUCKETS[table]} AS bucket, {self._CAMERA_EXPR} AS camera,
+                       source_type, danger_level, level, acknowledged, COUNT(*)
+                FROM alert_events
+                WHERE {where_clause.format(column='event_time')}
+                GROUP BY bucket, camera, source_type, danger_level, level, acknowledged
+            """, params)
+            rebuilt = cursor.rowcount
+        return rebuilt
+
+    def rebuild_rollups(self, since_days: Optional[int] = None) -> int:
+        """
+        从 alert_events 重新计算统计汇总（旧库回填或汇总与明细不一致时使用）
+        
+        Args:
+            since_days: 只重算最近多少天（含今天），None 表示全部重算
+            
+        Returns:
+            重算后的日汇总行数，失败返回-1
+        """
+        start_day = period_start(since_days)[0] if since_days else None
+        try:
+            with self._get_connection() as conn:
+                try:
+                    conn.begin()
+                    with conn.cursor() as cursor:
+                        rows = self._rebuild_rollups(cursor, start_day)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+            self.logger.info(f"告警统计汇总已重算: 起始日期 {start_day or '全部'}，{rows} 行日汇总")
+            return rows
+        except Exception as e:
+            self.logger.error(f"重算告警统计汇总失败: {str(e)}")
+            return -1
+
+    @staticmethod
+    def _build_conditions(danger_level: Optional[str] = None,
+                          level: Optional[str] = None,
+                          source_type: Optional[str] = None,
+                          acknowledged: Optional[bool] = None,
+                          start_time: Optional[str] = None,
+                          end_time: Optional[str] = None,
+                          search_text: Optional[str] = None) -> tuple:
+        """构建过滤条件，返回 (条件列表, 参数列表)"""
+        conditions = []
+        params = []
+        
+        if danger_level:
+            conditions.append("danger_level = %s")
+            params.append(danger_level)
+        
+        if level:
+            conditions.append("level = %s")
+            params.append(level)
+        
+        if source_type:
+            conditions.append("source_type = %s")
+            params.append(source_type)
+        
+        if acknowledged is not None:
+            conditions.append("acknowledged = %s")
+            params.append(acknowledged)
+        
+        if start_time:
+            conditions.append("event_time >= %s")
+            params.append(start_time)
+        
+        if end_time:
+            conditions.append("event_time <= %s")
+            params.append(end_time)
+        
+        if search_text:
+            conditions.append("(message LIKE %s OR details LIKE %s)")
+            search_pattern = f"%{search_text}%"
+            params.extend([search_pattern, search_pattern])
+        
+        return conditions, params
+
+    @staticmethod
+    def _row_to_event(row: Dict[str, Any]) -> Dict[str, Any]:
+        """把查询结果行转换为告警事件字典"""
+        event_dict = dict(row)
+        
+        # 解析JSON字段
+        try:
+            event_dict['details'] = json.loads(event_dict['details']) if event_dict['details'] else {}
+            event_dict['related_events'] = json.loads(event_dict['related_events']) if event_dict['related_events'] else []
+        except:
+            event_dict['details'] = {}
+            event_dict['related_events'] = []
+        
+        # 处理图像路径
+        event_dict['images'] = {}
+        if event_dict.get('image_paths'):
+            for path in event_dict['image_paths'].split(','):
+                if ':' in path:
+                    img_type, img_path = path.split(':', 1)
+                    event_dict['images'][img_type] = img_path
+        
+        # 添加可读时间
+        et = event_dict['event_time']
+        if isinstance(et, datetime):
+            event_dict['datetime'] = et.strftime('%Y-%m-%d %H:%M:%S')
+        else:
+            try:
+                event_dict['datetime'] = datetime.fromtimestamp(float(et)).strftime('%Y-%m-%d %H:%M:%S')
+            except Exception:
+                event_dict['datetime'] = str(et)
+        return event_dict
+
+    def _query_page(self, limit: int, offset: int = 0, cursor: Optional[str] = None,
+                    **filters) -> List[Dict[str, Any]]:
+        """
+        查询一页告警（按 event_time, id 升序）
+        
+        先在 alert_events 上按索引取出本页的id（游标或偏移），再只对这些行关联图片表，
+        避免对全部匹配行做 JOIN + GROUP BY。
+        """
+        conditions, params = self._build_conditions(**filters)
+        if cursor:
+            cursor_time, cursor_id = decode_cursor(cursor)
+            conditions.append(keyset_condition('event_time', 'id', False, '%s'))
+            params.extend([cursor_time, cursor_time, cursor_id])
+            offset = 0
+        where_clause = " AND ".join(conditions) if conditions else "1=1"
+        
+        sql = f"""
+            SELECT e.*, 
+                   GROUP_CONCAT(CONCAT(i.image_type, ':', i.image_path) SEPARATOR ',') as image_paths,
+                   GROUP_CONCAT(CONCAT(i.image_type, ':', i.file_size) SEPARATOR ',') as image_sizes
+            FROM (
+                SELECT id FROM alert_events
+                WHERE {where_clause}
+                ORDER BY event_time ASC, id ASC
+                LIMIT %s OFFSET %s
+            ) page
+            JOIN alert_events e ON e.id = page.id
+            LEFT JOIN alert_images i ON e.id = i.event_id
+            GROUP BY e.id
+            ORDER BY e.event_time ASC, e.id ASC
+        """
+        params.extend([limit, offset])
+        
+        with self._get_connection() as conn:
+            with conn.cursor() as db_cursor:
+                db_cursor.execute(sql, params)
+                return [self._row_to_event(row) for row in db_cursor.fetchall()]
+
     def get_alert_events(self, 
                         limit: int = 100,
                         offset: int = 0,
@@ -145,13 +493,14 @@ class MySQLAlertDatabase:
                         acknowledged: Optional[bool] = None,
                         start_time: Optional[str] = None,  # 起始时间DATETIME字符串
                         end_time: Optional[str] = None,    # 结束时间DATETIME字符串
-                        search_text: Optional[str] = None) -> List[Dict[str, Any]]:
+                        search_text: Optional[str] = None,
+                        cursor: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         查询告警事件
         
         Args:
             limit: 返回结果数量限制
-            offset: 分页偏移量
+            offset: 分页偏移量（指定 cursor 时忽略）
             danger_level: 危险级别过滤
             level: 告警级别过滤
             source_type: 来源类型过滤
@@ -159,110 +508,42 @@ class MySQLAlertDatabase:
             start_time: 起始时间DATETIME字符串
             end_time: 结束时间DATETIME字符串
             search_text: 搜索文本（在消息和详情中搜索）
+            cursor: 分页游标（上一页返回的 next_cursor），从该位置之后继续查询
             
         Returns:
             告警事件列表
         """
         try:
-            with self.lock:
-                with self._get_connection() as conn:
-                    with conn.cursor() as cursor:
-                        
-                        # 构建查询条件
-                        conditions = []
-                        params = []
-                        
-                        if danger_level:
-                            conditions.append("danger_level = %s")
-                            params.append(danger_level)
-                        
-                        if level:
-                            conditions.append("level = %s")
-                            params.append(level)
-                        
-                        if source_type:
-                            conditions.append("source_type = %s")
-                            params.append(source_type)
-                        
-                        if acknowledged is not None:
-                            conditions.append("acknowledged = %s")
-                            params.append(acknowledged)
-                        
-                        if start_time:
-                            conditions.append("event_time >= %s")
-                            params.append(start_time)
-                        
-                        if end_time:
-                            conditions.append("event_time <= %s")
-                            params.append(end_time)
-                        
-                        if search_text:
-                            conditions.append("(message LIKE %s OR details LIKE %s)")
-                            search_pattern = f"%{search_text}%"
-                            params.extend([search_pattern, search_pattern])
-                        
-                        # 构建SQL查询
-                        where_clause = " AND ".join(conditions) if conditions else "1=1"
-                        
-                        sql = f"""
-                            SELECT e.*, 
-                                   GROUP_CONCAT(CONCAT(i.image_type, ':', i.image_path) SEPARATOR ',') as image_paths,
-                                   GROUP_CONCAT(CONCAT(i.image_type, ':', i.file_size) SEPARATOR ',') as image_sizes
-                            FROM alert_events e
-                            LEFT JOIN alert_images i ON e.id = i.event_id
-                            WHERE {where_clause}
-                            GROUP BY e.id
-                            ORDER BY e.id ASC
-                            LIMIT %s OFFSET %s
-                        """
-                        
-                        params.extend([limit, offset])
-                        
-                        cursor.execute(sql, params)
-                        rows = cursor.fetchall()
-                        
-                        # 转换为字典列表
-                        results = []
-                        for row in rows:
-                            event_dict = dict(row)
-                            
-                            # 解析JSON字段
-                            try:
-                                event_dict['details'] = json.loads(event_dict['details']) if event_dict['details'] else {}
-                                event_dict['related_events'] = json.loads(event_dict['related_events']) if event_dict['related_events'] else []
-                            except:
-                                event_dict['details'] = {}
-                                event_dict['related_events'] = []
-                            
-                            # 处理图像路径
-                            if event_dict['image_paths']:
-                                image_paths = event_dict['image_paths'].split(',')
-                                image_sizes = event_dict['image_sizes'].split(',') if event_dict['image_sizes'] else []
-                                event_dict['images'] = {}
-                                for i, path in enumerate(image_paths):
-                                    if ':' in path:
-                                        img_type, img_path = path.split(':', 1)
-                                        event_dict['images'][img_type] = img_path
-                            else:
-                                event_dict['images'] = {}
-                            
-                            # 添加可读时间
-                            et = event_dict['event_time']
-                            if isinstance(et, datetime):
-                                event_dict['datetime'] = et.strftime('%Y-%m-%d %H:%M:%S')
-                            else:
-                                try:
-                                    event_dict['datetime'] = datetime.fromtimestamp(float(et)).strftime('%Y-%m-%d %H:%M:%S')
-                                except Exception:
-                                    event_dict['datetime'] = str(et)
-                            
-                            results.append(event_dict)
-                        
-                        return results
-                        
+            return self._query_page(limit, offset, cursor,
+                                    danger_level=danger_level, level=level, source_type=source_type,
+                                    acknowledged=acknowledged, start_time=start_time, end_time=end_time,
+                                    search_text=search_text)
         except Exception as e:
             self.logger.error(f"查询告警事件失败: {str(e)}")
             return []
+
+    def get_alert_events_page(self,
+                              limit: int = 20,
+                              cursor: Optional[str] = None,
+                              offset: int = 0,
+                              **filters) -> Dict[str, Any]:
+        """
+        分页查询告警事件，并返回下一页的游标
+        
+        Args:
+            limit: 每页数量
+            cursor: 分页游标，为空时按 offset 定位（用于跳页）
+            offset: 分页偏移量
+            **filters: 与 get_alert_events 相同的过滤条件
+            
+        Returns:
+            {'alerts': 告警列表, 'next_cursor': 下一页游标或None, 'has_more': 是否还有下一页}
+        """
+        rows = self.get_alert_events(limit=limit + 1, offset=offset, cursor=cursor, **filters)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['event_time'], rows[-1]['id']) if has_more else None
+        return {'alerts': rows, 'next_cursor': next_cursor, 'has_more': has_more}
     
     def get_alert_count(self, 
                        danger_level: Optional[str] = None,
@@ -270,7 +551,8 @@ class MySQLAlertDatabase:
                        source_type: Optional[str] = None,
                        acknowledged: Optional[bool] = None,
                        start_time: Optional[str] = None,  # 起始时间DATETIME字符串
-                       end_time: Optional[str] = None    # 结束时间DATETIME字符串
+                       end_time: Optional[str] = None,    # 结束时间DATETIME字符串
+                       cached: bool = False
     ) -> int:
         """
         获取告警事件数量
@@ -282,56 +564,63 @@ class MySQLAlertDatabase:
             acknowledged: 是否已确认过滤
             start_time: 起始时间DATETIME字符串
             end_time: 结束时间DATETIME字符串
+            cached: 是否使用缓存的总数（在 count_cache.ttl 秒内可能略有滞后）
             
         Returns:
             告警事件数量
         """
+        filters = dict(danger_level=danger_level, level=level, source_type=source_type,
+                       acknowledged=acknowledged, start_time=start_time, end_time=end_time)
+        cache_key = CountCache.make_key(**filters)
+        if cached:
+            count = self.count_cache.get(cache_key)
+            if count is not None:
+                return count
         try:
-            with self.lock:
-                with self._get_connection() as conn:
-                    with conn.cursor() as cursor:
-                        
-                        # 构建查询条件
-                        conditions = []
-                        params = []
-                        
-                        if danger_level:
-                            conditions.append("danger_level = %s")
-                            params.append(danger_level)
-                        
-                        if level:
-                            conditions.append("level = %s")
-                            params.append(level)
-                        
-                        if source_type:
-                            conditions.append("source_type = %s")
-                            params.append(source_type)
-                        
-                        if acknowledged is not None:
-                            conditions.append("acknowledged = %s")
-                            params.append(acknowledged)
-                        
-                        if start_time:
-                            conditions.append("event_time >= %s")
-                            params.append(start_time)
-                        
-                        if end_time:
-                            conditions.append("event_time <= %s")
-                            params.append(end_time)
-                        
-                        where_clause = " AND ".join(conditions) if conditions else "1=1"
-                        
-                        sql = f"SELECT COUNT(*) as count FROM alert_events WHERE {where_clause}"
-                        
-                        cursor.execute(sql, params)
-                        result = cursor.fetchone()
-                        
-                        return result['count'] if result else 0
+            conditions, params = self._build_conditions(**filters)
+            where_clause = " AND ".join(conditions) if conditions else "1=1"
+            with self._get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(f"SELECT COUNT(*) as count FROM alert_events WHERE {where_clause}", params)
+                    result = cursor.fetchone()
+                    count = result['count'] if result else 0
+            self.count_cache.put(cache_key, count)
+            return count
                         
         except Exception as e:
             self.logger.error(f"获取告警数量失败: {str(e)}")
             return 0
     
+    def _set_acknowledged(self, event_id: str, acknowledged: bool) -> bool:
+        """修改确认状态，并在同一事务内把统计汇总从原确认状态挪到新状态"""
+        with self._get_connection() as conn:
+            try:
+                conn.begin()
+                with conn.cursor() as cursor:
+                    # 只更新状态确实变化的行，UPDATE 持有行锁，并发确认同一告警时只有一个会挪动汇总
+                    cursor.execute("""
+                        UPDATE alert_events SET acknowledged = %s
+                        WHERE id = %s AND acknowledged <> %s
+                    """, (acknowledged, event_id, acknowledged))
+                    changed = cursor.rowcount > 0
+                    cursor.execute(f"""
+                        SELECT event_time, {self._CAMERA_EXPR} AS camera_id, source_type, danger_level, level
+                        FROM alert_events WHERE id = %s
+                    """, (event_id,))
+                    row = cursor.fetchone()
+                    if changed and row:
+                        self._apply_rollup_deltas(cursor, ack_deltas(
+                            row['event_time'], row['camera_id'], row['source_type'],
+                            row['danger_level'], row['level'], acknowledged))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        if changed:
+            # 确认状态变化会影响按 acknowledged 过滤的总数
+            self.count_cache.invalidate()
+        return row is not None
+
     def acknowledge_alert(self, event_id: str) -> bool:
         """
         确认告警事件
@@ -340,21 +629,10 @@ class MySQLAlertDatabase:
             event_id: 告警事件ID
             
         Returns:
-            是否确认成功
+            是否确认成功（告警已是确认状态时也返回True）
         """
         try:
-            with self.lock:
-                with self._get_connection() as conn:
-                    with conn.cursor() as cursor:
-                        
-                        cursor.execute("""
-                            UPDATE alert_events 
-                            SET acknowledged = TRUE 
-                            WHERE id = %s
-                        """, (event_id,))
-                        
-                        return cursor.rowcount > 0
-                        
+            return self._set_acknowledged(event_id, True)
         except Exception as e:
             self.logger.error(f"确认告警失败: {str(e)}")
             return False
@@ -367,83 +645,65 @@ class MySQLAlertDatabase:
             event_id: 告警事件ID
             
         Returns:
-            是否取消确认成功
+            是否取消确认成功（告警已是未确认状态时也返回True）
         """
         try:
-            with self.lock:
-                with self._get_connection() as conn:
-                    with conn.cursor() as cursor:
-                        
-                        cursor.execute("""
-                            UPDATE alert_events 
-                            SET acknowledged = FALSE 
-                            WHERE id = %s
-                        """, (event_id,))
-                        
-                        return cursor.rowcount > 0
-                        
+            return self._set_acknowledged(event_id, False)
         except Exception as e:
             self.logger.error(f"取消确认告警失败: {str(e)}")
             return False
     
     def get_alert_statistics(self, days: int = 30) -> Dict[str, Any]:
         """
-        获取告警统计信息
+        获取告警统计信息（读取按天/按小时的统计汇总表，耗时与天数成正比，与告警总量无关）
         
         Args:
-            days: 统计天数
+            days: 统计天数（含今天）
             
         Returns:
-            统计信息字典
+            统计信息字典：总数、未处理/已处理数、各危险级别/告警级别/来源/摄像头数量、
+            今日告警数、每日趋势和最近24小时的逐小时趋势
         """
         try:
-            with self.lock:
-                with self._get_connection() as conn:
-                    with conn.cursor() as cursor:
-                        end_time = time.time()
-                        start_time = end_time - (days * 24 * 3600)
-                        stats = {
-                            'total_alerts': 0,
-                            'unhandled_alerts': 0,
-                            'handled_alerts': 0,
-                            'high_level_alerts': 0,
-                            'medium_level_alerts': 0,
-                            'low_level_alerts': 0,
-                            'today_alerts': 0,
-                            'period_days': days
-                        }
-                        # 总告警数
-                        cursor.execute("SELECT COUNT(*) as total FROM alert_events WHERE event_time >= %s", (start_time,))
-                        row = cursor.fetchone()
-                        stats['total_alerts'] = row['total'] if row and 'total' in row else 0
-                        # 未处理告警
-                        cursor.execute("SELECT COUNT(*) as count FROM alert_events WHERE event_time >= %s AND acknowledged = 0", (start_time,))
-                        row = cursor.fetchone()
-                        stats['unhandled_alerts'] = row['count'] if row and 'count' in row else 0
-                        # 已处理告警
-                        stats['handled_alerts'] = stats['total_alerts'] - stats['unhandled_alerts']
-                        # 各级别
-                        cursor.execute("SELECT COUNT(*) as count FROM alert_events WHERE event_time >= %s AND danger_level = 'high'", (start_time,))
-                        row = cursor.fetchone()
-                        stats['high_level_alerts'] = row['count'] if row and 'count' in row else 0
-                        cursor.execute("SELECT COUNT(*) as count FROM alert_events WHERE event_time >= %s AND danger_level = 'medium'", (start_time,))
-                        row = cursor.fetchone()
-                        stats['medium_level_alerts'] = row['count'] if row and 'count' in row else 0
-                        cursor.execute("SELECT COUNT(*) as count FROM alert_events WHERE event_time >= %s AND danger_level = 'low'", (start_time,))
-                        row = cursor.fetchone()
-                        stats['low_level_alerts'] = row['count'] if row and 'count' in row else 0
-                        # 今日告警
-                        import datetime
-                        today = datetime.date.today()
-                        today_start = int(datetime.datetime.combine(today, datetime.time.min).timestamp())
-                        cursor.execute("SELECT COUNT(*) as count FROM alert_events WHERE event_time >= %s", (today_start,))
-                        row = cursor.fetchone()
-                        stats['today_alerts'] = row['count'] if row and 'count' in row else 0
-                        return stats
+            start_day, start_hour = period_start(days)
+            columns = ", ".join(ROLLUP_DIMENSIONS)
+            with self._get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(f"""
+                        SELECT bucket_date AS bucket, {columns}, alert_count
+                        FROM alert_rollup_daily WHERE bucket_date >= %s
+                    """, (start_day,))
+                    daily_rows = cursor.fetchall()
+                    cursor.execute(f"""
+                        SELECT bucket_start AS bucket, {columns}, alert_count
+                        FROM alert_rollup_hourly WHERE bucket_start >= %s
+                    """, (start_hour,))
+                    hourly_rows = cursor.fetchall()
+            return summarize(daily_rows, hourly_rows, days)
         except Exception as e:
             self.logger.error(f"获取告警统计失败: {str(e)}")
             return {}
     
+    def get_alert_totals(self) -> Dict[str, Any]:
+        """
+        获取全部告警的累计数量（总数、未处理数、各级别数量），读取按天汇总表
+        
+        Returns:
+            累计数量字典
+        """
+        try:
+            with self._get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("""
+                        SELECT danger_level, level, acknowledged, SUM(alert_count) AS alert_count
+                        FROM alert_rollup_daily
+                        GROUP BY danger_level, level, acknowledged
+                    """)
+                    return summarize_totals(cursor.fetchall())
+        except Exception as e:
+            self.logger.error(f"获取告警累计数量失败: {str(e)}")
+            return {}
+    
     def delete_old_alerts(self, days: int = 90) -> int:
         """
         删除指定天数之前的告警数据
@@ -455,25 +715,42 @@ class MySQLAlertDatabase:
             删除的记录数
         """
         try:
-            with self.lock:
-                with self._get_connection() as conn:
-                    with conn.cursor() as cursor:
+            with self._get_connection() as conn:
+                with conn.cursor() as cursor:
                         
-                        # 使用存储过程清理旧数据
-                        cursor.callproc('cleanup_old_alerts', [days])
-                        result = cursor.fetchone()
+                    # 使用存储过程清理旧数据
+                    cursor.callproc('cleanup_old_alerts', [days])
+                    result = cursor.fetchone()
                         
-                        deleted_count = result['deleted_count'] if result else 0
-                        self.logger.info(f"删除了 {deleted_count} 条旧告警记录")
-                        return deleted_count
+                    deleted_count = result['deleted_count'] if result else 0
+            self._trim_rollups(days)
+            self.count_cache.invalidate()
+            self.logger.info(f"删除了 {deleted_count} 条旧告警记录")
+            return deleted_count
                         
         except Exception as e:
             self.logger.error(f"删除旧告警失败: {str(e)}")
             return 0
     
+    def _trim_rollups(self, days: int):
+        """删除保留期之前的统计汇总，并重算保留期起始那一天（该天的告警只删除了一部分）"""
+        cutoff_day = (datetime.now() - timedelta(days=days)).date()
+        next_day = cutoff_day + timedelta(days=1)
+        with self._get_connection() as conn:
+            try:
+                conn.begin()
+                with conn.cursor() as cursor:
+                    for table, bucket_column in ROLLUP_TABLES.items():
+                        cursor.execute(f"DELETE FROM {table} WHERE {bucket_column} < %s", (str(cutoff_day),))
+                    self._rebuild_rollups(cursor, str(cutoff_day), str(next_day))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
     def close(self):
-        """关闭数据库连接"""
-        pass  # PyMySQL会自动管理连接
+        """关闭连接池中的数据库连接"""
+        self.pool.close()
     
     def get_system_config(self, config_key: str, default_value: Any = None) -> Any:
         """
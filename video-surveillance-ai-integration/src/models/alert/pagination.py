@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+告警历史分页工具 - 游标（keyset）分页和总数缓存，MySQL 与 SQLite 告警库共用
+
+游标编码了上一页最后一条记录的 (时间, id)，下一页查询 "(时间, id) 在游标之后" 的记录，
+可以直接沿 (时间, id) 索引定位，不像 OFFSET 那样需要扫描并丢弃前面所有的行。
+"""
+
+import json
+import time
+import base64
+import threading
+from collections import OrderedDict
+
+
+def encode_cursor(event_time, event_id):
+    """把一条记录的 (时间, id) 编码为URL安全的游标字符串"""
+    if hasattr(event_time, 'strftime'):
+        event_time = event_time.strftime('%Y-%m-%d %H:%M:%S')
+    raw = json.dumps([event_time, event_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析游标字符串
+
+    Returns:
+        tuple: (时间, id)
+
+    Raises:
+        ValueError: 游标格式无效
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        event_time, event_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError(f"无效的分页游标: {cursor}")
+    return event_time, event_id
+
+
+def keyset_condition(time_column, id_column, descending, placeholder):
+    """生成 "(时间, id) 在游标之后" 的WHERE条件，参数顺序为 (时间, 时间, id)
+
+    第一项 "时间 <= 游标时间" 是单列范围条件，MySQL 和 SQLite 都能据此在 (…, 时间, id) 索引上直接定位；
+    第二项再排除与游标同一时间且 id 不在其后的记录
+    """
+    op = '<' if descending else '>'
+    return (f"({time_column} {op}= {placeholder} AND "
+            f"({time_column} {op} {placeholder} OR {id_column} {op} {placeholder}))")
+
+
+class CountCache:
+    """按过滤条件缓存告警总数，过期时间内直接返回缓存值"""
+
+    def __init__(self, ttl=30.0, max_entries=256):
+        """
+        Args:
+            ttl (float): 缓存有效期（秒），0 表示不缓存
+            max_entries (int): 最多缓存的过滤条件组合数
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (count, 写入时间)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(**filters):
+        return tuple(sorted((k, v) for k, v in filters.items() if v is not None))
+
+    def get(self, key):
+        """返回缓存的总数，不存在或已过期时返回 None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.time() - entry[1] <= self.ttl:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def put(self, key, count):
+        if self.ttl <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (count, time.time())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self):
+        """清空缓存（确认状态变化或删除记录后调用）"""
+        with self.lock:
+            self.entries.clear()
+
+    def get_stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses, 'ttl': self.ttl}
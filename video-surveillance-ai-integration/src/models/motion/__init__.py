@@ -7,12 +7,14 @@
 """
 
 from .motion_manager import MotionFeatureManager
+from .flow_pool import FlowWorkerPool
 from .optical_flow import OpticalFlowExtractor
 from .motion_history import MotionHistoryExtractor
 from .motion_feature_base import MotionFeature, MotionFeatureExtractor
 
 __all__ = [
     'MotionFeatureManager',
+    'FlowWorkerPool',
     'OpticalFlowExtractor',
     'MotionHistoryExtractor',
     'MotionFeature',
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+光流工作进程池 - 在多个子进程中并行计算Farneback光流，绕开GIL
+
+帧数据通过共享内存传递：每个槽位存放一对灰度帧（前一帧、当前帧）和
+计算结果（flow、mag、ang）。工作进程是无状态的，前一帧由调用方
+（MotionFeatureManager）持有并随任务一起提交，因此多路摄像头可以共享同一个池。
+"""
+
+import time
+import logging
+import threading
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from queue import Queue
+
+import cv2
+import numpy as np
+
+from .motion_manager import FARNEBACK_PARAMS, compute_farneback_flow
+
+logger = logging.getLogger("FlowWorkerPool")
+
+# 每个像素在槽位中占用的字节数：2帧uint8灰度 + flow(2×float32) + mag/ang(2×float32)
+_INPUT_BYTES_PER_PIXEL = 2
+_OUTPUT_BYTES_PER_PIXEL = 16
+
+# 工作进程内的全局状态（由 _init_worker 设置）
+_worker_shm = None
+_worker_slot_bytes = 0
+_worker_slot_pixels = 0
+_worker_params = None
+_worker_step = 16
+_worker_mag_threshold = 1.0
+
+
+def _slot_views(buf, slot, slot_bytes, slot_pixels, height, width):
+    """获取槽位中各数组的视图（按实际帧尺寸紧凑排列）"""
+    base = slot * slot_bytes
+    pixels = height * width
+    prev_gray = np.ndarray((height, width), dtype=np.uint8, buffer=buf, offset=base)
+    gray = np.ndarray((height, width), dtype=np.uint8, buffer=buf, offset=base + slot_pixels)
+    out_base = base + slot_pixels * _INPUT_BYTES_PER_PIXEL
+    flow = np.ndarray((height, width, 2), dtype=np.float32, buffer=buf, offset=out_base)
+    mag = np.ndarray((height, width), dtype=np.float32, buffer=buf, offset=out_base + pixels * 8)
+    ang = np.ndarray((height, width), dtype=np.float32, buffer=buf, offset=out_base + pixels * 12)
+    return prev_gray, gray, flow, mag, ang
+
+
+def _init_worker(shm_name, slot_bytes, slot_pixels, params, step, mag_threshold):
+    """工作进程初始化：挂载共享内存"""
+    global _worker_shm, _worker_slot_bytes, _worker_slot_pixels
+    global _worker_params, _worker_step, _worker_mag_threshold
+    # 每个进程只用一个线程，由进程数控制并行度，避免过度订阅CPU
+    cv2.setNumThreads(1)
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_slot_bytes = slot_bytes
+    _worker_slot_pixels = slot_pixels
+    _worker_params = params
+    _worker_step = step
+    _worker_mag_threshold = mag_threshold
+
+
+def _flow_task(slot, height, width):
+    """工作进程任务：读取槽位中的两帧，计算光流并写回槽位"""
+    prev_gray, gray, out_flow, out_mag, out_ang = _slot_views(
+        _worker_shm.buf, slot, _worker_slot_bytes, _worker_slot_pixels, height, width)
+    flow, mag, ang, motion_vectors = compute_farneback_flow(
+        prev_gray, gray, _worker_params, _worker_step, _worker_mag_threshold)
+    out_flow[...] = flow
+    out_mag[...] = mag
+    out_ang[...] = ang
+    del prev_gray, gray, out_flow, out_mag, out_ang
+    return motion_vectors
+
+
+class FlowTask:
+    """已提交的光流任务，get() 取回结果
+
+    槽位在任务真正结束时（结果处理线程的回调中）才释放：get() 超时或出错时
+    工作进程可能仍在写该槽位，此时释放会让下一次 submit 复用同一块共享内存
+    """
+
+    def __init__(self, pool, slot, shape):
+        self._pool = pool
+        self._slot = slot
+        self._shape = shape
+        self._async_result = None
+        self._result = None
+        self._error = None
+
+    def _on_done(self, motion_vectors):
+        """任务完成回调：把结果拷贝出槽位后释放槽位"""
+        try:
+            _, _, flow, mag, ang = self._pool._views(self._slot, *self._shape)
+            # 槽位会被复用，结果必须拷贝出来
+            self._result = (flow.copy(), mag.copy(), ang.copy(), motion_vectors)
+            del flow, mag, ang
+        except Exception as e:
+            self._error = e
+        finally:
+            self._pool._release_slot(self._slot)
+
+    def _on_error(self, error):
+        """任务失败回调：工作进程已不再使用槽位，直接释放"""
+        self._pool._release_slot(self._slot)
+
+    def get(self, timeout=None):
+        """等待任务完成
+
+        Returns:
+            tuple: (flow, mag, ang, motion_vectors)，与 compute_farneback_flow 一致
+        """
+        if self._result is None:
+            # 回调在结果就绪之前执行，get 返回时结果已拷贝完成
+            self._async_result.get(timeout)
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+class FlowWorkerPool:
+    """Farneback光流工作进程池"""
+
+    def __init__(self, num_workers=None, max_width=1920, max_height=1080, num_slots=None,
+                 farneback_params=None, step=16, mag_threshold=1.0):
+        """初始化进程池
+
+        Args:
+            num_workers (int): 工作进程数，默认CPU核数
+            max_width (int): 支持的最大帧宽（与 max_height 一起决定每个槽位的像素容量）
+            max_height (int): 支持的最大帧高
+            num_slots (int): 共享内存槽位数（同时在途的任务数），默认 2 × num_workers
+            farneback_params (dict): Farneback参数，默认与 MotionFeatureManager 一致
+            step (int): 运动矢量采样步长
+            mag_threshold (float): 运动矢量的最小幅值
+        """
+        self.num_workers = num_workers or mp.cpu_count()
+        self.step = step
+        self.mag_threshold = mag_threshold
+        self.num_slots = num_slots or self.num_workers * 2
+        self.slot_pixels = int(max_width) * int(max_height)
+        self.slot_bytes = self.slot_pixels * (_INPUT_BYTES_PER_PIXEL + _OUTPUT_BYTES_PER_PIXEL)
+
+        self.shm = shared_memory.SharedMemory(create=True, size=self.slot_bytes * self.num_slots)
+        self.free_slots = Queue()
+        for slot in range(self.num_slots):
+            self.free_slots.put(slot)
+
+        self.pool = mp.Pool(
+            processes=self.num_workers,
+            initializer=_init_worker,
+            initargs=(self.shm.name, self.slot_bytes, self.slot_pixels,
+                      dict(farneback_params or FARNEBACK_PARAMS), step, mag_threshold)
+        )
+        self.closed = False
+
+        # 统计信息
+        self.stats_lock = threading.Lock()
+        self.task_count = 0
+        self.total_time = 0.0
+
+        logger.info(f"光流进程池已启动: workers={self.num_workers}, slots={self.num_slots}, "
+                    f"最大帧={max_width}x{max_height}")
+
+    def _views(self, slot, height, width):
+        return _slot_views(self.shm.buf, slot, self.slot_bytes, self.slot_pixels, height, width)
+
+    def _release_slot(self, slot):
+        self.free_slots.put(slot)
+
+    def accepts(self, shape):
+        """帧尺寸是否能放入槽位"""
+        return not self.closed and shape[0] * shape[1] <= self.slot_pixels
+
+    def submit(self, prev_gray, gray):
+        """提交一对灰度帧，返回 FlowTask；没有空闲槽位时阻塞"""
+        if prev_gray.shape != gray.shape:
+            raise ValueError(f"前后帧尺寸不一致: {prev_gray.shape} vs {gray.shape}")
+        if not self.accepts(gray.shape):
+            raise ValueError(f"帧尺寸超过进程池容量: {gray.shape}")
+
+        height, width = gray.shape[:2]
+        slot = self.free_slots.get()
+        try:
+            slot_prev, slot_gray, _, _, _ = self._views(slot, height, width)
+            slot_prev[...] = prev_gray
+            slot_gray[...] = gray
+            del slot_prev, slot_gray
+            task = FlowTask(self, slot, (height, width))
+            task._async_result = self.pool.apply_async(
+                _flow_task, (slot, height, width), callback=task._on_done, error_callback=task._on_error)
+        except Exception:
+            self._release_slot(slot)
+            raise
+        return task
+
+    def compute(self, prev_gray, gray):
+        """同步计算光流，返回 (flow, mag, ang, motion_vectors)"""
+        start = time.time()
+        result = self.submit(prev_gray, gray).get()
+        with self.stats_lock:
+            self.task_count += 1
+            self.total_time += time.time() - start
+        return result
+
+    def get_stats(self):
+        """获取进程池统计信息"""
+        with self.stats_lock:
+            return {
+                'workers': self.num_workers,
+                'slots': self.num_slots,
+                'free_slots': self.free_slots.qsize(),
+                'task_count': self.task_count,
+                'avg_task_ms': self.total_time / max(1, self.task_count) * 1000
+            }
+
+    def close(self):
+        """关闭进程池并释放共享内存"""
+        if self.closed:
+            return
+        self.closed = True
+        self.pool.terminate()
+        self.pool.join()
+        self.shm.close()
+        self.shm.unlink()
+        logger.info("光流进程池已关闭")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -11,6 +11,8 @@ import logging
 import time
 from enum import Enum
 
+from metrics import METRICS
+
 # 配置日志
 logger = logging.getLogger("MotionFeatureManager")
 
@@ -22,12 +24,159 @@ class FeatureType(Enum):
     CONTOUR = "contour"
     KEYPOINT = "keypoint"
 
+# Farneback光流参数
+FARNEBACK_PARAMS = dict(
+    pyr_scale=0.5,
+    levels=3,
+    winsize=15,
+    iterations=3,
+    poly_n=5,
+    poly_sigma=1.2,
+    flags=0)
+
+
+# 阈值标定所用的参考帧宽：按分析分辨率计算光流时，幅值换算到该宽度下的像素位移
+REFERENCE_WIDTH = 640
+
+# 参考帧宽下的运动矢量采样步长
+MOTION_VECTOR_STEP = 16
+
+
+# 运动矢量结构化数组类型：采样点坐标、位移分量和幅值
+MOTION_VECTOR_DTYPE = np.dtype([
+    ('x', np.int32),
+    ('y', np.int32),
+    ('fx', np.float32),
+    ('fy', np.float32),
+    ('mag', np.float32)])
+
+
+def sample_motion_vectors(flow, mag, step=16, mag_threshold=1.0):
+    """按步长对稠密光流采样，只保留幅值大于阈值的点
+
+    Returns:
+        np.ndarray: MOTION_VECTOR_DTYPE 结构化数组，按行优先顺序排列
+    """
+    sampled_mag = mag[::step, ::step]
+    mask = sampled_mag > mag_threshold
+    rows, cols = np.nonzero(mask)
+    sampled_flow = flow[::step, ::step]
+
+    motion_vectors = np.empty(len(rows), dtype=MOTION_VECTOR_DTYPE)
+    motion_vectors['x'] = cols * step
+    motion_vectors['y'] = rows * step
+    motion_vectors['fx'] = sampled_flow[..., 0][mask]
+    motion_vectors['fy'] = sampled_flow[..., 1][mask]
+    motion_vectors['mag'] = sampled_mag[mask]
+    return motion_vectors
+
+
+def flow_sampling_params(analysis_width=None):
+    """按分析宽度换算运动矢量的采样步长和幅值阈值（参考帧宽下分别为 MOTION_VECTOR_STEP 和1像素）
+
+    Args:
+        analysis_width (int): 光流分析宽度，None 表示按输入分辨率计算、不换算
+
+    Returns:
+        tuple: (unit, step, mag_threshold)，unit 为分析分辨率像素换算到参考帧宽像素的倍数
+    """
+    if not analysis_width:
+        return 1.0, MOTION_VECTOR_STEP, 1.0
+    unit = REFERENCE_WIDTH / analysis_width
+    return unit, max(1, int(round(MOTION_VECTOR_STEP / unit))), 1.0 / unit
+
+
+def compute_farneback_flow(prev_gray, gray, params=None, step=16, mag_threshold=1.0):
+    """计算Farneback稠密光流及其统计信息（无状态，可在工作进程中调用）
+
+    Args:
+        prev_gray: 前一帧灰度图
+        gray: 当前帧灰度图
+        params (dict): Farneback参数，默认 FARNEBACK_PARAMS
+        step (int): 运动矢量采样步长，None 表示不采样（motion_vectors 为 None）
+        mag_threshold (float): 运动矢量的最小幅值
+
+    Returns:
+        tuple: (flow, mag, ang, motion_vectors)
+    """
+    flow = cv2.calcOpticalFlowFarneback(prev_gray, gray, None, **(params or FARNEBACK_PARAMS))
+    mag, ang = cv2.cartToPolar(flow[..., 0], flow[..., 1])
+
+    # 计算运动矢量（只保留显著运动）
+    motion_vectors = sample_motion_vectors(flow, mag, step, mag_threshold) if step is not None else None
+    return flow, mag, ang, motion_vectors
+
+
+def find_active_regions(prev_gray, gray, diff_threshold=15, min_area=64, downscale=4):
+    """帧差门控：找出前后两帧有变化的区域
+
+    在缩小 downscale 倍的图上做帧差、二值化和膨胀，再按连通域取外接矩形。
+
+    Returns:
+        list: 原图坐标的矩形 [(x1, y1, x2, y2), ...]，画面完全静止时为空列表
+    """
+    h, w = gray.shape[:2]
+    size = (max(1, w // downscale), max(1, h // downscale))
+    small_prev = cv2.resize(prev_gray, size, interpolation=cv2.INTER_AREA)
+    small = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+    _, mask = cv2.threshold(cv2.absdiff(small, small_prev), diff_threshold, 255, cv2.THRESH_BINARY)
+    if not cv2.countNonZero(mask):
+        return []
+    mask = cv2.dilate(mask, np.ones((3, 3), np.uint8), iterations=2)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+
+    sx, sy = w / size[0], h / size[1]
+    regions = []
+    for x, y, bw, bh, area in stats[1:count]:
+        if area * sx * sy < min_area:
+            continue
+        regions.append((int(x * sx), int(y * sy), int(np.ceil((x + bw) * sx)), int(np.ceil((y + bh) * sy))))
+    return regions
+
+
+def merge_regions(regions, shape, padding=16, min_size=32):
+    """扩展并合并矩形：每个矩形向外扩展 padding 像素、不小于 min_size，
+    裁剪到画面内后把相交的矩形反复合并，直到互不相交
+
+    Returns:
+        list: 互不相交的矩形 [(x1, y1, x2, y2), ...]
+    """
+    h, w = shape[:2]
+    boxes = []
+    for x1, y1, x2, y2 in regions:
+        cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+        half_w = max((x2 - x1) / 2 + padding, min_size / 2)
+        half_h = max((y2 - y1) / 2 + padding, min_size / 2)
+        box = [max(0, int(cx - half_w)), max(0, int(cy - half_h)),
+               min(w, int(np.ceil(cx + half_w))), min(h, int(np.ceil(cy + half_h)))]
+        if box[2] > box[0] and box[3] > box[1]:
+            boxes.append(box)
+
+    merged = True
+    while merged and len(boxes) > 1:
+        merged = False
+        result = []
+        for box in boxes:
+            for other in result:
+                if box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]:
+                    other[0], other[1] = min(box[0], other[0]), min(box[1], other[1])
+                    other[2], other[3] = max(box[2], other[2]), max(box[3], other[3])
+                    merged = True
+                    break
+            else:
+                result.append(box)
+        boxes = result
+    return [tuple(box) for box in boxes]
+
+
 class MotionFeatureManager:
     """运动特征管理器 - 负责从视频帧中提取各种运动特征"""
     
     def __init__(self, use_optical_flow=True, use_motion_history=False, 
                  use_background_sub=False, use_contour=True, use_keypoint=False,
-                 optical_flow_method='farneback', use_gpu=False):
+                 optical_flow_method='farneback', use_gpu=False, flow_pool=None,
+                 roi_gating=False, gate_threshold=15, roi_padding=16, roi_max_fraction=0.6,
+                 flow_width=None, metrics=None):
         """初始化运动特征管理器
         
         Args:
@@ -38,6 +187,16 @@ class MotionFeatureManager:
             use_keypoint (bool): 是否使用关键点检测
             optical_flow_method (str): 光流方法 ('farneback', 'sparse', 'dense_pyr_lk')
             use_gpu (bool): 是否使用GPU加速
+            flow_pool (FlowWorkerPool): 可选的光流工作进程池，Farneback光流在子进程中计算
+            roi_gating (bool): 是否按帧差门控Farneback光流，只在有变化的区域（及人员框）附近计算
+            gate_threshold (int): 门控帧差的灰度阈值
+            roi_padding (int): 变化区域向外扩展的像素数
+            roi_max_fraction (float): 区域总面积超过画面的该比例时直接计算整帧光流
+            flow_width (int): Farneback光流的分析宽度（如320），宽于该值的帧先缩小再计算；
+                此时光流幅值统计和运动矢量位移换算为 REFERENCE_WIDTH 宽度下的像素，
+                与输入分辨率无关（optical_flow/flow_magnitude 数组仍为分析分辨率像素，
+                乘以 features['flow_unit'] 换算）。None 表示按输入分辨率计算，统计值为输入帧像素
+            metrics (MetricsScope): 记录光流耗时的指标句柄（如带 camera 标签），None 时使用默认注册表
         """
         self.use_optical_flow = use_optical_flow
         self.use_motion_history = use_motion_history
@@ -46,9 +205,18 @@ class MotionFeatureManager:
         self.use_keypoint = use_keypoint
         self.optical_flow_method = optical_flow_method
         self.use_gpu = use_gpu
+        self.flow_pool = flow_pool
+        self.roi_gating = roi_gating
+        self.gate_threshold = gate_threshold
+        self.roi_padding = roi_padding
+        self.roi_max_fraction = roi_max_fraction
+        self.flow_width = flow_width
+        self.metrics = metrics if metrics is not None else METRICS.scope()
         
         # 初始化状态变量
         self.prev_gray = None
+        self.prev_flow_gray = None  # 分析分辨率下的前一帧（未设置 flow_width 时与 prev_gray 相同）
+        self.static_flow = None  # 静止帧共用的只读全零 (flow, mag, ang)，按尺寸缓存
         self.motion_history = None
         self.bg_subtractor = None
         self.feature_detector = None
@@ -85,14 +253,7 @@ class MotionFeatureManager:
                 self.prev_points = None
             elif self.optical_flow_method == 'farneback':
                 # Farneback光流参数
-                self.farneback_params = dict(
-                    pyr_scale=0.5,
-                    levels=3,
-                    winsize=15,
-                    iterations=3,
-                    poly_n=5,
-                    poly_sigma=1.2,
-                    flags=0)
+                self.farneback_params = dict(FARNEBACK_PARAMS)
             elif self.optical_flow_method == 'dense_pyr_lk':
                 # 密集金字塔LK
                 self.lk_pyr_params = dict(
@@ -104,15 +265,16 @@ class MotionFeatureManager:
                     f"运动历史={use_motion_history}, 背景减除={use_background_sub}, "
                     f"轮廓={use_contour}, 关键点={use_keypoint}, GPU={use_gpu}")
     
-    def extract_features(self, frame, prev_frame=None):
+    def extract_features(self, frame, prev_frame=None, person_boxes=None):
         """从帧中提取特征
         
         Args:
             frame: 当前帧
             prev_frame: 前一帧（可选）
+            person_boxes: 可选，检测器给出的人员框 [x1, y1, x2, y2] 列表，开启门控时这些区域也计算光流
         
         Returns:
-            features: 提取的特征字典
+            features: 提取的特征字典，其中 motion_vectors 为 MOTION_VECTOR_DTYPE 结构化数组
         """
         self.frame_count += 1
         features = {}
@@ -123,30 +285,57 @@ class MotionFeatureManager:
         
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         features['gray'] = gray
+        flow_gray, scale = gray, 1.0
+        if self.use_optical_flow and self.optical_flow_method == 'farneback':
+            flow_gray, scale = self._analysis_gray(gray)
         
-        # 提取光流
-        if self.use_optical_flow and self.prev_gray is not None:
+        # 提取光流（分析宽度刚调整过时前后两帧尺寸不同，跳过这一帧）
+        if (self.use_optical_flow and self.prev_gray is not None and
+                self.prev_flow_gray is not None and self.prev_flow_gray.shape == flow_gray.shape):
             start_time = time.time()
             if self.optical_flow_method == 'farneback':
-                flow = cv2.calcOpticalFlowFarneback(self.prev_gray, gray, None, **self.farneback_params)
+                prev_flow_gray = self.prev_flow_gray
+                regions = None
+                if self.roi_gating:
+                    boxes = None
+                    if person_boxes is not None:
+                        boxes = [[v * scale for v in box[:4]] for box in person_boxes]
+                    regions = self._gate_regions(prev_flow_gray, flow_gray, boxes)
+
+                # 采样步长和幅值阈值按参考帧宽换算到分析分辨率，运动矢量只采样一次
+                unit, step, mag_threshold = flow_sampling_params(flow_gray.shape[1] if self.flow_width else None)
+
+                if regions is None:
+                    flow, mag, ang, motion_vectors = self._compute_flow(
+                        prev_flow_gray, flow_gray, step, mag_threshold)
+                    mean_mag, max_mag = np.mean(mag), np.max(mag)
+                else:
+                    flow, mag, ang, motion_vectors, mean_mag, max_mag = self._compute_region_flow(
+                        prev_flow_gray, flow_gray, regions, step, mag_threshold)
+                    features['flow_regions'] = [tuple(int(round(v / scale)) for v in region)
+                                                for region in regions]
+
+                if self.flow_width:
+                    # 幅值换算到参考帧宽，运动矢量坐标换算回输入帧
+                    motion_vectors['x'] = np.round(motion_vectors['x'] / scale)
+                    motion_vectors['y'] = np.round(motion_vectors['y'] / scale)
+                    for name in ('fx', 'fy', 'mag'):
+                        motion_vectors[name] *= unit
+                    mean_mag, max_mag = mean_mag * unit, max_mag * unit
                 features[FeatureType.OPTICAL_FLOW.value] = flow
                 
-                # 计算光流统计信息
-                mag, ang = cv2.cartToPolar(flow[..., 0], flow[..., 1])
+                # 计算光流统计信息（flow/flow_magnitude/flow_angle 为分析分辨率的数组，单位为分析分辨率像素，
+                # 乘以 flow_unit 换算到与 flow_mean_magnitude、motion_vectors 相同的单位）
                 features['flow_magnitude'] = mag
+                features['flow_unit'] = unit
                 features['flow_angle'] = ang
-                features['flow_mean_magnitude'] = np.mean(mag)
-                features['flow_max_magnitude'] = np.max(mag)
-                
-                # 计算运动矢量
-                motion_vectors = []
-                step = 16  # 采样步长
-                for y in range(0, gray.shape[0], step):
-                    for x in range(0, gray.shape[1], step):
-                        fx, fy = flow[y, x]
-                        if mag[y, x] > 1.0:  # 只保留显著运动
-                            motion_vectors.append((x, y, fx, fy, mag[y, x]))
+                features['flow_mean_magnitude'] = mean_mag
+                features['flow_max_magnitude'] = max_mag
                 features['motion_vectors'] = motion_vectors
+                features['flow_scale'] = scale
+                # 每个运动矢量代表 step×step 的采样面积，按分析帧面积归一化
+                features['motion_area_ratio'] = min(
+                    1.0, len(motion_vectors) * step * step / (flow_gray.shape[0] * flow_gray.shape[1]))
                 
                 # 调试输出
                 # print(f"[光流Farneback] 帧: {self.frame_count}, motion_vectors: {len(motion_vectors)}, mean_mag: {features['flow_mean_magnitude']:.2f}, max_mag: {features['flow_max_magnitude']:.2f}")
@@ -167,15 +356,19 @@ class MotionFeatureManager:
                         features[FeatureType.OPTICAL_FLOW.value] = (good_old, good_new)
                         
                         # 计算运动矢量
-                        motion_vectors = []
+                        motion_vectors = np.empty(0, dtype=MOTION_VECTOR_DTYPE)
                         if len(good_old) > 0:
                             # 计算位移向量
                             displacements = good_new - good_old
                             magnitudes = np.sqrt(displacements[:, 0]**2 + displacements[:, 1]**2)
                             
-                            for i, ((x1, y1), (x2, y2), mag) in enumerate(zip(good_old, good_new, magnitudes)):
-                                if mag > 1.0:  # 只保留显著运动
-                                    motion_vectors.append((int(x1), int(y1), x2-x1, y2-y1, mag))
+                            mask = magnitudes > 1.0  # 只保留显著运动
+                            motion_vectors = np.empty(int(mask.sum()), dtype=MOTION_VECTOR_DTYPE)
+                            motion_vectors['x'] = good_old[mask, 0].astype(np.int32)
+                            motion_vectors['y'] = good_old[mask, 1].astype(np.int32)
+                            motion_vectors['fx'] = displacements[mask, 0]
+                            motion_vectors['fy'] = displacements[mask, 1]
+                            motion_vectors['mag'] = magnitudes[mask]
                             
                             features['flow_mean_magnitude'] = np.mean(magnitudes)
                             features['flow_max_magnitude'] = np.max(magnitudes)
@@ -193,6 +386,7 @@ class MotionFeatureManager:
                     self.prev_points = cv2.goodFeaturesToTrack(gray, **self.feature_params)
             
             features['flow_extraction_time'] = time.time() - start_time
+            self.metrics.observe('flow', features['flow_extraction_time'])
         
         # 提取运动历史
         if self.use_motion_history:
@@ -304,9 +498,87 @@ class MotionFeatureManager:
         
         # 更新前一帧
         self.prev_gray = gray.copy()
+        self.prev_flow_gray = self.prev_gray if flow_gray is gray else flow_gray
         
         return features
     
+    def _analysis_gray(self, gray):
+        """缩小到光流分析宽度（不放大）
+
+        Returns:
+            tuple: (分析用灰度图, 分析分辨率相对输入帧的缩放比例)
+        """
+        width = gray.shape[1]
+        if not self.flow_width or width <= self.flow_width:
+            return gray, 1.0
+        scale = self.flow_width / width
+        size = (int(self.flow_width), max(1, int(round(gray.shape[0] * scale))))
+        return cv2.resize(gray, size, interpolation=cv2.INTER_AREA), scale
+
+    def _compute_flow(self, prev_gray, gray, step=MOTION_VECTOR_STEP, mag_threshold=1.0):
+        """计算一对灰度图的Farneback光流，有进程池时在子进程中计算
+
+        step 为 None 时不采样运动矢量
+        """
+        # 前一帧由本管理器持有并随任务一起提交，工作进程保持无状态
+        if self.flow_pool is not None and self.flow_pool.accepts(gray.shape):
+            flow, mag, ang, motion_vectors = self.flow_pool.compute(prev_gray, gray)
+            if step is not None and (step, mag_threshold) != (self.flow_pool.step, self.flow_pool.mag_threshold):
+                motion_vectors = sample_motion_vectors(flow, mag, step, mag_threshold)
+            return flow, mag, ang, motion_vectors
+        return compute_farneback_flow(prev_gray, gray, self.farneback_params, step, mag_threshold)
+
+    def _gate_regions(self, prev_gray, gray, person_boxes=None):
+        """确定需要计算光流的区域
+
+        Returns:
+            list 或 None: 合并后的矩形列表（画面静止时为空列表）；
+            区域总面积超过 roi_max_fraction 时返回None，表示计算整帧光流
+        """
+        regions = find_active_regions(prev_gray, gray, self.gate_threshold)
+        if not regions:
+            return []
+        if person_boxes is not None:
+            regions.extend(tuple(int(v) for v in box[:4]) for box in person_boxes)
+        regions = merge_regions(regions, gray.shape, self.roi_padding)
+        area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions)
+        if area > self.roi_max_fraction * gray.shape[0] * gray.shape[1]:
+            return None
+        return regions
+
+    def _compute_region_flow(self, prev_gray, gray, regions, step=MOTION_VECTOR_STEP, mag_threshold=1.0):
+        """只在各区域内计算光流，结果写回整帧大小的数组（区域外为0）
+
+        幅值均值按整帧面积计算，与整帧光流的统计口径一致；运动矢量在整帧的同一采样网格上采样。
+        画面静止（regions 为空）时直接返回共用的只读全零数组和空运动矢量，不分配也不采样。
+
+        Returns:
+            tuple: (flow, mag, ang, motion_vectors, mean_magnitude, max_magnitude)
+        """
+        h, w = gray.shape[:2]
+        if not regions:
+            if self.static_flow is None or self.static_flow[1].shape != (h, w):
+                zeros = np.zeros((h, w, 3), dtype=np.float32)
+                zeros.setflags(write=False)
+                self.static_flow = (zeros[..., :2], zeros[..., 2], zeros[..., 2])
+            flow, mag, ang = self.static_flow
+            return (flow, mag, ang, np.empty(0, dtype=MOTION_VECTOR_DTYPE),
+                    np.float32(0.0), np.float32(0.0))
+        flow = np.zeros((h, w, 2), dtype=np.float32)
+        mag = np.zeros((h, w), dtype=np.float32)
+        ang = np.zeros((h, w), dtype=np.float32)
+        total, max_mag = 0.0, 0.0
+        for x1, y1, x2, y2 in regions:
+            crop_flow, crop_mag, crop_ang, _ = self._compute_flow(
+                np.ascontiguousarray(prev_gray[y1:y2, x1:x2]), np.ascontiguousarray(gray[y1:y2, x1:x2]), None)
+            flow[y1:y2, x1:x2] = crop_flow
+            mag[y1:y2, x1:x2] = crop_mag
+            ang[y1:y2, x1:x2] = crop_ang
+            total += float(crop_mag.sum(dtype=np.float64))
+            max_mag = max(max_mag, float(crop_mag.max()))
+        motion_vectors = sample_motion_vectors(flow, mag, step, mag_threshold)
+        return flow, mag, ang, motion_vectors, np.float32(total / (h * w)), np.float32(max_mag)
+
     def visualize_features(self, frame, features):
         """可视化提取的特征
         
@@ -398,6 +670,7 @@ class MotionFeatureManager:
     def reset(self):
         """重置状态"""
         self.prev_gray = None
+        self.prev_flow_gray = None
         self.motion_history = None
         if self.use_background_sub:
             self.bg_subtractor = cv2.createBackgroundSubtractorMOG2(
@@ -4,6 +4,8 @@ import torch
 import logging
 from typing import Dict, List, Tuple, Optional, Union, Any
 
+from tracking_engine import TrackingEngine
+
 
 class Detection:
     """表示检测到的目标对象的类。"""
@@ -455,13 +457,17 @@ class CentroidTracker(ObjectTracker):
         self.max_disappeared = max_disappeared
         self.max_distance = max_distance
         
-        # Initialize ID counter
-        self.next_object_id = 0
-        
-        # Track dictionaries
-        self.objects = {}  # ID -> centroid
-        self.disappeared = {}  # ID -> number of frames disappeared
-        self.object_data = {}  # ID -> detection data
+        # Centroid distance + optimal assignment; IDs start at 0, every track is confirmed immediately
+        self.engine = TrackingEngine(
+            iou_threshold=None,
+            distance_threshold=max_distance,
+            recent_frames=None,
+            min_hits=1,
+            max_missing=max_disappeared,
+            tentative_max_missing=max_disappeared,
+            use_motion=True,
+            first_id=0
+        )
         
         self.is_initialized = True
     
@@ -482,6 +488,10 @@ class CentroidTracker(ObjectTracker):
         """
         Update object tracks with new detections.
         
+        Detections are matched to the Kalman-predicted positions of existing tracks with a
+        vectorized centroid distance matrix and optimal (Hungarian) assignment, so each
+        detection is assigned to at most one track.
+        
         Args:
             detections: List of detection dictionaries
             frame: Current frame (not used in centroid tracker)
@@ -489,121 +499,30 @@ class CentroidTracker(ObjectTracker):
         Returns:
             List of track dictionaries
         """
-        # If no detections, increment disappeared count for all objects
-        if len(detections) == 0:
-            for object_id in list(self.disappeared.keys()):
-                self.disappeared[object_id] += 1
-                
-                # Deregister if object has disappeared for too long
-                if self.disappeared[object_id] > self.max_disappeared:
-                    self._deregister(object_id)
-            
-            # Return current tracks
-            return self._get_tracks()
-        
-        # Initialize centroids for current detections
-        centroids = []
-        for detection in detections:
-            centroid = self._get_centroid(detection['box'])
-            centroids.append(centroid)
-        
-        # If no existing objects, register all detections
-        if len(self.objects) == 0:
-            for i, (centroid, detection) in enumerate(zip(centroids, detections)):
-                self._register(centroid, detection)
-        
-        # Otherwise, match detections to existing objects
-        else:
-            # Get existing object IDs and centroids
-            object_ids = list(self.objects.keys())
-            object_centroids = list(self.objects.values())
-            
-            # Calculate distances between existing objects and new detections
-            distances = np.zeros((len(object_centroids), len(centroids)))
-            for i, object_centroid in enumerate(object_centroids):
-                for j, centroid in enumerate(centroids):
-                    distances[i, j] = np.sqrt(
-                        (object_centroid[0] - centroid[0]) ** 2 +
-                        (object_centroid[1] - centroid[1]) ** 2
-                    )
-            
-            # Find the minimum distance for each row (existing object)
-            # and sort by minimum distance
-            rows = distances.min(axis=1).argsort()
-            
-            # Find the minimum distance for each column (detection)
-            cols = distances.argmin(axis=0)
-            
-            # Keep track of which rows and columns have been matched
-            used_rows = set()
-            used_cols = set()
-            
-            # Match objects to detections
-            for row in rows:
-                # Get the column with the minimum distance for this row
-                col = distances[row].argmin()
-                
-                # If the column has been used or the distance is too large, skip
-                if col in used_cols or distances[row, col] > self.max_distance:
-                    continue
-                
-                # Get the object ID for this row
-                object_id = object_ids[row]
-                
-                # Update the object with the new centroid and detection data
-                self.objects[object_id] = centroids[col]
-                self.object_data[object_id] = detections[col]
-                self.disappeared[object_id] = 0
-                
-                # Mark row and column as used
-                used_rows.add(row)
-                used_cols.add(col)
-            
-            # Handle unused rows (disappeared objects)
-            for row in range(len(object_ids)):
-                if row not in used_rows:
-                    object_id = object_ids[row]
-                    self.disappeared[object_id] += 1
-                    
-                    # Deregister if object has disappeared for too long
-                    if self.disappeared[object_id] > self.max_disappeared:
-                        self._deregister(object_id)
-            
-            # Handle unused columns (new detections)
-            for col in range(len(centroids)):
-                if col not in used_cols:
-                    self._register(centroids[col], detections[col])
+        self.engine.update([detection['box'] for detection in detections], data=detections)
         
         # Return current tracks
         return self._get_tracks()
     
-    def _register(self, centroid: Tuple[int, int], detection: Dict[str, Any]):
-        """
-        Register a new object.
-        
-        Args:
-            centroid: Centroid coordinates (x, y)
-            detection: Detection dictionary
-        """
-        # Assign new ID and store object data
-        self.objects[self.next_object_id] = centroid
-        self.disappeared[self.next_object_id] = 0
-        self.object_data[self.next_object_id] = detection
-        
-        # Increment ID counter
-        self.next_object_id += 1
+    @property
+    def next_object_id(self) -> int:
+        """ID that will be assigned to the next new object."""
+        return self.engine.next_id
     
-    def _deregister(self, object_id: int):
-        """
-        Deregister an object.
-        
-        Args:
-            object_id: Object ID to deregister
-        """
-        # Remove object from dictionaries
-        del self.objects[object_id]
-        del self.disappeared[object_id]
-        del self.object_data[object_id]
+    @property
+    def objects(self) -> Dict[int, Tuple[int, int]]:
+        """ID -> centroid"""
+        return {object_id: track.centroid() for object_id, track in self.engine.tracks.items()}
+    
+    @property
+    def disappeared(self) -> Dict[int, int]:
+        """ID -> number of frames disappeared"""
+        return {object_id: track.missing for object_id, track in self.engine.tracks.items()}
+    
+    @property
+    def object_data(self) -> Dict[int, Dict[str, Any]]:
+        """ID -> detection data"""
+        return {object_id: track.data for object_id, track in self.engine.tracks.items()}
     
     def _get_tracks(self) -> List[Dict[str, Any]]:
         """
@@ -614,31 +533,28 @@ class CentroidTracker(ObjectTracker):
         """
         tracks = []
         
-        for object_id in self.objects.keys():
+        for object_id, track in self.engine.tracks.items():
             # Get detection data
-            detection = self.object_data[object_id]
+            detection = track.data
             
             # Create track dictionary
-            track = {
+            track_dict = {
                 'id': object_id,
                 'box': detection['box'],
                 'score': detection['score'],
                 'class_id': detection['class_id'],
                 'class_name': detection['class_name'],
-                'age': self.max_disappeared - self.disappeared[object_id],
-                'centroid': self.objects[object_id]
+                'age': self.max_disappeared - track.missing,
+                'centroid': track.centroid()
             }
             
-            tracks.append(track)
+            tracks.append(track_dict)
         
         return tracks
     
     def reset(self):
         """Reset the tracker state."""
-        self.objects = {}
-        self.disappeared = {}
-        self.object_data = {}
-        self.next_object_id = 0
+        self.engine.reset()
 
 
 class ObjectDetectionAndTracking:
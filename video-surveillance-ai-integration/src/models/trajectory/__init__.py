@@ -6,14 +6,14 @@
 用于分析和预测运动轨迹
 """
 
-from .trajectory import Trajectory
+from .trajectory import ObjectTrajectory
+from .trajectory_store import TrajectoryStore
 from .trajectory_manager import TrajectoryManager
-from .trajectory_analysis import TrajectoryAnalyzer
 from .interaction_detector import InteractionDetector
 
 __all__ = [
-    'Trajectory',
+    'ObjectTrajectory',
+    'TrajectoryStore',
     'TrajectoryManager',
-    'TrajectoryAnalyzer',
     'InteractionDetector'
 ] 
\ No newline at end of file
@@ -2,6 +2,8 @@ import numpy as np
 import logging
 from typing import Dict, List, Tuple, Set, Any
 
+from pair_analysis import candidate_pairs
+
 
 class InteractionDetector:
     """基于对象轨迹检测对象之间的交互。"""
@@ -36,61 +38,57 @@ class InteractionDetector:
         Returns:
             检测到的交互的字典
         """
-        # 检查所有对象对
+        # 网格近邻搜索找到距离小于阈值的对象对，不再逐对计算
         current_interacting_pairs = set()
+        object_ids, _, (idx1, idx2), distances = self._close_pairs(object_positions)
         
-        # 找到接近的对象对
-        object_ids = list(object_positions.keys())
-        for i, obj_id1 in enumerate(object_ids):
-            pos1 = object_positions[obj_id1]
+        for i, j, distance in zip(idx1, idx2, distances):
+            obj_id1, obj_id2 = object_ids[i], object_ids[j]
             
-            for j in range(i + 1, len(object_ids)):
-                obj_id2 = object_ids[j]
-                pos2 = object_positions[obj_id2]
-                
-                # 计算距离
-                dx = pos1[0] - pos2[0]
-                dy = pos1[1] - pos2[1]
-                distance = np.sqrt(dx*dx + dy*dy)
-                
-                # 确定对键（总是按较小的ID排序）
-                pair = (min(obj_id1, obj_id2), max(obj_id1, obj_id2))
-                
-                if distance < self.distance_threshold:
-                    current_interacting_pairs.add(pair)
-                    
-                    # 更新计数
-                    if pair in self.interaction_counts:
-                        self.interaction_counts[pair] += 1
-                    else:
-                        self.interaction_counts[pair] = 1
-                    
-                    # 检查是否达到交互阈值
-                    if self.interaction_counts[pair] >= self.count_threshold:
-                        self.detected_interactions[pair] = {
-                            'distance': distance,
-                            'count': self.interaction_counts[pair],
-                            'position1': pos1,
-                            'position2': pos2
-                        }
-                else:
-                    # 如果对象距离较远，则减少计数
-                    if pair in self.interaction_counts:
-                        self.interaction_counts[pair] -= 1
-                        if self.interaction_counts[pair] <= 0:
-                            self.interaction_counts.pop(pair, None)
-                            self.detected_interactions.pop(pair, None)
-        
-        # 移除当前未检测到的对
+            # 确定对键（总是按较小的ID排序）
+            pair = (min(obj_id1, obj_id2), max(obj_id1, obj_id2))
+            current_interacting_pairs.add(pair)
+            
+            # 更新计数
+            self.interaction_counts[pair] = self.interaction_counts.get(pair, 0) + 1
+            
+            # 检查是否达到交互阈值
+            if self.interaction_counts[pair] >= self.count_threshold:
+                self.detected_interactions[pair] = {
+                    'distance': float(distance),
+                    'count': self.interaction_counts[pair],
+                    'position1': object_positions[obj_id1],
+                    'position2': object_positions[obj_id2]
+                }
+        
+        # 距离较远的对减少2次计数（原逐对循环中减1，移除未检测到的对时再减1），当前未检测到的对减1
         for pair in list(self.interaction_counts.keys()):
             if pair not in current_interacting_pairs:
-                self.interaction_counts[pair] -= 1
+                both_visible = pair[0] in object_positions and pair[1] in object_positions
+                self.interaction_counts[pair] -= 2 if both_visible else 1
                 if self.interaction_counts[pair] <= 0:
                     self.interaction_counts.pop(pair, None)
                     self.detected_interactions.pop(pair, None)
         
         return self.detected_interactions
     
+    def _close_pairs(self, object_positions):
+        """
+        找出距离小于 distance_threshold 的对象对。
+        
+        Args:
+            object_positions: 对象ID到位置（x, y）的字典
+            
+        Returns:
+            (对象ID列表, 位置数组, (索引i数组, 索引j数组), 距离数组)
+        """
+        object_ids = list(object_positions.keys())
+        positions = np.array([object_positions[obj_id][:2] for obj_id in object_ids], dtype=np.float64).reshape(-1, 2)
+        idx1, idx2 = candidate_pairs(np.hstack([positions, positions]), self.distance_threshold / 2)
+        distances = np.linalg.norm(positions[idx1] - positions[idx2], axis=1)
+        close = distances < self.distance_threshold
+        return object_ids, positions, (idx1[close], idx2[close]), distances[close]
+    
     def get_interactions(self):
         """
         获取当前检测到的交互。
@@ -120,22 +118,10 @@ class InteractionDetector:
         adjacency = {obj_id: set() for obj_id in object_positions}
         
         # 找到接近的对象对
-        object_ids = list(object_positions.keys())
-        for i, obj_id1 in enumerate(object_ids):
-            pos1 = object_positions[obj_id1]
-            
-            for j in range(i + 1, len(object_ids)):
-                obj_id2 = object_ids[j]
-                pos2 = object_positions[obj_id2]
-                
-                # 计算距离
-                dx = pos1[0] - pos2[0]
-                dy = pos1[1] - pos2[1]
-                distance = np.sqrt(dx*dx + dy*dy)
-                
-                if distance < self.distance_threshold:
-                    adjacency[obj_id1].add(obj_id2)
-                    adjacency[obj_id2].add(obj_id1)
+        object_ids, _, (idx1, idx2), _ = self._close_pairs(object_positions)
+        for i, j in zip(idx1, idx2):
+            adjacency[object_ids[i]].add(object_ids[j])
+            adjacency[object_ids[j]].add(object_ids[i])
         
         # 找到连通分量
         visited = set()
@@ -1,11 +1,21 @@
 import numpy as np
 import time
 from typing import Dict, List, Tuple, Optional, Any
+from collections import deque
 from models.motion.motion_features import MotionFeature
+from models.trajectory.trajectory_store import RingBuffer
 
 
 class ObjectTrajectory:
-    """Class for storing and analyzing object trajectories."""
+    """Class for storing and analyzing object trajectories.
+    
+    History is kept in fixed-size ring buffers, so memory per object does not grow
+    with tracking time; statistics are updated incrementally on every update.
+    """
+    
+    __slots__ = ('_positions', '_velocities', '_boxes', 'class_names', 'motion_features', 'max_history',
+                 'last_update_time', 'avg_speed', 'max_speed', 'direction_changes', 'area_covered',
+                 'behavior_history', '_velocity_total')
     
     def __init__(self, max_history: int = 60):
         """
@@ -14,11 +24,11 @@ class ObjectTrajectory:
         Args:
             max_history: Maximum number of positions to store
         """
-        self.positions = []  # List of (x, y, frame_idx)
-        self.velocities = []  # List of (vx, vy, frame_idx)
-        self.boxes = []  # List of (x1, y1, x2, y2, frame_idx)
-        self.class_names = []  # List of class names
-        self.motion_features = []  # List of motion features
+        self._positions = RingBuffer(max_history, 3)  # (x, y, frame_idx)
+        self._velocities = RingBuffer(max_history, 3)  # (vx, vy, frame_idx)
+        self._boxes = RingBuffer(max_history, 5)  # (x1, y1, x2, y2, frame_idx)
+        self.class_names = deque(maxlen=max_history)  # Class names
+        self.motion_features = deque(maxlen=max_history)  # Motion features
         self.max_history = max_history
         self.last_update_time = 0
         
@@ -27,9 +37,25 @@ class ObjectTrajectory:
         self.max_speed = 0
         self.direction_changes = 0
         self.area_covered = 0
+        self._velocity_total = 0
         
         # Analysis results
-        self.behavior_history = []  # List of behavior analysis results
+        self.behavior_history = deque(maxlen=max_history)  # Behavior analysis results
+    
+    @property
+    def positions(self) -> List[Tuple[float, float, int]]:
+        """Stored positions as [(x, y, frame_idx), ...], oldest first."""
+        return [(x, y, int(f)) for x, y, f in self._positions.ordered().tolist()]
+    
+    @property
+    def velocities(self) -> List[Tuple[float, float, int]]:
+        """Stored velocities as [(vx, vy, frame_idx), ...], oldest first."""
+        return [(vx, vy, int(f)) for vx, vy, f in self._velocities.ordered().tolist()]
+    
+    @property
+    def boxes(self) -> List[Tuple[float, float, float, float, int]]:
+        """Stored boxes as [(x1, y1, x2, y2, frame_idx), ...], oldest first."""
+        return [(x1, y1, x2, y2, int(f)) for x1, y1, x2, y2, f in self._boxes.ordered().tolist()]
     
     def update(self, track: Dict[str, Any], motion_features: List[MotionFeature], frame_idx: int):
         """
@@ -45,19 +71,20 @@ class ObjectTrajectory:
         class_name = track['class_name']
         
         # Add box and class name
-        self.boxes.append((box[0], box[1], box[2], box[3], frame_idx))
+        self._boxes.append((box[0], box[1], box[2], box[3], frame_idx))
         self.class_names.append(class_name)
         
         # Calculate center position
         cx = (box[0] + box[2]) / 2
         cy = (box[1] + box[3]) / 2
         
-        # Add position
-        self.positions.append((cx, cy, frame_idx))
+        # Previous position (if any) before adding the new one
+        prev = self._positions.last(1)[0].copy() if len(self._positions) else None
+        self._positions.append((cx, cy, frame_idx))
         
         # Calculate velocity if we have previous positions
-        if len(self.positions) > 1:
-            prev_x, prev_y, prev_frame = self.positions[-2]
+        if prev is not None:
+            prev_x, prev_y, prev_frame = prev
             
             # Calculate time difference in frames
             frame_diff = frame_idx - prev_frame
@@ -67,8 +94,11 @@ class ObjectTrajectory:
                 vx = (cx - prev_x) / frame_diff
                 vy = (cy - prev_y) / frame_diff
                 
+                prev_velocity = self._velocities.last(1)[0].copy() if len(self._velocities) else None
+                
                 # Add velocity
-                self.velocities.append((vx, vy, frame_idx))
+                self._velocities.append((vx, vy, frame_idx))
+                self._velocity_total += 1
                 
                 # Update statistics
                 speed = np.sqrt(vx*vx + vy*vy)
@@ -76,12 +106,13 @@ class ObjectTrajectory:
                 # Update max speed
                 self.max_speed = max(self.max_speed, speed)
                 
-                # Update average speed
-                self.avg_speed = (self.avg_speed * (len(self.velocities) - 1) + speed) / len(self.velocities)
+                # Update average speed (running mean over at most max_history + 1 samples, as before)
+                n = min(self._velocity_total, self.max_history + 1)
+                self.avg_speed = (self.avg_speed * (n - 1) + speed) / n
                 
                 # Check for direction change
-                if len(self.velocities) > 1:
-                    prev_vx, prev_vy, _ = self.velocities[-2]
+                if prev_velocity is not None:
+                    prev_vx, prev_vy, _ = prev_velocity
                     
                     # Calculate dot product to check direction change
                     dot = prev_vx * vx + prev_vy * vy
@@ -105,26 +136,10 @@ class ObjectTrajectory:
         # Update last update time
         self.last_update_time = time.time()
         
-        # Trim history if needed
-        if len(self.positions) > self.max_history:
-            self.positions.pop(0)
-        if len(self.velocities) > self.max_history:
-            self.velocities.pop(0)
-        if len(self.boxes) > self.max_history:
-            self.boxes.pop(0)
-        if len(self.class_names) > self.max_history:
-            self.class_names.pop(0)
-        if len(self.motion_features) > self.max_history:
-            self.motion_features.pop(0)
-        
-        # Update area covered
-        if len(self.positions) > 1:
-            x_values = [p[0] for p in self.positions]
-            y_values = [p[1] for p in self.positions]
-            
-            width = max(x_values) - min(x_values)
-            height = max(y_values) - min(y_values)
-            
+        # Update area covered (bounding box of the stored positions)
+        if len(self._positions) > 1:
+            points = self._positions.ordered()[:, :2]
+            width, height = points.max(axis=0) - points.min(axis=0)
             self.area_covered = width * height
     
     def get_features(self) -> Dict[str, Any]:
@@ -139,14 +154,15 @@ class ObjectTrajectory:
             'max_speed': self.max_speed,
             'direction_changes': self.direction_changes,
             'area_covered': self.area_covered,
-            'trajectory_length': len(self.positions),
+            'trajectory_length': len(self._positions),
             'class_name': self.class_names[-1] if self.class_names else 'unknown'
         }
         
         # Add velocity features if available
-        if self.velocities:
-            vx_values = [v[0] for v in self.velocities]
-            vy_values = [v[1] for v in self.velocities]
+        if len(self._velocities):
+            velocities = self._velocities.ordered()
+            vx_values = velocities[:, 0]
+            vy_values = velocities[:, 1]
             
             # Calculate average velocity components
             features['avg_vx'] = np.mean(vx_values)
@@ -157,9 +173,9 @@ class ObjectTrajectory:
             features['var_vy'] = np.var(vy_values)
             
             # Calculate acceleration
-            if len(self.velocities) > 1:
-                acc_x = np.diff([v[0] for v in self.velocities])
-                acc_y = np.diff([v[1] for v in self.velocities])
+            if len(velocities) > 1:
+                acc_x = np.diff(vx_values)
+                acc_y = np.diff(vy_values)
                 
                 features['max_acc'] = max(np.sqrt(acc_x**2 + acc_y**2))
                 features['avg_acc'] = np.mean(np.sqrt(acc_x**2 + acc_y**2))
@@ -173,8 +189,5 @@ class ObjectTrajectory:
         Args:
             result: Behavior analysis result
         """
+        # Oldest results are dropped once max_history is reached
         self.behavior_history.append(result)
-        
-        # Trim history if needed
-        if len(self.behavior_history) > self.max_history:
-            self.behavior_history.pop(0) 
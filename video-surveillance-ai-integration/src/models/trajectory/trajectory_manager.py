@@ -5,6 +5,7 @@ import numpy as np
 from models.motion.motion_features import MotionFeature
 from models.trajectory.trajectory import ObjectTrajectory
 from models.trajectory.interaction_detector import InteractionDetector
+from models.trajectory.trajectory_store import TrajectoryStore
 
 
 class TrajectoryManager:
@@ -21,7 +22,7 @@ class TrajectoryManager:
             interaction_distance: Distance threshold for interaction detection
             interaction_threshold: Number of frames for interaction confirmation
         """
-        self.trajectories = {}  # Object ID -> trajectory data
+        self.store = TrajectoryStore(max_length=max_trajectory_length)  # Object ID -> trajectory arrays
         self.active_object_ids = set()
         self.disappeared_counts = {}  # Object ID -> number of frames disappeared
         
@@ -65,8 +66,7 @@ class TrajectoryManager:
                 # Remove if disappeared for too long
                 if self.disappeared_counts[obj_id] > self.max_disappeared:
                     del self.disappeared_counts[obj_id]
-                    if obj_id in self.trajectories:
-                        del self.trajectories[obj_id]
+                    self.store.remove(obj_id)
             else:
                 self.disappeared_counts[obj_id] = 0
                 self.active_object_ids.add(obj_id)
@@ -77,103 +77,33 @@ class TrajectoryManager:
                 self.disappeared_counts[obj_id] = 0
                 self.active_object_ids.add(obj_id)
         
-        # Update trajectories
+        # Collect center positions (one entry per object ID, the last one wins)
+        updates = {}
         for obj in tracked_objects:
             if not hasattr(obj, 'id'):
                 continue
-                
-            obj_id = obj.id
             
-            # Get center position
-            if hasattr(obj, 'x1') and hasattr(obj, 'y1') and hasattr(obj, 'x2') and hasattr(obj, 'y2'):
-                center_x = (obj.x1 + obj.x2) / 2
-                center_y = (obj.y1 + obj.y2) / 2
-                position = (center_x, center_y)
-            else:
-                # Skip if we can't determine position
+            # Skip if we can't determine position
+            if not (hasattr(obj, 'x1') and hasattr(obj, 'y1') and hasattr(obj, 'x2') and hasattr(obj, 'y2')):
                 continue
             
-            # Initialize trajectory if new
-            if obj_id not in self.trajectories:
-                self.trajectories[obj_id] = {
-                    'positions': [position],
-                    'timestamps': [time.time()],
-                    'class_name': getattr(obj, 'class_name', None),
-                    'confidence': getattr(obj, 'confidence', 0),
-                    'speeds': [],
-                    'direction_changes': 0,
-                    'is_stationary': False,
-                    'area_covered': 0
-                }
-            else:
-                # Add to existing trajectory
-                self.trajectories[obj_id]['positions'].append(position)
-                self.trajectories[obj_id]['timestamps'].append(time.time())
-                
-                # Update class name and confidence if available
-                if hasattr(obj, 'class_name'):
-                    self.trajectories[obj_id]['class_name'] = obj.class_name
-                if hasattr(obj, 'confidence'):
-                    self.trajectories[obj_id]['confidence'] = obj.confidence
-                
-                # Limit trajectory length
-                if len(self.trajectories[obj_id]['positions']) > self.max_trajectory_length:
-                    self.trajectories[obj_id]['positions'] = self.trajectories[obj_id]['positions'][-self.max_trajectory_length:]
-                    self.trajectories[obj_id]['timestamps'] = self.trajectories[obj_id]['timestamps'][-self.max_trajectory_length:]
-                
-                # Calculate speed
-                if len(self.trajectories[obj_id]['positions']) >= 2:
-                    prev_pos = self.trajectories[obj_id]['positions'][-2]
-                    curr_pos = self.trajectories[obj_id]['positions'][-1]
-                    
-                    dx = curr_pos[0] - prev_pos[0]
-                    dy = curr_pos[1] - prev_pos[1]
-                    distance = np.sqrt(dx*dx + dy*dy)
-                    
-                    dt = self.trajectories[obj_id]['timestamps'][-1] - self.trajectories[obj_id]['timestamps'][-2]
-                    speed = distance / dt if dt > 0 else 0
-                    
-                    self.trajectories[obj_id]['speeds'].append(speed)
-                    
-                    # Limit speed history
-                    if len(self.trajectories[obj_id]['speeds']) > self.max_trajectory_length:
-                        self.trajectories[obj_id]['speeds'] = self.trajectories[obj_id]['speeds'][-self.max_trajectory_length:]
-                    
-                    # Calculate if stationary
-                    avg_speed = np.mean(self.trajectories[obj_id]['speeds'][-min(10, len(self.trajectories[obj_id]['speeds'])):])
-                    self.trajectories[obj_id]['is_stationary'] = avg_speed < 5.0
-                
-                # Calculate direction changes
-                if len(self.trajectories[obj_id]['positions']) >= 3:
-                    p1 = self.trajectories[obj_id]['positions'][-3]
-                    p2 = self.trajectories[obj_id]['positions'][-2]
-                    p3 = self.trajectories[obj_id]['positions'][-1]
-                    
-                    v1 = (p2[0] - p1[0], p2[1] - p1[1])
-                    v2 = (p3[0] - p2[0], p3[1] - p2[1])
-                    
-                    # Calculate angle between vectors
-                    dot_product = v1[0]*v2[0] + v1[1]*v2[1]
-                    mag1 = np.sqrt(v1[0]*v1[0] + v1[1]*v1[1])
-                    mag2 = np.sqrt(v2[0]*v2[0] + v2[1]*v2[1])
-                    
-                    if mag1 > 0 and mag2 > 0:
-                        cos_angle = dot_product / (mag1 * mag2)
-                        # Clamp to [-1, 1] to avoid numerical errors
-                        cos_angle = max(-1, min(1, cos_angle))
-                        angle = np.arccos(cos_angle) * 180 / np.pi
-                        
-                        # Detect significant direction change
-                        if angle > 45:
-                            self.trajectories[obj_id]['direction_changes'] += 1
-                
-                # Calculate area covered
-                if len(self.trajectories[obj_id]['positions']) >= 2:
-                    points = np.array(self.trajectories[obj_id]['positions'])
-                    x_min, y_min = np.min(points, axis=0)
-                    x_max, y_max = np.max(points, axis=0)
-                    
-                    self.trajectories[obj_id]['area_covered'] = (x_max - x_min) * (y_max - y_min)
+            updates[obj.id] = (
+                ((obj.x1 + obj.x2) / 2, (obj.y1 + obj.y2) / 2),
+                getattr(obj, 'class_name', None),
+                getattr(obj, 'confidence', None)
+            )
+        
+        # Append to all trajectories at once; speeds, stationary flags, direction changes
+        # and area covered are updated incrementally inside the store
+        if updates:
+            obj_ids = list(updates.keys())
+            self.store.update(
+                obj_ids,
+                [updates[obj_id][0] for obj_id in obj_ids],
+                timestamp=time.time(),
+                class_names=[updates[obj_id][1] for obj_id in obj_ids],
+                confidences=[updates[obj_id][2] for obj_id in obj_ids]
+            )
         
         # Update interaction detector
         self.interaction_detector.update(self.get_trajectory_positions())
@@ -189,8 +119,10 @@ class TrajectoryManager:
         """
         positions = {}
         for obj_id in self.active_object_ids:
-            if obj_id in self.trajectories and self.trajectories[obj_id]['positions']:
-                positions[obj_id] = self.trajectories[obj_id]['positions'][-1]
+            if obj_id in self.store:
+                position = self.store.last_position(obj_id)
+                if position is not None:
+                    positions[obj_id] = position
         return positions
     
     def get_active_trajectories(self):
@@ -200,14 +132,7 @@ class TrajectoryManager:
         Returns:
             List of active trajectories
         """
-        active_trajectories = []
-        for obj_id in self.active_object_ids:
-            if obj_id in self.trajectories:
-                traj = self.trajectories[obj_id].copy()
-                traj['id'] = obj_id
-                traj['position'] = traj['positions'][-1] if traj['positions'] else None
-                active_trajectories.append(traj)
-        return active_trajectories
+        return [self.store.as_dict(obj_id) for obj_id in self.active_object_ids if obj_id in self.store]
     
     def get_interaction_detector(self):
         """
@@ -228,16 +153,13 @@ class TrajectoryManager:
         Returns:
             Object trajectory or None if not found
         """
-        if object_id in self.trajectories:
-            traj = self.trajectories[object_id].copy()
-            traj['id'] = object_id
-            traj['position'] = traj['positions'][-1] if traj['positions'] else None
-            return traj
+        if object_id in self.store:
+            return self.store.as_dict(object_id)
         return None
     
     def reset(self):
         """Reset all trajectories and counts."""
-        self.trajectories = {}
+        self.store.clear()
         self.active_object_ids.clear()
         self.disappeared_counts = {}
         self.interaction_detector.reset() 
\ No newline at end of file
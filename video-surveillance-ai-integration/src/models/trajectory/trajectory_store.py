@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+轨迹存储 - 预分配的数组环形缓冲，替代每条轨迹不断增长再切片的 Python 列表
+
+- RingBuffer：单个对象的定长环形缓冲（ObjectTrajectory 使用）
+- TrajectoryStore：所有轨迹共用一组按行分配的数组（结构体数组），每条轨迹占一行，
+  行内是最近 max_length 帧的位置、时间戳和速度的环形缓冲，轨迹删除后行号复用
+- 速度、是否静止、方向变化次数在写入新位置时按数组增量更新，覆盖面积按整批轨迹一次性归约，
+  不再从列表重新计算
+- 每条轨迹占用的内存固定，与跟踪时长无关
+"""
+
+import time
+import numpy as np
+
+
+class RingBuffer:
+    """定长环形缓冲，每个元素是长度为 width 的一行"""
+
+    __slots__ = ('data', 'count')
+
+    def __init__(self, length, width, dtype=np.float64):
+        self.data = np.zeros((int(length), int(width)), dtype=dtype)
+        self.count = 0  # 累计写入次数
+
+    def __len__(self):
+        return min(self.count, len(self.data))
+
+    def append(self, row):
+        self.data[self.count % len(self.data)] = row
+        self.count += 1
+
+    def last(self, k=1):
+        """最近 k 个元素（按时间顺序），k 超过现有数量时返回全部"""
+        k = min(k, len(self))
+        positions = (self.count - k + np.arange(k)) % len(self.data)
+        return self.data[positions]
+
+    def ordered(self):
+        """全部元素（按时间顺序）"""
+        return self.last(len(self))
+
+    def clear(self):
+        self.count = 0
+
+
+class TrackInfo:
+    """轨迹的非数值属性，数值数据在 TrajectoryStore 的数组中（按 row 索引）"""
+
+    __slots__ = ('obj_id', 'row', 'class_name', 'confidence')
+
+    def __init__(self, obj_id, row, class_name=None, confidence=0):
+        self.obj_id = obj_id
+        self.row = row
+        self.class_name = class_name
+        self.confidence = confidence
+
+
+class TrajectoryStore:
+    """多条轨迹的结构体数组存储"""
+
+    def __init__(self, max_length=60, capacity=64, stationary_speed=5.0, stationary_window=10,
+                 direction_change_degrees=45.0):
+        """
+        Args:
+            max_length (int): 每条轨迹保留的最大点数
+            capacity (int): 初始可容纳的轨迹数，不够时按倍数扩容
+            stationary_speed (float): 最近 stationary_window 个速度的均值低于该值视为静止
+            stationary_window (int): 判断静止所用的速度个数
+            direction_change_degrees (float): 相邻两段位移夹角超过该角度计为一次方向变化
+        """
+        self.max_length = int(max_length)
+        self.stationary_speed = stationary_speed
+        self.stationary_window = min(int(stationary_window), self.max_length)
+        self.direction_change_degrees = direction_change_degrees
+        self.tracks = {}  # 对象ID -> TrackInfo
+        self.free_rows = []
+        self.capacity = 0
+        self._allocate(max(1, int(capacity)))
+
+    def _allocate(self, capacity):
+        """分配（或扩容到）capacity 行，已有数据保留"""
+        L = self.max_length
+        shapes = {
+            'positions': ((capacity, L, 2), np.float64),
+            'timestamps': ((capacity, L), np.float64),
+            'speeds': ((capacity, L), np.float64),
+            'position_count': ((capacity,), np.int64),
+            'speed_count': ((capacity,), np.int64),
+            'last_velocity': ((capacity, 2), np.float64),
+            'direction_changes': ((capacity,), np.int64),
+            'is_stationary': ((capacity,), bool),
+            'area_covered': ((capacity,), np.float64),
+        }
+        old = self.capacity
+        for name, (shape, dtype) in shapes.items():
+            array = np.zeros(shape, dtype=dtype)
+            if old:
+                array[:old] = getattr(self, name)
+            setattr(self, name, array)
+        self.free_rows.extend(range(capacity - 1, old - 1, -1))
+        self.capacity = capacity
+
+    def _new_track(self, obj_id):
+        if not self.free_rows:
+            self._allocate(self.capacity * 2)
+        row = self.free_rows.pop()
+        for name in ('position_count', 'speed_count', 'direction_changes', 'area_covered'):
+            getattr(self, name)[row] = 0
+        self.last_velocity[row] = 0
+        self.is_stationary[row] = False
+        info = TrackInfo(obj_id, row)
+        self.tracks[obj_id] = info
+        return info
+
+    def __contains__(self, obj_id):
+        return obj_id in self.tracks
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def ids(self):
+        return list(self.tracks.keys())
+
+    def update(self, obj_ids, positions, timestamp=None, class_names=None, confidences=None):
+        """
+        写入一帧中多个对象的位置（同一对象在一次调用中只能出现一次）
+
+        Args:
+            obj_ids: 对象ID列表
+            positions: (K, 2) 位置数组
+            timestamp: 时间戳，None 表示当前时间
+            class_names: 可选，与 obj_ids 对应的类别名（None 的项不修改）
+            confidences: 可选，与 obj_ids 对应的置信度（None 的项不修改）
+        """
+        if len(obj_ids) == 0:
+            return
+        timestamp = time.time() if timestamp is None else timestamp
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        rows = np.empty(len(obj_ids), dtype=np.int64)
+        for k, obj_id in enumerate(obj_ids):
+            info = self.tracks.get(obj_id) or self._new_track(obj_id)
+            rows[k] = info.row
+            if class_names is not None and class_names[k] is not None:
+                info.class_name = class_names[k]
+            if confidences is not None and confidences[k] is not None:
+                info.confidence = confidences[k]
+
+        L = self.max_length
+        count = self.position_count[rows]
+        has_prev = count > 0
+        prev_slot = (count - 1) % L
+        prev_pos = self.positions[rows, prev_slot]
+        prev_time = self.timestamps[rows, prev_slot]
+
+        slot = count % L
+        self.positions[rows, slot] = positions
+        self.timestamps[rows, slot] = timestamp
+        self.position_count[rows] = count + 1
+
+        moved = rows[has_prev]
+        if len(moved) == 0:
+            return
+        displacement = positions[has_prev] - prev_pos[has_prev]
+        self._update_speeds(moved, displacement, timestamp - prev_time[has_prev])
+        self._update_direction_changes(moved, displacement, count[has_prev] >= 2)
+        self._update_area(moved)
+
+    def _update_speeds(self, rows, displacement, dt):
+        """追加速度，并用最近 stationary_window 个速度判断是否静止"""
+        distance = np.linalg.norm(displacement, axis=1)
+        speed = np.where(dt > 0, distance / np.where(dt > 0, dt, 1), 0.0)
+        count = self.speed_count[rows]
+        self.speeds[rows, count % self.max_length] = speed
+        count = count + 1
+        self.speed_count[rows] = count
+
+        W = self.stationary_window
+        n = np.minimum(count, W)
+        offsets = np.arange(W)
+        slots = (count[:, None] - W + offsets[None, :]) % self.max_length
+        valid = offsets[None, :] >= (W - n)[:, None]
+        recent = np.where(valid, self.speeds[rows[:, None], slots], 0.0)
+        self.is_stationary[rows] = recent.sum(axis=1) / n < self.stationary_speed
+
+    def _update_direction_changes(self, rows, displacement, has_velocity):
+        """与上一段位移的夹角超过阈值时方向变化次数加1"""
+        previous = self.last_velocity[rows]
+        dot = np.einsum('ij,ij->i', previous, displacement)
+        norms = np.linalg.norm(previous, axis=1) * np.linalg.norm(displacement, axis=1)
+        cos_angle = np.clip(dot / np.where(norms > 0, norms, 1.0), -1, 1)
+        angle = np.arccos(cos_angle) * 180 / np.pi
+        turned = has_velocity & (norms > 0) & (angle > self.direction_change_degrees)
+        self.direction_changes[rows] += turned
+        self.last_velocity[rows] = displacement
+
+    def _update_area(self, rows):
+        """覆盖面积：保留窗口内所有位置的外接矩形面积（整批轨迹一次归约）"""
+        valid = np.arange(self.max_length)[None, :] < self.position_count[rows][:, None]
+        points = self.positions[rows]
+        mins = np.where(valid[..., None], points, np.inf).min(axis=1)
+        maxs = np.where(valid[..., None], points, -np.inf).max(axis=1)
+        extent = maxs - mins
+        self.area_covered[rows] = extent[:, 0] * extent[:, 1]
+
+    def remove(self, obj_id):
+        info = self.tracks.pop(obj_id, None)
+        if info is not None:
+            self.free_rows.append(info.row)
+
+    def clear(self):
+        self.tracks = {}
+        self.free_rows = list(range(self.capacity - 1, -1, -1))
+
+    def _ordered(self, array, row, count):
+        n = min(int(count), self.max_length)
+        return array[row, (count - n + np.arange(n)) % self.max_length]
+
+    def get_positions(self, obj_id):
+        """保留窗口内的位置 (n, 2)，按时间顺序"""
+        info = self.tracks[obj_id]
+        return self._ordered(self.positions, info.row, self.position_count[info.row])
+
+    def get_timestamps(self, obj_id):
+        info = self.tracks[obj_id]
+        return self._ordered(self.timestamps, info.row, self.position_count[info.row])
+
+    def get_speeds(self, obj_id):
+        info = self.tracks[obj_id]
+        return self._ordered(self.speeds, info.row, self.speed_count[info.row])
+
+    def last_position(self, obj_id):
+        """最近一次的位置 (x, y)，没有位置时返回None"""
+        info = self.tracks[obj_id]
+        count = self.position_count[info.row]
+        if count == 0:
+            return None
+        x, y = self.positions[info.row, (count - 1) % self.max_length]
+        return (float(x), float(y))
+
+    def as_dict(self, obj_id):
+        """轨迹的字典形式（与原 TrajectoryManager 轨迹字典的字段一致），列表为拷贝"""
+        info = self.tracks[obj_id]
+        row = info.row
+        return {
+            'id': obj_id,
+            'positions': [tuple(p) for p in self.get_positions(obj_id).tolist()],
+            'timestamps': self.get_timestamps(obj_id).tolist(),
+            'speeds': self.get_speeds(obj_id).tolist(),
+            'position': self.last_position(obj_id),
+            'class_name': info.class_name,
+            'confidence': info.confidence,
+            'direction_changes': int(self.direction_changes[row]),
+            'is_stationary': bool(self.is_stationary[row]),
+            'area_covered': float(self.area_covered[row])
+        }
+
+    def nbytes_per_track(self):
+        """每条轨迹占用的数组字节数（固定值）"""
+        arrays = ('positions', 'timestamps', 'speeds', 'position_count', 'speed_count',
+                  'last_velocity', 'direction_changes', 'is_stationary', 'area_covered')
+        return sum(getattr(self, name).nbytes for name in arrays) // self.capacity
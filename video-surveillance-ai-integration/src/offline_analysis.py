@@ -0,0 +1,515 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+离线加速分析模块 - 对录像文件做批处理分析：不限帧率、不丢帧，长视频切成片段由多个进程并行处理
+
+- 每一帧都按顺序解码和处理（没有 --max_fps 限速，也没有实时模式下落后时的跳帧）；
+  分析节奏与实时系统一致（--process_every、--ai_interval），计时改用视频时间而不是墙上时间
+- 视频按帧数切成 --segment_seconds 长的片段，每个片段往前多解码 --warmup_seconds 的预热帧：
+  预热帧照常做运动分析、检测和跟踪，建立光流、轨迹和打架持续性等状态，但其间产生的告警丢弃
+  （这些帧属于上一个片段，由上一个片段报告）
+- 每个片段在独立进程中使用自己的运动特征管理器、危险行为识别器和检测模型
+- 告警的帧号为源视频中的帧序号，时间为 视频起始时间 + 帧序号 / 帧率；
+  各片段的告警按帧号合并后写入JSONL，可选写入告警数据库
+
+用法:
+    python src/offline_analysis.py --source day.mp4 --workers 4 --output_jsonl day_alerts.jsonl
+    python src/offline_analysis.py --source day.mp4 --enable_ai --start_time "2026-10-17 08:00:00" --db mysql
+"""
+
+import os
+import sys
+import ast
+import json
+import time
+import uuid
+import logging
+import argparse
+import multiprocessing as mp
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from danger_recognizer import DangerRecognizer
+from detection_propagation import DetectionPropagator
+from inference_scheduler import parse_yolo_results
+from models.motion.motion_manager import MotionFeatureManager
+
+# （可选）检测模型，未安装时只做运动分析和不依赖人员框的检测
+try:
+    from ultralytics import YOLO
+    HAS_AI = True
+except ImportError:
+    HAS_AI = False
+
+logger = logging.getLogger("OfflineAnalysis")
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# 视频帧率读取失败时使用的帧率
+DEFAULT_FPS = 25.0
+# 片段长度至少为预热长度的倍数，避免预热开销超过片段本身
+MIN_SEGMENT_WARMUP_RATIO = 4
+
+# 一个片段：index 片段序号，[start, end) 报告告警的帧范围（end 为None表示读到文件末尾），
+# warmup_start 开始解码的帧（start 之前的帧只用于预热）
+Segment = namedtuple('Segment', ['index', 'start', 'end', 'warmup_start'])
+
+
+def plan_segments(total_frames, fps, segment_seconds=300.0, warmup_seconds=5.0, workers=1):
+    """按帧数把视频切成片段
+
+    片段长度取 segment_seconds 和「总帧数 / workers」中较小的一个（让每个进程都有片段可做），
+    但不短于预热长度的 MIN_SEGMENT_WARMUP_RATIO 倍。最后一个片段读到文件末尾，
+    容器记录的总帧数不准确时也不会漏帧。
+
+    Args:
+        total_frames (int): 视频总帧数，未知时（<=0）整个文件作为一个片段
+        fps (float): 视频帧率
+        segment_seconds (float): 片段长度（秒）
+        warmup_seconds (float): 每个片段的预热长度（秒）
+        workers (int): 并行进程数
+
+    Returns:
+        list: Segment 列表
+    """
+    if total_frames <= 0:
+        return [Segment(0, 0, None, 0)]
+    warmup = max(0, int(round(warmup_seconds * fps)))
+    length = max(1, int(round(segment_seconds * fps)))
+    length = min(length, -(-total_frames // max(1, int(workers))))
+    length = max(length, warmup * MIN_SEGMENT_WARMUP_RATIO, 1)
+
+    segments = []
+    for index, start in enumerate(range(0, total_frames, length)):
+        end = start + length if start + length < total_frames else None
+        segments.append(Segment(index, start, end, max(0, start - warmup)))
+    return segments
+
+
+class VideoClock:
+    """视频时间：起始时间 + 帧序号 / 帧率，代替识别器的墙上时钟（停留时间、打架持续时间按视频时间计算）"""
+
+    def __init__(self, start_time, fps):
+        self.start_time = float(start_time)
+        self.fps = float(fps)
+        self.frame_index = 0
+
+    def seek(self, frame_index):
+        self.frame_index = frame_index
+
+    def timestamp(self, frame_index):
+        return self.start_time + frame_index / self.fps
+
+    def __call__(self):
+        return self.timestamp(self.frame_index)
+
+
+def open_video_at(source, frame_index):
+    """打开视频并定位到指定帧；容器不支持精确定位时从头顺序跳过"""
+    cap = cv2.VideoCapture(source)
+    if frame_index <= 0 or not cap.isOpened():
+        return cap
+    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+    if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != frame_index:
+        logger.warning(f"视频无法精确定位到第 {frame_index} 帧，改为顺序跳过")
+        cap.release()
+        cap = cv2.VideoCapture(source)
+        for _ in range(frame_index):
+            if not cap.grab():
+                break
+    return cap
+
+
+def create_danger_recognizer(args, fps):
+    """创建危险行为识别器，配置与实时系统相同（帧率取视频帧率，不保存告警图片）"""
+    danger_recognizer = DangerRecognizer({
+        'feature_count_threshold': args.feature_threshold,
+        'motion_area_threshold': args.area_threshold,
+        'alert_cooldown': args.alert_cooldown,
+        'save_alerts': False,
+        'min_confidence': args.min_confidence,
+        'distance_threshold_m': args.distance_threshold,
+        'dwell_time_threshold_s': args.dwell_time_threshold,
+        'fps': fps
+    })
+    if args.alert_region:
+        try:
+            regions = ast.literal_eval(args.alert_region)
+            if isinstance(regions, list) and len(regions) >= 3:
+                danger_recognizer.add_alert_region(regions, "Alert Zone")
+        except Exception as e:
+            logger.error(f"解析警戒区域失败: {str(e)}")
+    return danger_recognizer
+
+
+class SegmentAnalyzer:
+    """逐帧分析一个片段：运动特征 → AI检测（或传播） → 危险行为识别"""
+
+    def __init__(self, args, fps, start_time, model=None):
+        self.args = args
+        self.fps = fps
+        self.clock = VideoClock(start_time, fps)
+        self.model = model
+        self.motion_manager = MotionFeatureManager(
+            use_optical_flow=True,
+            use_motion_history=args.use_motion_history,
+            optical_flow_method='farneback',
+            roi_gating=args.roi_flow,
+            flow_width=args.flow_width or None
+        )
+        self.danger_recognizer = create_danger_recognizer(args, fps)
+        self.danger_recognizer.clock = self.clock
+        self.propagator = DetectionPropagator() if args.propagate_detections else None
+        self.prev_frame = None
+        self.person_boxes = []
+        self.last_ai_frame = None
+        self.processed_count = 0
+        self.ai_count = 0
+
+    def _prepare(self, frame):
+        """与实时系统的捕获线程相同：竖屏转横屏，按 --process_scale 缩小"""
+        h, w = frame.shape[:2]
+        if h > w:
+            frame = cv2.rotate(frame, cv2.ROTATE_90_COUNTERCLOCKWISE)
+        if self.args.process_scale < 1.0:
+            h, w = frame.shape[:2]
+            frame = cv2.resize(frame, (int(w * self.args.process_scale), int(h * self.args.process_scale)))
+        return frame
+
+    def process(self, frame_index, frame):
+        """处理一帧，返回该帧产生的告警列表"""
+        self.clock.seek(frame_index)
+        frame = self._prepare(frame)
+        prev_frame, self.prev_frame = self.prev_frame, frame
+        if frame_index % self.args.process_every != 0:
+            return []
+        self.processed_count += 1
+        features = self.motion_manager.extract_features(frame, prev_frame, person_boxes=self.person_boxes)
+
+        detections = None
+        run_ai = self.last_ai_frame is None or frame_index - self.last_ai_frame >= self.args.ai_interval
+        if self.propagator is not None and self.propagator.needs_refresh():
+            run_ai = True
+        if self.model is not None and run_ai:
+            detections = parse_yolo_results(self.model(frame, verbose=False), self.args.ai_confidence)
+            self.last_ai_frame = frame_index
+            self.ai_count += 1
+            self.person_boxes = [det['bbox'] for det in detections if str(det.get('class', '')).lower() == 'person']
+            if self.propagator is not None:
+                self.propagator.reset(detections)
+        elif self.propagator is not None:
+            h, w = frame.shape[:2]
+            propagated = self.propagator.propagate(features, (w, h))
+            if propagated:
+                detections = propagated
+                self.person_boxes = [det['bbox'] for det in propagated]
+
+        return self.danger_recognizer.process_frame(frame, features, detections)
+
+
+def _to_builtin(value):
+    """把告警中的 numpy 数值和数组转换为可序列化的 Python 类型"""
+    if isinstance(value, dict):
+        return {key: _to_builtin(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_builtin(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def make_alert_record(alert, frame_index, clock, camera_id, source):
+    """把识别器的告警转换为离线告警记录（帧号为源视频帧序号，时间为视频时间）"""
+    timestamp = clock.timestamp(frame_index)
+    return _to_builtin({
+        'id': str(uuid.uuid4()),
+        'camera_id': camera_id,
+        'source': source,
+        'type': alert.get('type', ''),
+        'danger_level': alert.get('danger_level', 'medium'),
+        'time': datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S'),
+        'timestamp': timestamp,
+        'frame': frame_index,
+        'video_offset_s': round(frame_index / clock.fps, 3),
+        'confidence': float(alert.get('confidence', 0) or 0),
+        'desc': alert.get('desc', ''),
+        'person_id': alert.get('person_id', ''),
+        'person_class': alert.get('person_class', ''),
+        'region_name': alert.get('region_name', ''),
+        'location': alert.get('location', {}),
+        'bbox': alert.get('bbox')
+    })
+
+
+def analyze_segment(args, segment, fps, start_time):
+    """分析一个片段（在工作进程中执行）
+
+    Returns:
+        dict: {'segment', 'alerts', 'frames', 'processed', 'ai_runs', 'elapsed'}，
+        alerts 只包含 [start, end) 范围内的告警
+    """
+    begin = time.time()
+    model = None
+    if args.enable_ai:
+        if HAS_AI:
+            model = YOLO(args.vision_model + ".pt")
+        else:
+            logger.warning("未找到必要的AI依赖，离线分析不做AI检测")
+    analyzer = SegmentAnalyzer(args, fps, start_time, model)
+
+    cap = open_video_at(args.source, segment.warmup_start)
+    if not cap.isOpened():
+        raise RuntimeError(f"无法打开视频源: {args.source}")
+    alerts = []
+    frame_index = segment.warmup_start
+    try:
+        while segment.end is None or frame_index < segment.end:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frame_alerts = analyzer.process(frame_index, frame)
+            if frame_index >= segment.start:
+                for alert in frame_alerts:
+                    alerts.append(make_alert_record(alert, frame_index, analyzer.clock, args.camera_id, args.source))
+            frame_index += 1
+    finally:
+        cap.release()
+
+    return {
+        'segment': segment.index,
+        'alerts': alerts,
+        'frames': max(0, frame_index - segment.start),
+        'processed': analyzer.processed_count,
+        'ai_runs': analyzer.ai_count,
+        'elapsed': time.time() - begin
+    }
+
+
+def merge_alerts(results):
+    """合并各片段的告警，按帧号排序（同一帧内保持识别器的产生顺序）"""
+    alerts = []
+    for result in sorted(results, key=lambda r: r['segment']):
+        alerts.extend(result['alerts'])
+    alerts.sort(key=lambda alert: alert['frame'])
+    return alerts
+
+
+def write_jsonl(alerts, path):
+    """告警按行写入JSONL文件"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        for alert in alerts:
+            f.write(json.dumps(alert, ensure_ascii=False) + '\n')
+
+
+def open_alert_database(backend, sqlite_db=None):
+    """按 src/config/database.json 打开告警数据库"""
+    config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config', 'database.json')
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    if backend == 'sqlite':
+        from models.alert.alert_database import AlertDatabase
+        return AlertDatabase(sqlite_db or config.get('sqlite', {}).get('database', 'alerts.db'))
+
+    from models.alert.mysql_database import MySQLAlertDatabase
+    mysql_config = config['mysql']
+    return MySQLAlertDatabase(
+        host=mysql_config['host'],
+        port=mysql_config['port'],
+        user=mysql_config['user'],
+        password=mysql_config['password'],
+        database=mysql_config['database'],
+        charset=mysql_config['charset']
+    )
+
+
+def to_alert_event(record):
+    """离线告警记录转换为告警事件（告警时间取视频时间）"""
+    from models.alert.alert_event import AlertEvent
+    from models.alert.alert_rule import AlertLevel
+    danger_level = record['danger_level']
+    if danger_level == 'high':
+        alert_level = AlertLevel.CRITICAL
+    elif danger_level == 'medium':
+        alert_level = AlertLevel.ALERT
+    else:
+        alert_level = AlertLevel.WARNING
+    event = AlertEvent.create(
+        rule_id=f"rule_{record['type'] or 'unknown'}",
+        level=alert_level,
+        danger_level=danger_level,
+        source_type=record['type'] or 'unknown',
+        message=record['desc'],
+        details={
+            'camera_id': record['camera_id'],
+            'person_id': record['person_id'],
+            'person_class': record['person_class'],
+            'confidence': record['confidence'],
+            'frame': record['frame'],
+            'location': record['location'],
+            'region_name': record['region_name'],
+            'source': record['source'],
+            'video_offset_s': record['video_offset_s'],
+            'offline': True
+        },
+        frame_idx=record['frame']
+    )
+    event.timestamp = record['timestamp']
+    return event
+
+
+def save_to_database(database, alerts, batch_size=500):
+    """告警批量写入数据库，返回写入成功的条数"""
+    saved = 0
+    for i in range(0, len(alerts), batch_size):
+        items = [(to_alert_event(record), None) for record in alerts[i:i + batch_size]]
+        if hasattr(database, 'save_alert_events_batch'):
+            results = database.save_alert_events_batch(items)
+        else:
+            results = [database.save_alert_event(event) for event, _ in items]
+        saved += sum(1 for result in results if result)
+    return saved
+
+
+def _init_worker():
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+
+
+def run(args):
+    """分析整个视频文件，返回合并后的告警列表"""
+    cap = cv2.VideoCapture(args.source)
+    if not cap.isOpened():
+        raise RuntimeError(f"无法打开视频源: {args.source}")
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    if not fps or fps <= 0 or fps > 240:
+        fps = args.fps or DEFAULT_FPS
+        logger.warning(f"无法读取视频帧率，按 {fps} fps 计算")
+    elif args.fps:
+        fps = args.fps
+
+    if args.start_time:
+        start_time = datetime.strptime(args.start_time, '%Y-%m-%d %H:%M:%S').timestamp()
+    else:
+        # 默认录像在文件最后修改时结束
+        start_time = os.path.getmtime(args.source) - max(total_frames, 0) / fps
+
+    segments = plan_segments(total_frames, fps, args.segment_seconds, args.warmup_seconds, args.workers)
+    workers = min(max(1, args.workers), len(segments))
+    logger.info(f"视频 {args.source}: {total_frames} 帧, {fps:.2f} fps, 切分为 {len(segments)} 个片段, "
+                f"{workers} 个进程")
+
+    begin = time.time()
+    results = []
+    if workers == 1:
+        for segment in segments:
+            results.append(analyze_segment(args, segment, fps, start_time))
+            logger.info(f"片段 {segment.index + 1}/{len(segments)} 完成")
+    else:
+        # spawn 启动的工作进程各自加载模型，不继承父进程的线程和句柄
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context('spawn'),
+                                 initializer=_init_worker) as executor:
+            futures = [executor.submit(analyze_segment, args, segment, fps, start_time) for segment in segments]
+            for done, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                results.append(result)
+                logger.info(f"片段 {result['segment'] + 1}/{len(segments)} 完成 ({done}/{len(segments)})")
+
+    elapsed = time.time() - begin
+    alerts = merge_alerts(results)
+    frames = sum(result['frames'] for result in results)
+    video_seconds = frames / fps
+    logger.info(f"分析完成: {frames} 帧（视频时长 {video_seconds:.1f}秒）, 分析帧 "
+                f"{sum(result['processed'] for result in results)}, AI检测 "
+                f"{sum(result['ai_runs'] for result in results)} 次, 告警 {len(alerts)} 条, "
+                f"耗时 {elapsed:.1f}秒 ({video_seconds / max(elapsed, 1e-6):.1f}x 实时)")
+    return alerts
+
+
+def parse_args(argv=None):
+    """解析命令行参数（分析相关参数与 all_in_one_system.py 同名同默认值）"""
+    parser = argparse.ArgumentParser(description='录像文件离线加速分析')
+
+    parser.add_argument('--source', type=str, required=True, help='视频文件路径')
+    parser.add_argument('--camera_id', type=str, default='offline', help='告警记录中的摄像头ID')
+    parser.add_argument('--start_time', type=str, default=None,
+                        help='录像起始时间 "YYYY-MM-DD HH:MM:SS"（默认按文件修改时间减去视频时长）')
+    parser.add_argument('--fps', type=float, default=0, help='视频帧率（0表示从文件读取）')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2), help='并行进程数')
+    parser.add_argument('--segment_seconds', type=float, default=300, help='每个片段的视频时长（秒）')
+    parser.add_argument('--warmup_seconds', type=float, default=5, help='每个片段的预热时长（秒），预热期间的告警丢弃')
+
+    # 处理参数
+    parser.add_argument('--process_every', type=int, default=3, help='每N帧处理一次')
+    parser.add_argument('--process_scale', type=float, default=1.0, help='处理分辨率缩放比例 (0.5=半分辨率)')
+    parser.add_argument('--flow_width', type=int, default=0,
+                        help='光流分析宽度（如320），光流统计换算为与分辨率无关的值（0表示按处理分辨率计算）')
+    parser.add_argument('--roi_flow', action='store_true',
+                        help='按帧差门控光流，只在有变化的区域和人员框附近计算，静止帧跳过光流')
+    parser.add_argument('--use_motion_history', action='store_true', help='使用运动历史')
+
+    # 危险行为检测参数
+    parser.add_argument('--feature_threshold', type=int, default=80, help='特征点数量阈值')
+    parser.add_argument('--area_threshold', type=float, default=0.05, help='运动区域阈值')
+    parser.add_argument('--alert_cooldown', type=int, default=10, help='告警冷却帧数')
+    parser.add_argument('--min_confidence', type=float, default=0.5, help='最小置信度')
+    parser.add_argument('--alert_region', type=str,
+                        help='警戒区域, 格式为坐标点列表, 例如: "[(100,100), (300,100), (300,300), (100,300)]"')
+    parser.add_argument('--distance_threshold', type=int, default=50, help='距离危险区域边界的阈值（像素）')
+    parser.add_argument('--dwell_time_threshold', type=float, default=1.0, help='危险区域停留时间阈值（秒）')
+
+    # AI参数
+    parser.add_argument('--enable_ai', action='store_true', help='启用AI功能')
+    parser.add_argument('--vision_model', type=str, default='yolov8n', help='使用的视觉模型')
+    parser.add_argument('--ai_interval', type=int, default=20, help='AI处理间隔帧数')
+    parser.add_argument('--propagate_detections', action='store_true',
+                        help='两次AI检测之间按光流推移上一次的人员框，置信度衰减后提前重新检测')
+    parser.add_argument('--ai_confidence', type=float, default=0.4, help='AI检测置信度阈值')
+
+    # 输出参数
+    parser.add_argument('--output_jsonl', type=str, default=None,
+                        help='告警输出文件（默认 system_output/offline_<视频文件名>.jsonl）')
+    parser.add_argument('--db', choices=['mysql', 'sqlite'], default=None, help='同时写入告警数据库')
+    parser.add_argument('--sqlite_db', type=str, default=None, help='SQLite数据库文件（--db sqlite 时使用）')
+
+    return parser.parse_args(argv)
+
+
+def main():
+    """主函数"""
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT, handlers=[logging.StreamHandler(sys.stdout)])
+    args = parse_args()
+    try:
+        alerts = run(args)
+    except Exception as e:
+        logger.error(f"离线分析失败: {str(e)}")
+        return False
+
+    output = args.output_jsonl or os.path.join(
+        'system_output', f"offline_{os.path.splitext(os.path.basename(args.source))[0]}.jsonl")
+    write_jsonl(alerts, output)
+    logger.info(f"告警已写入: {output}")
+
+    if args.db:
+        try:
+            database = open_alert_database(args.db, args.sqlite_db)
+            saved = save_to_database(database, alerts)
+            logger.info(f"告警已写入数据库: {saved}/{len(alerts)} 条")
+        except Exception as e:
+            logger.error(f"写入告警数据库失败: {str(e)}")
+            return False
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+人员两两关系分析 - 打架检测、交互检测共用的成对几何计算
+
+- 均匀网格近邻搜索：每个框向外扩展 margin 后登记到覆盖的网格单元，只有落在同一单元的框才成对，
+  再用扩展框是否相交做精确过滤。中心点距离不超过 2*margin、或框本身有重叠的两两组合一定会被保留，
+  距离远的组合不再参与后续计算
+- 候选对的中心距离、重叠面积、大小比例、估算实际距离一次性按数组计算
+- PairHistory：按 (轨迹ID, 轨迹ID) 保存每一对的持续性记录，数据放在紧凑的 NumPy 数组中
+"""
+
+import numpy as np
+
+
+def candidate_pairs(boxes, margin):
+    """用均匀网格找出扩展框相交的两两组合
+
+    Args:
+        boxes: (N, 4) 数组 [x1, y1, x2, y2]；点可以写成 [x, y, x, y]
+        margin (float): 每个框向外扩展的像素数
+
+    Returns:
+        (i, j): 两个整数数组，i < j，按 (i, j) 升序
+    """
+    b = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    n = len(b)
+    empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+    if n < 2:
+        return empty
+
+    ex = b + np.array([-margin, -margin, margin, margin])
+    # 网格边长取扩展框的中位尺寸，每个框大约落在 1~4 个单元内
+    cell = max(float(np.median(np.maximum(ex[:, 2] - ex[:, 0], ex[:, 3] - ex[:, 1]))), 1.0)
+    gx0, gy0 = np.floor(ex[:, 0] / cell).astype(np.int64), np.floor(ex[:, 1] / cell).astype(np.int64)
+    gx1, gy1 = np.floor(ex[:, 2] / cell).astype(np.int64), np.floor(ex[:, 3] / cell).astype(np.int64)
+
+    cells = {}
+    for k in range(n):
+        for gx in range(gx0[k], gx1[k] + 1):
+            for gy in range(gy0[k], gy1[k] + 1):
+                cells.setdefault((gx, gy), []).append(k)
+
+    pair_codes = []
+    for members in cells.values():
+        if len(members) < 2:
+            continue
+        m = np.asarray(members, dtype=np.int64)
+        a, c = np.triu_indices(len(m), k=1)
+        pair_codes.append(m[a] * n + m[c])
+    if not pair_codes:
+        return empty
+
+    codes = np.unique(np.concatenate(pair_codes))
+    i, j = codes // n, codes % n
+    intersect = ((np.minimum(ex[i, 2], ex[j, 2]) >= np.maximum(ex[i, 0], ex[j, 0])) &
+                 (np.minimum(ex[i, 3], ex[j, 3]) >= np.maximum(ex[i, 1], ex[j, 1])))
+    return i[intersect], j[intersect]
+
+
+def pair_geometry(boxes, i, j):
+    """计算候选对的几何关系（中心点按整数像素取，与原逐对计算一致）
+
+    Returns:
+        dict: center1/center2 (K, 2)，pixel_distance、overlap_area、size1、size2、size_ratio (K,)
+    """
+    b = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    centers = np.stack([(b[:, 0] + b[:, 2]) // 2, (b[:, 1] + b[:, 3]) // 2], axis=1)
+    sizes = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    c1, c2 = centers[i], centers[j]
+    ow = np.minimum(b[i, 2], b[j, 2]) - np.maximum(b[i, 0], b[j, 0])
+    oh = np.minimum(b[i, 3], b[j, 3]) - np.maximum(b[i, 1], b[j, 1])
+    overlap = np.where((ow >= 0) & (oh >= 0), ow * oh, 0.0)
+    s1, s2 = sizes[i], sizes[j]
+    smaller = np.minimum(s1, s2)
+    ratio = np.where(smaller > 0, np.maximum(s1, s2) / np.where(smaller > 0, smaller, 1), 1.0)
+    return {
+        'center1': c1,
+        'center2': c2,
+        'pixel_distance': np.linalg.norm(c1 - c2, axis=1),
+        'overlap_area': overlap,
+        'size1': s1,
+        'size2': s2,
+        'size_ratio': ratio
+    }
+
+
+def estimate_real_distance(center1, center2, size1, size2, frame_width, frame_height):
+    """估算两人之间的实际距离（相对单位），参数均可为数组
+
+    综合人物大小、到画面中心的距离（透视）和两人大小差异三个因子，再乘1.2倍保守系数。
+    """
+    center1 = np.asarray(center1, dtype=np.float64)
+    center2 = np.asarray(center2, dtype=np.float64)
+    size1 = np.asarray(size1, dtype=np.float64)
+    size2 = np.asarray(size2, dtype=np.float64)
+    frame_center = np.array([frame_width / 2, frame_height / 2])
+
+    pixel_distance = np.linalg.norm(center1 - center2, axis=-1)
+    size_factor = np.minimum((size1 + size2) / 2 / 8000, 1.5)
+    avg_distance_to_center = (np.linalg.norm(center1 - frame_center, axis=-1) +
+                              np.linalg.norm(center2 - frame_center, axis=-1)) / 2
+    position_factor = 1 + avg_distance_to_center / 200
+    smaller = np.minimum(size1, size2)
+    size_ratio = np.where(smaller > 0, np.maximum(size1, size2) / np.where(smaller > 0, smaller, 1), 1.0)
+    size_diff_factor = np.minimum(size_ratio / 2, 1.5)
+    combined_factor = (size_factor + position_factor + size_diff_factor) / 3
+    return pixel_distance * combined_factor * 1.2
+
+
+class PairHistory:
+    """按 (ID, ID) 保存成对的持续性记录，所有数值存放在按行分配的数组中
+
+    每一行：起始帧、持续帧数、最近更新时间，以及最近 window 帧的运动强度和置信度（环形缓冲）。
+    删除的行进入空闲列表复用，容量不足时按倍数扩容。
+    """
+
+    def __init__(self, window=30, capacity=64):
+        self.window = int(window)
+        self.index = {}  # pair_key -> 行号
+        self.free_rows = []
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old = getattr(self, 'capacity', 0)
+        self.capacity = capacity
+        arrays = {
+            'start_frame': np.zeros(capacity, dtype=np.int64),
+            'duration': np.zeros(capacity, dtype=np.int64),
+            'last_update': np.zeros(capacity, dtype=np.float64),
+            'count': np.zeros(capacity, dtype=np.int64),  # 环形缓冲写入总次数
+            'motion': np.zeros((capacity, self.window), dtype=np.float32),
+            'confidence': np.zeros((capacity, self.window), dtype=np.float32)
+        }
+        for name, array in arrays.items():
+            if old:
+                array[:old] = getattr(self, name)
+            setattr(self, name, array)
+        self.free_rows.extend(range(capacity - 1, old - 1, -1))
+
+    def __contains__(self, pair_key):
+        return pair_key in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def get(self, pair_key):
+        """返回行号，不存在时返回None"""
+        return self.index.get(pair_key)
+
+    def start(self, pair_key, frame, now, motion, confidence):
+        """新建一对的记录，返回行号"""
+        if not self.free_rows:
+            self._allocate(self.capacity * 2)
+        row = self.free_rows.pop()
+        self.index[pair_key] = row
+        self.start_frame[row] = frame
+        self.duration[row] = 0
+        self.count[row] = 0
+        self.append(row, now, motion, confidence)
+        return row
+
+    def append(self, row, now, motion, confidence):
+        """记录一帧，持续帧数加1"""
+        pos = self.count[row] % self.window
+        self.motion[row, pos] = motion
+        self.confidence[row, pos] = confidence
+        self.count[row] += 1
+        self.duration[row] += 1
+        self.last_update[row] = now
+
+    def recent_confidence(self, row, n):
+        """最近 n 帧的置信度（按时间顺序）"""
+        n = int(min(n, self.count[row], self.window))
+        positions = (self.count[row] - n + np.arange(n)) % self.window
+        return self.confidence[row, positions]
+
+    def remove(self, pair_key):
+        row = self.index.pop(pair_key, None)
+        if row is not None:
+            self.free_rows.append(row)
+
+    def expire(self, now, max_age):
+        """删除超过 max_age 秒没有更新的记录，返回删除的数量"""
+        if not self.index:
+            return 0
+        keys = list(self.index.keys())
+        rows = np.fromiter(self.index.values(), dtype=np.int64, count=len(keys))
+        stale = np.flatnonzero(now - self.last_update[rows] > max_age)
+        for k in stale:
+            self.remove(keys[k])
+        return len(stale)
+
+    def clear(self):
+        self.index = {}
+        self.free_rows = list(range(self.capacity - 1, -1, -1))
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分阶段流水线模块 - 把单路视频的逐帧处理拆成若干阶段，阶段之间用有界队列连接
+
+- 每个阶段一个工作线程、按提交顺序处理，帧的顺序和各阶段独占的状态（运动特征管理器、
+  危险行为识别器等）天然得到保持；不同阶段并行，第 k 帧的后一阶段与第 k+1 帧的前一阶段重叠执行
+- 队列有界，下游处理不过来时上游阻塞（背压），不会无限堆积帧
+- 每个阶段统计吞吐量、处理耗时和排队耗时的分位数，以及整条流水线的端到端延迟
+- threaded=False 时在调用线程内依次执行各阶段（与原串行处理一致），统计口径相同，便于对比
+- 条目带有 stage_times 字典时记录各阶段的处理耗时，on_complete 回调在条目走完所有阶段后调用
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from queue import Queue
+
+import numpy as np
+
+logger = logging.getLogger("StagePipeline")
+
+_STOP = object()  # 停止信号，依次穿过所有阶段
+
+
+def _percentiles_ms(values):
+    if not values:
+        return {'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0}
+    p50, p95, p99 = np.percentile(np.fromiter(values, dtype=np.float64, count=len(values)), [50, 95, 99])
+    return {'p50_ms': p50 * 1000, 'p95_ms': p95 * 1000, 'p99_ms': p99 * 1000}
+
+
+class StageStats:
+    """单个阶段（或端到端）的耗时统计，保留最近 window 次的样本"""
+
+    def __init__(self, window=512, rate_window=5.0):
+        self.lock = threading.Lock()
+        self.durations = deque(maxlen=window)
+        self.waits = deque(maxlen=window)
+        self.finish_times = deque(maxlen=window)
+        self.rate_window = rate_window
+        self.count = 0
+        self.errors = 0
+
+    def record(self, duration, wait=0.0, now=None):
+        with self.lock:
+            self.durations.append(duration)
+            self.waits.append(wait)
+            self.finish_times.append(time.time() if now is None else now)
+            self.count += 1
+
+    def record_error(self):
+        with self.lock:
+            self.errors += 1
+
+    def snapshot(self):
+        """吞吐量（最近 rate_window 秒内每秒完成数）、处理耗时和排队耗时分位数"""
+        with self.lock:
+            durations = list(self.durations)
+            waits = list(self.waits)
+            now = time.time()
+            recent = [t for t in self.finish_times if now - t <= self.rate_window]
+            stats = {'count': self.count, 'errors': self.errors}
+        if len(recent) > 1:
+            stats['throughput_fps'] = (len(recent) - 1) / max(recent[-1] - recent[0], 1e-6)
+        else:
+            stats['throughput_fps'] = 0.0
+        stats.update(_percentiles_ms(durations))
+        stats['wait_p95_ms'] = _percentiles_ms(waits)['p95_ms']
+        return stats
+
+
+class Stage:
+    """流水线阶段：名称、处理函数和输入队列长度"""
+
+    def __init__(self, name, fn, queue_size=2):
+        """
+        Args:
+            name (str): 阶段名称（用于统计和线程名）
+            fn: 处理函数 fn(item)，就地修改 item，返回值忽略
+            queue_size (int): 该阶段输入队列的长度
+        """
+        self.name = name
+        self.fn = fn
+        self.queue_size = max(1, int(queue_size))
+        self.queue = None
+        self.stats = StageStats()
+
+
+class StagePipeline:
+    """按顺序连接的多阶段流水线"""
+
+    def __init__(self, stages, name='pipeline', threaded=True, on_error=None, on_complete=None):
+        """
+        Args:
+            stages: Stage 列表，按执行顺序排列
+            name (str): 流水线名称（用于线程名和日志）
+            threaded (bool): True 时每个阶段一个工作线程；False 时 submit() 在调用线程内依次执行
+            on_error: 可选回调 on_error(item, stage_name, exc)，阶段出错时调用（如释放帧引用），
+                出错的 item 不再进入后续阶段
+            on_complete: 可选回调 on_complete(item)，item 成功走完所有阶段后调用（如按各阶段耗时调整负载）
+        """
+        self.stages = list(stages)
+        self.name = name
+        self.threaded = threaded
+        self.on_error = on_error
+        self.on_complete = on_complete
+        self.end_to_end = StageStats()
+        self.threads = []
+        self.running = False
+        self.in_flight = 0
+        self.in_flight_lock = threading.Lock()
+        for stage in self.stages:
+            stage.queue = Queue(maxsize=stage.queue_size)
+
+    @property
+    def depth(self):
+        """流水线中最多同时存在的条目数（各队列长度 + 各阶段正在处理的一条）"""
+        return sum(stage.queue_size + 1 for stage in self.stages)
+
+    def start(self):
+        if not self.threaded or self.running:
+            return
+        self.running = True
+        for index, stage in enumerate(self.stages):
+            thread = threading.Thread(target=self._worker, args=(index,), name=f"{self.name}-{stage.name}")
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, item):
+        """提交一个条目；第一个阶段的队列满时阻塞（threaded=False 时同步执行完所有阶段）"""
+        with self.in_flight_lock:
+            self.in_flight += 1
+        now = time.time()
+        if not self.threaded:
+            self._run_inline(item, now)
+            return
+        self.stages[0].queue.put((item, now, now))
+
+    def _run_stage(self, stage, item, enqueued):
+        """执行一个阶段，成功返回 True"""
+        start = time.time()
+        try:
+            stage.fn(item)
+        except Exception as e:
+            stage.stats.record_error()
+            logger.error(f"[{self.name}] 阶段 {stage.name} 出错: {str(e)}", exc_info=True)
+            self._finish()
+            if self.on_error is not None:
+                self.on_error(item, stage.name, e)
+            return False
+        end = time.time()
+        stage.stats.record(end - start, start - enqueued, end)
+        stage_times = getattr(item, 'stage_times', None)
+        if stage_times is not None:
+            stage_times[stage.name] = end - start
+        return True
+
+    def _run_inline(self, item, submitted):
+        for stage in self.stages:
+            if not self._run_stage(stage, item, time.time()):
+                return
+        self._complete(item)
+        self._finish(submitted)
+
+    def _complete(self, item):
+        if self.on_complete is None:
+            return
+        try:
+            self.on_complete(item)
+        except Exception as e:
+            logger.error(f"[{self.name}] on_complete 出错: {str(e)}", exc_info=True)
+
+    def _finish(self, submitted=None):
+        with self.in_flight_lock:
+            self.in_flight -= 1
+        if submitted is not None:
+            now = time.time()
+            self.end_to_end.record(now - submitted, now=now)
+
+    def _worker(self, index):
+        stage = self.stages[index]
+        next_queue = self.stages[index + 1].queue if index + 1 < len(self.stages) else None
+        while True:
+            entry = stage.queue.get()
+            if entry is _STOP:
+                if next_queue is not None:
+                    next_queue.put(_STOP)
+                break
+            item, submitted, enqueued = entry
+            if not self._run_stage(stage, item, enqueued):
+                continue
+            if next_queue is not None:
+                next_queue.put((item, submitted, time.time()))
+            else:
+                self._complete(item)
+                self._finish(submitted)
+
+    def stop(self, timeout=2.0):
+        """处理完已提交的条目后停止所有工作线程"""
+        if not self.running:
+            return
+        self.running = False
+        self.stages[0].queue.put(_STOP)
+        deadline = time.time() + timeout
+        for thread in self.threads:
+            thread.join(timeout=max(0.0, deadline - time.time()))
+        self.threads = []
+
+    def get_stats(self):
+        """各阶段吞吐量、耗时分位数、队列深度，以及端到端延迟"""
+        stages = {}
+        for stage in self.stages:
+            stats = stage.stats.snapshot()
+            stats['queue_depth'] = stage.queue.qsize()
+            stages[stage.name] = stats
+        with self.in_flight_lock:
+            in_flight = self.in_flight
+        return {
+            'threaded': self.threaded,
+            'in_flight': in_flight,
+            'stages': stages,
+            'end_to_end': self.end_to_end.snapshot()
+        }
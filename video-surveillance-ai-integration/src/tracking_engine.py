@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+多目标跟踪引擎 - 代价矩阵 + 最优分配 + 卡尔曼运动预测
+
+每帧调用一次 update()：
+1. 所有轨迹用匀速卡尔曼滤波预测当前帧的位置
+2. 第一轮：预测框与检测框的IOU矩阵（向量化计算），IOU超过阈值的按 1-IOU 做最优分配
+3. 第二轮：剩余的轨迹和检测按中心点距离矩阵做最优分配（距离阈值内、且最近 recent_frames 帧内出现过）
+4. 匹配上的轨迹用检测框校正，未匹配的检测建立新轨迹，丢失过久的轨迹删除
+
+轨迹状态：
+- tentative：新建的轨迹，连续匹配 min_hits 帧后转为 confirmed；丢失超过 tentative_max_missing 帧即删除
+- confirmed：稳定的轨迹
+- lost：确认过的轨迹当前帧未匹配，仍参与匹配（遮挡后重新出现保持原ID），丢失超过 max_missing 帧后删除
+
+最优分配优先使用 scipy.optimize.linear_sum_assignment，未安装 scipy 时退化为按代价从小到大的贪心分配，
+两种方式都保证一个检测只分配给一条轨迹。
+"""
+
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+    HAS_SCIPY = True
+except ImportError:
+    HAS_SCIPY = False
+
+TENTATIVE = 'tentative'
+CONFIRMED = 'confirmed'
+LOST = 'lost'
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """两组框两两之间的IOU
+
+    Args:
+        boxes_a: (N, 4) 数组，[x1, y1, x2, y2]
+        boxes_b: (M, 4) 数组，[x1, y1, x2, y2]
+
+    Returns:
+        (N, M) IOU矩阵
+    """
+    a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)
+    iw = np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0])
+    ih = np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1])
+    inter = np.clip(iw, 0, None) * np.clip(ih, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.where(union > 0, union, 1), 0.0)
+
+
+def centroid_distance_matrix(boxes_a, boxes_b):
+    """两组框中心点两两之间的欧氏距离，返回 (N, M) 矩阵"""
+    a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)
+    ca = (a[:, :2] + a[:, 2:]) / 2
+    cb = (b[:, :2] + b[:, 2:]) / 2
+    return np.linalg.norm(ca[:, None, :] - cb[None, :, :], axis=2)
+
+
+def linear_assignment(cost, valid):
+    """在 valid 为 True 的位置上求代价最小的一对一分配
+
+    Args:
+        cost: (N, M) 代价矩阵
+        valid: (N, M) bool，False 的位置不允许分配
+
+    Returns:
+        [(行, 列)] 匹配对列表
+    """
+    if cost.size == 0 or not valid.any():
+        return []
+    if HAS_SCIPY:
+        # 不允许的位置给一个比所有有效代价都大的值，求解后再剔除
+        big = float(cost[valid].max()) * 2 + 1.0
+        rows, cols = linear_sum_assignment(np.where(valid, cost, big))
+        return [(r, c) for r, c in zip(rows, cols) if valid[r, c]]
+
+    matches = []
+    used_rows, used_cols = set(), set()
+    flat = np.argsort(np.where(valid, cost, np.inf), axis=None, kind='stable')
+    for idx in flat:
+        r, c = np.unravel_index(idx, cost.shape)
+        if not valid[r, c]:
+            break
+        if r in used_rows or c in used_cols:
+            continue
+        used_rows.add(r)
+        used_cols.add(c)
+        matches.append((int(r), int(c)))
+    return matches
+
+
+class KalmanBoxFilter:
+    """框的匀速卡尔曼滤波，状态为 [cx, cy, w, h, vx, vy, vw, vh]"""
+
+    _F = np.eye(8)
+    _F[:4, 4:] = np.eye(4)
+    _H = np.eye(4, 8)
+
+    def __init__(self, bbox, position_noise=1.0 / 20, velocity_noise=1.0 / 160):
+        self.position_noise = position_noise
+        self.velocity_noise = velocity_noise
+        self.x = np.zeros(8)
+        self.x[:4] = self._to_measurement(bbox)
+        scale = max(self.x[3], 1.0)
+        std = np.array([2 * position_noise * scale] * 4 + [10 * velocity_noise * scale] * 4)
+        self.P = np.diag(std ** 2)
+
+    @staticmethod
+    def _to_measurement(bbox):
+        x1, y1, x2, y2 = [float(v) for v in bbox[:4]]
+        return np.array([(x1 + x2) / 2, (y1 + y2) / 2, max(x2 - x1, 1.0), max(y2 - y1, 1.0)])
+
+    def predict(self):
+        """推进一帧，返回预测框 [x1, y1, x2, y2]"""
+        scale = max(self.x[3], 1.0)
+        std = np.array([self.position_noise * scale] * 4 + [self.velocity_noise * scale] * 4)
+        self.x = self._F @ self.x
+        self.x[2:4] = np.maximum(self.x[2:4], 1.0)
+        self.P = self._F @ self.P @ self._F.T + np.diag(std ** 2)
+        return self.bbox()
+
+    def update(self, bbox):
+        """用观测框校正状态"""
+        scale = max(self.x[3], 1.0)
+        R = np.diag([(self.position_noise * scale) ** 2] * 4)
+        innovation = self._to_measurement(bbox) - self._H @ self.x
+        S = self._H @ self.P @ self._H.T + R
+        K = self.P @ self._H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ innovation
+        self.P = (np.eye(8) - K @ self._H) @ self.P
+
+    def bbox(self):
+        cx, cy, w, h = self.x[:4]
+        return [cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2]
+
+
+class Track:
+    """单条轨迹"""
+
+    __slots__ = ('track_id', 'bbox', 'predicted_bbox', 'kalman', 'state', 'hits',
+                 'consecutive_frames', 'missing', 'last_seen', 'data')
+
+    def __init__(self, track_id, bbox, frame_index, use_motion=True, data=None):
+        self.track_id = track_id
+        self.bbox = list(bbox)  # 最近一次观测到的检测框
+        self.predicted_bbox = list(bbox)  # 当前帧的预测框（用于匹配）
+        self.kalman = KalmanBoxFilter(bbox) if use_motion else None
+        self.state = TENTATIVE
+        self.hits = 1
+        self.consecutive_frames = 1
+        self.missing = 0
+        self.last_seen = frame_index
+        self.data = data
+
+    def centroid(self):
+        x1, y1, x2, y2 = self.bbox[:4]
+        return (int((x1 + x2) / 2), int((y1 + y2) / 2))
+
+
+class TrackingEngine:
+    """多目标跟踪引擎（非线程安全，由调用方保证每帧只调用一次 update）"""
+
+    def __init__(self, iou_threshold=0.3, distance_threshold=75.0, recent_frames=10,
+                 min_hits=3, max_missing=30, tentative_max_missing=15, use_motion=True, first_id=1):
+        """
+        Args:
+            iou_threshold (float): IOU匹配阈值，None 表示不做IOU匹配、只按距离匹配
+            distance_threshold (float): 中心点距离匹配阈值（像素）
+            recent_frames (int): 距离匹配只考虑最近多少帧内出现过的轨迹，None 表示不限制
+            min_hits (int): tentative 轨迹连续匹配多少帧后转为 confirmed
+            max_missing (int): confirmed/lost 轨迹最多丢失多少帧
+            tentative_max_missing (int): tentative 轨迹最多丢失多少帧
+            use_motion (bool): 是否用卡尔曼预测框参与匹配（False 时按最近一次观测框匹配）
+            first_id (int): 第一条轨迹的ID
+        """
+        self.iou_threshold = iou_threshold
+        self.distance_threshold = distance_threshold
+        self.recent_frames = recent_frames
+        self.min_hits = max(1, int(min_hits))
+        self.max_missing = max_missing
+        self.tentative_max_missing = min(tentative_max_missing, max_missing)
+        self.use_motion = use_motion
+        self.first_id = first_id
+        self.reset()
+
+    def reset(self):
+        """清空所有轨迹，ID从 first_id 重新开始"""
+        self.tracks = {}  # 轨迹ID -> Track，按创建顺序
+        self.next_id = self.first_id
+        self.frame_index = 0
+
+    def update(self, bboxes, data=None, frame_index=None):
+        """
+        用当前帧的检测框更新跟踪（每帧调用一次，没有检测时也应调用以累计丢失帧数）
+
+        Args:
+            bboxes: 检测框列表 [[x1, y1, x2, y2], ...]
+            data: 可选，与 bboxes 一一对应的附加数据，保存在 Track.data
+            frame_index: 可选，调用方的帧号；与上次相隔多帧（跳帧处理）时按间隔预测和累计丢失帧数，
+                None 表示紧接上一次调用
+
+        Returns:
+            与 bboxes 一一对应的轨迹ID列表（同一帧内不会重复）
+        """
+        steps = 1 if frame_index is None else max(1, int(frame_index) - self.frame_index)
+        self.frame_index += steps
+        boxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+        tracks = list(self.tracks.values())
+        for track in tracks:
+            if track.kalman is not None:
+                for _ in range(steps):
+                    track.predicted_bbox = track.kalman.predict()
+            else:
+                track.predicted_bbox = track.bbox
+
+        matches = self._match(tracks, boxes)
+
+        assigned = [None] * len(boxes)
+        for t, d in matches:
+            track = tracks[t]
+            track.bbox = list(bboxes[d])
+            if track.kalman is not None:
+                track.kalman.update(track.bbox)
+            track.hits += 1
+            track.consecutive_frames = track.consecutive_frames + 1 if track.missing == 0 else 1
+            track.missing = 0
+            track.last_seen = self.frame_index
+            track.data = data[d] if data is not None else None
+            if track.state == LOST or track.hits >= self.min_hits:
+                track.state = CONFIRMED
+            assigned[d] = track.track_id
+
+        matched_tracks = {t for t, _ in matches}
+        for t, track in enumerate(tracks):
+            if t in matched_tracks:
+                continue
+            track.missing += steps
+            if track.state == CONFIRMED:
+                track.state = LOST
+            limit = self.tentative_max_missing if track.state == TENTATIVE else self.max_missing
+            if track.missing > limit:
+                del self.tracks[track.track_id]
+
+        for d in range(len(boxes)):
+            if assigned[d] is None:
+                track = Track(self.next_id, bboxes[d], self.frame_index, self.use_motion,
+                              data[d] if data is not None else None)
+                if self.min_hits <= 1:
+                    track.state = CONFIRMED
+                self.tracks[track.track_id] = track
+                self.next_id += 1
+                assigned[d] = track.track_id
+        return assigned
+
+    def _match(self, tracks, boxes):
+        """两轮最优分配：先按IOU，再对剩余的按中心点距离"""
+        if not tracks or len(boxes) == 0:
+            return []
+        predicted = np.array([t.predicted_bbox[:4] for t in tracks], dtype=np.float64)
+        matches = []
+        if self.iou_threshold is not None:
+            iou = iou_matrix(predicted, boxes)
+            matches = linear_assignment(1.0 - iou, iou > self.iou_threshold)
+
+        free_tracks = np.setdiff1d(np.arange(len(tracks)), [t for t, _ in matches])
+        free_boxes = np.setdiff1d(np.arange(len(boxes)), [d for _, d in matches])
+        if len(free_tracks) == 0 or len(free_boxes) == 0:
+            return matches
+
+        distance = centroid_distance_matrix(predicted[free_tracks], boxes[free_boxes])
+        valid = distance < self.distance_threshold
+        if self.recent_frames is not None:
+            unseen = self.frame_index - np.array([tracks[t].last_seen for t in free_tracks])
+            valid &= (unseen < self.recent_frames)[:, None]
+        for r, c in linear_assignment(distance, valid):
+            matches.append((int(free_tracks[r]), int(free_boxes[c])))
+        return matches
+
+    def confirmed_tracks(self):
+        """当前帧已确认且被匹配的轨迹"""
+        return [t for t in self.tracks.values() if t.state == CONFIRMED and t.missing == 0]
+
+    def get_stats(self):
+        """按状态统计轨迹数"""
+        stats = {TENTATIVE: 0, CONFIRMED: 0, LOST: 0}
+        for track in self.tracks.values():
+            stats[track.state] += 1
+        stats['next_id'] = self.next_id
+        return stats
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+危险区域空间索引 - 把告警区域预先栅格化，区域判定和距离计算改为数组查表
+
+每个区域只在其外接矩形向外扩展 margin 像素的范围内建立：
+- 掩码：区域内（含边界）为1
+- 距离变换：每个像素到区域的欧氏距离（区域内为0）
+范围之外的点一定不在区域内，且到区域的距离大于 margin（外接矩形预过滤）。
+查询时对所有检测框的4个角点和中心点一次性做数组索引，不再逐点调用 cv2.pointPolygonTest。
+"""
+
+import numpy as np
+import cv2
+
+
+def bbox_sample_points(bboxes):
+    """检测框的采样点：4个角点和中心点
+
+    Args:
+        bboxes: (N, 4) 数组，[x1, y1, x2, y2]
+
+    Returns:
+        (xs, ys): 两个 (N, 5) 整数数组
+    """
+    b = np.floor(np.asarray(bboxes, dtype=np.float64)).astype(np.int64).reshape(-1, 4)
+    x1, y1, x2, y2 = b[:, 0], b[:, 1], b[:, 2], b[:, 3]
+    cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
+    xs = np.stack([x1, x2, x2, x1, cx], axis=1)
+    ys = np.stack([y1, y1, y2, y2, cy], axis=1)
+    return xs, ys
+
+
+class ZoneIndex:
+    """告警区域的栅格索引（区域变化时重建）"""
+
+    def __init__(self, regions, margin=50):
+        """
+        Args:
+            regions: 多边形顶点数组列表，每个为 (K, 2) int32
+            margin (int): 距离查询的有效范围（像素），超出该距离的点返回 inf
+        """
+        self.margin = int(max(0, margin))
+        self.rects = np.zeros((len(regions), 4), dtype=np.int64)  # cv2.boundingRect: x, y, w, h
+        self.zones = []  # [(x0, y0, 掩码, 距离图)]
+        for i, points in enumerate(regions):
+            points = np.asarray(points, dtype=np.int32).reshape(-1, 2)
+            x, y, w, h = cv2.boundingRect(points)
+            self.rects[i] = (x, y, w, h)
+            x0, y0 = x - self.margin, y - self.margin
+            mask = np.zeros((h + 2 * self.margin, w + 2 * self.margin), dtype=np.uint8)
+            cv2.fillPoly(mask, [points - (x0, y0)], 1)
+            cv2.polylines(mask, [points - (x0, y0)], True, 1)  # 边界上的点也算区域内
+            distance = cv2.distanceTransform(1 - mask, cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+            self.zones.append((x0, y0, mask.astype(bool), distance))
+
+    def __len__(self):
+        return len(self.zones)
+
+    def query(self, bboxes):
+        """查询一批检测框与每个区域的关系
+
+        Args:
+            bboxes: (N, 4) 数组，[x1, y1, x2, y2]
+
+        Returns:
+            (point_inside, distance):
+                point_inside: (N, R) bool，检测框任一采样点落在区域内
+                distance: (N, R) float，采样点到区域的最小距离（像素），超出 margin 的为 inf
+        """
+        xs, ys = bbox_sample_points(bboxes)
+        n = xs.shape[0]
+        point_inside = np.zeros((n, len(self.zones)), dtype=bool)
+        distance = np.full((n, len(self.zones)), np.inf, dtype=np.float32)
+        if n == 0:
+            return point_inside, distance
+
+        for r, (x0, y0, mask, dist_map) in enumerate(self.zones):
+            h, w = mask.shape
+            lx, ly = xs - x0, ys - y0
+            valid = (lx >= 0) & (lx < w) & (ly >= 0) & (ly < h)
+            if not valid.any():
+                continue
+            lx, ly = np.where(valid, lx, 0), np.where(valid, ly, 0)
+            point_inside[:, r] = (mask[ly, lx] & valid).any(axis=1)
+            d = np.where(valid, dist_map[ly, lx], np.inf)
+            d = np.where(d <= self.margin, d, np.inf)
+            distance[:, r] = d.min(axis=1)
+        return point_inside, distance
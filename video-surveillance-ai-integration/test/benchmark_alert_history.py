@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+告警历史分页基准测试 - 向告警表写入大量合成告警，比较页码偏移与游标分页在不同页深下的耗时，
+以及精确总数与缓存总数的耗时
+
+用法:
+    python test/benchmark_alert_history.py --rows 2000000
+    python test/benchmark_alert_history.py --backend mysql --rows 2000000
+
+MySQL 模式会向 --mysql_database 指定的库写入合成数据，需先按 database_schema.sql 建好表（不要指向生产库）
+"""
+
+import sys
+import os
+import time
+import json
+import random
+import argparse
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from models.alert.pagination import encode_cursor
+
+DANGER_LEVELS = ['low', 'medium', 'high']
+LEVELS = {'low': 'WARNING', 'medium': 'ALERT', 'high': 'CRITICAL'}
+SOURCE_TYPES = ['fall_detection', 'danger_zone_dwell', 'sudden_motion', 'fighting_detection', 'large_area_motion']
+
+
+def synthetic_rows(count, start_time, seed=0):
+    """生成合成告警：时间递增，危险级别/来源/确认状态随机分布"""
+    rng = random.Random(seed)
+    details = json.dumps({'camera_id': 'cam0'})
+    for i in range(count):
+        danger_level = rng.choice(DANGER_LEVELS)
+        yield (i, f"rule_{danger_level}", LEVELS[danger_level], danger_level, rng.choice(SOURCE_TYPES),
+               start_time + i * 0.5, f"合成告警 {i}", details, i, rng.random() < 0.7)
+
+
+def load_sqlite(database, rows, chunk=50000):
+    start_time = time.time() - rows * 0.5
+    with database._get_connection() as conn:
+        batch = []
+        for row in synthetic_rows(rows, start_time):
+            i, *rest = row
+            batch.append((f"evt_{i:09d}", *rest))
+            if len(batch) >= chunk:
+                conn.executemany('''
+                    INSERT INTO alert_events (id, rule_id, level, danger_level, source_type, timestamp,
+                                              message, details, frame_idx, acknowledged)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', batch)
+                conn.commit()
+                batch = []
+        if batch:
+            conn.executemany('''
+                INSERT INTO alert_events (id, rule_id, level, danger_level, source_type, timestamp,
+                                          message, details, frame_idx, acknowledged)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', batch)
+            conn.commit()
+        conn.execute("ANALYZE")
+
+
+def load_mysql(database, rows, chunk=5000):
+    from datetime import datetime
+    start_time = time.time() - rows * 0.5
+    placeholders = "(%s, %s, %s, %s, %s, %s, %s, %s, %s, '[]')"
+    with database._get_connection() as conn:
+        with conn.cursor() as cursor:
+            batch = []
+            for row in synthetic_rows(rows, start_time):
+                _, rule_id, level, danger_level, source_type, ts, message, details, frame_idx, ack = row
+                event_time = datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
+                batch.extend([rule_id, level, danger_level, source_type, event_time, message, details, frame_idx, ack])
+                if len(batch) >= chunk * 9:
+                    cursor.execute(database._INSERT_EVENT_COLUMNS + ", ".join([placeholders] * (len(batch) // 9)), batch)
+                    batch = []
+            if batch:
+                cursor.execute(database._INSERT_EVENT_COLUMNS + ", ".join([placeholders] * (len(batch) // 9)), batch)
+            cursor.execute("ANALYZE TABLE alert_events")
+
+
+def timed(fn, repeat=3):
+    """返回最快一次的耗时（毫秒）和结果"""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.time()
+        result = fn()
+        elapsed = (time.time() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def cursor_at(database, offset, time_key, **filters):
+    """取第 offset 条记录之前那一条的游标，用于和偏移分页定位到同一位置"""
+    rows = database.get_alert_events(limit=1, offset=offset - 1, **filters)
+    return encode_cursor(rows[0][time_key], rows[0]['id']) if rows else None
+
+
+def run(database, time_key, page_size, filters):
+    label = ', '.join(f"{k}={v}" for k, v in filters.items()) or '无过滤'
+    print(f"\n[{label}]")
+    total_pages = max(1, database.get_alert_count(**filters) // page_size)
+    depths = sorted({d for d in (0, 100, 1000, 10000, total_pages // 2, total_pages - 1) if d < total_pages})
+    for depth in depths:
+        offset = depth * page_size
+        offset_ms, offset_rows = timed(lambda: database.get_alert_events(limit=page_size, offset=offset, **filters))
+        cursor = cursor_at(database, offset, time_key, **filters) if offset else None
+        keyset_ms, keyset_rows = timed(lambda: database.get_alert_events(limit=page_size, cursor=cursor, **filters))
+        same = [r['id'] for r in offset_rows] == [r['id'] for r in keyset_rows]
+        print(f"  第 {depth + 1:>7d} 页: 偏移 {offset_ms:8.2f}ms  游标 {keyset_ms:8.2f}ms  结果一致={same}")
+
+    database.count_cache.invalidate()
+    exact_ms, total = timed(lambda: database.get_alert_count(**filters), repeat=1)
+    cached_ms, _ = timed(lambda: database.get_alert_count(cached=True, **filters))
+    print(f"  总数 {total}: 精确 {exact_ms:.2f}ms  缓存 {cached_ms:.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='告警历史分页基准测试')
+    parser.add_argument('--backend', choices=['sqlite', 'mysql'], default='sqlite')
+    parser.add_argument('--rows', type=int, default=2000000, help='合成告警条数')
+    parser.add_argument('--page_size', type=int, default=20)
+    parser.add_argument('--db', type=str, default=None, help='SQLite数据库文件（默认临时文件，已有数据时跳过写入）')
+    parser.add_argument('--mysql_host', type=str, default='localhost')
+    parser.add_argument('--mysql_user', type=str, default='root')
+    parser.add_argument('--mysql_password', type=str, default='')
+    parser.add_argument('--mysql_database', type=str, default='video_surveillance_alerts_bench')
+    args = parser.parse_args()
+
+    if args.backend == 'sqlite':
+        from models.alert.alert_database import AlertDatabase
+        tmp_dir = None
+        db_path = args.db
+        if db_path is None:
+            tmp_dir = tempfile.TemporaryDirectory()
+            db_path = os.path.join(tmp_dir.name, 'alerts_bench.db')
+        database = AlertDatabase(db_path)
+        time_key, loader = 'timestamp', load_sqlite
+    else:
+        from models.alert.mysql_database import MySQLAlertDatabase
+        database = MySQLAlertDatabase(host=args.mysql_host, user=args.mysql_user,
+                                      password=args.mysql_password, database=args.mysql_database)
+        time_key, loader = 'event_time', load_mysql
+
+    existing = database.get_alert_count()
+    if existing < args.rows:
+        start = time.time()
+        loader(database, args.rows - existing)
+        print(f"写入 {args.rows - existing} 条合成告警，耗时 {time.time() - start:.1f}秒")
+
+    run(database, time_key, args.page_size, {})
+    run(database, time_key, args.page_size, {'danger_level': 'high', 'acknowledged': False})
+    run(database, time_key, args.page_size, {'source_type': 'fall_detection'})
+    database.close()
+
+
+if __name__ == "__main__":
+    main()
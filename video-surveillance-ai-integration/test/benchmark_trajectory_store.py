@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+轨迹存储基准测试 - 同时跟踪大量对象的随机游走，输出每帧更新耗时和每条轨迹占用的内存
+
+用法: python test/benchmark_trajectory_store.py --objects 1000 --frames 300 --length 60
+"""
+
+import sys
+import os
+import time
+import argparse
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+
+from models.trajectory import TrajectoryStore, TrajectoryManager
+
+
+class TrackedObject:
+    """模拟跟踪器输出的对象"""
+
+    __slots__ = ('id', 'x1', 'y1', 'x2', 'y2', 'class_name', 'confidence')
+
+    def __init__(self, obj_id, x, y):
+        self.id = obj_id
+        self.x1, self.y1, self.x2, self.y2 = x - 10, y - 20, x + 10, y + 20
+        self.class_name = 'person'
+        self.confidence = 0.9
+
+
+def random_walk(objects, frames, seed=0):
+    rng = np.random.default_rng(seed)
+    positions = rng.uniform(0, 1920, (objects, 2))
+    for _ in range(frames):
+        positions += rng.normal(0, 3, positions.shape)
+        yield positions.copy()
+
+
+def bench_store(objects, frames, length):
+    store = TrajectoryStore(max_length=length, capacity=objects)
+    ids = list(range(objects))
+    t = 0.0
+    start = time.perf_counter()
+    for positions in random_walk(objects, frames):
+        t += 1 / 25
+        store.update(ids, positions, timestamp=t)
+    elapsed = time.perf_counter() - start
+    return elapsed, store
+
+
+def bench_manager(objects, frames, length):
+    manager = TrajectoryManager(max_trajectory_length=length, max_disappeared=30)
+    start = time.perf_counter()
+    for positions in random_walk(objects, frames):
+        tracked = [TrackedObject(i, x, y) for i, (x, y) in enumerate(positions)]
+        manager.update(tracked)
+    elapsed = time.perf_counter() - start
+    return elapsed, manager
+
+
+def main():
+    parser = argparse.ArgumentParser(description='轨迹存储基准测试')
+    parser.add_argument('--objects', type=int, default=1000, help='同时跟踪的对象数')
+    parser.add_argument('--frames', type=int, default=300, help='帧数')
+    parser.add_argument('--length', type=int, default=60, help='每条轨迹保留的点数')
+    args = parser.parse_args()
+
+    elapsed, store = bench_store(args.objects, args.frames, args.length)
+    print(f"TrajectoryStore: {args.objects} 个对象 x {args.frames} 帧，"
+          f"每帧 {elapsed / args.frames * 1000:.2f}ms，每条轨迹 {store.nbytes_per_track()} 字节（固定）")
+
+    elapsed, manager = bench_manager(args.objects, args.frames, args.length)
+    print(f"TrajectoryManager（含交互检测）: 每帧 {elapsed / args.frames * 1000:.2f}ms，"
+          f"活动轨迹 {len(manager.get_trajectory_positions())} 条")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+告警历史分页测试 - 验证游标分页与页码偏移结果一致、总数缓存及失效
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from models.alert.alert_database import AlertDatabase
+from models.alert.alert_event import AlertEvent
+from models.alert.alert_rule import AlertLevel
+from models.alert.pagination import encode_cursor, decode_cursor
+
+
+def make_database(tmp_dir, count=53):
+    database = AlertDatabase(os.path.join(tmp_dir, 'alerts.db'))
+    for i in range(count):
+        event = AlertEvent.create('rule_test', AlertLevel.ALERT, ['low', 'medium', 'high'][i % 3],
+                                  'test', f'告警{i}', {}, i)
+        # 每3条共用同一时间戳，验证同一时间内按 id 继续翻页
+        event.timestamp = 1700000000.0 + i // 3
+        database.save_alert_event(event)
+    return database
+
+
+def test_cursor_walk_matches_offset():
+    """测试逐页按游标翻页与按偏移翻页得到相同的记录序列"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database = make_database(tmp_dir)
+        for filters in ({}, {'danger_level': 'high'}):
+            by_offset = [e['id'] for e in database.get_alert_events(limit=1000, **filters)]
+
+            by_cursor = []
+            cursor = None
+            while True:
+                page = database.get_alert_events_page(limit=10, cursor=cursor, **filters)
+                by_cursor.extend(e['id'] for e in page['alerts'])
+                if not page['has_more']:
+                    break
+                cursor = page['next_cursor']
+            assert by_cursor == by_offset, filters
+            assert len(set(by_cursor)) == len(by_cursor)
+        database.close()
+    print("游标翻页测试通过")
+
+
+def test_cursor_roundtrip():
+    """测试游标编解码，及无效游标报错"""
+    cursor = encode_cursor('2025-01-01 08:00:00', 42)
+    assert decode_cursor(cursor) == ('2025-01-01 08:00:00', 42)
+    try:
+        decode_cursor('not-a-cursor')
+        assert False, "应抛出 ValueError"
+    except ValueError:
+        pass
+    print("游标编解码测试通过")
+
+
+def test_cached_count():
+    """测试缓存总数在有效期内不重复查询，确认状态变化后失效"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database = make_database(tmp_dir, count=9)
+        assert database.get_alert_count(acknowledged=False, cached=True) == 9
+        assert database.get_alert_count(acknowledged=False, cached=True) == 9
+        assert database.count_cache.get_stats()['hits'] == 1
+
+        event_id = database.get_alert_events(limit=1)[0]['id']
+        assert database.acknowledge_alert(event_id)
+        assert database.get_alert_count(acknowledged=False, cached=True) == 8
+        database.close()
+    print("总数缓存测试通过")
+
+
+if __name__ == "__main__":
+    test_cursor_walk_matches_offset()
+    test_cursor_roundtrip()
+    test_cached_count()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+告警持久化测试 - 用假数据库验证批量写入、图片保存、回调和队列满时的丢弃
+"""
+
+import sys
+import os
+import time
+import tempfile
+import logging
+import threading
+import contextlib
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+
+from models.alert.alert_event import AlertEvent
+from models.alert.alert_rule import AlertLevel
+from models.alert.alert_persistence import AlertPersistence
+from models.alert.alert_database import AlertDatabase
+from models.alert.mysql_database import MySQLAlertDatabase
+
+
+class FakeDatabase:
+    """假数据库：记录每次批量写入的条数，按顺序分配自增id"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+        self.rows = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def save_alert_events_batch(self, items):
+        self.gate.wait()
+        time.sleep(self.delay)
+        self.batches.append(len(items))
+        ids = []
+        for event, image_paths in items:
+            self.rows.append((event, image_paths))
+            ids.append(len(self.rows))
+        return ids
+
+
+def make_event(danger_level='medium'):
+    return AlertEvent.create(
+        rule_id='rule_test',
+        level=AlertLevel.ALERT,
+        danger_level=danger_level,
+        source_type='test',
+        message='测试告警',
+        details={},
+        frame_idx=0
+    )
+
+
+def test_batched_save_with_images():
+    """测试告警被批量写入，图片在写库前落盘，回调拿到自增id"""
+    database = FakeDatabase(delay=0.02)
+    persistence = AlertPersistence(database, batch_size=8, flush_interval_ms=50)
+    persistence.start()
+
+    image = np.zeros((48, 64, 3), dtype=np.uint8)
+    saved = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for i in range(20):
+            path = os.path.join(tmp_dir, 'alerts', f'alert_{i}.jpg')
+            ok = persistence.submit(make_event(), {'frame': (path, path, image)},
+                                    callback=lambda new_id, i=i: saved.__setitem__(i, new_id))
+            assert ok
+        persistence.stop()
+
+        assert len(saved) == 20
+        assert sorted(saved.values()) == list(range(1, 21))
+        assert max(database.batches) > 1, f"告警未被合并: {database.batches}"
+        for event, image_paths in database.rows:
+            assert os.path.exists(image_paths['frame'])
+
+    stats = persistence.get_stats()
+    assert stats['saved_count'] == 20
+    assert stats['images_written'] == 20
+    assert stats['queue_depth'] == 0
+    print(f"批量写入测试通过，批次: {database.batches}")
+
+
+def test_backpressure_never_blocks():
+    """测试数据库卡住时 submit 不阻塞：高水位跳过图片，队列满后丢弃"""
+    database = FakeDatabase()
+    database.gate.clear()  # 模拟数据库卡住
+    persistence = AlertPersistence(database, max_queue=4, batch_size=1, high_watermark=0.5)
+    persistence.start()
+    time.sleep(0.05)
+
+    image = np.zeros((8, 8, 3), dtype=np.uint8)
+    tmp_dir = tempfile.TemporaryDirectory()
+    path = os.path.join(tmp_dir.name, 'alert.jpg')
+    start = time.time()
+    results = [persistence.submit(make_event(), {'frame': (path, path, image)}) for _ in range(10)]
+    elapsed = time.time() - start
+    assert elapsed < 0.1, f"submit 被阻塞: {elapsed:.3f}s"
+
+    stats = persistence.get_stats()
+    assert results.count(False) == stats['dropped_count'] > 0
+    assert stats['images_skipped'] > 0
+    assert stats['queue_lag_ms'] >= 0
+    print(f"背压测试通过，丢弃 {stats['dropped_count']} 条，跳过图片 {stats['images_skipped']} 张")
+
+    database.gate.set()
+    persistence.stop()
+    assert persistence.get_stats()['saved_count'] == results.count(True)
+    tmp_dir.cleanup()
+
+
+def test_stop_timeout_keeps_draining():
+    """测试 stop() 超时后后台线程继续写完剩余告警和图片，不因线程池关闭而丢失"""
+    database = FakeDatabase(delay=0.05)
+    persistence = AlertPersistence(database, batch_size=1, flush_interval_ms=0)
+    persistence.start()
+
+    image = np.zeros((8, 8, 3), dtype=np.uint8)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for i in range(6):
+            path = os.path.join(tmp_dir, f'alert_{i}.jpg')
+            assert persistence.submit(make_event(), {'frame': (path, path, image)})
+        persistence.stop(timeout=0.01)
+        assert persistence.thread.is_alive(), "stop() 超时时后台线程应仍在写入"
+
+        persistence.thread.join(timeout=5)
+        assert not persistence.thread.is_alive()
+        stats = persistence.get_stats()
+        assert stats['saved_count'] == 6 and stats['failed_count'] == 0
+        assert stats['images_written'] == 6
+        assert all(os.path.exists(image_paths['frame']) for _, image_paths in database.rows)
+
+    # 队列很短时高水位至少为1，不会让所有告警都跳过图片
+    assert AlertPersistence(database, max_queue=1).high_watermark == 1
+    print("停止超时继续写入测试通过")
+
+
+def test_sqlite_callback_receives_event_id():
+    """测试逐条写入的SQLite数据库把告警主键交给回调（可直接用于确认），失败时为None"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database = AlertDatabase(os.path.join(tmp_dir, 'alerts.db'))
+        persistence = AlertPersistence(database, batch_size=4, flush_interval_ms=20)
+        persistence.start()
+        saved = []
+        events = [make_event() for _ in range(3)]
+        for event in events + events[:1]:  # 最后一条主键重复，写入失败
+            assert persistence.submit(event, callback=saved.append)
+        persistence.stop()
+        # 回调拿到的id可直接确认告警
+        assert database.acknowledge_alert(saved[0])
+
+    assert saved == [event.id for event in events] + [None]
+    stats = persistence.get_stats()
+    assert stats['saved_count'] == 3 and stats['failed_count'] == 1
+    print("SQLite回调id测试通过")
+
+
+class FakeMySQLConnection:
+    """假MySQL连接：多行INSERT的第一条id为 first_id，会话的自增步长为 step"""
+
+    def __init__(self, first_id, step):
+        self.first_id = first_id
+        self.step = step
+        self.statements = []
+
+    def begin(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def cursor(self):
+        return FakeMySQLCursor(self)
+
+
+class FakeMySQLCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+        self.lastrowid = None
+        self.result = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.conn.statements.append((' '.join(sql.split()), params))
+        if 'auto_increment_increment' in sql:
+            self.result = {'step': self.conn.step}
+        elif 'INSERT INTO alert_events' in sql:
+            self.rowcount = sql.count('(%s')
+            self.lastrowid = self.conn.first_id
+
+    def fetchone(self):
+        return self.result
+
+
+def test_mysql_batch_ids_follow_increment_step():
+    """测试MySQL批量写入按 auto_increment_increment 推算每条告警的id，图片记录关联到对应告警"""
+    conn = FakeMySQLConnection(first_id=11, step=2)
+    database = MySQLAlertDatabase.__new__(MySQLAlertDatabase)
+    database.logger = logging.getLogger("test")
+    database._get_connection = lambda: contextlib.nullcontext(conn)
+
+    items = [(make_event(), {'frame': f'alerts/{i}.jpg'}) for i in range(3)]
+    assert database.save_alert_events_batch(items) == [11, 13, 15]
+    image_sql, image_params = next(statement for statement in conn.statements
+                                   if statement[0].startswith('INSERT INTO alert_images'))
+    assert image_params[::len(image_params) // 3] == [11, 13, 15]
+    print("MySQL自增步长测试通过")
+
+
+if __name__ == "__main__":
+    test_batched_save_with_images()
+    test_backpressure_never_blocks()
+    test_stop_timeout_keeps_draining()
+    test_sqlite_callback_receives_event_id()
+    test_mysql_batch_ids_follow_increment_step()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+告警统计汇总测试 - 验证写入/确认/取消确认时汇总表增量维护的结果与从明细重算一致，
+统计接口读取汇总表的结果与直接扫描 alert_events 一致，以及旧库自动回填
+"""
+
+import sys
+import os
+import time
+import sqlite3
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from models.alert.alert_database import AlertDatabase
+from models.alert.alert_event import AlertEvent
+from models.alert.alert_rule import AlertLevel
+
+LEVELS = {'low': AlertLevel.WARNING, 'medium': AlertLevel.ALERT, 'high': AlertLevel.CRITICAL}
+
+
+def make_event(i, timestamp):
+    danger_level = ['low', 'medium', 'high'][i % 3]
+    event = AlertEvent.create(f'rule_{i % 2}', LEVELS[danger_level], danger_level,
+                              ['fall_detection', 'sudden_motion'][i % 2], f'告警{i}',
+                              {'camera_id': f'cam{i % 2}'} if i % 4 else {}, i)
+    event.timestamp = timestamp
+    return event
+
+
+def rollup_rows(database, table):
+    with database._get_connection() as conn:
+        return sorted(conn.execute(f"SELECT * FROM {table} WHERE alert_count != 0").fetchall())
+
+
+def test_incremental_matches_rebuild():
+    """测试增量维护的汇总与从 alert_events 重算的结果一致"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database = AlertDatabase(os.path.join(tmp_dir, 'alerts.db'))
+        now = time.time()
+        events = [make_event(i, now - i * 1800) for i in range(120)]  # 覆盖约2.5天
+        for event in events:
+            assert database.save_alert_event(event)
+        for event in events[::5]:
+            assert database.acknowledge_alert(event.id)
+        assert database.acknowledge_alert(events[0].id), "重复确认应返回成功"
+        assert database.unacknowledge_alert(events[10].id)
+        assert not database.acknowledge_alert('not_exists')
+
+        incremental = {t: rollup_rows(database, t) for t in ('alert_rollup_hourly', 'alert_rollup_daily')}
+        assert database.rebuild_rollups() > 0
+        rebuilt = {t: rollup_rows(database, t) for t in ('alert_rollup_hourly', 'alert_rollup_daily')}
+        assert incremental == rebuilt, "增量汇总应与重算结果一致"
+
+        stats = database.get_alert_statistics(days=7)
+        assert stats['total_alerts'] == database.get_alert_count() == 120
+        assert stats['unhandled_alerts'] == database.get_alert_count(acknowledged=False) == 120 - 23
+        assert stats['high_level_alerts'] == database.get_alert_count(danger_level='high')
+        assert stats['level_statistics']['CRITICAL'] == database.get_alert_count(level='CRITICAL')
+        assert sum(stats['daily_trend'].values()) == 120
+        assert stats['camera_statistics'][''] == 30
+        assert sum(stats['hourly_trend'].values()) == database.get_alert_count(start_time=now - 23 * 3600 - now % 3600)
+
+        totals = database.get_alert_totals()
+        assert totals['total_alerts'] == 120 and totals['unhandled_alerts'] == 97
+        database.close()
+    print(f"增量汇总测试通过: {stats['daily_trend']}")
+
+
+def test_backfill_and_retention():
+    """测试旧库（只有明细没有汇总表）打开时自动回填，删除旧告警后汇总同步裁剪"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'alerts.db')
+        database = AlertDatabase(db_path)
+        now = time.time()
+        for i in range(40):
+            database.save_alert_event(make_event(i, now - i * 6 * 3600))  # 覆盖10天
+        database.close()
+
+        # 模拟升级前的旧库
+        conn = sqlite3.connect(db_path)
+        conn.execute("DROP TABLE alert_rollup_hourly")
+        conn.execute("DROP TABLE alert_rollup_daily")
+        conn.commit()
+        conn.close()
+
+        database = AlertDatabase(db_path)
+        assert database.get_alert_totals()['total_alerts'] == 40, "打开旧库时应自动回填汇总"
+
+        deleted = database.delete_old_alerts(days=5)
+        assert deleted > 0
+        remaining = database.get_alert_count()
+        assert database.get_alert_totals()['total_alerts'] == remaining
+        assert database.get_alert_statistics(days=30)['total_alerts'] == remaining
+        database.close()
+    print(f"回填与保留期裁剪测试通过: 删除 {deleted} 条，剩余 {remaining} 条")
+
+
+if __name__ == "__main__":
+    test_incremental_matches_rebuild()
+    test_backfill_and_retention()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+内存告警存储测试 - 验证容量上限与淘汰落库、按id定位与换id、按类型的处理计数、最近告警查询
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from models.alert.alert_store import AlertStore
+
+
+def make_alert(i, alert_type='Fall Detection'):
+    return {'id': f'uuid-{i}', 'type': alert_type, 'time': '', 'handled': False}
+
+
+def test_eviction_and_spill():
+    """测试超过容量后淘汰最旧告警，只有未落库的告警交给 on_evict"""
+    spilled = []
+    store = AlertStore(max_alerts=5, on_evict=spilled.extend)
+    alerts = [make_alert(i) for i in range(8)]
+    for alert in alerts:
+        store.add(alert)
+        if alert['id'] == 'uuid-1':
+            store.mark_persisted(alert, 101)  # 模拟写入数据库后换成自增id
+
+    assert len(store) == 5
+    assert [a['id'] for a in spilled] == ['uuid-0', 'uuid-2'], "已落库的告警淘汰时不应回调"
+    assert store.get('uuid-0') is None and store.get(101) is None
+    assert store.get('uuid-7')['id'] == 'uuid-7'
+    stats = store.get_stats()
+    assert stats['evicted_count'] == 3 and stats['spilled_count'] == 2
+    assert store.counts()['total_alerts'] == 8, "计数为累计值，不受淘汰影响"
+    print(f"淘汰与落库测试通过: {stats}")
+
+
+def test_submitted_alerts_not_spilled():
+    """测试已提交后台持久化、回调未到的告警淘汰时不交给 on_evict；提交失败的仍会交出"""
+    spilled = []
+    store = AlertStore(max_alerts=2, on_evict=spilled.extend)
+    alerts = [make_alert(i) for i in range(4)]
+    store.add(alerts[0])
+    store.mark_submitted(alerts[0])
+    store.add(alerts[1])
+    store.mark_submitted(alerts[1])
+    store.mark_submitted(alerts[1], False)  # 队列已满、提交失败
+    store.add(alerts[2])
+    store.add(alerts[3])
+
+    assert [a['id'] for a in spilled] == ['uuid-1'], "已提交的告警会由持久化队列写入，不应重复落库"
+    # 淘汰后回调才到达：不影响存储
+    store.mark_persisted(alerts[0], 101)
+    assert store.get(101) is None and len(store) == 2
+    assert not store.submitted and not store.persisted
+    print("已提交告警不重复落库测试通过")
+
+
+def test_handle_and_counts():
+    """测试按id处理/取消处理（包括换id后）和按类型过滤的计数"""
+    store = AlertStore(max_alerts=100)
+    fall = make_alert(0)
+    store.add(fall)
+    store.add(make_alert(1, 'Large Area Motion'))
+    store.add(make_alert(2, 'Fighting Detection'))
+    store.mark_persisted(fall, 42)
+
+    assert store.set_handled('uuid-0', True) is None, "换id后旧id应找不到"
+    assert store.set_handled(42, True, '2026-01-01 00:00:00') is True
+    assert store.set_handled('42', True) is False, "字符串id同样可以定位，重复处理不改变计数"
+    assert store.get(42)['handled_time'] == '2026-01-01 00:00:00'
+
+    hidden = ('Intrusion Alert', 'Large Area Motion')
+    assert store.counts(exclude_types=hidden) == {'total_alerts': 2, 'handled_alerts': 1, 'unhandled_alerts': 1}
+    assert store.counts()['total_alerts'] == 3
+
+    assert store.set_handled(42, False) is True
+    assert 'handled_time' not in store.get(42)
+    assert store.counts()['handled_alerts'] == 0
+
+    recent = store.recent(10, exclude_types=hidden)
+    assert [a['id'] for a in recent] == ['uuid-2', 42]
+    print("处理状态与计数测试通过")
+
+
+def test_last_time_by_type():
+    """测试按类型记录最近告警时间（音频告警判断附近是否有行为告警）"""
+    store = AlertStore()
+    now = time.time()
+    store.add(make_alert(0, 'Fall Detection'), timestamp=now - 10)
+    store.add(make_alert(1, 'Classroom Noise'), timestamp=now)
+    assert store.last_time(['Fighting Detection']) is None
+    assert store.last_time(['Fighting Detection', 'Fall Detection']) == now - 10
+    print("按类型最近时间测试通过")
+
+
+if __name__ == "__main__":
+    test_eviction_and_spill()
+    test_submitted_alerts_not_spilled()
+    test_handle_and_counts()
+    test_last_time_by_type()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+告警延迟追踪测试 - 验证捕获时间戳随帧传递、告警 trace 的各阶段偏移、
+入库/送达阶段只记一次，以及按告警类型汇总的延迟分布
+"""
+
+import sys
+import os
+import json
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+
+from metrics import MetricsRegistry
+from alert_tracing import AlertLatencyTracker, make_trace, new_trace_id
+from frame_ring_buffer import FrameRingBuffer
+
+
+def test_capture_time_travels_with_frame():
+    """测试提交时指定的单调时钟时间戳原样出现在读取方的帧引用上"""
+    ring = FrameRingBuffer(2)
+    slot = ring.acquire_write()
+    frame = np.zeros((4, 4, 3), dtype=np.uint8)
+    ring.commit(slot, frame, None, 1, timestamp=1700000000.0, capture_time=123.5)
+    with ring.wait_next(-1, timeout=0.1) as ref:
+        assert ref.capture_time == 123.5 and ref.timestamp == 1700000000.0
+
+    # 未指定时取提交时刻的单调时钟
+    before = time.monotonic()
+    ring.commit(ring.acquire_write(), frame, None, 2)
+    with ring.latest() as ref:
+        assert before <= ref.capture_time <= time.monotonic()
+
+
+def test_trace_stages_and_latency_distribution():
+    """测试告警 trace 的阶段偏移、补记阶段只记第一次，以及按类型和阶段的延迟分布"""
+    registry = MetricsRegistry()
+    tracker = AlertLatencyTracker(registry)
+
+    captured = 1000.0
+    marks = {'features': captured + 0.010, 'detection': captured + 0.030, 'recognition': captured + 0.040}
+    trace = make_trace(new_trace_id(), captured, 1700000000.0, marks)
+    assert len(trace['trace_id']) == 16
+    assert {k: round(v, 3) for k, v in trace['stages_ms'].items()} == {'features': 10.0, 'detection': 30.0,
+                                                                         'recognition': 40.0}
+    tracker.record(trace, 'Fall Detection')
+
+    assert round(tracker.mark(trace, 'db', 'Fall Detection', now=captured + 0.250), 3) == 250.0
+    assert tracker.mark(trace, 'db', 'Fall Detection', now=captured + 9.0) is None  # 重复补记被忽略
+    assert tracker.mark(None, 'db', 'Fall Detection') is None  # 没有 trace 的告警（如音频告警）
+    tracker.mark(trace, 'notified', 'Fall Detection', now=captured + 0.600)
+    json.dumps(trace)  # trace 随告警返回给前端、写入数据库，必须可序列化
+
+    for k in range(9):
+        other = make_trace(new_trace_id(), captured, 0.0, {'recognition': captured + 0.001 * (k + 1)})
+        tracker.record(other, 'Fighting Detection')
+        tracker.mark(other, 'db', 'Fighting Detection', now=captured + 0.1 * (k + 1))
+
+    stats = tracker.get_stats()
+    assert list(stats) == ['features', 'detection', 'recognition', 'db', 'notified']
+    assert stats['db']['Fall Detection']['count'] == 1 and abs(stats['db']['Fall Detection']['p50_ms'] - 250) < 1e-6
+    assert stats['db']['Fighting Detection']['count'] == 9
+    assert abs(stats['db']['Fighting Detection']['p50_ms'] - 500) < 1e-6
+    assert abs(stats['db']['Fighting Detection']['max_ms'] - 900) < 1e-6
+    assert 'Fighting Detection' not in stats['notified']
+
+    fall_only = tracker.get_stats('Fall Detection')
+    assert all(set(by_type) == {'Fall Detection'} for by_type in fall_only.values())
+    assert 'alert_latency_seconds{stage="notified",type="Fall Detection",quantile="0.5"} 0.6' in registry.render()
+
+
+if __name__ == "__main__":
+    print("告警延迟追踪测试...")
+    test_capture_time_travels_with_frame()
+    test_trace_stages_and_latency_distribution()
+    print("所有测试通过")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+自适应处理节奏测试 - 验证画面活跃时分析和AI检测间隔缩短、安静后衰减回空闲节奏，
+以及超出CPU预算时间隔按比例拉长
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from cadence_controller import CadenceController
+
+
+def run(controller, frames, features=None, person_count=0, process_time=0.001, ai_time=0.001, fps=25):
+    """模拟处理线程：返回参与分析的帧数和AI检测次数"""
+    processed, ai_runs = 0, 0
+    for frame_id in frames:
+        if not controller.should_process(frame_id):
+            continue
+        processed += 1
+        run_ai = controller.should_run_ai(frame_id)
+        ai_runs += run_ai
+        controller.observe(frame_id, features, person_count, process_time, ai_time if run_ai else None, fps)
+    return processed, ai_runs
+
+
+def test_cadence_follows_activity():
+    """测试空闲→活跃→安静三个阶段的节奏变化"""
+    controller = CadenceController(idle_process_every=6, idle_ai_interval=60, busy_ai_interval=5, cpu_budget=0)
+    processed, ai_runs = run(controller, range(0, 300))
+    assert controller.process_every == 6 and controller.ai_interval == 60
+    assert processed == 50 and ai_runs == 5
+
+    busy = {'flow_mean_magnitude': 3.0, 'motion_area_ratio': 0.2}
+    processed, ai_runs = run(controller, range(300, 600), busy, person_count=4)
+    assert controller.process_every == 1 and controller.ai_interval == 5
+    assert processed >= 290 and ai_runs >= 55
+
+    run(controller, range(600, 1200), {'flow_mean_magnitude': 0.0})
+    assert controller.process_every == 6 and controller.ai_interval == 60, "安静后应衰减回空闲节奏"
+
+    controller.observe(1200, {'foreground_ratio': 0.05})
+    assert 0.49 < controller.activity < 0.51 and controller.process_every == 4
+    print(f"节奏统计: {controller.get_stats()}")
+
+
+def test_cpu_budget_limits_cadence():
+    """测试单帧耗时较大时，繁忙节奏被预算拉长，CPU占用不超过预算"""
+    controller = CadenceController(idle_process_every=12, idle_ai_interval=120, busy_ai_interval=5, cpu_budget=0.5)
+    busy = {'flow_mean_magnitude': 5.0}
+    run(controller, range(0, 600), busy, person_count=5, process_time=0.04, ai_time=0.1, fps=25)
+    stats = controller.get_stats()
+    assert stats['budget_limited'] and stats['cpu_usage'] <= 0.5
+    assert controller.process_every > 1 and controller.ai_interval > 5
+    print(f"预算限制后: 每 {controller.process_every} 帧分析一次，AI间隔 {controller.ai_interval}，"
+          f"CPU占用 {stats['cpu_usage']:.2f}")
+
+
+if __name__ == "__main__":
+    test_cadence_follows_activity()
+    test_cpu_budget_limits_cadence()
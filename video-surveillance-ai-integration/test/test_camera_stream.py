@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+多路摄像头注册测试 - 验证视频源解析和注册表行为
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from camera_stream import CameraStream, CameraRegistry, parse_camera_sources
+
+
+def test_parse_camera_sources():
+    """测试多路视频源参数解析"""
+    assert parse_camera_sources(None, '0') == [('cam0', '0')]
+    assert parse_camera_sources('a.mp4, 1') == [('cam0', 'a.mp4'), ('cam1', '1')]
+
+    entries = parse_camera_sources('front=rtmp://host/live/a?key=1,back=2')
+    assert entries == [('front', 'rtmp://host/live/a?key=1'), ('back', '2')]
+    # URL查询参数中的等号不能被当作ID分隔符
+    assert parse_camera_sources('rtmp://host/live?token=x') == [('cam0', 'rtmp://host/live?token=x')]
+
+    # 按位置命名的ID与显式ID冲突时改名，显式ID重复时报错
+    assert parse_camera_sources('a.mp4,cam0=b.mp4') == [('cam0_2', 'a.mp4'), ('cam0', 'b.mp4')]
+    for sources in ('front=0,front=1', '=0'):
+        try:
+            parse_camera_sources(sources)
+            assert False, f"应拒绝: {sources}"
+        except ValueError:
+            pass
+    print("视频源解析测试通过")
+
+
+def test_camera_registry():
+    """测试摄像头注册表"""
+    registry = CameraRegistry()
+    registry.register(CameraStream('front', '0', None, None))
+    registry.register(CameraStream('back', '1', None, None))
+
+    assert len(registry) == 2
+    assert registry.ids() == ['front', 'back']
+    assert registry.default.cam_id == 'front'
+    assert registry.get('back').source == '1'
+    assert registry.get('missing') is None
+
+    try:
+        registry.register(CameraStream('front', '2', None, None))
+        assert False, "重复ID应抛出ValueError"
+    except ValueError:
+        pass
+
+    stats = registry.get('back').get_stats()
+    assert stats['cam_id'] == 'back' and stats['frame_count'] == 0
+    print("摄像头注册表测试通过")
+
+
+if __name__ == "__main__":
+    test_parse_camera_sources()
+    test_camera_registry()
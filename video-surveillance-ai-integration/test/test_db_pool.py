@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据库连接池测试 - 验证连接复用、上限与等待、健康检查、空闲回收，以及SQLite告警库的连接池模式
+"""
+
+import sys
+import os
+import time
+import tempfile
+import threading
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from models.alert.db_pool import ConnectionPool
+from models.alert.alert_database import AlertDatabase
+from models.alert.alert_event import AlertEvent
+from models.alert.alert_rule import AlertLevel
+
+
+class FakeConnection:
+    """假连接：记录是否关闭，alive 为 False 时 ping 失败"""
+
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+
+    def ping(self):
+        if not self.alive:
+            raise ConnectionError("连接已断开")
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    created = []
+
+    def connect():
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+
+    return ConnectionPool(connect, ping_fn=lambda conn: conn.ping(), **kwargs), created
+
+
+def test_reuse_and_limit():
+    """测试连接被复用，借满后其他线程等待并计入 waiters"""
+    pool, created = make_pool(max_size=2, acquire_timeout=2.0)
+    for _ in range(5):
+        with pool.connection():
+            pass
+    assert len(created) == 1, "顺序操作应复用同一个连接"
+
+    first = pool.acquire()
+    second = pool.acquire()
+    acquired = []
+
+    def waiter():
+        with pool.connection() as conn:
+            acquired.append(conn)
+
+    t = threading.Thread(target=waiter)
+    t.start()
+    time.sleep(0.1)
+    stats = pool.get_stats()
+    assert stats['in_use'] == 2 and stats['waiters'] == 1
+    pool.release(first)
+    t.join(timeout=2.0)
+    pool.release(second)
+
+    assert acquired == [first]
+    assert len(created) == 2
+    assert pool.get_stats()['max_wait_ms'] >= 50
+    print(f"复用与上限测试通过: {pool.get_stats()}")
+
+
+def test_timeout():
+    """测试连接池满且无人归还时抛出 TimeoutError"""
+    pool, _ = make_pool(max_size=1, acquire_timeout=0.05)
+    conn = pool.acquire()
+    try:
+        pool.acquire()
+        assert False, "应等待超时"
+    except TimeoutError:
+        pass
+    pool.release(conn)
+    assert pool.get_stats()['timeout_count'] == 1
+    print("超时测试通过")
+
+
+def test_health_check_and_recycle():
+    """测试失效连接在借出前被替换，闲置过久的连接被回收"""
+    pool, created = make_pool(health_check_interval=0.0, idle_timeout=0.2)
+    with pool.connection() as conn:
+        pass
+    conn.alive = False
+    with pool.connection() as conn2:
+        assert conn2 is not conn
+    assert conn.closed and pool.get_stats()['discarded_count'] == 1
+
+    time.sleep(0.3)
+    with pool.connection() as conn3:
+        assert conn3 is not conn2
+    assert conn2.closed and pool.get_stats()['recycled_count'] == 1
+
+    # 块内出错且连接已失效时不再放回池中
+    try:
+        with pool.connection() as conn4:
+            conn4.alive = False
+            raise RuntimeError("查询失败")
+    except RuntimeError:
+        pass
+    assert conn4.closed and pool.get_stats()['size'] == 0
+    print("健康检查与回收测试通过")
+
+
+def test_sqlite_pooled_mode():
+    """测试SQLite告警库在连接池模式下多线程读写"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database = AlertDatabase(os.path.join(tmp_dir, 'alerts.db'), pool_size=3)
+
+        def writer(n):
+            for i in range(n):
+                event = AlertEvent.create('rule_test', AlertLevel.ALERT, 'medium', 'test', f'告警{i}', {}, i)
+                assert database.save_alert_event(event, {'frame': f'frame_{i}.jpg'})
+
+        threads = [threading.Thread(target=writer, args=(10,)) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert database.get_alert_count() == 40
+        events = database.get_alert_events(limit=5)
+        assert len(events) == 5 and events[0]['images']
+        stats = database.get_pool_stats()
+        assert stats['size'] <= 3 and stats['created_count'] <= 3
+        database.close()
+    print(f"SQLite连接池模式测试通过: {stats}")
+
+
+if __name__ == "__main__":
+    test_reuse_and_limit()
+    test_timeout()
+    test_health_check_and_recycle()
+    test_sqlite_pooled_mode()
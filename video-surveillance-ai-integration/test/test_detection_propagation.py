@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+检测结果传播测试 - 验证两次AI检测之间人员框按光流跟随目标移动、静止目标的框不动，
+以及置信度衰减后要求重新检测
+"""
+
+import sys
+import os
+import cv2
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from models.motion.motion_manager import MotionFeatureManager
+from detection_propagation import DetectionPropagator, box_flow_shift
+
+
+def moving_scene(count, speed=(5, 2), scale=1, seed=0):
+    """静态纹理背景上一个移动方块（“行人”）和一个静止方块"""
+    rng = np.random.default_rng(seed)
+    background = cv2.GaussianBlur(rng.integers(0, 255, (480, 640), dtype=np.uint8), (5, 5), 0)
+    walker = cv2.GaussianBlur(rng.integers(0, 255, (120, 60), dtype=np.uint8), (5, 5), 0)
+    for k in range(count):
+        gray = background.copy()
+        x, y = 100 + k * speed[0], 150 + k * speed[1]
+        gray[y:y + 120, x:x + 60] = walker
+        gray[300:420, 500:560] = 255 - walker
+        if scale != 1:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale)
+        yield np.dstack([gray] * 3), (x * scale, y * scale)
+
+
+def run_propagation(manager, frames, scale=1):
+    propagator = DetectionPropagator(decay=0.95, refresh_confidence=0.3)
+    for k, (frame, (x, y)) in enumerate(frames):
+        features = manager.extract_features(frame)
+        if k == 0:
+            propagator.reset([
+                {'bbox': [x, y, x + 60 * scale, y + 120 * scale], 'class': 'person', 'confidence': 0.9},
+                {'bbox': [500 * scale, 300 * scale, 560 * scale, 420 * scale], 'class': 'person', 'confidence': 0.9},
+                {'bbox': [0, 0, 50, 50], 'class': 'chair', 'confidence': 0.9}])
+            continue
+        detections = propagator.propagate(features, (frame.shape[1], frame.shape[0]))
+    return propagator, detections, (x, y)
+
+
+def test_boxes_follow_flow():
+    """测试移动目标的框跟随位移（误差在2像素内），静止目标的框不动，非人员类别不传播"""
+    propagator, detections, (x, y) = run_propagation(MotionFeatureManager(use_contour=False), moving_scene(11))
+    assert len(detections) == 2 and all(det['propagated'] for det in detections)
+    assert detections[0]['propagated_frames'] == 10
+    assert np.abs(np.subtract(detections[0]['bbox'], [x, y, x + 60, y + 120])).max() <= 2
+    assert detections[1]['bbox'] == [500, 300, 560, 420]
+    assert abs(detections[0]['confidence'] - 0.9 * 0.95 ** 10) < 1e-9
+    assert not propagator.needs_refresh()
+    print(f"传播10帧后框: {detections[0]['bbox']}，实际位置: {[x, y, x + 60, y + 120]}")
+
+
+def test_propagation_at_analysis_resolution():
+    """测试光流在缩小的分析分辨率上计算时，位移换算回输入帧坐标"""
+    manager = MotionFeatureManager(use_contour=False, flow_width=320)
+    _, detections, (x, y) = run_propagation(manager, moving_scene(6, scale=2), scale=2)
+    assert np.abs(np.subtract(detections[0]['bbox'], [x, y, x + 120, y + 240])).max() <= 4
+
+
+def test_refresh_when_confidence_decays():
+    """测试置信度衰减到阈值以下、或传播次数达到上限时要求重新检测"""
+    propagator = DetectionPropagator(decay=0.5, refresh_confidence=0.3, max_age=5)
+    assert not propagator.needs_refresh()
+    propagator.reset([{'bbox': [0, 0, 10, 10], 'class': 'Person', 'confidence': 0.8}])
+    propagator.propagate()
+    assert not propagator.needs_refresh()
+    propagator.propagate()
+    assert propagator.needs_refresh(), "0.5*0.5=0.25 低于原始置信度的0.3倍"
+
+    # 按相对原始置信度判断：原始置信度偏低的检测不会几帧后就要求重新检测
+    propagator = DetectionPropagator()
+    propagator.reset([{'bbox': [0, 0, 10, 10], 'class': 'person', 'confidence': 0.35}])
+    for _ in range(23):
+        propagator.propagate()
+    assert not propagator.needs_refresh(), "0.95**23≈0.307，仍在原始置信度的0.3倍以上"
+    propagator.propagate()
+    assert propagator.needs_refresh()
+
+    propagator = DetectionPropagator(decay=1.0, max_age=3)
+    propagator.reset([{'bbox': [0, 0, 10, 10], 'class': 'person', 'confidence': 0.8}])
+    for _ in range(3):
+        propagator.propagate()
+    assert propagator.needs_refresh()
+    propagator.reset([])
+    assert not propagator.needs_refresh() and propagator.propagate() == []
+
+    flow = np.zeros((100, 100, 2), dtype=np.float32)
+    flow[20:40, 20:30] = (3.0, -1.0)
+    assert box_flow_shift(flow, [10, 10, 50, 50]) == (3.0, -1.0)
+    assert box_flow_shift(flow, [60, 60, 90, 90]) == (0.0, 0.0)
+    print("重新检测条件测试通过")
+
+
+if __name__ == "__main__":
+    test_boxes_follow_flow()
+    test_propagation_at_analysis_resolution()
+    test_refresh_when_confidence_decays()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+光流进程池测试 - 验证进程池结果与进程内计算一致，且前一帧状态正确
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import multiprocessing as mp
+
+import cv2
+import numpy as np
+
+from models.motion.motion_manager import MotionFeatureManager
+from models.motion.flow_pool import FlowWorkerPool
+
+
+def create_frames(count=4, width=160, height=120):
+    """生成带移动方块的测试帧"""
+    frames = []
+    for i in range(count):
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        cv2.rectangle(frame, (20 + i * 6, 30), (60 + i * 6, 80), (255, 255, 255), -1)
+        frames.append(frame)
+    return frames
+
+
+def test_pool_matches_inline():
+    """测试进程池和进程内计算结果一致"""
+    frames = create_frames()
+    inline = MotionFeatureManager(use_contour=False)
+    with FlowWorkerPool(num_workers=2, max_width=160, max_height=120) as pool:
+        pooled = MotionFeatureManager(use_contour=False, flow_pool=pool)
+        for frame in frames:
+            expected = inline.extract_features(frame)
+            actual = pooled.extract_features(frame)
+            if 'optical_flow' not in expected:
+                assert 'optical_flow' not in actual
+                continue
+            assert np.allclose(expected['optical_flow'], actual['optical_flow'])
+            assert np.allclose(expected['flow_magnitude'], actual['flow_magnitude'])
+            assert len(expected['motion_vectors']) == len(actual['motion_vectors']) > 0
+        assert pool.get_stats()['task_count'] == len(frames) - 1
+        assert pool.get_stats()['free_slots'] == pool.num_slots
+    print("进程池结果一致性测试通过")
+
+
+def test_oversized_frame_falls_back():
+    """测试超出槽位容量的帧回退到进程内计算"""
+    frames = create_frames(width=320, height=240)
+    with FlowWorkerPool(num_workers=1, max_width=160, max_height=120) as pool:
+        manager = MotionFeatureManager(use_contour=False, flow_pool=pool)
+        for frame in frames:
+            manager.extract_features(frame)
+        assert pool.get_stats()['task_count'] == 0
+    print("超大帧回退测试通过")
+
+
+def test_slot_held_until_task_finishes():
+    """测试 get() 超时后槽位仍被占用，任务真正完成后才归还"""
+    width, height = 1920, 1080
+    frames = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+              for frame in create_frames(count=2, width=width, height=height)]
+    with FlowWorkerPool(num_workers=1, max_width=width, max_height=height, num_slots=1) as pool:
+        task = pool.submit(frames[0], frames[1])
+        try:
+            task.get(timeout=0.001)
+        except mp.TimeoutError:
+            # 工作进程可能仍在写槽位，不能提前归还
+            assert pool.get_stats()['free_slots'] == 0
+        flow, mag, ang, motion_vectors = task.get()
+        assert flow.shape == (height, width, 2)
+        assert pool.get_stats()['free_slots'] == 1
+        # 再次 get 返回同一份结果，不重复归还槽位
+        assert task.get()[0] is flow
+        assert pool.get_stats()['free_slots'] == 1
+    print("槽位释放时机测试通过")
+
+
+if __name__ == "__main__":
+    test_pool_matches_inline()
+    test_oversized_frame_falls_back()
+    test_slot_held_until_task_finishes()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+光流分析分辨率测试 - 验证按固定分析宽度计算光流时，同一场景在不同摄像头分辨率下
+得到的幅值和运动面积一致，并与参考分辨率（640宽）下的原始统计接近
+"""
+
+import sys
+import os
+import time
+import cv2
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from models.motion import motion_manager as motion_module
+from models.motion.motion_manager import MotionFeatureManager
+from danger_recognizer import DangerRecognizer
+
+
+def scene(count, scale=1, seed=0):
+    """640x480 的纹理场景（一个方块水平移动），按 scale 倍放大"""
+    rng = np.random.default_rng(seed)
+    background = cv2.GaussianBlur(rng.integers(0, 255, (480, 640), dtype=np.uint8), (5, 5), 0)
+    patch = cv2.GaussianBlur(rng.integers(0, 255, (120, 120), dtype=np.uint8), (5, 5), 0)
+    for k in range(count):
+        gray = background.copy()
+        x = 200 + k * 4
+        gray[180:300, x:x + 120] = patch
+        if scale != 1:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
+        yield np.dstack([gray] * 3)
+
+
+def last_stats(manager, frames):
+    recognizer = DangerRecognizer({'save_alerts': False})
+    start = time.time()
+    for frame in frames:
+        features = manager.extract_features(frame)
+    elapsed = (time.time() - start) * 1000
+    stats = recognizer._extract_motion_stats(features, (frame.shape[1], frame.shape[0]))
+    return features, stats, elapsed
+
+
+def test_stats_independent_of_resolution():
+    """测试 640 与 1920 宽输入在 flow_width=320 下统计一致，且与 640 宽原始统计接近"""
+    reference, reference_stats, reference_ms = last_stats(MotionFeatureManager(use_contour=False), scene(4))
+    small, small_stats, _ = last_stats(MotionFeatureManager(use_contour=False, flow_width=320), scene(4))
+    large, large_stats, large_ms = last_stats(
+        MotionFeatureManager(use_contour=False, flow_width=320), scene(4, scale=3))
+
+    assert large['flow_magnitude'].shape == (240, 320) and abs(large['flow_scale'] - 1 / 6) < 1e-9
+    for key in ('avg_magnitude', 'max_magnitude', 'motion_area'):
+        assert abs(large_stats[key] - small_stats[key]) <= 0.15 * small_stats[key], key
+        assert abs(large_stats[key] - reference_stats[key]) <= 0.3 * reference_stats[key], key
+    assert abs(np.median(large['motion_vectors']['fx']) - 4) < 1, "位移按参考帧宽的像素表示"
+    assert large['motion_vectors']['x'].max() > 640, "运动矢量坐标为输入帧坐标"
+    print(f"640宽原始: {reference_ms:.1f}ms，1920宽按320分析: {large_ms:.1f}ms，"
+          f"平均幅值 {reference_stats['avg_magnitude']:.3f} / {large_stats['avg_magnitude']:.3f}，"
+          f"运动面积 {reference_stats['motion_area']:.4f} / {large_stats['motion_area']:.4f}")
+
+
+def test_default_mode_unchanged():
+    """测试未设置 flow_width 时统计与原来的计算方式一致"""
+    manager = MotionFeatureManager(use_contour=False)
+    for frame in scene(3):
+        features = manager.extract_features(frame)
+    assert features['flow_scale'] == 1.0
+    assert features['motion_area_ratio'] * 640 * 480 == len(features['motion_vectors']) * 16 * 16
+    print("默认模式统计不变")
+
+
+def test_vectors_sampled_once_with_consistent_units():
+    """测试按分析宽度计算时每帧只采样一次运动矢量（整帧和门控区域两种路径），
+    flow_magnitude 数组乘以 flow_unit 后与 flow_mean_magnitude 单位一致"""
+    original = motion_module.sample_motion_vectors
+    calls = []
+
+    def counting_sample(*args, **kwargs):
+        calls.append(args[2:] or kwargs)
+        return original(*args, **kwargs)
+
+    motion_module.sample_motion_vectors = counting_sample
+    try:
+        for roi_gating in (False, True):
+            manager = MotionFeatureManager(use_contour=False, flow_width=320, roi_gating=roi_gating)
+            calls.clear()
+            for frame in scene(3, scale=3):
+                features = manager.extract_features(frame)
+            assert len(calls) == 2, f"roi_gating={roi_gating}: 采样 {len(calls)} 次"
+            assert calls[-1] == (8, 0.5), "步长和阈值按分析宽度换算（320宽：16/2、1/2）"
+            assert features['flow_unit'] == 2.0
+            assert abs(features['flow_magnitude'].mean() * features['flow_unit']
+                       - features['flow_mean_magnitude']) < 1e-3
+    finally:
+        motion_module.sample_motion_vectors = original
+    print("运动矢量单次采样测试通过")
+
+
+if __name__ == "__main__":
+    test_stats_independent_of_resolution()
+    test_default_mode_unchanged()
+    test_vectors_sampled_once_with_consistent_units()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+帧环形缓冲测试 - 验证序列号、引用计数保护和落后跳帧
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+
+from frame_ring_buffer import FrameRingBuffer
+
+
+def write_frame(ring, value):
+    """向缓冲写入一帧，像素值为 value"""
+    slot = ring.acquire_write()
+    if slot is None:
+        return None
+    frame = slot.buffer('raw', (4, 4, 3))
+    frame[...] = value
+    return ring.commit(slot, frame, None, frame_id=value)
+
+
+def test_sequence_and_zero_copy():
+    """测试按序读取，且读到的是槽位内存而非拷贝"""
+    ring = FrameRingBuffer(num_slots=4)
+    for i in range(3):
+        write_frame(ring, i)
+
+    ref = ring.wait_next(-1, timeout=0.1)
+    assert ref.seq == 0 and ref.frame_id == 0
+    assert ref.process_frame is ref.frame and ref.original_frame is None
+    assert np.shares_memory(ref.frame, ring.slots[ref._slot.index].buffer('raw'))
+    ref.release()
+
+    ref = ring.wait_next(0, timeout=0.1)
+    assert ref.seq == 1
+    ref.release()
+    assert ring.wait_next(2, timeout=0.05) is None
+    print("序列号与零拷贝测试通过")
+
+
+def test_referenced_slot_not_overwritten():
+    """测试被引用的槽位不会被覆盖，所有槽位被占用时丢帧"""
+    ring = FrameRingBuffer(num_slots=2)
+    write_frame(ring, 1)
+    held = ring.wait_next(-1, timeout=0.1)
+
+    # 只剩一个空闲槽位，反复写入都不能碰到被持有的帧
+    for value in range(2, 6):
+        write_frame(ring, value)
+    assert held.frame.min() == 1 and held.frame.max() == 1
+
+    latest = ring.latest()
+    assert latest.frame_id == 5
+    # 两个槽位都被持有，写入应被丢弃
+    assert write_frame(ring, 6) is None
+    assert ring.get_stats()['write_drops'] == 1
+
+    held.release()
+    latest.release()
+    assert write_frame(ring, 7) is not None
+    print("引用计数保护测试通过")
+
+
+def test_max_lag_skips_old_frames():
+    """测试读取方落后时跳帧并统计"""
+    ring = FrameRingBuffer(num_slots=8)
+    for i in range(8):
+        write_frame(ring, i)
+    first = ring.wait_next(-1, timeout=0.1)
+    first.release()
+    ref = ring.wait_next(first.seq, timeout=0.1, max_lag=2)
+    assert ref.seq == 5
+    ref.release()
+    assert ring.get_stats()['read_skips'] == 4
+    print("落后跳帧测试通过")
+
+
+
+def test_retain_keeps_slot():
+    """测试 retain() 增加的引用单独释放，两个引用都释放后槽位才可写"""
+    ring = FrameRingBuffer(num_slots=2)
+    write_frame(ring, 1)
+    ref = ring.wait_next(-1, timeout=0.1)
+    held = ref.retain()
+    assert held.frame_id == 1 and ring.slots[ref._slot.index].refcount == 2
+    ref.release()
+    ref.release()  # 重复释放无效
+    write_frame(ring, 2)
+    write_frame(ring, 3)
+    assert held.frame[0, 0, 0] == 1, "被 retain 的槽位不能被覆盖"
+    held.release()
+    write_frame(ring, 4)
+    assert held.frame[0, 0, 0] == 4, "全部释放后槽位可以复用"
+    print("retain 引用测试通过")
+
+
+if __name__ == "__main__":
+    test_sequence_and_zero_copy()
+    test_referenced_slot_not_overwritten()
+    test_max_lag_skips_old_frames()
+    test_retain_keeps_slot()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+批量推理调度测试 - 用假模型验证多路请求合并成批次并按顺序分发结果，
+单路时不等待凑批，以及模型结果数与输入不一致时调用方立即得到异常
+"""
+
+import sys
+import os
+import time
+import threading
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from inference_scheduler import InferenceScheduler
+
+
+class FakeModel:
+    """假检测模型：记录每次调用的批大小，结果为输入帧本身"""
+
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.calls = []
+
+    def __call__(self, frames, verbose=False):
+        self.calls.append(len(frames))
+        time.sleep(self.delay)
+        return list(frames)
+
+
+def test_batching_across_streams():
+    """测试多路并发请求被合并到同一批次"""
+    model = FakeModel()
+    scheduler = InferenceScheduler(model, lambda results: results[0], max_batch=4, max_wait_ms=50)
+    scheduler.start()
+
+    outputs = {}
+
+    def worker(i):
+        outputs[i] = scheduler.infer(f"frame-{i}", timeout=2.0)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    scheduler.stop()
+
+    # 每个调用方拿到的是自己那一帧的结果
+    assert outputs == {i: f"frame-{i}" for i in range(8)}
+    assert max(model.calls) > 1, f"请求未被合并: {model.calls}"
+    assert all(size <= 4 for size in model.calls)
+
+    stats = scheduler.get_stats()
+    assert stats['frame_count'] == 8
+    assert sum(int(k) * v for k, v in stats['batch_size_histogram'].items()) == 8
+    print(f"批量推理测试通过，批次: {model.calls}")
+
+
+def test_model_error_propagates():
+    """测试模型异常会传递给该批次的所有调用方"""
+    def broken(frames, verbose=False):
+        raise RuntimeError("boom")
+
+    scheduler = InferenceScheduler(broken, lambda results: results[0], max_batch=2, max_wait_ms=10)
+    scheduler.start()
+    try:
+        scheduler.infer("frame", timeout=2.0)
+        assert False, "应抛出模型异常"
+    except RuntimeError:
+        pass
+    finally:
+        scheduler.stop()
+    assert scheduler.get_stats()['error_count'] == 1
+    print("异常传递测试通过")
+
+
+def test_single_stream_dispatches_immediately():
+    """测试只有一路视频时不等待 max_wait_ms 凑批"""
+    model = FakeModel(delay=0.0)
+    scheduler = InferenceScheduler(model, lambda results: results[0], max_batch=8, max_wait_ms=500, num_streams=1)
+    scheduler.start()
+    try:
+        start = time.time()
+        for i in range(3):
+            assert scheduler.infer(f"frame-{i}", timeout=2.0) == f"frame-{i}"
+        elapsed = time.time() - start
+    finally:
+        scheduler.stop()
+    assert model.calls == [1, 1, 1]
+    assert elapsed < 0.5, f"单路请求不应等待凑批: {elapsed:.3f}s"
+    print("单路不等待测试通过")
+
+
+def test_result_count_mismatch_fails_fast():
+    """测试模型返回的结果少于输入帧数时，所有调用方立即得到异常而不是等到超时"""
+    def short(frames, verbose=False):
+        return list(frames)[:-1]
+
+    scheduler = InferenceScheduler(short, lambda results: results[0], max_batch=2, max_wait_ms=200, num_streams=2)
+    scheduler.start()
+    errors = []
+
+    def worker(i):
+        try:
+            scheduler.infer(f"frame-{i}", timeout=5.0)
+        except RuntimeError as e:
+            errors.append(e)
+
+    start = time.time()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    scheduler.stop()
+    assert len(errors) == 2
+    assert time.time() - start < 2.0
+    print("结果数不一致测试通过")
+
+
+if __name__ == "__main__":
+    test_batching_across_streams()
+    test_model_error_propagates()
+    test_single_stream_dispatches_immediately()
+    test_result_count_mismatch_fails_fast()
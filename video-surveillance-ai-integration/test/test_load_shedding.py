@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+过载降级测试 - 验证过载时按顺序逐级降级、余量恢复后逐级还原、
+AI检测间隔不低于最低检测频率，以及降级对运动分析和视频流编码设置的调整
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+
+from load_shedding import LoadShedController, SHED_FLOW_WIDTH_MIN, SHED_STREAM_QUALITY
+from camera_stream import CameraStream
+
+
+def _run_windows(shedder, count, busy_time, start, backlog=0, frames=10):
+    """按每窗口 frames 帧、每帧耗时 busy_time 喂入 count 个1秒窗口，返回结束时刻"""
+    for window in range(count):
+        for k in range(1, frames + 1):
+            shedder.observe(busy_time, backlog, now=start + window + k / frames)
+    return start + count
+
+
+def test_escalate_and_restore_in_order():
+    """测试持续过载时逐级降级、持续有余量时逐级还原（滞回）"""
+    shedder = LoadShedController(escalate_windows=2, restore_windows=5)
+    shedder.observe(0.0, now=0.0)  # 第一个窗口从首帧开始计时
+    now = _run_windows(shedder, 1, 0.05, 0.0)
+    assert shedder.level == 0
+
+    # 每帧耗时 0.12s、每秒10帧：占用 120%，每两个窗口升一级，直到最高级
+    levels = []
+    for _ in range(6):
+        now = _run_windows(shedder, 2, 0.12, now)
+        levels.append(shedder.level)
+    assert levels == [1, 2, 3, 4, 5, 5]
+    assert shedder.get_stats()['level_name'] == 'lower_stream_quality'
+    assert shedder.get_stats()['utilization'] > 0.9
+
+    # 介于两个阈值之间：保持不变
+    now = _run_windows(shedder, 10, 0.075, now)
+    assert shedder.level == 5
+
+    # 占用 30%：每五个窗口还原一级
+    now = _run_windows(shedder, 4, 0.03, now)
+    assert shedder.level == 5
+    now = _run_windows(shedder, 1, 0.03, now)
+    assert shedder.level == 4
+    now = _run_windows(shedder, 20, 0.03, now)
+    assert shedder.level == 0
+    stats = shedder.get_stats()
+    assert stats['escalations'] == 5 and stats['restorations'] == 5
+
+    # 耗时不高但处理落后跳帧、或积压过多，同样视为过载
+    shedder.note_skipped(3)
+    now = _run_windows(shedder, 1, 0.01, now)
+    _run_windows(shedder, 1, 0.01, now, backlog=5)
+    assert shedder.level == 1
+
+
+def test_ai_interval_keeps_minimum_check_rate():
+    """测试拉长AI检测间隔时不低于最低检测频率，基础间隔本身更长时保持不变"""
+    shedder = LoadShedController(ai_interval_factor=3, min_check_fps=1.0)
+    assert shedder.ai_interval(5, 30) == 5
+    shedder.level = 3
+    assert shedder.ai_interval(5, 30) == 15  # 5 × 3
+    assert shedder.ai_interval(20, 30) == 30  # 受 30fps / 1次每秒 限制
+    assert shedder.ai_interval(60, 30) == 60  # 基础间隔已超过限制
+    assert shedder.ai_interval(5, 0) == 15  # 帧率未知时只按倍数拉长
+
+
+def test_camera_applies_and_restores_settings():
+    """测试摄像头按降级级别调整运动历史、光流分析宽度和视频流质量，级别回落后还原"""
+    class FakeMotionManager:
+        use_motion_history = True
+        flow_width = None
+        prev_gray = np.zeros((480, 640), dtype=np.uint8)
+
+    shedder = LoadShedController()
+    motion_manager = FakeMotionManager()
+    camera = CameraStream('front', '0', motion_manager, None, load_shedder=shedder)
+
+    shedder.level = 2
+    camera.apply_load_shedding()
+    assert motion_manager.use_motion_history is False
+    assert motion_manager.flow_width == 320
+    assert camera.broadcaster.quality_limit is None
+
+    shedder.level = 5
+    camera.apply_load_shedding()
+    assert camera.broadcaster.quality_limit == SHED_STREAM_QUALITY
+    assert camera.get_stats()['load_shedding']['level'] == 5
+    assert ('load_shed_level', 'gauge', {'camera': 'front'}, 5) in camera.collect_metrics()
+
+    shedder.level = 0
+    camera.apply_load_shedding()
+    assert motion_manager.use_motion_history is True
+    assert motion_manager.flow_width is None
+    assert camera.broadcaster.quality_limit is None
+
+    # 已设置较小的分析宽度时不低于最小宽度
+    motion_manager.flow_width = 240
+    camera.shed_defaults = None
+    shedder.level = 2
+    camera.apply_load_shedding()
+    assert motion_manager.flow_width == SHED_FLOW_WIDTH_MIN
+
+
+if __name__ == "__main__":
+    print("过载降级测试...")
+    test_escalate_and_restore_in_order()
+    test_ai_interval_keeps_minimum_check_rate()
+    test_camera_applies_and_restores_settings()
+    print("所有测试通过")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+运行指标测试 - 验证步骤耗时的滚动分位数、按摄像头标签区分的句柄、
+计数器和采集函数，以及 Prometheus 文本格式输出
+"""
+
+import sys
+import os
+import re
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from metrics import MetricsRegistry
+
+
+def parse_samples(text):
+    """解析 Prometheus 文本格式为 {'name{labels}': value}"""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        name, value = line.rsplit(' ', 1)
+        samples[name] = float(value)
+    return samples
+
+
+def test_rolling_quantiles_per_camera():
+    """测试每路摄像头的分位数只统计最近 window 个样本，次数和总耗时为累计值"""
+    registry = MetricsRegistry(window=100)
+    cam0, cam1 = registry.scope(camera='cam0'), registry.scope(camera='cam1')
+    for i in range(200):
+        cam0.observe('flow', 1.0 if i < 100 else (i - 100 + 1) / 1000.0)  # 最近100个为 1..100ms
+    cam1.observe('flow', 0.5)
+    with cam1.timer('yolo'):
+        pass
+
+    stats0, stats1 = cam0.snapshot(), cam1.snapshot()
+    assert set(stats0) == {'flow'} and set(stats1) == {'flow', 'yolo'}
+    assert stats0['flow']['count'] == 200
+    assert abs(stats0['flow']['p50_ms'] - 50.5) < 1 and abs(stats0['flow']['p99_ms'] - 99) < 1.5
+    assert stats1['flow']['p95_ms'] == 500 and stats1['yolo']['count'] == 1
+
+    samples = parse_samples(registry.render())
+    assert samples['vsai_step_duration_seconds_count{camera="cam0",step="flow"}'] == 200
+    assert abs(samples['vsai_step_duration_seconds_sum{camera="cam0",step="flow"}'] - (100 + 5.05)) < 1e-6
+    assert abs(samples['vsai_step_duration_seconds{camera="cam0",step="flow",quantile="0.5"}'] - 0.0505) < 1e-3
+
+
+def test_counters_and_collectors_render():
+    """测试丢帧计数按原因累加，采集函数在导出时读取，出错的采集函数被跳过"""
+    registry = MetricsRegistry()
+    cam0 = registry.scope(camera='cam0')
+    cam0.inc('frames_dropped_total', 3, reason='reader_lag')
+    cam0.inc('frames_dropped_total', reason='ring_full')
+    cam0.inc('frames_dropped_total', 2, reason='reader_lag')
+    cam0.inc('frames_dropped_total', 0, reason='stream_client')  # 0 不产生序列
+    depth = {'value': 4}
+    registry.add_collector(lambda: [('queue_depth', 'gauge', {'camera': 'cam0', 'queue': 'frame_ring'},
+                                     depth['value'])])
+    registry.add_collector(lambda: 1 / 0)
+
+    text = registry.render()
+    samples = parse_samples(text)
+    assert samples['vsai_frames_dropped_total{camera="cam0",reason="reader_lag"}'] == 5
+    assert samples['vsai_frames_dropped_total{camera="cam0",reason="ring_full"}'] == 1
+    assert not any('stream_client' in key for key in samples)
+    assert samples['vsai_queue_depth{camera="cam0",queue="frame_ring"}'] == 4
+    depth['value'] = 7
+    assert parse_samples(registry.render())['vsai_queue_depth{camera="cam0",queue="frame_ring"}'] == 7
+
+    # 每个指标只有一行 TYPE，指标名和标签符合 Prometheus 文本格式
+    types = re.findall(r'^# TYPE (\S+) (\S+)$', text, re.M)
+    assert len(types) == len({name for name, _ in types})
+    assert ('vsai_frames_dropped_total', 'counter') in types and ('vsai_queue_depth', 'gauge') in types
+    for key in samples:
+        assert re.match(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_]\w*="[^"]*",?)+\})?$', key), key
+
+
+if __name__ == "__main__":
+    print("运行指标测试...")
+    test_rolling_quantiles_per_camera()
+    test_counters_and_collectors_render()
+    print("所有测试通过")
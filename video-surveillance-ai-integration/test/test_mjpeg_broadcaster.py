@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+MJPEG广播测试 - 验证多个客户端共享同一次编码，慢客户端丢帧而不积压，以及清晰度档位
+"""
+
+import sys
+import os
+import time
+import threading
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import cv2
+import numpy as np
+
+from mjpeg_broadcaster import MJPEGBroadcaster, BOUNDARY_PREFIX, parse_rendition
+
+
+def test_encode_once_for_many_clients():
+    """测试同一帧只编码一次"""
+    broadcaster = MJPEGBroadcaster()
+    broadcaster.publish(np.zeros((48, 64, 3), dtype=np.uint8))
+
+    chunks = [broadcaster.wait_chunk(0, timeout=0.1) for _ in range(5)]
+    assert all(seq == 1 and chunk is chunks[0][1] for seq, chunk in chunks)
+    assert chunks[0][1].startswith(b'--frame\r\n')
+    assert broadcaster.get_stats()['encode_count'] == 1
+
+    # 没有新帧时等待超时
+    assert broadcaster.wait_chunk(1, timeout=0.05) == (1, None)
+    print("单次编码共享测试通过")
+
+
+def test_slow_client_drops_frames():
+    """测试慢客户端只拿最新帧"""
+    broadcaster = MJPEGBroadcaster()
+    received = []
+
+    def slow_client():
+        stream = broadcaster.stream(timeout=0.2)
+        for _ in range(3):
+            next(stream)
+            received.append(broadcaster.encoded[('full', 'high')][0])
+            time.sleep(0.1)
+        stream.close()
+
+    thread = threading.Thread(target=slow_client)
+    thread.start()
+    time.sleep(0.02)
+    for value in range(30):
+        broadcaster.publish(np.full((48, 64, 3), value, dtype=np.uint8))
+        time.sleep(0.01)
+    thread.join(timeout=2.0)
+
+    stats = broadcaster.get_stats()
+    assert stats['subscribers'] == 0
+    assert stats['sent_count'] == 3
+    assert stats['dropped_count'] > 0
+    assert stats['encode_count'] <= 3
+    print(f"慢客户端丢帧测试通过: {stats}")
+
+
+def test_renditions_encoded_lazily():
+    """测试各档位只在被请求时编码，且尺寸正确"""
+    broadcaster = MJPEGBroadcaster()
+    broadcaster.publish(np.zeros((480, 640, 3), dtype=np.uint8))
+
+    _, thumb = broadcaster.wait_chunk(0, timeout=0.1, rendition=('thumb', 'low'))
+    image = cv2.imdecode(np.frombuffer(thumb[len(BOUNDARY_PREFIX):-2], np.uint8), cv2.IMREAD_COLOR)
+    assert image.shape[:2] == (120, 160)
+
+    stats = broadcaster.get_stats()
+    assert stats['encode_counts'] == {'thumb/low': 1}
+    assert parse_rendition('auto', None) == (('full', 'high'), True)
+    assert parse_rendition('bogus', 'low') == (('full', 'low'), False)
+    print("清晰度档位测试通过")
+
+
+def test_auto_downgrades_slow_client():
+    """测试自动模式下持续丢帧的客户端会降档"""
+    broadcaster = MJPEGBroadcaster()
+    stream = broadcaster.stream(timeout=0.1, size='auto')
+    for value in range(1, 200, 4):
+        # 每次只取一帧、期间发布4帧，丢帧比例约75%
+        for _ in range(4):
+            broadcaster.publish(np.full((64, 64, 3), value, dtype=np.uint8))
+        next(stream)
+    renditions = broadcaster.get_stats()['renditions']
+    stream.close()
+    assert 'full/high' not in renditions, renditions
+    print(f"自动降档测试通过: {renditions}")
+
+
+def test_counters_consistent_across_clients():
+    """测试多个客户端线程同时收帧时发送计数不丢失"""
+    broadcaster = MJPEGBroadcaster()
+    received = []
+    stop = threading.Event()
+
+    def client():
+        stream = broadcaster.stream(timeout=0.05)
+        count = 0
+        while not stop.is_set() or count == 0:
+            next(stream)
+            count += 1
+        stream.close()
+        received.append(count)
+
+    threads = [threading.Thread(target=client) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for value in range(100):
+        broadcaster.publish(np.full((16, 16, 3), value, dtype=np.uint8))
+        time.sleep(0.002)
+    stop.set()
+    for _ in range(5):
+        broadcaster.publish(np.zeros((16, 16, 3), dtype=np.uint8))
+        time.sleep(0.05)
+    for thread in threads:
+        thread.join(timeout=2.0)
+
+    stats = broadcaster.get_stats()
+    assert len(received) == 8 and stats['subscribers'] == 0
+    assert stats['sent_count'] == sum(received)
+    print(f"多客户端计数测试通过: 发送 {stats['sent_count']}，丢帧 {stats['dropped_count']}")
+
+
+if __name__ == "__main__":
+    test_encode_once_for_many_clients()
+    test_slow_client_drops_frames()
+    test_renditions_encoded_lazily()
+    test_auto_downgrades_slow_client()
+    test_counters_consistent_across_clients()
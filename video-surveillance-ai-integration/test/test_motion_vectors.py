@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+运动矢量测试 - 验证向量化采样与逐点循环结果一致，以及危险识别器对两种格式的兼容
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+
+from models.motion.motion_manager import sample_motion_vectors, MOTION_VECTOR_DTYPE
+from danger_recognizer import _motion_vector_columns
+
+
+def loop_motion_vectors(flow, mag, step=16, mag_threshold=1.0):
+    """原逐点循环实现，作为对照"""
+    motion_vectors = []
+    for y in range(0, flow.shape[0], step):
+        for x in range(0, flow.shape[1], step):
+            fx, fy = flow[y, x]
+            if mag[y, x] > mag_threshold:
+                motion_vectors.append((x, y, fx, fy, mag[y, x]))
+    return motion_vectors
+
+
+def test_sample_matches_loop():
+    """测试向量化采样与逐点循环一致"""
+    rng = np.random.RandomState(0)
+    flow = (rng.randn(120, 200, 2) * 2).astype(np.float32)
+    mag = np.sqrt((flow ** 2).sum(axis=-1))
+
+    expected = loop_motion_vectors(flow, mag)
+    actual = sample_motion_vectors(flow, mag)
+
+    assert actual.dtype == MOTION_VECTOR_DTYPE
+    assert len(actual) == len(expected) > 0
+    for row, (x, y, fx, fy, m) in zip(actual, expected):
+        assert row['x'] == x and row['y'] == y
+        assert np.isclose(row['fx'], fx) and np.isclose(row['fy'], fy) and np.isclose(row['mag'], m)
+    print(f"向量化采样一致，共 {len(actual)} 个运动矢量")
+
+
+def test_columns_accept_both_formats():
+    """测试结构化数组与元组列表得到相同的列"""
+    vectors = [(16, 32, 1.5, -2.0, 2.5), (48, 0, 3.0, 4.0, 5.0)]
+    structured = np.array(vectors, dtype=MOTION_VECTOR_DTYPE)
+
+    for a, b in zip(_motion_vector_columns(vectors), _motion_vector_columns(structured)):
+        assert np.allclose(a, b)
+    assert _motion_vector_columns([]) is None
+    assert _motion_vector_columns(np.empty(0, dtype=MOTION_VECTOR_DTYPE)) is None
+    print("运动矢量格式兼容测试通过")
+
+
+if __name__ == "__main__":
+    test_sample_matches_loop()
+    test_columns_accept_both_formats()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+离线分析测试 - 验证片段切分与预热、按视频时间计时、分段处理不漏帧不重复，
+以及告警记录的帧号、时间戳和合并顺序
+"""
+
+import sys
+import os
+import json
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import cv2
+import numpy as np
+
+from offline_analysis import (Segment, VideoClock, analyze_segment, create_danger_recognizer, make_alert_record,
+                              merge_alerts, parse_args, plan_segments)
+
+
+def test_plan_segments():
+    """测试片段覆盖全部帧、预热向前延伸、最后一个片段读到文件末尾"""
+    segments = plan_segments(9000, 30.0, segment_seconds=60, warmup_seconds=2, workers=2)
+    assert [s.start for s in segments] == [0, 1800, 3600, 5400, 7200]
+    assert [s.end for s in segments] == [1800, 3600, 5400, 7200, None]
+    assert [s.warmup_start for s in segments] == [0, 1740, 3540, 5340, 7140]
+
+    # 进程多于片段时缩短片段，但不短于预热长度的4倍
+    segments = plan_segments(900, 30.0, segment_seconds=300, warmup_seconds=5, workers=8)
+    assert [(s.start, s.end) for s in segments] == [(0, 600), (600, None)]
+    segments = plan_segments(9000, 30.0, segment_seconds=300, warmup_seconds=2, workers=4)
+    assert len(segments) == 4
+
+    # 总帧数未知时整个文件一个片段
+    assert plan_segments(0, 25.0) == [Segment(0, 0, None, 0)]
+
+
+def test_video_clock_drives_dwell_time():
+    """测试识别器按视频时间计算停留时间：处理远快于实时时仍在视频中停留满1秒后告警"""
+    args = parse_args(['--source', 'unused.mp4', '--alert_region', '[(0,0),(100,0),(100,100),(0,100)]'])
+    recognizer = create_danger_recognizer(args, 30.0)
+    clock = VideoClock(1700000000.0, 30.0)
+    recognizer.clock = clock
+
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+    person = [{'bbox': [20, 20, 60, 90], 'class': 'person', 'confidence': 0.9}]
+    dwell = []
+    for frame_index in range(90):
+        clock.seek(frame_index)
+        for alert in recognizer.process_frame(frame, {}, person):
+            if alert['type'] == 'Danger Zone Dwell':
+                dwell.append((frame_index, alert['dwell_time']))
+    assert dwell, "视频中停留超过1秒应产生停留告警"
+    frame_index, dwell_time = dwell[0]
+    assert abs(dwell_time - 1.0) < 1e-6
+
+    record = make_alert_record({'type': 'Danger Zone Dwell', 'confidence': np.float32(0.9),
+                                'bbox': np.array([20, 20, 60, 90])}, frame_index, clock, 'cam1', 'day.mp4')
+    assert record['frame'] == frame_index
+    assert abs(record['timestamp'] - (1700000000.0 + frame_index / 30.0)) < 1e-6
+    assert record['video_offset_s'] == round(frame_index / 30.0, 3)
+    json.dumps(record)
+
+
+def test_segments_cover_every_frame_once():
+    """测试分段处理与整段处理解码的帧数相同，预热帧不重复计入；告警按帧号合并"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'clip.avi')
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 20.0, (160, 120))
+        for k in range(60):
+            frame = np.zeros((120, 160, 3), dtype=np.uint8)
+            cv2.rectangle(frame, (k * 2, 40), (k * 2 + 30, 90), (255, 255, 255), -1)
+            writer.write(frame)
+        writer.release()
+
+        args = parse_args(['--source', path, '--process_every', '1'])
+        single = analyze_segment(args, Segment(0, 0, None, 0), 20.0, 0.0)
+        segments = plan_segments(60, 20.0, segment_seconds=1, warmup_seconds=0.25, workers=3)
+        assert len(segments) == 3
+        results = [analyze_segment(args, segment, 20.0, 0.0) for segment in segments]
+
+    assert single['frames'] == 60 and single['processed'] == 60
+    assert sum(result['frames'] for result in results) == 60
+    # 每个后续片段多处理5帧预热
+    assert sum(result['processed'] for result in results) == 60 + 5 * 2
+
+    merged = merge_alerts([
+        {'segment': 1, 'alerts': [{'frame': 25, 'type': 'b'}, {'frame': 30, 'type': 'c'}]},
+        {'segment': 0, 'alerts': [{'frame': 3, 'type': 'a'}, {'frame': 25, 'type': 'a'}]},
+    ])
+    assert [(a['frame'], a['type']) for a in merged] == [(3, 'a'), (25, 'a'), (25, 'b'), (30, 'c')]
+
+
+if __name__ == "__main__":
+    print("离线分析测试...")
+    test_plan_segments()
+    test_video_clock_drives_dwell_time()
+    test_segments_cover_every_frame_once()
+    print("所有测试通过")
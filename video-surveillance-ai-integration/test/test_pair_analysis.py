@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+成对关系分析测试 - 验证网格近邻搜索不漏掉近距离/有重叠的组合、成对几何与逐对计算一致，
+以及按ID对保存的持续性记录
+"""
+
+import sys
+import os
+import time
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from pair_analysis import candidate_pairs, pair_geometry, estimate_real_distance, PairHistory
+from danger_recognizer import DangerRecognizer
+
+
+def random_person_boxes(rng, count):
+    x1 = rng.integers(0, 600, count)
+    y1 = rng.integers(0, 400, count)
+    w = rng.integers(30, 90, count)
+    h = rng.integers(60, 180, count)
+    return np.stack([x1, y1, x1 + w, y1 + h], axis=1)
+
+
+def test_candidate_pairs_match_brute_force():
+    """测试网格搜索得到的组合包含所有中心距离<=80或有重叠的两两组合"""
+    rng = np.random.default_rng(1)
+    boxes = random_person_boxes(rng, 40)
+
+    start = time.time()
+    i, j = candidate_pairs(boxes, margin=40)
+    geometry = pair_geometry(boxes, i, j)
+    grid_ms = (time.time() - start) * 1000
+    assert np.all(i < j)
+    found = {(a, b) for a, b, d, o in zip(i, j, geometry['pixel_distance'], geometry['overlap_area'])
+             if d <= 80 or o >= 60}
+
+    recognizer = DangerRecognizer({'save_alerts': False})
+    expected = set()
+    for a in range(len(boxes)):
+        for b in range(a + 1, len(boxes)):
+            c1 = ((boxes[a][0] + boxes[a][2]) // 2, (boxes[a][1] + boxes[a][3]) // 2)
+            c2 = ((boxes[b][0] + boxes[b][2]) // 2, (boxes[b][1] + boxes[b][3]) // 2)
+            d = np.hypot(c1[0] - c2[0], c1[1] - c2[1])
+            ow = min(boxes[a][2], boxes[b][2]) - max(boxes[a][0], boxes[b][0])
+            oh = min(boxes[a][3], boxes[b][3]) - max(boxes[a][1], boxes[b][1])
+            overlap = ow * oh if ow >= 0 and oh >= 0 else 0
+            if d <= 80 or overlap >= 60:
+                expected.add((a, b))
+                k = np.flatnonzero((i == a) & (j == b))[0]
+                assert abs(geometry['overlap_area'][k] - overlap) < 1e-9
+                real = recognizer._estimate_real_distance(boxes[a], boxes[b], c1[0], c1[1], c2[0], c2[1])
+                got = estimate_real_distance(geometry['center1'][k], geometry['center2'][k],
+                                             geometry['size1'][k], geometry['size2'][k], 640, 480)
+                assert abs(real - got) < 1e-6
+
+    assert found == expected, f"漏掉的组合: {expected - found}"
+    print(f"40人共780对，网格剪枝后 {len(i)} 对，符合条件 {len(found)} 对，耗时 {grid_ms:.2f}ms")
+
+
+def test_pair_history():
+    """测试持续性记录的环形缓冲、删除后行复用、扩容和过期清理"""
+    history = PairHistory(window=4, capacity=2)
+    row = history.start((1, 2), frame=10, now=100.0, motion=5.0, confidence=0.1)
+    for k in range(2, 7):
+        history.append(row, 100.0 + k, 5.0, k / 10)
+    assert history.duration[row] == 6 and history.start_frame[row] == 10
+    assert np.allclose(history.recent_confidence(row, 3), [0.4, 0.5, 0.6])
+    assert np.allclose(history.recent_confidence(row, 10), [0.3, 0.4, 0.5, 0.6])
+
+    history.start((3, 4), frame=11, now=50.0, motion=1.0, confidence=0.2)
+    history.start((5, 6), frame=12, now=106.0, motion=1.0, confidence=0.3)  # 触发扩容
+    assert len(history) == 3 and history.capacity == 4
+    assert history.get((1, 2)) == row and history.duration[row] == 6, "扩容后数据保留"
+
+    assert history.expire(now=106.0, max_age=5.0) == 1
+    assert (3, 4) not in history and (1, 2) in history
+    history.remove((1, 2))
+    assert history.start((7, 8), frame=13, now=107.0, motion=1.0, confidence=0.5) == row, "删除的行应被复用"
+    assert history.duration[row] == 1
+    history.clear()
+    assert len(history) == 0
+    print("持续性记录测试通过")
+
+
+def test_fighting_uses_each_pairs_own_size():
+    """测试打架检测按每一对自己的框大小判断“人物大小合理”，不沿用最后一对的大小；
+    持续性记录以排序后的 (person_id, person_id) 元组为键"""
+    recognizer = DangerRecognizer({'save_alerts': False, 'fighting_distance_threshold': 1,
+                                   'fighting_confidence_threshold': 0.0})
+    recognizer.current_frame = 100
+    persons = [
+        # 大框一对（面积7200）：重叠 5×120=600
+        {'bbox': [300, 100, 360, 220], 'class': 'person', 'person_id': 2},
+        {'bbox': [355, 100, 415, 220], 'class': 'person', 'person_id': 1},
+        # 小框一对（面积750，低于800）：重叠 20×30=600，排在最后
+        {'bbox': [0, 0, 25, 30], 'class': 'person', 'person_id': 3},
+        {'bbox': [5, 0, 30, 30], 'class': 'person', 'person_id': 4},
+    ]
+    assert recognizer._detect_fighting(persons, {'flow_mean_magnitude': 10.0}) == []
+
+    history = recognizer.fighting_history
+    assert len(history) == 2
+    assert (1, 2) in history and (3, 4) in history
+    large = float(history.recent_confidence(history.get((1, 2)), 1)[0])
+    small = float(history.recent_confidence(history.get((3, 4)), 1)[0])
+    # 两对的重叠和运动条件相同，只差“人物大小合理”的 +0.1
+    assert abs(large - small - 0.1) < 1e-6, f"大框 {large:.3f}，小框 {small:.3f}"
+    print("打架检测按配对大小判断测试通过")
+
+
+if __name__ == "__main__":
+    test_candidate_pairs_match_brute_force()
+    test_pair_history()
+    test_fighting_uses_each_pairs_own_size()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分阶段流水线测试 - 验证多线程流水线保持提交顺序、相邻阶段重叠执行、
+阶段出错时只丢弃该条目，以及各阶段的吞吐量和延迟统计
+"""
+
+import sys
+import os
+import time
+import threading
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from pipeline import Stage, StagePipeline
+
+
+def make_stages(delay, log):
+    """三个阶段：每个阶段耗时 delay 秒，并记录处理顺序和执行线程"""
+    def stage(name):
+        def fn(item):
+            time.sleep(delay)
+            item.append(name)
+            log.append((name, item[0], threading.current_thread().name))
+        return Stage(name, fn, queue_size=2)
+    return [stage('a'), stage('b'), stage('c')]
+
+
+def test_threaded_pipeline_overlaps_and_keeps_order():
+    """测试三阶段各20ms、20个条目：流水线总耗时接近 (20+2)*20ms，远小于串行的 20*60ms，且顺序不变"""
+    results = {}
+    for threaded in (False, True):
+        log, done = [], []
+        stages = make_stages(0.02, log)
+        stages[-1].fn = (lambda fn: lambda item: (fn(item), done.append(item[0])))(stages[-1].fn)
+        pipeline = StagePipeline(stages, name='test', threaded=threaded)
+        pipeline.start()
+        start = time.time()
+        for k in range(20):
+            pipeline.submit([k])
+        while len(done) < 20:
+            time.sleep(0.005)
+        results[threaded] = time.time() - start
+        pipeline.stop()
+
+        assert done == list(range(20)), "输出顺序应与提交顺序一致"
+        for name in 'abc':
+            assert [k for n, k, _ in log if n == name] == list(range(20))
+        threads = {n: {t for m, _, t in log if m == n} for n in 'abc'}
+        stats = pipeline.get_stats()
+        assert stats['in_flight'] == 0 and stats['end_to_end']['count'] == 20
+        assert all(stats['stages'][n]['count'] == 20 and stats['stages'][n]['p50_ms'] >= 19 for n in 'abc')
+        if threaded:
+            assert all(len(t) == 1 for t in threads.values()) and len(set.union(*threads.values())) == 3
+            assert stats['end_to_end']['p95_ms'] > stats['stages']['a']['p95_ms']
+    assert results[True] < 0.6 * results[False]
+    print(f"串行 {results[False] * 1000:.0f}ms，流水线 {results[True] * 1000:.0f}ms")
+
+
+def test_stage_error_drops_only_that_item():
+    """测试某个条目在中间阶段出错时调用 on_error，后续条目照常通过"""
+    dropped, done = [], []
+
+    def fail_on_three(item):
+        if item == 3:
+            raise ValueError("bad item")
+
+    pipeline = StagePipeline([
+        Stage('first', lambda item: None),
+        Stage('middle', fail_on_three),
+        Stage('last', done.append),
+    ], name='errors', on_error=lambda item, stage, exc: dropped.append((item, stage)))
+    pipeline.start()
+    for k in range(6):
+        pipeline.submit(k)
+    pipeline.stop()
+    assert done == [0, 1, 2, 4, 5] and dropped == [(3, 'middle')]
+    stats = pipeline.get_stats()
+    assert stats['stages']['middle']['errors'] == 1 and stats['in_flight'] == 0
+    assert pipeline.depth == 9
+    print("阶段出错测试通过")
+
+
+if __name__ == "__main__":
+    test_threaded_pipeline_overlaps_and_keeps_order()
+    test_stage_error_drops_only_that_item()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+光流区域门控测试 - 验证只在变化区域计算的光流与整帧光流的统计结果一致，
+静止帧跳过光流计算，以及人员框会并入计算区域
+"""
+
+import sys
+import os
+import time
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from models.motion.motion_manager import MotionFeatureManager, find_active_regions, merge_regions
+
+
+def textured_frames(count, size=(480, 640), square=80, speed=4, seed=0):
+    """静态纹理背景上一个带纹理的方块水平移动"""
+    rng = np.random.default_rng(seed)
+    background = cv2_blur(rng.integers(0, 255, size, dtype=np.uint8))
+    patch = cv2_blur(rng.integers(0, 255, (square, square), dtype=np.uint8))
+    frames = []
+    for k in range(count):
+        gray = background.copy()
+        x = 200 + k * speed
+        gray[200:200 + square, x:x + square] = patch
+        frames.append(np.dstack([gray] * 3))
+    return frames
+
+
+def cv2_blur(image):
+    import cv2
+    return cv2.GaussianBlur(image, (5, 5), 0)
+
+
+def run(manager, frames, **kwargs):
+    results = []
+    for frame in frames:
+        results.append(manager.extract_features(frame, **kwargs))
+    return results[1:]
+
+
+def test_gated_flow_matches_full_frame():
+    """测试门控光流的均值/最大值/运动矢量与整帧光流一致"""
+    frames = textured_frames(6)
+    full = MotionFeatureManager(use_contour=False)
+    gated = MotionFeatureManager(use_contour=False, roi_gating=True)
+
+    start = time.time()
+    full_features = run(full, frames)
+    full_ms = (time.time() - start) * 1000
+    start = time.time()
+    gated_features = run(gated, frames)
+    gated_ms = (time.time() - start) * 1000
+
+    for f, g in zip(full_features, gated_features):
+        assert len(g['flow_regions']) == 1
+        assert abs(g['flow_mean_magnitude'] - f['flow_mean_magnitude']) < 0.05 * f['flow_mean_magnitude']
+        assert abs(g['flow_max_magnitude'] - f['flow_max_magnitude']) < 0.1 * f['flow_max_magnitude']
+        assert g['flow_magnitude'].shape == f['flow_magnitude'].shape
+        full_points = set(zip(f['motion_vectors']['x'], f['motion_vectors']['y']))
+        gated_points = set(zip(g['motion_vectors']['x'], g['motion_vectors']['y']))
+        assert len(full_points ^ gated_points) <= 0.1 * len(full_points)
+    print(f"整帧光流 {full_ms:.1f}ms，门控光流 {gated_ms:.1f}ms（{len(frames) - 1} 帧）")
+
+
+def test_static_frame_skips_flow():
+    """测试静止帧不计算光流但仍输出统计字段，人员框并入计算区域"""
+    frame = textured_frames(1)[0]
+    manager = MotionFeatureManager(use_contour=False, roi_gating=True)
+    calls = []
+    compute = manager._compute_flow
+    manager._compute_flow = lambda prev, gray, *args: calls.append(gray.shape) or compute(prev, gray, *args)
+
+    manager.extract_features(frame)
+    features = manager.extract_features(frame.copy(), person_boxes=[[10, 10, 60, 120]])
+    assert not calls and features['flow_regions'] == []
+    assert features['flow_mean_magnitude'] == 0 and features['flow_max_magnitude'] == 0
+    assert len(features['motion_vectors']) == 0
+    # 连续静止帧共用同一组只读全零数组，不再逐帧分配
+    static = manager.extract_features(frame.copy())
+    assert static['optical_flow'] is features['optical_flow'] and not static['optical_flow'].flags.writeable
+    assert static['optical_flow'].shape == frame.shape[:2] + (2,) and not static['flow_magnitude'].any()
+
+    moved = textured_frames(2)[1]
+    features = manager.extract_features(moved, person_boxes=[[10, 10, 60, 120]])
+    assert len(calls) == 2 and len(features['flow_regions']) == 2
+
+    regions = find_active_regions(frame[..., 0], moved[..., 0])
+    assert regions and all(x1 <= 204 and x2 >= 284 for x1, y1, x2, y2 in regions)
+    assert merge_regions([(0, 0, 10, 10), (20, 0, 30, 10)], (100, 100), padding=8) == [(0, 0, 41, 21)]
+    print("静止帧跳过光流测试通过")
+
+
+if __name__ == "__main__":
+    test_gated_flow_matches_full_frame()
+    test_static_frame_skips_flow()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+多目标跟踪引擎测试 - 验证向量化IOU、一对一最优分配、卡尔曼预测下交叉运动的ID保持、
+轨迹状态流转，以及 DangerRecognizer 每帧只推进一次跟踪、渲染滞后的帧不推进跟踪
+"""
+
+import sys
+import os
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import tracking_engine
+from tracking_engine import TrackingEngine, iou_matrix, linear_assignment, CONFIRMED, LOST, TENTATIVE
+from danger_recognizer import DangerRecognizer
+
+
+def test_iou_matrix_and_assignment():
+    """测试IOU矩阵与逐对计算一致，分配结果不会把同一检测分给两条轨迹"""
+    a = [[0, 0, 10, 10], [5, 5, 15, 15]]
+    b = [[0, 0, 10, 10], [20, 20, 30, 30], [5, 0, 15, 10]]
+    iou = iou_matrix(a, b)
+    assert iou.shape == (2, 3)
+    assert abs(iou[0, 0] - 1.0) < 1e-9 and iou[0, 1] == 0.0
+    assert abs(iou[0, 2] - 50 / 150) < 1e-9 and abs(iou[1, 0] - 25 / 175) < 1e-9
+
+    # 两条轨迹都和第0个检测最接近：逐个检测取最优会重复分配，这里的结果必须一对一
+    cost = np.array([[1.0, 2.0], [1.5, 10.0]])
+    valid = np.ones_like(cost, dtype=bool)
+    saved = tracking_engine.HAS_SCIPY
+    try:
+        tracking_engine.HAS_SCIPY = False
+        greedy = sorted(linear_assignment(cost, valid))
+    finally:
+        tracking_engine.HAS_SCIPY = saved
+    assert greedy == [(0, 0), (1, 1)]
+    if tracking_engine.HAS_SCIPY:
+        assert sorted(linear_assignment(cost, valid)) == [(0, 1), (1, 0)], "最优分配应使总代价最小"
+    valid[1, 0] = False
+    assert sorted(linear_assignment(cost, valid)) == [(0, 0), (1, 1)], "不允许的位置不能分配"
+    print("IOU矩阵与分配测试通过")
+
+
+def test_crossing_tracks_keep_ids():
+    """测试两人相向而行交叉时，卡尔曼预测使ID保持不变，且同一帧内不会出现重复ID"""
+    engine = TrackingEngine(iou_threshold=0.3, distance_threshold=75, min_hits=3)
+    history = []
+    for f in range(30):
+        left = [20 + 12 * f, 100, 60 + 12 * f, 200]
+        right = [400 - 12 * f, 110, 440 - 12 * f, 210]
+        ids = engine.update([left, right])
+        assert len(set(ids)) == 2, f"第{f}帧出现重复ID: {ids}"
+        history.append(ids)
+    assert history[0] == history[-1] == [1, 2], f"交叉后ID发生了交换: {history[0]} -> {history[-1]}"
+    assert all(t.state == CONFIRMED for t in engine.tracks.values())
+    print(f"交叉运动ID保持测试通过: {history[0]} -> {history[-1]}")
+
+
+def test_lifecycle_states():
+    """测试 tentative -> confirmed -> lost -> 删除 的状态流转，以及遮挡后重新出现保持原ID"""
+    engine = TrackingEngine(min_hits=3, max_missing=5, tentative_max_missing=2)
+    box = [100, 100, 150, 200]
+    engine.update([box])
+    assert engine.tracks[1].state == TENTATIVE
+    engine.update([box])
+    engine.update([box])
+    assert engine.tracks[1].state == CONFIRMED
+
+    engine.update([])
+    assert engine.tracks[1].state == LOST
+    assert engine.update([box]) == [1], "短暂遮挡后应恢复原ID"
+    assert engine.tracks[1].state == CONFIRMED
+
+    # 跳帧处理：frame_index 间隔超过 max_missing 时轨迹被删除
+    engine.update([], frame_index=engine.frame_index + 6)
+    assert 1 not in engine.tracks
+
+    # tentative 轨迹丢失超过 tentative_max_missing 即删除
+    engine.update([[300, 300, 340, 380]])
+    engine.update([])
+    engine.update([])
+    assert len(engine.tracks) == 1
+    engine.update([])
+    assert len(engine.tracks) == 0
+    print(f"轨迹状态流转测试通过: {engine.get_stats()}")
+
+
+def test_recognizer_tracks_once_per_frame():
+    """测试 DangerRecognizer 同一帧内多次调用 update_person_tracking 不会重复推进跟踪"""
+    recognizer = DangerRecognizer({'save_alerts': False})
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    for f in range(5):
+        detections = [
+            {'class': 'person', 'bbox': [100 + 5 * f, 100, 150 + 5 * f, 220], 'confidence': 0.9},
+            {'class': 'person', 'bbox': [300, 100, 350, 220], 'confidence': 0.9},
+            {'class': 'chair', 'bbox': [0, 0, 20, 20], 'confidence': 0.9},
+        ]
+        recognizer.process_frame(frame, [], detections)
+        recognizer.visualize(frame, [], detections=[dict(d) for d in detections])
+        recognizer.update_person_tracking(detections)
+        assert [d.get('person_id') for d in detections] == [1, 2, None]
+
+    tracked = recognizer.tracked_persons
+    assert sorted(tracked) == [1, 2]
+    assert tracked[1]['consecutive_frames'] == 5, "每帧只应推进一次跟踪"
+    assert tracked[1]['state'] == CONFIRMED
+
+    recognizer.reset()
+    assert recognizer.tracked_persons == {}
+    print("每帧一次跟踪测试通过")
+
+
+def test_lagging_render_does_not_advance_tracking():
+    """测试流水线渲染第k帧时识别器已处理第k+1帧（无检测），按识别时的ID绘制、不再推进跟踪"""
+    recognizer = DangerRecognizer({'save_alerts': False})
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    detections = [{'class': 'person', 'bbox': [100, 100, 150, 220], 'confidence': 0.9}]
+    for f in range(3):
+        frame_k = [dict(d) for d in detections]
+        recognizer.process_frame(frame, [], frame_k)
+    recognizer.process_frame(frame, [], None)  # 第k+1帧：没有检测结果
+
+    before = recognizer.tracked_persons
+    recognizer.visualize(frame, [], detections=frame_k, track=False)
+    assert recognizer.tracked_persons == before, "渲染滞后的帧不应推进跟踪"
+    assert frame_k[0]['person_id'] == 1
+    print("渲染不推进跟踪测试通过")
+
+
+if __name__ == "__main__":
+    test_iou_matrix_and_assignment()
+    test_crossing_tracks_keep_ids()
+    test_lifecycle_states()
+    test_recognizer_tracks_once_per_frame()
+    test_lagging_render_does_not_advance_tracking()
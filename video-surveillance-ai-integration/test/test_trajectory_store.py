@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+轨迹存储测试 - 验证环形缓冲的轨迹数据、增量计算的速度/静止/方向变化/覆盖面积与按列表重新计算的结果一致，
+以及轨迹删除后行复用、每条轨迹内存固定
+"""
+
+import sys
+import os
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from models.trajectory import TrajectoryStore, TrajectoryManager, ObjectTrajectory
+
+
+def reference_stats(points, speeds):
+    """按列表重新计算最近10个速度的均值和覆盖面积（原 TrajectoryManager 的做法）"""
+    avg_speed = np.mean(speeds[-min(10, len(speeds)):]) if speeds else None
+    pts = np.array(points)
+    area = (pts[:, 0].max() - pts[:, 0].min()) * (pts[:, 1].max() - pts[:, 1].min())
+    return avg_speed, area
+
+
+def test_store_matches_list_computation():
+    """测试随机游走下（含环形缓冲回绕、轨迹删除与新建）各项统计与列表计算一致"""
+    rng = np.random.default_rng(3)
+    max_length = 8
+    store = TrajectoryStore(max_length=max_length, capacity=2)
+    reference = {}  # id -> (位置列表, 时间列表, 速度列表, 方向变化数)
+    positions = {i: rng.uniform(0, 500, 2) for i in range(12)}
+    t = 100.0
+    for frame in range(60):
+        t += 0.04
+        ids = [i for i in positions if rng.random() < 0.8]
+        for i in ids:
+            positions[i] = positions[i] + rng.normal(0, 5, 2)
+        store.update(ids, [positions[i] for i in ids], timestamp=t)
+
+        for i in ids:
+            pts, times, speeds, turns = reference.setdefault(i, ([], [], [], 0))
+            pts.append(tuple(positions[i]))
+            times.append(t)
+            if len(pts) >= 2:
+                d = np.hypot(pts[-1][0] - pts[-2][0], pts[-1][1] - pts[-2][1])
+                speeds.append(d / (times[-1] - times[-2]))
+            if len(pts) >= 3:
+                v1 = np.subtract(pts[-2], pts[-3])
+                v2 = np.subtract(pts[-1], pts[-2])
+                cos = np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2))
+                turns += np.degrees(np.arccos(np.clip(cos, -1, 1))) > 45
+            reference[i] = (pts[-max_length:], times[-max_length:], speeds[-max_length:], turns)
+
+        if frame == 30:
+            store.remove(0)
+            reference.pop(0)
+            positions.pop(0)
+
+    assert sorted(store.ids()) == sorted(reference)
+    for i, (pts, times, speeds, turns) in reference.items():
+        data = store.as_dict(i)
+        assert np.allclose(data['positions'], pts) and np.allclose(data['timestamps'], times)
+        assert np.allclose(data['speeds'], speeds)
+        avg_speed, area = reference_stats(pts, speeds)
+        assert data['direction_changes'] == turns
+        assert abs(data['area_covered'] - area) < 1e-6
+        if avg_speed is not None:
+            assert data['is_stationary'] == (avg_speed < 5.0)
+    assert store.capacity == 16, "12条轨迹从容量2按倍数扩容"
+    print(f"增量统计一致，每条轨迹 {store.nbytes_per_track()} 字节")
+
+
+def test_manager_and_object_trajectory():
+    """测试 TrajectoryManager 输出的轨迹字典字段，以及 ObjectTrajectory 的历史长度固定"""
+    class Obj:
+        def __init__(self, obj_id, x):
+            self.id, self.x1, self.y1, self.x2, self.y2 = obj_id, x, 100, x + 20, 140
+            self.class_name, self.confidence = 'person', 0.9
+
+    manager = TrajectoryManager(max_trajectory_length=5, max_disappeared=2)
+    for f in range(10):
+        manager.update([Obj(1, 10 * f), Obj(2, 300)])
+    trajectories = {t['id']: t for t in manager.get_active_trajectories()}
+    assert len(trajectories[1]['positions']) == 5 and trajectories[1]['position'] == (100.0, 120.0)
+    assert trajectories[2]['is_stationary'] and trajectories[2]['area_covered'] == 0
+    assert trajectories[1]['area_covered'] == 0 and trajectories[1]['direction_changes'] == 0
+    for _ in range(3):
+        manager.update([Obj(1, 100)])
+    assert manager.get_trajectory(2) is None, "消失超过 max_disappeared 帧的轨迹应删除"
+
+    trajectory = ObjectTrajectory(max_history=4)
+    for f in range(20):
+        trajectory.update({'id': 1, 'box': [f * 5, 0, f * 5 + 10, 20], 'class_name': 'person'}, [], f)
+    assert len(trajectory.positions) == 4 and trajectory.positions[-1] == (100.0, 10.0, 19)
+    assert len(trajectory.velocities) == 4 and trajectory.velocities[0] == (5.0, 0.0, 16)
+    assert trajectory.get_features()['trajectory_length'] == 4
+    assert abs(trajectory.avg_speed - 5.0) < 1e-9 and trajectory.area_covered == 0
+    print("轨迹管理器与对象轨迹测试通过")
+
+
+if __name__ == "__main__":
+    test_store_matches_list_computation()
+    test_manager_and_object_trajectory()
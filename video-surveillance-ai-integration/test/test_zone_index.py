@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+危险区域空间索引测试 - 验证栅格索引的区域判定、距离与逐点 cv2.pointPolygonTest 的结果一致，
+以及区域变化时索引重建
+"""
+
+import sys
+import os
+import time
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from danger_recognizer import DangerRecognizer
+
+
+def random_regions(rng, count):
+    regions = []
+    for _ in range(count):
+        cx, cy = rng.integers(50, 590), rng.integers(50, 430)
+        angles = np.sort(rng.uniform(0, 2 * np.pi, rng.integers(3, 8)))
+        radius = rng.uniform(10, 60, len(angles))
+        regions.append([(int(cx + r * np.cos(a)), int(cy + r * np.sin(a))) for a, r in zip(angles, radius)])
+    return regions
+
+
+def random_bboxes(rng, count):
+    x1 = rng.integers(-20, 620, count)
+    y1 = rng.integers(-20, 460, count)
+    return np.stack([x1, y1, x1 + rng.integers(10, 80, count), y1 + rng.integers(20, 160, count)], axis=1).tolist()
+
+
+def test_matches_point_polygon_test():
+    """测试索引查表与逐个区域调用 _check_bbox_intersection / _calculate_distance_to_region 的结果一致"""
+    rng = np.random.default_rng(0)
+    recognizer = DangerRecognizer({'save_alerts': False, 'danger_zone_approach_distance': 50})
+    for i, region in enumerate(random_regions(rng, 20)):
+        recognizer.add_alert_region(region, f"区域{i}")
+    bboxes = random_bboxes(rng, 300)
+
+    start = time.time()
+    in_zone, distance = recognizer._query_zones(bboxes)
+    index_ms = (time.time() - start) * 1000
+
+    start = time.time()
+    mismatched_inside = mismatched_distance = 0
+    for n, bbox in enumerate(bboxes):
+        for r, region in enumerate(recognizer.alert_regions):
+            if recognizer._check_bbox_intersection(bbox, region['points']) != in_zone[n, r]:
+                mismatched_inside += 1
+            if not in_zone[n].any():
+                expected = recognizer._calculate_distance_to_region(bbox, region['points'])
+                got = distance[n, r]
+                if (expected < 49 and abs(got - expected) > 1.5) or (expected > 51 and np.isfinite(got)):
+                    mismatched_distance += 1
+    loop_ms = (time.time() - start) * 1000
+
+    total = len(bboxes) * len(recognizer.alert_regions)
+    # 只允许多边形边界上个别像素的栅格化差异
+    assert mismatched_inside <= total * 0.002, f"区域判定不一致 {mismatched_inside}/{total}"
+    assert mismatched_distance <= total * 0.002, f"距离不一致 {mismatched_distance}/{total}"
+    print(f"索引查表 {index_ms:.2f}ms，逐点计算 {loop_ms:.2f}ms，不一致 {mismatched_inside}/{mismatched_distance}")
+
+
+def test_rebuild_on_region_change():
+    """测试区域增删或接近距离变化后索引重建，区域不变时复用"""
+    recognizer = DangerRecognizer({'save_alerts': False})
+    recognizer.add_alert_region([(100, 100), (300, 100), (300, 300), (100, 300)], "禁区1")
+    index = recognizer._get_zone_index()
+    assert recognizer._get_zone_index() is index
+
+    in_zone, _ = recognizer._query_zones([[150, 150, 200, 250], [400, 400, 450, 470]])
+    assert in_zone[:, 0].tolist() == [True, False]
+
+    recognizer.add_alert_region([(400, 400), (500, 400), (500, 500)], "禁区2")
+    assert recognizer._get_zone_index() is not index and len(recognizer._get_zone_index()) == 2
+    in_zone, _ = recognizer._query_zones([[150, 150, 200, 250], [450, 410, 470, 430]])
+    assert in_zone.tolist() == [[True, False], [False, True]]
+
+    index = recognizer._get_zone_index()
+    recognizer.config['danger_zone_approach_distance'] = 80
+    assert recognizer._get_zone_index() is not index
+
+    recognizer.clear_alert_regions()
+    in_zone, distance = recognizer._query_zones([[150, 150, 200, 250]])
+    assert in_zone.shape == (1, 0) and distance.shape == (1, 0)
+    print("索引重建测试通过")
+
+
+if __name__ == "__main__":
+    test_matches_point_polygon_test()
+    test_rebuild_on_region_change()